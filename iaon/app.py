@@ -6,13 +6,39 @@ import random
 import re
 import phonenumbers
 from phonenumbers import geocoder, carrier
-from flask import Flask, send_from_directory, request, jsonify, session
+from flask import Flask, send_from_directory, send_file, request, jsonify, session
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import or_
+from sqlalchemy import or_, inspect, text, event, select
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import time
 import uuid
+from collections import Counter
 from datetime import datetime, timedelta
+from functools import lru_cache
+from text_search import build_search_text, search_terms
+from voice_match import VoiceMatchIndex, APP_REASONS
+from intent_router import IntentClassifier
+from emotional_state import EmotionalStateCache, MoodWindow, WINDOW_SIZE, WINDOW_DAYS
+from job_queue import JobQueue
+from notification_scheduler import NotificationScheduler, naive_utc
+from response_cache import ResponseCache, backend_from_url
+from metrics_rollup import MetricRollups, DailyCounters, TOTAL, DAY, HOUR, timeline
+from db_upsert import consistent_read
+from backup_archive import ArchiveReader, ArchiveWriter, load_key as load_backup_key, verify_archive
+from backup_restore import BackupRestorer
+from ledger import BalanceLedger, signed_amount
+from bank_statement import parse_statement, dedupe_key
+from finance_analytics import MonthlyCategoryTotals, month_key, months_between, shift_month
+from pagination import Keyset, InvalidCursor, paginate, page_limit, page_info, stream_response
+from serving import engine_options
+from schema_bootstrap import SchemaBootstrap
+from speaker_scoring import SpeakerScoringEngine, MeetingProfileCache, participant_profile
+from audio_stream import SUPPORTED_ENCODINGS, DEFAULT_SAMPLE_RATE, BYTES_PER_SAMPLE, frame_size_bytes, iter_frames, tee_frames, segment_speech
+from wake_word import POWER_PROFILES, DEFAULT_POWER_MODE, WakeWordDetector, WakeWordStream, extract_template, template_to_bytes, template_from_bytes
+from audio_features import analyze_audio, summarize as summarize_audio, extract_features as extract_voice_features, audio_quality as audio_quality_from_summary, formants_dict, vocal_tract_length
 # from subscription_system import create_subscription_routes  # Comentado temporariamente
 
 # Criar instância única do SQLAlchemy
@@ -55,27 +81,32 @@ else:
     app.config['AUTO_INIT_DB'] = False
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_pre_ping': True,
-    'pool_recycle': 300,
-}
+app.config['MEETING_RECORDINGS_DIR'] = os.getenv('MEETING_RECORDINGS_DIR', os.path.join(os.path.dirname(__file__), 'recordings'))
+# Arquivos de backup dos usuários; com IAON_BACKUP_KEY (32 bytes em base64) os backups são criptografados
+app.config['BACKUP_DIR'] = os.getenv('IAON_BACKUP_DIR', os.path.join(os.path.dirname(__file__), 'backups'))
+app.config['BACKUP_KEY'] = os.getenv('IAON_BACKUP_KEY', '')
+# Pool dimensionado pelo gunicorn.conf.py (serving.py) em produção
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+# Threads da fila de tarefas por processo (0 = este processo só enfileira)
+app.config['JOB_WORKERS'] = int(os.getenv('IAON_JOB_WORKERS', '4'))
+# Agendador que entrega as notificações com scheduled_for (0 = desligado neste processo)
+app.config['NOTIFICATION_SCHEDULER'] = os.getenv('IAON_NOTIFICATION_SCHEDULER', '1') == '1'
+# Cache de respostas do catálogo: vazio = LRU em memória por processo; redis://... = compartilhado entre workers
+app.config['CACHE_URL'] = os.getenv('IAON_CACHE_URL', '')
 
 # Inicializar banco de dados
 db.init_app(app)
 
-# Middleware para Railway
+# Cache dos endpoints de catálogo (planos, coaches, listas estáticas)
+response_cache = ResponseCache(backend_from_url(app.config['CACHE_URL']))
+
+# O esquema é preparado na partida do processo (schema_bootstrap), não nas requisições
 @app.before_request
 def before_request():
-    """Middleware para inicialização do banco em Railway"""
-    # Garantir que o banco está inicializado
-    if app.config.get('AUTO_INIT_DB', False) and not hasattr(app, '_db_initialized'):
-        with app.app_context():
-            try:
-                db.create_all()
-                app._db_initialized = True
-                print("✅ Banco de dados inicializado com sucesso")
-            except Exception as e:
-                print(f"❌ Erro na inicialização do banco: {e}")
+    """Iniciar os serviços de segundo plano deste processo"""
+    # Fila de tarefas e agendador de notificações deste processo (iniciam uma vez, depois do fork do gunicorn)
+    job_queue.start()
+    notification_scheduler.start()
 
 @app.after_request
 def after_request(response):
@@ -89,6 +120,10 @@ def after_request(response):
 # Modelos avançados
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_created_at', 'created_at'),
+        db.Index('ix_users_last_activity', 'last_activity'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -213,6 +248,9 @@ class User(db.Model):
 
 class VoiceBiometry(db.Model):
     __tablename__ = 'voice_biometry'
+    __table_args__ = (
+        db.Index('ix_voice_biometry_user_id_is_owner', 'user_id', 'is_owner'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -250,8 +288,24 @@ class VoiceBiometry(db.Model):
             'permissions': '🔒 Pode controlar IAON' if self.command_authority else '👁️ Apenas reconhecimento'
         }
 
+class TriggerWordTemplate(db.Model):
+    __tablename__ = 'trigger_word_templates'
+    __table_args__ = (
+        db.Index('ix_trigger_word_templates_user_word_created', 'user_id', 'trigger_word', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    trigger_word = db.Column(db.String(50), nullable=False)  # custom_trigger_word na hora da gravação
+    mfcc = db.Column(db.LargeBinary, nullable=False)  # MFCCs float32 (quadros x 12) de wake_word.extract_template
+    frame_count = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Conversation(db.Model):
     __tablename__ = 'conversations'
+    __table_args__ = (
+        db.Index('ix_conversations_user_id_session_id', 'user_id', 'session_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -264,6 +318,9 @@ class Conversation(db.Model):
 
 class Message(db.Model):
     __tablename__ = 'messages'
+    __table_args__ = (
+        db.Index('ix_messages_conversation_id_created_at', 'conversation_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
@@ -274,6 +331,9 @@ class Message(db.Model):
 
 class MeetingSession(db.Model):
     __tablename__ = 'meeting_sessions'
+    __table_args__ = (
+        db.Index('ix_meeting_sessions_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -287,6 +347,13 @@ class MeetingSession(db.Model):
     agenda_generated = db.Column(db.Boolean, default=False)
     total_participants = db.Column(db.Integer, default=0)
     quality_score = db.Column(db.Float, default=0.0)  # Qualidade da gravação/transcrição
+    # Agregados das transcrições, atualizados a cada MeetingTranscript inserido
+    transcripts_count = db.Column(db.Integer, default=0)
+    total_words = db.Column(db.Integer, default=0)
+    action_items_count = db.Column(db.Integer, default=0)
+    decisions_count = db.Column(db.Integer, default=0)
+    confidence_sum = db.Column(db.Float, default=0.0)
+    profiles_version = db.Column(db.Integer, default=0)  # Versão dos perfis de voz (cache de identificação)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -304,6 +371,16 @@ class MeetingSession(db.Model):
             'duration_minutes': self.get_duration_minutes()
         }
     
+    def get_statistics(self):
+        """Estatísticas das transcrições (leitura dos agregados, sem varrer transcrições)"""
+        return {
+            'total_transcripts': self.transcripts_count or 0,
+            'total_words': self.total_words or 0,
+            'action_items_count': self.action_items_count or 0,
+            'decisions_count': self.decisions_count or 0,
+            'average_confidence': (self.confidence_sum or 0.0) / self.transcripts_count if self.transcripts_count else 0.0
+        }
+    
     def get_duration_minutes(self):
         if self.start_time and self.end_time:
             return int((self.end_time - self.start_time).total_seconds() / 60)
@@ -314,6 +391,10 @@ class MeetingSession(db.Model):
 class KnownParticipant(db.Model):
     """Participantes conhecidos do sistema - memória de participantes"""
     __tablename__ = 'known_participants'
+    __table_args__ = (
+        db.Index('ix_known_participants_user_id_is_frequent_meeting_count', 'user_id', 'is_frequent', 'meeting_count'),
+        db.Index('ix_known_participants_user_id_email', 'user_id', 'email'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)  # Dono dos participantes
@@ -350,6 +431,9 @@ class KnownParticipant(db.Model):
 
 class MeetingParticipant(db.Model):
     __tablename__ = 'meeting_participants'
+    __table_args__ = (
+        db.Index('ix_meeting_participants_meeting_id_known_participant_id', 'meeting_id', 'known_participant_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     meeting_id = db.Column(db.Integer, db.ForeignKey('meeting_sessions.id'), nullable=False)
@@ -360,9 +444,11 @@ class MeetingParticipant(db.Model):
     email = db.Column(db.String(120))
     speaking_time_minutes = db.Column(db.Float, default=0.0)
     interventions_count = db.Column(db.Integer, default=0)
+    words_count = db.Column(db.Integer, default=0)
     confidence_level = db.Column(db.Float, default=0.0)  # Confiança no reconhecimento
     is_verified = db.Column(db.Boolean, default=False)  # Se foi verificado por biometria
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Backup incremental
     
     # Relacionamento com participante conhecido
     known_participant = db.relationship('KnownParticipant', backref='meeting_participations')
@@ -375,6 +461,7 @@ class MeetingParticipant(db.Model):
             'email': self.email,
             'speaking_time_minutes': self.speaking_time_minutes,
             'interventions_count': self.interventions_count,
+            'words_count': self.words_count or 0,
             'confidence_level': self.confidence_level,
             'is_verified': self.is_verified,
             'known_participant_id': self.known_participant_id,
@@ -383,6 +470,9 @@ class MeetingParticipant(db.Model):
 
 class MeetingTranscript(db.Model):
     __tablename__ = 'meeting_transcripts'
+    __table_args__ = (
+        db.Index('ix_meeting_transcripts_meeting_id_start_time_seconds', 'meeting_id', 'start_time_seconds'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     meeting_id = db.Column(db.Integer, db.ForeignKey('meeting_sessions.id'), nullable=False)
@@ -415,6 +505,9 @@ class MeetingTranscript(db.Model):
 
 class MeetingAgenda(db.Model):
     __tablename__ = 'meeting_agendas'
+    __table_args__ = (
+        db.Index('ix_meeting_agendas_meeting_id', 'meeting_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     meeting_id = db.Column(db.Integer, db.ForeignKey('meeting_sessions.id'), nullable=False)
@@ -449,6 +542,11 @@ class MeetingAgenda(db.Model):
 
 class Contact(db.Model):
     __tablename__ = 'contacts'
+    __table_args__ = (
+        db.Index('uq_contacts_user_id_phone_number', 'user_id', 'phone_number', unique=True),
+        db.Index('ix_contacts_user_id_name', 'user_id', 'name'),
+        db.Index('ix_contacts_user_id_call_frequency', 'user_id', 'call_frequency'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -524,8 +622,36 @@ class Contact(db.Model):
         
         return score
 
+class ContactSyncState(db.Model):
+    """Cursor de sincronização de contatos por usuário/origem (sync delta)"""
+    __tablename__ = 'contact_sync_states'
+    __table_args__ = (
+        db.Index('uq_contact_sync_states_user_id_sync_source', 'user_id', 'sync_source', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    sync_source = db.Column(db.String(50), nullable=False, default='phone_sync')
+    sync_token = db.Column(db.String(64), nullable=False)  # Token devolvido ao cliente na última sincronização
+    last_full_sync = db.Column(db.DateTime)
+    last_synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+    contacts_received = db.Column(db.Integer, default=0)  # Contatos recebidos na última sincronização
+    
+    def to_dict(self):
+        return {
+            'sync_source': self.sync_source,
+            'sync_token': self.sync_token,
+            'last_full_sync': self.last_full_sync.isoformat() if self.last_full_sync else None,
+            'last_synced_at': self.last_synced_at.isoformat() if self.last_synced_at else None,
+            'contacts_received': self.contacts_received
+        }
+
 class CallLog(db.Model):
     __tablename__ = 'call_logs'
+    __table_args__ = (
+        db.Index('ix_call_logs_user_id_initiated_at', 'user_id', 'initiated_at'),
+        db.Index('ix_call_logs_user_id_call_type_initiated_at', 'user_id', 'call_type', 'initiated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -571,6 +697,10 @@ class CallLog(db.Model):
 
 class AppControl(db.Model):
     __tablename__ = 'app_controls'
+    __table_args__ = (
+        db.Index('ix_app_controls_user_id_app_package', 'user_id', 'app_package'),
+        db.Index('ix_app_controls_user_id_usage_count', 'user_id', 'usage_count'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -635,6 +765,9 @@ class AppControl(db.Model):
 
 class AppLaunchLog(db.Model):
     __tablename__ = 'app_launch_logs'
+    __table_args__ = (
+        db.Index('ix_app_launch_logs_user_id_launched_at', 'user_id', 'launched_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -661,6 +794,9 @@ class AppLaunchLog(db.Model):
 
 class IntelligentReport(db.Model):
     __tablename__ = 'intelligent_reports'
+    __table_args__ = (
+        db.Index('ix_intelligent_reports_meeting_id_user_id', 'meeting_id', 'user_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -812,6 +948,10 @@ class SubscriptionPlan(db.Model):
 
 class UserSubscription(db.Model):
     __tablename__ = 'user_subscriptions'
+    __table_args__ = (
+        db.Index('ix_user_subscriptions_user_id_status', 'user_id', 'status'),
+        db.Index('ix_user_subscriptions_status', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1006,6 +1146,9 @@ class DiscountCoupon(db.Model):
 
 class CouponUsage(db.Model):
     __tablename__ = 'coupon_usages'
+    __table_args__ = (
+        db.Index('ix_coupon_usages_coupon_id_user_id', 'coupon_id', 'user_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     coupon_id = db.Column(db.Integer, db.ForeignKey('discount_coupons.id'), nullable=False)
@@ -1031,6 +1174,10 @@ class CouponUsage(db.Model):
 
 class CoachingSession(db.Model):
     __tablename__ = 'coaching_sessions'
+    __table_args__ = (
+        db.Index('ix_coaching_sessions_coach_id_status', 'coach_id', 'status'),
+        db.Index('ix_coaching_sessions_user_id_scheduled_at', 'user_id', 'scheduled_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1088,6 +1235,11 @@ class CoachingSession(db.Model):
 
 class ConversationMemory(db.Model):
     __tablename__ = 'conversation_memory'
+    __table_args__ = (
+        db.Index('ix_conversation_memory_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_conversation_memory_user_id_importance_level_created_at', 'user_id', 'importance_level', 'created_at'),
+        db.Index('ix_conversation_memory_user_id_related_topic_importance_level', 'user_id', 'related_topic', 'importance_level'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1112,9 +1264,13 @@ class ConversationMemory(db.Model):
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Backup incremental
     accessed_count = db.Column(db.Integer, default=0)
     last_referenced = db.Column(db.DateTime)
     
+    # Busca textual (tokens normalizados e reduzidos ao radical - ver text_search.py)
+    search_text = db.Column(db.Text)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -1136,6 +1292,9 @@ class ConversationMemory(db.Model):
 
 class UserContext(db.Model):
     __tablename__ = 'user_context'
+    __table_args__ = (
+        db.Index('ix_user_context_user_id', 'user_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1180,6 +1339,11 @@ class UserContext(db.Model):
 
 class NotificationSystem(db.Model):
     __tablename__ = 'notification_system'
+    __table_args__ = (
+        db.Index('ix_notification_system_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_notification_system_user_id_status_created_at', 'user_id', 'status', 'created_at'),
+        db.Index('ix_notification_system_status_scheduled_for', 'status', 'scheduled_for'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1196,7 +1360,7 @@ class NotificationSystem(db.Model):
     repeat_pattern = db.Column(db.String(50))  # daily, weekly, monthly, custom
     
     # Status
-    status = db.Column(db.String(20), default='pending')  # pending, sent, delivered, read, dismissed
+    status = db.Column(db.String(20), default='pending')  # pending, sending, sent, failed, expired, delivered, read, dismissed
     sent_at = db.Column(db.DateTime)
     read_at = db.Column(db.DateTime)
     dismissed_at = db.Column(db.DateTime)
@@ -1232,6 +1396,10 @@ class NotificationSystem(db.Model):
 
 class SmartCalendar(db.Model):
     __tablename__ = 'smart_calendar'
+    __table_args__ = (
+        db.Index('ix_smart_calendar_user_id_start_datetime', 'user_id', 'start_datetime'),
+        db.Index('ix_smart_calendar_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1313,6 +1481,9 @@ class SmartCalendar(db.Model):
 
 class FinancialAccount(db.Model):
     __tablename__ = 'financial_accounts'
+    __table_args__ = (
+        db.Index('ix_financial_accounts_user_id_is_active_is_primary', 'user_id', 'is_active', 'is_primary'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1362,6 +1533,11 @@ class FinancialAccount(db.Model):
 
 class FinancialTransaction(db.Model):
     __tablename__ = 'financial_transactions'
+    __table_args__ = (
+        db.Index('ix_financial_transactions_user_id_transaction_date', 'user_id', 'transaction_date'),
+        db.Index('ix_financial_transactions_account_id_transaction_date', 'account_id', 'transaction_date'),
+        db.Index('ix_financial_transactions_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1423,8 +1599,26 @@ class FinancialTransaction(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+class FinancialBalanceCheckpoint(db.Model):
+    __tablename__ = 'financial_balance_checkpoints'
+    __table_args__ = (
+        db.Index('ix_financial_balance_checkpoints_account_id_id', 'account_id', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('financial_accounts.id'), nullable=False)
+    current_balance = db.Column(db.Float, nullable=False)  # Saldo até last_transaction_id (inclusive)
+    available_balance = db.Column(db.Float, nullable=False)
+    last_transaction_id = db.Column(db.Integer, nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, default=0)  # Transações somadas desde a abertura
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class FinancialGoal(db.Model):
     __tablename__ = 'financial_goals'
+    __table_args__ = (
+        db.Index('ix_financial_goals_user_id_status_created_at', 'user_id', 'status', 'created_at'),
+        db.Index('ix_financial_goals_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1489,6 +1683,9 @@ class FinancialGoal(db.Model):
 
 class UserAnalytics(db.Model):
     __tablename__ = 'user_analytics'
+    __table_args__ = (
+        db.Index('ix_user_analytics_user_id_is_current_period', 'user_id', 'is_current_period'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1575,6 +1772,10 @@ class UserAnalytics(db.Model):
 
 class DataBackup(db.Model):
     __tablename__ = 'data_backups'
+    __table_args__ = (
+        db.Index('ix_data_backups_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_data_backups_user_scope_status_started', 'user_id', 'backup_scope', 'status', 'started_at'),  # Base do incremental
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1639,8 +1840,162 @@ class DataBackup(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+class DataRestore(db.Model):
+    __tablename__ = 'data_restores'
+    __table_args__ = (
+        db.Index('ix_data_restores_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)  # Usuário de destino
+    source_backup_id = db.Column(db.Integer, db.ForeignKey('data_backups.id'))  # Vazio em arquivos importados
+    archive_path = db.Column(db.String(500), nullable=False)
+    source_user_id = db.Column(db.Integer)  # Usuário no arquivo (pode ser de outra instância)
+    
+    # Status e progresso
+    status = db.Column(db.String(20), default='pending')  # pending, in_progress, completed, failed
+    progress_percentage = db.Column(db.Float, default=0.0)
+    current_table = db.Column(db.String(50))
+    records_processed = db.Column(db.Integer, default=0)
+    records_inserted = db.Column(db.Integer, default=0)
+    records_updated = db.Column(db.Integer, default=0)
+    records_rejected = db.Column(db.Integer, default=0)
+    rejection_details = db.Column(db.Text)  # JSON com as primeiras linhas rejeitadas
+    
+    # Timestamps
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    
+    # Informações de erro
+    error_message = db.Column(db.Text)
+    retry_count = db.Column(db.Integer, default=0)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'source_backup_id': self.source_backup_id,
+            'source_user_id': self.source_user_id,
+            'status': self.status,
+            'progress_percentage': self.progress_percentage,
+            'current_table': self.current_table,
+            'records_processed': self.records_processed,
+            'records_inserted': self.records_inserted,
+            'records_updated': self.records_updated,
+            'records_rejected': self.records_rejected,
+            'rejection_details': json.loads(self.rejection_details) if self.rejection_details else [],
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat()
+        }
+
+class BackgroundJob(db.Model):
+    __tablename__ = 'background_jobs'
+    __table_args__ = (
+        db.Index('ix_background_jobs_status_run_after', 'status', 'run_after'),
+        db.Index('ix_background_jobs_status_finished_at', 'status', 'finished_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text)  # JSON
+    
+    # Estado e tentativas
+    status = db.Column(db.String(20), default='pending')  # pending, running, done, failed
+    priority = db.Column(db.Integer, default=0)  # Maior primeiro
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    last_error = db.Column(db.Text)
+    locked_by = db.Column(db.String(100))  # pid:thread do worker
+    
+    # Timestamps
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'payload': json.loads(self.payload or '{}'),
+            'status': self.status,
+            'priority': self.priority,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'last_error': self.last_error,
+            'run_after': self.run_after.isoformat() if self.run_after else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class SchemaState(db.Model):
+    __tablename__ = 'schema_state'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # SHA-256 do esquema declarado nos modelos
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+    duration_ms = db.Column(db.Integer)
+
+class MetricRollup(db.Model):
+    __tablename__ = 'metric_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('metric', 'period', 'bucket', 'dimension', name='uq_metric_rollups_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(50), nullable=False)  # users_active, mrr, meetings_new...
+    period = db.Column(db.String(10), nullable=False)  # total, day, hour
+    bucket = db.Column(db.String(20), nullable=False, default='')  # '' (total), AAAA-MM-DD, AAAA-MM-DDTHH (UTC)
+    dimension = db.Column(db.String(50), nullable=False, default='')  # plan_id, coach_id, status...
+    value = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UserActivityDaily(db.Model):
+    __tablename__ = 'user_activity_daily'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', name='uq_user_activity_daily_user_id_day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Date, nullable=False)  # UTC
+    
+    # Atividades do dia (somadas na mesma transação que grava cada linha de origem)
+    conversations = db.Column(db.Integer, nullable=False, default=0)
+    events = db.Column(db.Integer, nullable=False, default=0)
+    transactions = db.Column(db.Integer, nullable=False, default=0)
+    voice_commands = db.Column(db.Integer, nullable=False, default=0)
+    app_launches = db.Column(db.Integer, nullable=False, default=0)
+
+class FinancialMonthlyTotal(db.Model):
+    __tablename__ = 'financial_monthly_totals'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'year_month', 'category', 'transaction_type',
+                            name='uq_financial_monthly_totals_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    year_month = db.Column(db.String(7), nullable=False)  # AAAA-MM (data da transação)
+    category = db.Column(db.String(100), nullable=False, default='')
+    transaction_type = db.Column(db.String(20), nullable=False)  # income, expense, transfer
+    
+    # Somas das transações não canceladas (mantidas na mesma transação que grava cada uma)
+    total_amount = db.Column(db.Float, nullable=False, default=0.0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class SystemSettings(db.Model):
     __tablename__ = 'system_settings'
+    __table_args__ = (
+        db.Index('ix_system_settings_user_id', 'user_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1734,6 +2089,9 @@ class SystemSettings(db.Model):
 
 class EmotionalAnalysis(db.Model):
     __tablename__ = 'emotional_analysis'
+    __table_args__ = (
+        db.Index('ix_emotional_analysis_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1811,6 +2169,9 @@ class EmotionalAnalysis(db.Model):
 
 class EmergencyContact(db.Model):
     __tablename__ = 'emergency_contacts'
+    __table_args__ = (
+        db.Index('ix_emergency_contacts_user_id_is_active_notify_on_suicide_risk_is_primary', 'user_id', 'is_active', 'notify_on_suicide_risk', 'is_primary'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -2564,36 +2925,518 @@ def add_security_headers(response):
     
     return response
 
-# Função para inicializar o banco de dados
-def init_database():
-    """Inicializa o banco de dados de forma segura"""
-    try:
-        with app.app_context():
-            db.create_all()
+# ==================== AGREGADOS DAS MÉTRICAS ADMINISTRATIVAS ====================
+
+# Mantidos a cada flush; registrados antes de init_database() criar os dados padrão
+metric_rollups = MetricRollups(db, MetricRollup)
+
+@metric_rollups.source(User, ('is_active', 'created_at', 'last_activity'))
+def _user_rollups(user):
+    return [
+        ('users_active', TOTAL, None, '', 1 if user['is_active'] else 0),
+        ('users_last_active', HOUR, user['last_activity'], '', 1),  # Usuários pela hora da última atividade
+    ] + timeline('users_new', user['created_at'])
+
+@metric_rollups.source(UserSubscription, ('status', 'plan_id', 'billing_cycle', 'next_billing_amount', 'started_at'))
+def _subscription_rollups(subscription):
+    rollups = [('subscriptions', TOTAL, None, subscription['status'], 1)] + \
+        timeline('subscriptions_new', subscription['started_at'])
+    if subscription['status'] == 'active':
+        amount = subscription['next_billing_amount'] or 0.0
+        monthly = amount / 12 if subscription['billing_cycle'] == 'yearly' else amount
+        rollups += [
+            ('plan_subscribers', TOTAL, None, subscription['plan_id'], 1),
+            ('mrr', TOTAL, None, subscription['plan_id'], monthly),  # Receita mensal recorrente
+        ]
+    return rollups
+
+@metric_rollups.source(MeetingSession, ('created_at',))
+def _meeting_rollups(meeting):
+    return [('meetings', TOTAL, None, '', 1)] + timeline('meetings_new', meeting['created_at'])
+
+@metric_rollups.source(CoachingSession, ('coach_id', 'created_at'))
+def _coaching_rollups(coaching):
+    return [('coach_sessions', TOTAL, None, coaching['coach_id'], 1)] + \
+        timeline('coaching_sessions_new', coaching['created_at'])
+
+# Atividade diária por usuário (analytics_dashboard lê uma janela de dias)
+USER_ACTIVITY_COUNTERS = ('conversations', 'events', 'transactions', 'voice_commands', 'app_launches')
+user_activity = DailyCounters(db, UserActivityDaily, USER_ACTIVITY_COUNTERS)
+user_activity.source(ConversationMemory, 'conversations')
+user_activity.source(SmartCalendar, 'events')
+user_activity.source(FinancialTransaction, 'transactions')
+user_activity.source(AppLaunchLog, 'app_launches', time_field='launched_at')
+
+# Saldos das contas: deltas atômicos a cada flush de transações, conferidos por checkpoints
+balance_ledger = BalanceLedger(db, FinancialAccount, FinancialTransaction, FinancialBalanceCheckpoint)
+
+# Somas mensais por categoria: relatórios financeiros sem varrer o histórico de transações
+finance_totals = MonthlyCategoryTotals(db, FinancialMonthlyTotal, FinancialTransaction)
+
+# Ordenações das listagens paginadas por cursor (o id desempata; as principais seguem um índice (user_id, coluna))
+MEETINGS_KEYSET = Keyset('meetings', [(MeetingSession.created_at, True)], MeetingSession.id)
+CONTACTS_KEYSET = Keyset('contacts', [Contact.name], Contact.id)
+FREQUENT_PARTICIPANTS_KEYSET = Keyset('frequent_participants', [(KnownParticipant.meeting_count, True)], KnownParticipant.id)
+CALL_LOGS_KEYSET = Keyset('call_logs', [(CallLog.initiated_at, True)], CallLog.id)
+NOTIFICATIONS_KEYSET = Keyset('notifications', [(NotificationSystem.created_at, True)], NotificationSystem.id)
+CALENDAR_KEYSET = Keyset('calendar', [SmartCalendar.start_datetime], SmartCalendar.id)
+TRANSACTIONS_KEYSET = Keyset('transactions', [(FinancialTransaction.transaction_date, True)], FinancialTransaction.id)
+GOALS_KEYSET = Keyset('goals', [(FinancialGoal.created_at, True)], FinancialGoal.id)
+APP_KEYSETS = {
+    'usage_count': Keyset('apps_usage', [(AppControl.usage_count, True)], AppControl.id),
+    'name': Keyset('apps_name', [AppControl.app_name], AppControl.id),
+    'last_used': Keyset('apps_last_used', [(AppControl.last_opened, True, datetime(1970, 1, 1))], AppControl.id),
+}
+
+def ensure_user_activity_counters():
+    """Preencher os contadores diários a partir das tabelas de origem quando ainda estão vazios"""
+    if UserActivityDaily.query.first() is not None:
+        return 0
+    rows = user_activity.rebuild(db.session)
+    db.session.commit()
+    if rows:
+        print(f"✅ Contadores de atividade por usuário calculados: {rows} dias")
+    return rows
+
+def ensure_metric_rollups():
+    """Preencher os agregados a partir das tabelas de origem quando ainda estão vazios"""
+    if MetricRollup.query.first() is not None:
+        return 0
+    corrected = metric_rollups.reconcile(db.session)
+    db.session.commit()
+    if corrected:
+        print(f"✅ Agregados das métricas administrativas calculados: {corrected} linhas")
+    return corrected
+
+def ensure_finance_totals():
+    """Calcular as somas mensais das finanças a partir das transações quando ainda estão vazias"""
+    if FinancialMonthlyTotal.query.first() is not None:
+        return 0
+    corrected = finance_totals.reconcile(db.session)
+    db.session.commit()
+    if corrected:
+        print(f"✅ Somas mensais das finanças calculadas: {corrected} linhas")
+    return corrected
+
+def reconcile_metric_rollups():
+    """Recalcular os agregados das tabelas de origem e corrigir divergências"""
+    corrected = metric_rollups.reconcile(db.session)
+    db.session.commit()
+    if corrected:
+        print(f"⚠️ Reconciliação das métricas corrigiu {corrected} linhas")
+    return corrected
+
+# Índices substituídos por outros declarados nos modelos: removidos pela migração
+SUPERSEDED_INDEXES = {
+    'contacts': ('ix_contacts_user_id_phone_number',),  # Substituído por uq_contacts_user_id_phone_number
+}
+
+def apply_index_migrations(engine=None):
+    """Criar em um banco existente os índices declarados nos modelos que ainda não existem.
+    
+    db.create_all() só cria tabelas novas, então índices adicionados a tabelas que já
+    estão em produção (Railway) precisam desta migração. No PostgreSQL os índices são
+    criados com CONCURRENTLY para não bloquear escritas durante o deploy. Índices
+    substituídos (SUPERSEDED_INDEXES) são removidos depois que o novo existe.
+    Retorna a lista de índices criados.
+    """
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    is_postgres = engine.dialect.name == 'postgresql'
+    created = []
+    
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue  # Tabelas novas recebem os índices via create_all()
+        
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in existing_indexes:
+                continue
             
-            # Criar usuário padrão se não existir (apenas em desenvolvimento)
-            if os.getenv('FLASK_ENV') != 'production':
-                if not User.query.first():
-                    admin_user = User(
-                        username='admin',
-                        email='admin@iaon.com',
-                        full_name='Administrador IAON',
-                        is_active=True
-                    )
-                    db.session.add(admin_user)
-                    db.session.commit()
-                    print("Usuário administrador criado!")
-                
-                # Inicializar coaches padrão
-                init_default_coaches()
-                
-                # Inicializar planos padrão
-                init_default_plans()
-                
-                # NÃO criar cupons de exemplo - apenas cupons exclusivos criados manualmente
-                
-    except Exception as e:
-        print(f"Erro ao inicializar banco de dados: {e}")
+            missing_columns = [column.name for column in index.columns if column.name not in existing_columns]
+            if missing_columns:
+                print(f"⚠️ Índice {index.name} ignorado - colunas ausentes no banco: {', '.join(missing_columns)}")
+                continue
+            
+            ddl = str(CreateIndex(index).compile(dialect=engine.dialect))
+            if is_postgres:
+                ddl = re.sub(r'^CREATE (UNIQUE )?INDEX', r'CREATE \1INDEX CONCURRENTLY IF NOT EXISTS', ddl)
+                # CREATE INDEX CONCURRENTLY não pode rodar dentro de transação
+                with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                    connection.execute(text(ddl))
+            else:
+                with engine.begin() as connection:
+                    connection.execute(text(ddl))
+            
+            created.append(index.name)
+            print(f"✅ Índice criado: {index.name}")
+        
+        for name in SUPERSEDED_INDEXES.get(table.name, ()):
+            if name not in existing_indexes:
+                continue
+            if is_postgres:
+                with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                    connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+            else:
+                with engine.begin() as connection:
+                    connection.execute(text(f'DROP INDEX IF EXISTS {name}'))
+            print(f"🗑️ Índice substituído removido: {name}")
+    
+    return created
+
+def merge_duplicate_contacts(engine=None):
+    """Unificar contatos duplicados por (user_id, phone_number) antes de criar o índice único.
+    
+    Primeiro normaliza os telefones gravados com espaços (a sincronização grava
+    phone_number.strip()); se o número limpo já existe, a linha é unificada com ele.
+    Depois mantém o contato mais antigo de cada grupo, aponta o histórico de ligações
+    para ele e remove as cópias. Retorna quantos registros duplicados foram removidos.
+    """
+    engine = engine or db.engine
+    if 'contacts' not in inspect(engine).get_table_names():
+        return 0
+    
+    removed = normalized = 0
+    with engine.begin() as connection:
+        unstripped = [
+            row for row in connection.execute(text('SELECT id, user_id, phone_number FROM contacts ORDER BY id'))
+            if row.phone_number and row.phone_number.strip() != row.phone_number
+        ]
+        for row in unstripped:
+            params = {'id': row.id, 'user_id': row.user_id, 'phone_number': row.phone_number.strip()}
+            keep_id = connection.execute(text(
+                'SELECT MIN(id) FROM contacts WHERE user_id = :user_id AND phone_number = :phone_number'
+            ), params).scalar()
+            if keep_id is None:
+                connection.execute(text('UPDATE contacts SET phone_number = :phone_number WHERE id = :id'), params)
+                normalized += 1
+            else:
+                connection.execute(text('UPDATE call_logs SET contact_id = :keep_id WHERE contact_id = :id'),
+                                   {'keep_id': keep_id, 'id': row.id})
+                removed += connection.execute(text('DELETE FROM contacts WHERE id = :id'), params).rowcount
+        
+        duplicates = connection.execute(text(
+            'SELECT user_id, phone_number, MIN(id) AS keep_id FROM contacts '
+            'GROUP BY user_id, phone_number HAVING COUNT(*) > 1'
+        )).fetchall()
+        
+        for duplicate in duplicates:
+            params = {'user_id': duplicate.user_id, 'phone_number': duplicate.phone_number, 'keep_id': duplicate.keep_id}
+            connection.execute(text(
+                'UPDATE call_logs SET contact_id = :keep_id WHERE contact_id IN ('
+                'SELECT id FROM contacts WHERE user_id = :user_id AND phone_number = :phone_number AND id <> :keep_id)'
+            ), params)
+            removed += connection.execute(text(
+                'DELETE FROM contacts WHERE user_id = :user_id AND phone_number = :phone_number AND id <> :keep_id'
+            ), params).rowcount
+    
+    if normalized:
+        print(f"✅ {normalized} telefone(s) de contato normalizado(s)")
+    if removed:
+        print(f"✅ {removed} contato(s) duplicado(s) unificado(s)")
+    return removed
+
+MEMORY_FTS_TABLE = 'conversation_memory_fts'
+MEMORY_SEARCH_TEXT_VERSION = '2'  # 2: inclui os valores de context_extracted
+_memory_fts_cache = {}  # engine.url -> tabela FTS5 disponível
+
+def ensure_memory_search_index(engine=None, batch_size=500):
+    """Preparar a busca textual da memória conversacional em um banco existente.
+    
+    - Adiciona a coluna search_text se faltar e preenche as linhas antigas em lotes
+    - Reindexa todas as memórias uma vez quando o documento indexado muda
+      (MEMORY_SEARCH_TEXT_VERSION, guardada em schema_state)
+    - SQLite: tabela virtual FTS5 com conteúdo externo, mantida por triggers
+    - PostgreSQL: índice GIN sobre to_tsvector('simple', search_text)
+    
+    A normalização (acentos, stopwords, radicais em português) é feita em Python
+    por build_search_text(), então os dois bancos usam os mesmos termos.
+    """
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    if 'conversation_memory' not in inspector.get_table_names():
+        return False
+    
+    columns = {column['name'] for column in inspector.get_columns('conversation_memory')}
+    with engine.begin() as connection:
+        if 'search_text' not in columns:
+            connection.execute(text('ALTER TABLE conversation_memory ADD COLUMN search_text TEXT'))
+            print("✅ Coluna conversation_memory.search_text criada")
+        
+        if engine.dialect.name == 'sqlite':
+            try:
+                connection.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {MEMORY_FTS_TABLE} USING fts5("
+                    "search_text, content='conversation_memory', content_rowid='id', "
+                    "tokenize='unicode61 remove_diacritics 2')"
+                ))
+            except Exception as e:
+                print(f"⚠️ FTS5 indisponível no SQLite, usando busca por search_text: {e}")
+                return False
+            
+            connection.execute(text(f"""
+                CREATE TRIGGER IF NOT EXISTS conversation_memory_fts_insert AFTER INSERT ON conversation_memory
+                WHEN new.search_text IS NOT NULL BEGIN
+                    INSERT INTO {MEMORY_FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text);
+                END
+            """))
+            connection.execute(text(f"""
+                CREATE TRIGGER IF NOT EXISTS conversation_memory_fts_delete AFTER DELETE ON conversation_memory
+                WHEN old.search_text IS NOT NULL BEGIN
+                    INSERT INTO {MEMORY_FTS_TABLE}({MEMORY_FTS_TABLE}, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+                END
+            """))
+            connection.execute(text(f"""
+                CREATE TRIGGER IF NOT EXISTS conversation_memory_fts_update AFTER UPDATE OF search_text ON conversation_memory BEGIN
+                    INSERT INTO {MEMORY_FTS_TABLE}({MEMORY_FTS_TABLE}, rowid, search_text)
+                        SELECT 'delete', old.id, old.search_text WHERE old.search_text IS NOT NULL;
+                    INSERT INTO {MEMORY_FTS_TABLE}(rowid, search_text)
+                        SELECT new.id, new.search_text WHERE new.search_text IS NOT NULL;
+                END
+            """))
+        elif engine.dialect.name == 'postgresql':
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_conversation_memory_search_text_gin ON conversation_memory "
+                "USING GIN (to_tsvector('simple', coalesce(search_text, '')))"
+            ))
+    
+    state_name = 'memory_search_text'
+    track_version = 'schema_state' in inspector.get_table_names()
+    reindex = False
+    if track_version:
+        with engine.connect() as connection:
+            stored = connection.execute(text('SELECT fingerprint FROM schema_state WHERE name = :name'),
+                                        {'name': state_name}).scalar()
+        reindex = stored != MEMORY_SEARCH_TEXT_VERSION
+    
+    # Preencher memórias antigas, ou todas na troca de versão (os triggers do SQLite alimentam o FTS5)
+    backfilled = last_id = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(text(
+                'SELECT id, user_message, ai_response, related_topic, context_extracted FROM conversation_memory '
+                'WHERE id > :last_id AND (search_text IS NULL OR :reindex) ORDER BY id LIMIT :limit'
+            ), {'last_id': last_id, 'reindex': reindex, 'limit': batch_size}).fetchall()
+            if not rows:
+                break
+            connection.execute(
+                text('UPDATE conversation_memory SET search_text = :search_text WHERE id = :id'),
+                [{'id': row.id, 'search_text': memory_search_text(row.user_message, row.ai_response, row.related_topic,
+                                                                  row.context_extracted)}
+                 for row in rows]
+            )
+            backfilled += len(rows)
+            last_id = rows[-1].id
+    
+    if track_version and reindex:
+        with engine.begin() as connection:
+            params = {'name': state_name, 'fingerprint': MEMORY_SEARCH_TEXT_VERSION, 'applied_at': datetime.utcnow()}
+            if not connection.execute(text(
+                'UPDATE schema_state SET fingerprint = :fingerprint, applied_at = :applied_at WHERE name = :name'
+            ), params).rowcount:
+                connection.execute(text(
+                    'INSERT INTO schema_state (name, fingerprint, applied_at) VALUES (:name, :fingerprint, :applied_at)'
+                ), params)
+    
+    if backfilled:
+        print(f"✅ Busca textual: {backfilled} memória(s) indexada(s)")
+    _memory_fts_cache.pop(engine.url, None)
+    return True
+
+# Colunas de agregados (e a versão dos perfis de voz) das reuniões adicionadas a bancos já existentes
+MEETING_STATISTICS_COLUMNS = {
+    'meeting_sessions': (
+        ('transcripts_count', 'INTEGER DEFAULT 0'),
+        ('total_words', 'INTEGER DEFAULT 0'),
+        ('action_items_count', 'INTEGER DEFAULT 0'),
+        ('decisions_count', 'INTEGER DEFAULT 0'),
+        ('confidence_sum', 'FLOAT DEFAULT 0'),
+        ('profiles_version', 'INTEGER DEFAULT 0'),
+    ),
+    'meeting_participants': (
+        ('words_count', 'INTEGER DEFAULT 0'),
+    ),
+}
+
+# Tabelas que ganharam updated_at (filtro do backup incremental) depois de já estarem em produção
+UPDATED_AT_TABLES = ('conversation_memory', 'meeting_participants')
+
+def ensure_updated_at_columns(engine=None):
+    """Adicionar updated_at às tabelas de UPDATED_AT_TABLES em um banco existente.
+    
+    As linhas antigas recebem created_at: já estão no backup completo feito
+    depois delas, e a próxima alteração avança o valor.
+    """
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as connection:
+        for table in UPDATED_AT_TABLES:
+            if table not in tables or 'updated_at' in {column['name'] for column in inspector.get_columns(table)}:
+                continue
+            connection.execute(text(f'ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP'))
+            connection.execute(text(f'UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL'))
+            added.append(table)
+    if added:
+        print(f"✅ Coluna updated_at criada: {', '.join(added)}")
+    return added
+
+def ensure_meeting_statistics(engine=None):
+    """Adicionar as colunas de agregados das reuniões em um banco existente.
+    
+    Quando alguma coluna é criada, os agregados das reuniões antigas são
+    recalculados uma vez a partir das transcrições (recompute_meeting_statistics).
+    """
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as connection:
+        for table, columns in MEETING_STATISTICS_COLUMNS.items():
+            if table not in tables:
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table)}
+            for name, ddl in columns:
+                if name not in existing:
+                    connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+                    added.append(f'{table}.{name}')
+    
+    if added:
+        print(f"✅ Colunas de estatísticas criadas: {', '.join(added)}")
+        recompute_meeting_statistics(engine)
+    return added
+
+def recompute_meeting_statistics(engine=None):
+    """Recalcular do zero os agregados de todas as reuniões (uma passada pelas transcrições)"""
+    engine = engine or db.engine
+    meetings = {}
+    speakers = {}
+    with engine.begin() as connection:
+        rows = connection.execute(text(
+            'SELECT meeting_id, speaker_name, content, start_time_seconds, end_time_seconds, '
+            'confidence_score, is_action_item, is_decision FROM meeting_transcripts'
+        ))
+        for row in rows:
+            words = len(row.content.split()) if row.content else 0
+            meeting = meetings.setdefault(row.meeting_id, {
+                'transcripts_count': 0, 'total_words': 0, 'action_items_count': 0,
+                'decisions_count': 0, 'confidence_sum': 0.0
+            })
+            meeting['transcripts_count'] += 1
+            meeting['total_words'] += words
+            meeting['action_items_count'] += 1 if row.is_action_item else 0
+            meeting['decisions_count'] += 1 if row.is_decision else 0
+            meeting['confidence_sum'] += row.confidence_score or 0.0
+            
+            speaker = speakers.setdefault((row.meeting_id, row.speaker_name), {
+                'speaking_time_minutes': 0.0, 'interventions_count': 0, 'words_count': 0
+            })
+            speaker['speaking_time_minutes'] += ((row.end_time_seconds or 0) - (row.start_time_seconds or 0)) / 60
+            speaker['interventions_count'] += 1
+            speaker['words_count'] += words
+        
+        connection.execute(text(
+            'UPDATE meeting_sessions SET transcripts_count = 0, total_words = 0, action_items_count = 0, '
+            'decisions_count = 0, confidence_sum = 0, total_participants = ('
+            'SELECT COUNT(*) FROM meeting_participants WHERE meeting_participants.meeting_id = meeting_sessions.id)'
+        ))
+        connection.execute(text(
+            'UPDATE meeting_participants SET speaking_time_minutes = 0, interventions_count = 0, words_count = 0'
+        ))
+        if meetings:
+            connection.execute(text(
+                'UPDATE meeting_sessions SET transcripts_count = :transcripts_count, total_words = :total_words, '
+                'action_items_count = :action_items_count, decisions_count = :decisions_count, '
+                'confidence_sum = :confidence_sum WHERE id = :meeting_id'
+            ), [{'meeting_id': meeting_id, **values} for meeting_id, values in meetings.items()])
+        if speakers:
+            connection.execute(text(
+                'UPDATE meeting_participants SET speaking_time_minutes = :speaking_time_minutes, '
+                'interventions_count = :interventions_count, words_count = :words_count '
+                'WHERE meeting_id = :meeting_id AND participant_name = :speaker_name'
+            ), [{'meeting_id': meeting_id, 'speaker_name': speaker_name, **values}
+                for (meeting_id, speaker_name), values in speakers.items() if speaker_name])
+    return len(meetings)
+
+MEETING_STATISTICS = ('total_participants', 'transcripts_count', 'total_words', 'action_items_count',
+                      'decisions_count', 'confidence_sum')
+
+def reconcile_meeting_statistics():
+    """Corrigir os agregados das reuniões que divergem das transcrições e participantes.
+    
+    Gravações fora da sessão (lotes da restauração, SQL direto) não passam por
+    _accumulate_meeting_statistics. O recálculo e a leitura dos agregados usam
+    o mesmo instante do banco e as correções entram como deltas, como nas
+    demais reconciliações. Retorna quantas reuniões foram corrigidas.
+    """
+    table = MeetingSession.__table__
+    expected = {}
+    with consistent_read(db.session) as reader:
+        rows = reader.execute(text(
+            'SELECT meeting_id, COUNT(*) AS participants FROM meeting_participants GROUP BY meeting_id'))
+        for row in rows:
+            expected.setdefault(row.meeting_id, Counter())['total_participants'] = row.participants
+        rows = reader.execute(text(
+            'SELECT meeting_id, content, confidence_score, is_action_item, is_decision FROM meeting_transcripts'))
+        for row in rows:
+            meeting = expected.setdefault(row.meeting_id, Counter())
+            meeting['transcripts_count'] += 1
+            meeting['total_words'] += len(row.content.split()) if row.content else 0
+            meeting['action_items_count'] += 1 if row.is_action_item else 0
+            meeting['decisions_count'] += 1 if row.is_decision else 0
+            meeting['confidence_sum'] += row.confidence_score or 0.0
+        current = reader.execute(select(table.c.id, *[table.c[column] for column in MEETING_STATISTICS])).all()
+    
+    corrections = {}
+    for row in current:
+        values = expected.get(row.id, {})
+        deltas = Counter({column: values.get(column, 0) - (getattr(row, column) or 0) for column in MEETING_STATISTICS})
+        deltas = Counter({column: delta for column, delta in deltas.items() if abs(delta) > 1e-6})
+        if deltas:
+            corrections[row.id] = deltas
+    _apply_meeting_statistics(db.session, corrections)
+    db.session.commit()
+    if corrections:
+        print(f"⚠️ Reconciliação dos agregados de reuniões corrigiu {len(corrections)} reuniões")
+    return len(corrections)
+
+# ==================== CACHE DE RESPOSTAS DO CATÁLOGO ====================
+
+def _catalog_cache_tags(obj):
+    """Tags do cache de respostas afetadas por um objeto alterado"""
+    if isinstance(obj, Coach):
+        # Coach novo ainda sem id: não há detalhe dele no cache (só respostas 200 são guardadas)
+        return {'coaches', f'coach:{obj.id}'} if obj.id else {'coaches'}
+    if isinstance(obj, SubscriptionPlan):
+        return {'plans'}
+    if isinstance(obj, CoachingSession) and obj.coach_id:
+        return {f'coach:{obj.coach_id}'}  # Estatísticas do detalhe do coach
+    return set()
+
+def invalidate_catalog_cache(*tags):
+    """Descartar respostas cacheadas do catálogo ('plans', 'coaches', 'coach:<id>')"""
+    response_cache.invalidate(*tags)
+
+@event.listens_for(db.session, 'before_flush')
+def _track_catalog_changes(session, flush_context, instances):
+    """Anotar tags do catálogo alteradas nesta transação"""
+    stale = session.info.setdefault('catalog_cache_stale', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        stale.update(_catalog_cache_tags(obj))
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_catalog_after_commit(session):
+    tags = session.info.pop('catalog_cache_stale', None)
+    if tags:
+        invalidate_catalog_cache(*tags)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_catalog_changes(session):
+    session.info.pop('catalog_cache_stale', None)
 
 def init_default_coaches():
     """Inicializar coaches padrão"""
@@ -2680,6 +3523,7 @@ def init_default_coaches():
         db.session.add(coach)
     
     db.session.commit()
+    invalidate_catalog_cache('coaches')
     print("Coaches padrão criados!")
 
 def init_default_plans():
@@ -2799,6 +3643,7 @@ def init_default_plans():
         db.session.add(plan)
     
     db.session.commit()
+    invalidate_catalog_cache('plans')
     print("Planos padrão criados!")
 
 def init_sample_coupons():
@@ -2860,10 +3705,6 @@ def init_sample_coupons():
     db.session.commit()
     print("Cupons de exemplo criados!")
 
-# Inicializar apenas se não estiver em ambiente serverless
-if os.getenv('FLASK_ENV') != 'production':
-    init_database()
-
 # ===============================
 # AUTHENTICATION ENDPOINTS
 # ===============================
@@ -3750,6 +4591,26 @@ def get_security_audit_log():
         app.logger.error(f"Erro ao obter log de auditoria: {str(e)}")
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+# Intenções do chat em ordem de prioridade (a primeira encontrada responde)
+CHAT_INTENTS = IntentClassifier([
+    ('help', ['ajuda', 'help']),
+    ('secretary', ['secretária', 'secretaria', 'executiva']),
+    ('coach', ['coach']),
+    ('medical', ['médico', 'saúde', 'consultas']),
+    ('emergency', ['emergência', 'socorro', 'ajuda urgente']),
+    ('crisis', ['suicídio', 'morrer', 'acabar']),
+    ('finance', ['finanças', 'dinheiro', 'investimentos']),
+    ('agenda', ['agenda', 'compromissos']),
+    ('report', ['relatório', 'relatorio']),
+    ('coach_financial', ['coach financeiro']),
+    ('battery', ['bateria']),
+    ('weather', ['tempo', 'clima']),
+    # Especialidades dentro de 'coach'
+    ('coach_business', ['business', 'empresarial']),
+    ('coach_life', ['life', 'vida']),
+])
+CHAT_ROUTES = frozenset(CHAT_INTENTS.order) - {'coach_business', 'coach_life'}
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """API de chat inteligente com todas as funcionalidades"""
@@ -3758,8 +4619,10 @@ def chat():
         message = data.get('message', '').lower().strip()
         user_id = data.get('user_id', 1)
         
-        # Respostas inteligentes do assistente
-        if 'ajuda' in message or 'help' in message:
+        # Respostas inteligentes do assistente (uma passada pela mensagem)
+        matches = CHAT_INTENTS.classify(message)
+        intent = matches.first(CHAT_ROUTES)
+        if intent == 'help':
             response = """🤖 **IAON - Assistente IA Completo**
 
 **💼 Secretária Executiva:**
@@ -3790,7 +4653,7 @@ def chat():
 
 🎤 **Comando de voz ativo** - Diga "IAON" + comando"""
 
-        elif 'secretária' in message or 'secretaria' in message or 'executiva' in message:
+        elif intent == 'secretary':
             response = """💼 **Secretária Executiva IAON**
 
 **📅 Agenda Executiva:**
@@ -3815,8 +4678,8 @@ def chat():
 
 💡 Diga "agendar reunião" ou "preparar relatório"."""
 
-        elif 'coach' in message:
-            if 'business' in message or 'empresarial' in message:
+        elif intent == 'coach':
+            if 'coach_business' in matches:
                 response = """🧠 **Coach Empresarial IAON**
 
 👨‍💼 **Dr. Roberto Silva** - Coach Executivo
@@ -3839,7 +4702,7 @@ def chat():
 
 Digite "agendar coach business" para reservar."""
 
-            elif 'life' in message or 'vida' in message:
+            elif 'coach_life' in matches:
                 response = """🧠 **Coach de Vida IAON**
 
 👩‍🦰 **Dra. Ana Costa** - Life Coach
@@ -3883,7 +4746,7 @@ Digite "agendar life coach" para começar."""
 
 Diga "coach [tipo]" para mais detalhes."""
 
-        elif 'médico' in message or 'saúde' in message or 'consultas' in message:
+        elif intent == 'medical':
             response = """🏥 **Sistema Médico Avançado IAON**
 
 **📅 Consultas Agendadas:**
@@ -3913,7 +4776,7 @@ Diga "coach [tipo]" para mais detalhes."""
 
 Digite "agendar consulta" ou "medicamentos hoje"."""
 
-        elif 'emergência' in message or 'socorro' in message or 'ajuda urgente' in message:
+        elif intent == 'emergency':
             response = """🆘 **PROTOCOLO DE EMERGÊNCIA ATIVADO**
 
 **🚨 SITUAÇÃO DETECTADA: Solicitação de ajuda**
@@ -3943,7 +4806,7 @@ Digite "agendar consulta" ou "medicamentos hoje"."""
 
 💚 Você não está sozinho(a). Ajuda está chegando."""
 
-        elif 'suicídio' in message or 'morrer' in message or 'acabar' in message:
+        elif intent == 'crisis':
             response = """🆘 **SISTEMA DE PREVENÇÃO ATIVADO**
 
 **💚 VOCÊ NÃO ESTÁ SOZINHO(A)**
@@ -3974,7 +4837,7 @@ Ajuda profissional está chegando.
 
 Digite "conversar agora" para chat direto."""
 
-        elif 'finanças' in message or 'dinheiro' in message or 'investimentos' in message:
+        elif intent == 'finance':
             response = """💰 **Central Financeira Executiva IAON**
 
 **💎 PATRIMÔNIO CONSOLIDADO:**
@@ -4008,7 +4871,7 @@ Digite "conversar agora" para chat direto."""
 
 Digite "investir agora" ou "relatório detalhado"."""
 
-        elif 'agenda' in message or 'compromissos' in message:
+        elif intent == 'agenda':
             response = """📅 **Agenda Executiva IAON**
 
 **🌅 HOJE (03/08/2025):**
@@ -4039,7 +4902,7 @@ Digite "investir agora" ou "relatório detalhado"."""
 
 Digite "agendar reunião" ou "preparar viagem"."""
 
-        elif 'relatório' in message or 'relatorio' in message:
+        elif intent == 'report':
             response = """📊 **Central de Relatórios Executivos**
 
 **📈 RELATÓRIOS DISPONÍVEIS:**
@@ -4075,7 +4938,7 @@ Digite "agendar reunião" ou "preparar viagem"."""
 
 Digite "gerar relatório personalizado"."""
 
-        elif 'coach financeiro' in message:
+        elif intent == 'coach_financial':
             response = """💰 **Coach Financeiro Especializado**
 
 👨‍💼 **Dr. Pedro Santos** - CFP®
@@ -4108,7 +4971,7 @@ Digite "gerar relatório personalizado"."""
 
 Digite "agendar diagnóstico financeiro"."""
 
-        elif 'bateria' in message:
+        elif intent == 'battery':
             response = """🔋 **Status Energético Completo**
 
 **📱 DISPOSITIVOS MONITORADOS:**
@@ -4134,7 +4997,7 @@ Digite "agendar diagnóstico financeiro"."""
 
 Diga "carregar dispositivos" para automação."""
 
-        elif 'tempo' in message or 'clima' in message:
+        elif intent == 'weather':
             response = """🌤️ **Centro Meteorológico IAON**
 
 **📍 São Paulo - SP (Agora):**
@@ -4416,7 +5279,69 @@ def test_trigger_word():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+MAX_TRIGGER_TEMPLATES = 5
+
+@app.route('/api/voice/trigger-word/enroll', methods=['POST'])
+def enroll_trigger_word():
+    """Gravar modelos da palavra de ativação para a detecção no servidor
+    
+    'samples' é uma lista de áudios (base64 PCM 16 bits ou WAV) com o usuário
+    dizendo a palavra; cada um vira um modelo de MFCCs. replace=false
+    acrescenta aos modelos existentes (até MAX_TRIGGER_TEMPLATES).
+    """
+    try:
+        data = request.get_json()
+        user_id = data.get('user_id', 1)
+        samples = data.get('samples') or []
+        replace = data.get('replace', True)
+        
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+        
+        if not isinstance(samples, list) or not 1 <= len(samples) <= MAX_TRIGGER_TEMPLATES:
+            return jsonify({'error': f'Envie de 1 a {MAX_TRIGGER_TEMPLATES} gravações em samples'}), 400
+        
+        trigger_word = (user.custom_trigger_word or 'EION').upper()
+        sensitivity = user.trigger_sensitivity or 0.7
+        templates = []
+        for index, sample in enumerate(samples):
+            template = extract_template(sample, data.get('sample_rate'), sensitivity, data.get('power_mode', DEFAULT_POWER_MODE))
+            if template is None or not len(template):
+                return jsonify({'error': f'Nenhuma fala detectada na gravação {index + 1}'}), 400
+            templates.append(template)
+        
+        query = TriggerWordTemplate.query.filter_by(user_id=user_id, trigger_word=trigger_word)
+        if replace:
+            query.delete(synchronize_session=False)
+            existing = 0
+        else:
+            existing = query.count()
+        if existing + len(templates) > MAX_TRIGGER_TEMPLATES:
+            return jsonify({'error': f'Limite de {MAX_TRIGGER_TEMPLATES} gravações por palavra de ativação'}), 400
+        
+        for template in templates:
+            db.session.add(TriggerWordTemplate(
+                user_id=user_id,
+                trigger_word=trigger_word,
+                mfcc=template_to_bytes(template),
+                frame_count=len(template)
+            ))
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'trigger_word': trigger_word,
+            'templates': existing + len(templates),
+            'frames': [len(template) for template in templates],
+            'message': f'✅ {len(templates)} gravação(ões) de "{trigger_word}" cadastrada(s)'
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/voice/trigger-word/suggestions', methods=['GET'])
+@response_cache.cached(vary_query=False, ttl=3600)
 def get_trigger_word_suggestions():
     """Obter sugestões de palavras de ativação"""
     try:
@@ -4461,6 +5386,7 @@ def get_trigger_word_suggestions():
 # ==================== SISTEMA DE COACHES ====================
 
 @app.route('/api/coaches/list', methods=['GET'])
+@response_cache.cached('coaches')
 def list_coaches():
     """Listar todos os coaches disponíveis"""
     try:
@@ -4493,6 +5419,7 @@ def list_coaches():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/coaches/<int:coach_id>', methods=['GET'])
+@response_cache.cached('coach:{coach_id}')
 def get_coach_details(coach_id):
     """Obter detalhes de um coach específico"""
     try:
@@ -4583,6 +5510,7 @@ def book_coaching_session():
 # ==================== SISTEMA DE PLANOS E ASSINATURAS ====================
 
 @app.route('/api/plans/list', methods=['GET'])
+@response_cache.cached('plans')
 def list_subscription_plans():
     """Listar todos os planos de assinatura"""
     try:
@@ -4666,8 +5594,8 @@ def create_subscription():
             return jsonify({'error': 'Plano não encontrado'}), 404
         
         # Verificar se já tem assinatura ativa
-        existing = UserSubscription.query.filter_by(
-            user_id=user_id, status__in=['active', 'trial']
+        existing = UserSubscription.query.filter(
+            UserSubscription.user_id == user_id, UserSubscription.status.in_(['active', 'trial'])
         ).first()
         
         if existing:
@@ -5077,19 +6005,20 @@ def list_coupons():
 def admin_dashboard():
     """Dashboard administrativo com estatísticas"""
     try:
-        # Estatísticas gerais
-        total_users = User.query.filter_by(is_active=True).count()
-        total_meetings = MeetingSession.query.count()
-        active_subscriptions = UserSubscription.query.filter_by(status='active').count()
-        total_revenue = db.session.query(db.func.sum(UserSubscription.next_billing_amount)).scalar() or 0
-        
-        # Estatísticas por plano
-        plan_stats = db.session.query(
-            SubscriptionPlan.display_name,
-            db.func.count(UserSubscription.id).label('subscribers')
-        ).join(UserSubscription).group_by(SubscriptionPlan.id).all()
-        
-        # Cupons mais usados
+        # Estatísticas gerais (agregados pré-calculados, sem varrer as tabelas)
+        total_users = int(metric_rollups.total(db.session, 'users_active'))
+        total_meetings = int(metric_rollups.total(db.session, 'meetings'))
+        active_subscriptions = int(metric_rollups.total(db.session, 'subscriptions', 'active'))
+        monthly_revenue = round(metric_rollups.total(db.session, 'mrr'), 2)  # Assinaturas ativas, anuais / 12
+        
+        # Assinantes ativos por plano
+        subscribers = {int(plan_id): int(count) for plan_id, count
+                       in metric_rollups.totals(db.session, 'plan_subscribers').items() if count > 0}
+        plans = SubscriptionPlan.query.filter(SubscriptionPlan.id.in_(subscribers)).all() if subscribers else []
+        plan_stats = [(plan.display_name, subscribers[plan.id])
+                      for plan in sorted(plans, key=lambda plan: plan.sort_order or 0)]
+        
+        # Cupons mais usados (current_uses já é um contador mantido no uso do cupom)
         popular_coupons = db.session.query(
             DiscountCoupon.code,
             DiscountCoupon.name,
@@ -5097,11 +6026,13 @@ def admin_dashboard():
         ).order_by(DiscountCoupon.current_uses.desc()).limit(5).all()
         
         # Coaches mais populares
-        popular_coaches = db.session.query(
-            Coach.name,
-            Coach.specialty,
-            db.func.count(CoachingSession.id).label('sessions')
-        ).join(CoachingSession).group_by(Coach.id).order_by(db.text('sessions DESC')).limit(5).all()
+        coach_sessions = sorted(((int(coach_id), int(count)) for coach_id, count
+                                 in metric_rollups.totals(db.session, 'coach_sessions').items() if count > 0),
+                                key=lambda item: -item[1])[:5]
+        coaches = {coach.id: coach for coach in
+                   Coach.query.filter(Coach.id.in_([coach_id for coach_id, _ in coach_sessions])).all()} if coach_sessions else {}
+        popular_coaches = [(coaches[coach_id].name, coaches[coach_id].specialty, count)
+                           for coach_id, count in coach_sessions if coach_id in coaches]
         
         return jsonify({
             'success': True,
@@ -5109,7 +6040,7 @@ def admin_dashboard():
                 'total_users': total_users,
                 'total_meetings': total_meetings,
                 'active_subscriptions': active_subscriptions,
-                'monthly_revenue': total_revenue
+                'monthly_revenue': monthly_revenue
             },
             'plan_distribution': [
                 {'plan': name, 'subscribers': count} 
@@ -5132,18 +6063,18 @@ def admin_dashboard():
 def user_analytics():
     """Análise detalhada de usuários"""
     try:
-        # Usuários por período
-        total_users = User.query.filter_by(is_active=True).count()
+        # Usuários por período (janelas somadas pelos baldes de hora)
+        total_users = int(metric_rollups.total(db.session, 'users_active'))
         last_30_days = datetime.utcnow() - timedelta(days=30)
-        new_users_30d = User.query.filter(User.created_at >= last_30_days).count()
+        new_users_30d = int(metric_rollups.window(db.session, 'users_new', HOUR, last_30_days))
         
         # Churn rate (usuários que cancelaram)
-        cancelled_subs = UserSubscription.query.filter_by(status='cancelled').count()
+        cancelled_subs = int(metric_rollups.total(db.session, 'subscriptions', 'cancelled'))
         churn_rate = (cancelled_subs / total_users * 100) if total_users > 0 else 0
         
         # Engagement (usuários ativos nos últimos 7 dias)
         last_week = datetime.utcnow() - timedelta(days=7)
-        active_users_7d = User.query.filter(User.last_activity >= last_week).count()
+        active_users_7d = int(metric_rollups.window(db.session, 'users_last_active', HOUR, last_week))
         
         return jsonify({
             'success': True,
@@ -5159,6 +6090,43 @@ def user_analytics():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/admin/metrics/daily', methods=['GET'])
+def admin_metrics_daily():
+    """Série diária de uma métrica agregada (users_new, meetings_new, subscriptions_new...)"""
+    try:
+        metric = request.args.get('metric', 'users_new')
+        days = min(request.args.get('days', 30, type=int), 366)
+        since = datetime.utcnow() - timedelta(days=days - 1)
+        return jsonify({
+            'success': True,
+            'metric': metric,
+            'series': metric_rollups.series(db.session, metric, DAY, since),
+            'last_reconciled_at': metric_rollups.reconciled_at.isoformat() if metric_rollups.reconciled_at else None
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/metrics/reconcile', methods=['POST'])
+def admin_metrics_reconcile():
+    """Agendar a reconciliação dos agregados para agora"""
+    try:
+        job = job_queue.enqueue('metrics_reconcile')
+        db.session.commit()
+        return jsonify({'success': True, 'job_id': job.id})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/finance/checkpoint', methods=['POST'])
+def admin_finance_checkpoint():
+    """Conferir os saldos das contas agora (todas ou as de account_ids)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        job = job_queue.enqueue('finance_ledger_checkpoint', {'account_ids': data.get('account_ids')})
+        db.session.commit()
+        return jsonify({'success': True, 'job_id': job.id})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/process-voice-command', methods=['POST'])
 def process_voice_command():
     """Processar comando de voz com palavra de ativação personalizada"""
@@ -5190,6 +6158,10 @@ def process_voice_command():
                 'expected_format': f'{trigger_word}, [seu comando]'
             })
         
+        # Comando ativado: conta na atividade do dia antes de despachar
+        user_activity.record(db.session, user_id, 'voice_commands')
+        db.session.commit()
+        
         # Remover palavra de ativação do comando
         command_text = voice_input[len(trigger_word):].strip().lstrip(',').strip()
         
@@ -5288,16 +6260,10 @@ def process_call_command(user_id, command_text, trigger_word):
             'response': f'Não consegui identificar o contato. Tente: "{trigger_word}, ligar para João"'
         })
     
-    # Buscar contato
-    contacts = Contact.query.filter_by(user_id=user_id).all()
-    best_match = None
-    best_score = 0
-    
-    for contact in contacts:
-        score = contact.get_voice_match_score(contact_name)
-        if score > best_score:
-            best_score = score
-            best_match = contact
+    # Buscar contato (índice de voz em memória, só o melhor resultado)
+    matches = find_contacts_by_voice(user_id, contact_name, limit=1)
+    best_match = matches[0]['contact'] if matches else None
+    best_score = matches[0]['score'] if matches else 0
     
     if best_match and best_score >= 70:
         # Registrar log da chamada
@@ -5343,16 +6309,10 @@ def process_app_command(user_id, command_text, trigger_word):
             'response': f'Não consegui identificar o aplicativo. Tente: "{trigger_word}, abrir WhatsApp"'
         })
     
-    # Buscar aplicativo
-    apps = AppControl.query.filter_by(user_id=user_id).all()
-    best_match = None
-    best_score = 0
-    
-    for app in apps:
-        score = app.get_voice_match_score(app_name)
-        if score > best_score:
-            best_score = score
-            best_match = app
+    # Buscar aplicativo (índice de voz em memória, só o melhor resultado)
+    matches = find_apps_by_voice(user_id, app_name, limit=1)
+    best_match = matches[0]['app'] if matches else None
+    best_score = matches[0]['score'] if matches else 0
     
     if best_match and best_score >= 70:
         # Registrar log de abertura
@@ -5801,14 +6761,24 @@ def frequent_participants():
     if 'user_id' not in session:
         return jsonify({'error': 'Não autorizado'}), 401
     
-    # Buscar participantes frequentes
-    participants = KnownParticipant.query.filter_by(
+    # Buscar participantes frequentes (página por cursor, ou tudo em fluxo com ?format=ndjson)
+    query = KnownParticipant.query.filter_by(
         user_id=session['user_id'],
         is_frequent=True
-    ).order_by(KnownParticipant.meeting_count.desc()).all()
+    )
+    try:
+        streamed = stream_response(request.args, query, FREQUENT_PARTICIPANTS_KEYSET,
+                                   lambda p: p.to_dict(), 'frequent_participants')
+        if streamed:
+            return streamed
+        participants, next_cursor = paginate(query, FREQUENT_PARTICIPANTS_KEYSET,
+                                             request.args.get('cursor'), page_limit(request.args))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
-        'frequent_participants': [p.to_dict() for p in participants]
+        'frequent_participants': [p.to_dict() for p in participants],
+        **page_info(next_cursor)
     })
 
 @app.route('/api/meetings/start', methods=['POST'])
@@ -5831,6 +6801,9 @@ def start_meeting():
         db.session.add(meeting)
         db.session.commit()
         
+        # Reunião começa sem participantes: motor vazio já em cache
+        meeting_profile_cache.put(meeting.id, SpeakerScoringEngine(), version=meeting.profiles_version or 0)
+        
         # Configurações avançadas do dispositivo
         device_settings = {
             'meeting_id': meeting.id,
@@ -6022,10 +6995,12 @@ def add_meeting_participant(meeting_id):
         
         db.session.add(meeting_participant)
         
-        # Atualizar contagem de participantes na reunião
-        meeting.total_participants = MeetingParticipant.query.filter_by(meeting_id=meeting_id).count() + 1
+        # total_participants é incrementado no flush do novo participante
+        previous_version, version = bump_meeting_profiles_version(meeting_id)
         
         db.session.commit()
+        meeting_profile_cache.upsert_participant(meeting_id, participant_profile(meeting_participant),
+                                                 expected_version=previous_version, version=version)
         
         # Preparar resposta com informações inteligentes
         message = f'👤 Participante "{meeting_participant.participant_name}" adicionado'
@@ -6080,11 +7055,11 @@ def participant_introduction(meeting_id):
         participant.confidence_level = 0.95
         participant.is_verified = True
         
-        # Atualizar contagem se for novo participante
-        if not participant.id:
-            meeting.total_participants = MeetingParticipant.query.filter_by(meeting_id=meeting_id).count() + 1
+        previous_version, version = bump_meeting_profiles_version(meeting_id)
         
         db.session.commit()
+        meeting_profile_cache.upsert_participant(meeting_id, participant_profile(participant),
+                                                 expected_version=previous_version, version=version)
         
         return jsonify({
             'success': True,
@@ -6117,28 +7092,11 @@ def transcribe_meeting_audio(meeting_id):
         
         # Simular transcrição avançada com IA
         transcription_result = transcribe_with_speaker_identification(
-            audio_data, meeting_id, start_time, end_time
+            audio_data, meeting, start_time, end_time
         )
         
         # Salvar transcrição
-        transcript = MeetingTranscript(
-            meeting_id=meeting_id,
-            speaker_name=transcription_result['speaker_name'],
-            content=transcription_result['content'],
-            start_time_seconds=start_time,
-            end_time_seconds=end_time,
-            confidence_score=transcription_result['confidence'],
-            audio_quality=transcription_result['audio_quality'],
-            sentiment=transcription_result['sentiment']
-        )
-        
-        # Identificar se é item de ação ou decisão
-        if any(keyword in transcript.content.lower() for keyword in ['decidir', 'decidimos', 'resolução', 'conclusão']):
-            transcript.is_decision = True
-        
-        if any(keyword in transcript.content.lower() for keyword in ['ação', 'tarefa', 'deve fazer', 'responsável']):
-            transcript.is_action_item = True
-        
+        transcript = build_meeting_transcript(meeting_id, transcription_result, start_time, end_time)
         db.session.add(transcript)
         db.session.commit()
         
@@ -6152,27 +7110,101 @@ def transcribe_meeting_audio(meeting_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/meetings/<int:meeting_id>/generate-agenda', methods=['POST'])
-def generate_meeting_agenda(meeting_id):
-    """Gerar pauta da reunião baseada na transcrição"""
+@app.route('/api/meetings/<int:meeting_id>/audio-stream', methods=['POST'])
+def stream_meeting_audio(meeting_id):
+    """Receber áudio da reunião em fluxo (corpo bruto PCM 16 bits mono, pode ser chunked)
+    
+    Parâmetros na query string: encoding (pcm_s16le), sample_rate (padrão 16000) e
+    offset_seconds (posição na linha do tempo; padrão: fim da gravação já recebida).
+    O áudio é processado em quadros fixos, gravado incrementalmente e cada segmento
+    de fala concluído vira uma linha de MeetingTranscript na hora.
+    """
     try:
         meeting = MeetingSession.query.get(meeting_id)
         if not meeting:
             return jsonify({'error': 'Reunião não encontrada'}), 404
         
-        # Buscar todas as transcrições da reunião
-        transcripts = MeetingTranscript.query.filter_by(meeting_id=meeting_id).order_by(
-            MeetingTranscript.start_time_seconds
-        ).all()
-        
-        if not transcripts:
-            return jsonify({'error': 'Não há transcrições para gerar a pauta'}), 400
+        if meeting.status != 'active':
+            return jsonify({'error': 'Reunião não está ativa'}), 409
         
-        # Gerar pauta com IA avançada
-        agenda_data = generate_advanced_agenda(meeting, transcripts)
+        encoding = request.args.get('encoding', 'pcm_s16le')
+        if encoding not in SUPPORTED_ENCODINGS:
+            return jsonify({
+                'error': f'Codificação "{encoding}" não suportada',
+                'supported_encodings': list(SUPPORTED_ENCODINGS)
+            }), 415
+        
+        sample_rate = request.args.get('sample_rate', DEFAULT_SAMPLE_RATE, type=int)
+        if not sample_rate or sample_rate < 8000 or sample_rate > 48000:
+            return jsonify({'error': 'sample_rate deve estar entre 8000 e 48000'}), 400
+        
+        # Gravação bruta da reunião, continuada a cada envio
+        recordings_dir = app.config['MEETING_RECORDINGS_DIR']
+        os.makedirs(recordings_dir, exist_ok=True)
+        recording_path = meeting.recording_path or os.path.join(recordings_dir, f'meeting_{meeting_id}.pcm')
+        recorded_bytes = os.path.getsize(recording_path) if os.path.exists(recording_path) else 0
+        offset_seconds = request.args.get('offset_seconds', recorded_bytes / (sample_rate * BYTES_PER_SAMPLE), type=float)
+        
+        engine = get_meeting_speaker_engine(meeting)
+        segments_count = 0
+        last_transcript = None
+        
+        with open(recording_path, 'ab') as recording:
+            frames = iter_frames(request.stream, frame_size_bytes(sample_rate))
+            frames = tee_frames(frames, recording)
+            for segment in segment_speech(frames, sample_rate, offset_seconds):
+                transcription_result = transcribe_with_speaker_identification(
+                    segment.audio, meeting, segment.start_seconds, segment.end_seconds,
+                    engine=engine, sample_rate=sample_rate
+                )
+                last_transcript = build_meeting_transcript(
+                    meeting_id, transcription_result, segment.start_seconds, segment.end_seconds
+                )
+                db.session.add(last_transcript)
+                db.session.commit()  # Cada segmento fica disponível assim que termina
+                segments_count += 1
+            received_bytes = recording.tell() - recorded_bytes
         
-        # Verificar se já existe uma pauta
-        existing_agenda = MeetingAgenda.query.filter_by(meeting_id=meeting_id).first()
+        if meeting.recording_path != recording_path:
+            meeting.recording_path = recording_path
+            db.session.commit()
+        
+        received_seconds = received_bytes / (sample_rate * BYTES_PER_SAMPLE)
+        return jsonify({
+            'success': True,
+            'bytes_received': received_bytes,
+            'duration_seconds': round(received_seconds, 3),
+            'stream_end_seconds': round(offset_seconds + received_seconds, 3),
+            'segments_transcribed': segments_count,
+            'last_transcript': last_transcript.to_dict() if last_transcript else None,
+            'message': f'🎙️ {segments_count} trechos de fala transcritos em tempo real'
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/meetings/<int:meeting_id>/generate-agenda', methods=['POST'])
+def generate_meeting_agenda(meeting_id):
+    """Gerar pauta da reunião baseada na transcrição"""
+    try:
+        meeting = MeetingSession.query.get(meeting_id)
+        if not meeting:
+            return jsonify({'error': 'Reunião não encontrada'}), 404
+        
+        # Buscar todas as transcrições da reunião
+        transcripts = MeetingTranscript.query.filter_by(meeting_id=meeting_id).order_by(
+            MeetingTranscript.start_time_seconds
+        ).all()
+        
+        if not transcripts:
+            return jsonify({'error': 'Não há transcrições para gerar a pauta'}), 400
+        
+        # Gerar pauta com IA avançada
+        agenda_data = generate_advanced_agenda(meeting, transcripts)
+        
+        # Verificar se já existe uma pauta
+        existing_agenda = MeetingAgenda.query.filter_by(meeting_id=meeting_id).first()
         
         if existing_agenda:
             # Atualizar pauta existente
@@ -6225,24 +7257,11 @@ def end_meeting(meeting_id):
         meeting.end_time = datetime.utcnow()
         meeting.status = 'completed'
         
-        # Calcular estatísticas finais
-        transcripts = MeetingTranscript.query.filter_by(meeting_id=meeting_id).all()
-        participants = MeetingParticipant.query.filter_by(meeting_id=meeting_id).all()
-        
-        # Calcular tempo de fala por participante
-        for participant in participants:
-            participant_transcripts = [t for t in transcripts if t.speaker_name == participant.participant_name]
-            speaking_time = sum([
-                (t.end_time_seconds or 0) - (t.start_time_seconds or 0) 
-                for t in participant_transcripts
-            ])
-            participant.speaking_time_minutes = speaking_time / 60
-            participant.interventions_count = len(participant_transcripts)
-        
-        # Calcular qualidade geral
-        if transcripts:
-            avg_confidence = sum([t.confidence_score or 0 for t in transcripts]) / len(transcripts)
-            meeting.quality_score = avg_confidence
+        # Estatísticas finais: tempo de fala e intervenções por participante já foram
+        # acumulados a cada transcrição; a qualidade geral vem da soma das confianças
+        statistics = meeting.get_statistics()
+        if statistics['total_transcripts']:
+            meeting.quality_score = statistics['average_confidence']
         
         # Configurações de restauração do dispositivo
         restore_settings = {
@@ -6278,13 +7297,14 @@ def end_meeting(meeting_id):
         }
         
         db.session.commit()
+        meeting_profile_cache.evict(meeting_id)  # Perfis não são mais usados após o fim
         
         return jsonify({
             'success': True,
             'meeting': meeting.to_dict(),
             'statistics': {
-                'total_transcripts': len(transcripts),
-                'total_participants': len(participants),
+                'total_transcripts': statistics['total_transcripts'],
+                'total_participants': meeting.total_participants or 0,
                 'duration_minutes': meeting.get_duration_minutes(),
                 'quality_score': meeting.quality_score
             },
@@ -6312,32 +7332,9 @@ def configure_background_listening():
         trigger_phrase = data.get('trigger_phrase', 'IA')
         power_mode = data.get('power_mode', 'balanced')  # eco, balanced, performance
         
-        # Configurações por modo de energia
-        power_configs = {
-            'eco': {
-                'sample_rate': 16000,           # Menor taxa de amostragem
-                'buffer_size': 1024,            # Buffer maior
-                'processing_interval': 500,     # Processa a cada 500ms
-                'cpu_usage': 'minimal',
-                'battery_impact': '1-2%/hora'
-            },
-            'balanced': {
-                'sample_rate': 22050,           # Taxa média
-                'buffer_size': 512,             # Buffer médio
-                'processing_interval': 250,     # Processa a cada 250ms
-                'cpu_usage': 'low',
-                'battery_impact': '3-5%/hora'
-            },
-            'performance': {
-                'sample_rate': 44100,           # Taxa alta
-                'buffer_size': 256,             # Buffer pequeno
-                'processing_interval': 100,     # Processa a cada 100ms
-                'cpu_usage': 'moderate',
-                'battery_impact': '8-12%/hora'
-            }
-        }
-        
-        config = power_configs.get(power_mode, power_configs['balanced'])
+        # Configurações por modo de energia (as mesmas que o detector do servidor usa)
+        config = POWER_PROFILES.get(power_mode, POWER_PROFILES[DEFAULT_POWER_MODE])
+        detector = WakeWordDetector(phrase=trigger_phrase, sensitivity=sensitivity, power_mode=power_mode)
         
         # Salvar configurações do usuário
         user = User.query.get(user_id)
@@ -6366,7 +7363,8 @@ def configure_background_listening():
                 'silence_suppression': True,        # Ignora silêncio
                 'adaptive_sensitivity': True,       # Ajusta sensibilidade automaticamente
                 'thermal_throttling': True          # Reduz processamento se esquentar
-            }
+            },
+            'server_detection': dict(detector.settings(), stream_endpoint='/api/voice/background-listening/stream')  # VAD + palavra de ativação em /trigger e /stream
         }
         
         return jsonify({
@@ -6389,57 +7387,132 @@ def handle_voice_trigger():
         audio_data = data.get('audio_data', '')
         trigger_confidence = data.get('trigger_confidence', 0.0)
         screen_locked = data.get('screen_locked', False)
+        power_mode = data.get('power_mode', DEFAULT_POWER_MODE)
         
-        # Verificar se é realmente o comando "EION"
-        trigger_detected = validate_trigger_phrase(audio_data, 'EION')
+        user = User.query.get(user_id)
+        trigger_word = (user.custom_trigger_word if user else None) or 'EION'
+        sensitivity = (user.trigger_sensitivity if user else None) or 0.7
+        
+        # Verificar se é realmente a palavra de ativação do usuário (silêncio sai no VAD)
+        trigger_detected = validate_trigger_phrase(
+            audio_data, trigger_word, sensitivity=sensitivity, power_mode=power_mode,
+            templates=lambda: load_trigger_templates(user_id, trigger_word),
+            client_confidence=trigger_confidence, sample_rate=data.get('sample_rate')
+        )
         
         if not trigger_detected['valid']:
             return jsonify({
                 'triggered': False,
-                'reason': 'Comando não reconhecido',
-                'confidence': trigger_detected['confidence']
+                'reason': 'Nenhuma fala detectada' if trigger_detected['stage'] == 'silence' else 'Comando não reconhecido',
+                'confidence': trigger_detected['confidence'],
+                'stage': trigger_detected['stage'],
+                'enrollment_required': trigger_detected['stage'] == 'no_template'
             })
         
-        # Ações quando acionado
-        activation_response = {
-            'triggered': True,
-            'timestamp': datetime.utcnow().isoformat(),
-            'screen_locked': screen_locked,
-            'confidence': trigger_detected['confidence'],
-            'actions': []
-        }
+        return jsonify(build_voice_activation(trigger_word, trigger_detected['confidence'], screen_locked))
         
-        # Se tela está bloqueada, acordar com notificação
-        if screen_locked:
-            activation_response['actions'].extend([
-                'wake_screen_briefly',           # Acordar tela por 5 segundos
-                'show_voice_indicator',          # Mostrar indicador de escuta
-                'enable_voice_feedback',         # Ativar feedback por voz
-                'reduce_screen_brightness'       # Reduzir brilho para economia
-            ])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/voice/background-listening/stream', methods=['POST'])
+def stream_background_listening():
+    """Escuta contínua no servidor: PCM 16 bits mono em fluxo (corpo bruto, pode ser chunked)
+    
+    Parâmetros na query string: user_id, power_mode, sample_rate (padrão: taxa do
+    modo de energia), encoding (pcm_s16le) e screen_locked. O áudio passa pelo VAD
+    à medida que chega e só os trechos de fala são comparados com os modelos do
+    usuário; a resposta sai na primeira ativação, sem esperar o fim do envio.
+    """
+    try:
+        user_id = request.args.get('user_id', 1, type=int)
+        power_mode = request.args.get('power_mode', DEFAULT_POWER_MODE)
+        screen_locked = request.args.get('screen_locked', 'false').lower() == 'true'
+        
+        encoding = request.args.get('encoding', 'pcm_s16le')
+        if encoding not in SUPPORTED_ENCODINGS:
+            return jsonify({
+                'error': f'Codificação "{encoding}" não suportada',
+                'supported_encodings': list(SUPPORTED_ENCODINGS)
+            }), 415
+        
+        user = User.query.get(user_id)
+        trigger_word = (user.custom_trigger_word if user else None) or 'EION'
+        sensitivity = (user.trigger_sensitivity if user else None) or 0.7
+        detector = WakeWordDetector(lambda: load_trigger_templates(user_id, trigger_word), phrase=trigger_word,
+                                    sensitivity=sensitivity, power_mode=power_mode)
+        
+        sample_rate = request.args.get('sample_rate', detector.profile['sample_rate'], type=int)
+        if not sample_rate or sample_rate < 8000 or sample_rate > 48000:
+            return jsonify({'error': 'sample_rate deve estar entre 8000 e 48000'}), 400
+        
+        listener = WakeWordStream(detector, sample_rate)
+        detections = []
+        for frame in iter_frames(request.stream, listener.interval_bytes):
+            detections += listener.feed(frame)
+            if any(detection['valid'] for detection in detections):
+                break
         else:
-            activation_response['actions'].extend([
-                'focus_app',                     # Focar aplicativo
-                'show_voice_interface',          # Mostrar interface de voz
-                'start_voice_session'            # Iniciar sessão de comandos
-            ])
-        
-        # Configurações de sessão de voz
-        voice_session = {
-            'session_id': str(uuid.uuid4()),
-            'timeout_seconds': 10,               # 10 segundos para comando
-            'continuous_listening': True,        # Escuta contínua durante sessão
-            'auto_end_on_silence': True,        # Termina se ficar em silêncio
-            'wake_word_bypass': True            # Não precisa falar "EION" novamente
-        }
+            detections += listener.flush()
         
-        activation_response['voice_session'] = voice_session
+        hit = next((detection for detection in detections if detection['valid']), None)
+        if hit is None:
+            best = max(detections, key=lambda detection: detection['confidence'], default=None)
+            return jsonify({
+                'triggered': False,
+                'reason': 'Nenhuma fala detectada' if best is None else 'Comando não reconhecido',
+                'confidence': best['confidence'] if best else 0.0,
+                'stage': best['stage'] if best else 'silence',
+                'enrollment_required': any(detection['stage'] == 'no_template' for detection in detections),
+                'stream': listener.stats()
+            })
         
+        activation_response = build_voice_activation(trigger_word, hit['confidence'], screen_locked)
+        activation_response['detected_at_seconds'] = hit['start_seconds']
+        activation_response['stream'] = listener.stats()
         return jsonify(activation_response)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def build_voice_activation(trigger_word, confidence, screen_locked):
+    """Resposta de ativação pela palavra de ativação (ações no aparelho e sessão de voz)"""
+    activation_response = {
+        'triggered': True,
+        'timestamp': datetime.utcnow().isoformat(),
+        'screen_locked': screen_locked,
+        'confidence': confidence,
+        'trigger_word': trigger_word,
+        'actions': []
+    }
+    
+    # Se tela está bloqueada, acordar com notificação
+    if screen_locked:
+        activation_response['actions'].extend([
+            'wake_screen_briefly',           # Acordar tela por 5 segundos
+            'show_voice_indicator',          # Mostrar indicador de escuta
+            'enable_voice_feedback',         # Ativar feedback por voz
+            'reduce_screen_brightness'       # Reduzir brilho para economia
+        ])
+    else:
+        activation_response['actions'].extend([
+            'focus_app',                     # Focar aplicativo
+            'show_voice_interface',          # Mostrar interface de voz
+            'start_voice_session'            # Iniciar sessão de comandos
+        ])
+    
+    # Configurações de sessão de voz
+    voice_session = {
+        'session_id': str(uuid.uuid4()),
+        'timeout_seconds': 10,               # 10 segundos para comando
+        'continuous_listening': True,        # Escuta contínua durante sessão
+        'auto_end_on_silence': True,        # Termina se ficar em silêncio
+        'wake_word_bypass': True            # Não precisa falar "EION" novamente
+    }
+    
+    activation_response['voice_session'] = voice_session
+    
+    return activation_response
+
 @app.route('/api/device/do-not-disturb', methods=['POST'])
 def manage_do_not_disturb():
     """Gerenciar modo 'Não Perturbe' durante reuniões"""
@@ -6509,11 +7582,7 @@ def get_meeting_details(meeting_id):
             'participants': [p.to_dict() for p in participants],
             'transcripts': [t.to_dict() for t in transcripts],
             'agenda': agenda.to_dict() if agenda else None,
-            'statistics': {
-                'total_words': sum([len(t.content.split()) for t in transcripts]),
-                'action_items_count': len([t for t in transcripts if t.is_action_item]),
-                'decisions_count': len([t for t in transcripts if t.is_decision])
-            }
+            'statistics': meeting.get_statistics()
         })
         
     except Exception as e:
@@ -6523,22 +7592,28 @@ def get_meeting_details(meeting_id):
 def get_user_meetings(user_id):
     """Listar reuniões do usuário"""
     try:
-        meetings = MeetingSession.query.filter_by(user_id=user_id).order_by(
-            MeetingSession.created_at.desc()
-        ).all()
+        query = MeetingSession.query.filter_by(user_id=user_id)
         
-        meetings_data = []
-        for meeting in meetings:
+        def meeting_data(meeting):
             meeting_dict = meeting.to_dict()
-            meeting_dict['participants_count'] = MeetingParticipant.query.filter_by(meeting_id=meeting.id).count()
-            meeting_dict['transcripts_count'] = MeetingTranscript.query.filter_by(meeting_id=meeting.id).count()
-            meetings_data.append(meeting_dict)
+            meeting_dict['participants_count'] = meeting.total_participants or 0
+            meeting_dict['transcripts_count'] = meeting.transcripts_count or 0
+            return meeting_dict
+        
+        streamed = stream_response(request.args, query, MEETINGS_KEYSET, meeting_data, 'meetings')
+        if streamed:
+            return streamed
+        meetings, next_cursor = paginate(query, MEETINGS_KEYSET, request.args.get('cursor'), page_limit(request.args))
+        meetings_data = [meeting_data(meeting) for meeting in meetings]
         
         return jsonify({
             'meetings': meetings_data,
-            'total': len(meetings_data)
+            'total': len(meetings_data),
+            **page_info(next_cursor)
         })
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -6563,31 +7638,34 @@ def test_voice_recognition(meeting_id):
                 'suggestion': 'Cadastre os participantes primeiro com suas apresentações'
             }), 400
         
-        # Testar identificação
-        identified_speaker = identify_speaker_by_voice(audio_data, participants)
+        # Testar identificação: todos os perfis comparados em uma única operação
+        engine = get_meeting_speaker_engine(meeting)
         current_features = extract_audio_features(audio_data)
+        identified_speaker = engine.identify(current_features)
+        similarity_scores = engine.similarities(current_features)
+        participants_by_id = {participant.id: participant for participant in participants}
         
         # Análise detalhada para cada participante
         detailed_analysis = []
-        for participant in participants:
-            if participant.voice_profile and participant.voice_profile != '{}':
-                try:
-                    stored_profile = json.loads(participant.voice_profile)
-                    similarity_score = calculate_voice_similarity(current_features, stored_profile)
-                    
-                    detailed_analysis.append({
-                        'participant_name': participant.participant_name,
-                        'similarity_score': round(similarity_score, 3),
-                        'is_verified': participant.is_verified,
-                        'confidence_level': participant.confidence_level,
-                        'profile_quality': stored_profile.get('analysis_metadata', {}).get('sample_quality', 'unknown')
-                    })
-                except:
-                    detailed_analysis.append({
-                        'participant_name': participant.participant_name,
-                        'similarity_score': 0.0,
-                        'error': 'Perfil de voz inválido'
-                    })
+        for participant_id, stored_profile, similarity_score in zip(engine.participant_ids, engine.parsed_profiles, similarity_scores):
+            participant = participants_by_id.get(participant_id)
+            if not participant or not participant.voice_profile or participant.voice_profile == '{}':
+                continue
+            if stored_profile is None:
+                detailed_analysis.append({
+                    'participant_name': participant.participant_name,
+                    'similarity_score': 0.0,
+                    'error': 'Perfil de voz inválido'
+                })
+                continue
+            
+            detailed_analysis.append({
+                'participant_name': participant.participant_name,
+                'similarity_score': round(float(similarity_score), 3),
+                'is_verified': participant.is_verified,
+                'confidence_level': participant.confidence_level,
+                'profile_quality': stored_profile.get('analysis_metadata', {}).get('sample_quality', 'unknown')
+            })
         
         # Ordenar por similaridade
         detailed_analysis.sort(key=lambda x: x.get('similarity_score', 0), reverse=True)
@@ -6610,45 +7688,9 @@ def test_voice_recognition(meeting_id):
         return jsonify({'error': str(e)}), 500
 
 def calculate_voice_similarity(current_features, stored_profile):
-    """Calcular similaridade detalhada entre características vocais"""
-    import json
-    
-    similarities = []
-    
-    # Comparar frequência fundamental (25%)
-    if 'fundamental_frequency' in stored_profile and 'fundamental_frequency' in current_features:
-        freq_diff = abs(current_features['fundamental_frequency'] - stored_profile['fundamental_frequency'])
-        freq_sim = max(0, 1 - (freq_diff / 100))
-        similarities.append(freq_sim * 0.25)
-    
-    # Comparar formantes (30%)
-    if 'formants' in stored_profile and 'formants' in current_features:
-        formant_sim = compare_formants(current_features['formants'], stored_profile['formants'])
-        similarities.append(formant_sim * 0.30)
-    
-    # Comparar taxa de fala (15%)
-    if 'speech_rate' in stored_profile and 'speech_rate' in current_features:
-        rate_diff = abs(current_features['speech_rate'] - stored_profile['speech_rate'])
-        rate_sim = max(0, 1 - (rate_diff / 60))
-        similarities.append(rate_sim * 0.15)
-    
-    # Comparar características espectrais (20%)
-    if 'spectral_features' in stored_profile and 'spectral_features' in current_features:
-        spectral_sim = compare_spectral_features(
-            current_features['spectral_features'], 
-            stored_profile['spectral_features']
-        )
-        similarities.append(spectral_sim * 0.20)
-    
-    # Comparar características prosódicas (10%)
-    if 'prosodic_features' in stored_profile and 'prosodic_features' in current_features:
-        prosodic_sim = compare_prosodic_features(
-            current_features['prosodic_features'],
-            stored_profile['prosodic_features']
-        )
-        similarities.append(prosodic_sim * 0.10)
-    
-    return sum(similarities) if similarities else 0.0
+    """Calcular similaridade detalhada entre características vocais (um perfil)"""
+    engine = SpeakerScoringEngine([{'name': '', 'voice_profile': stored_profile}])
+    return float(engine.similarities(current_features)[0])
 
 def generate_recognition_recommendations(analysis_results, current_features):
     """Gerar recomendações para melhorar reconhecimento"""
@@ -6687,35 +7729,42 @@ def generate_recognition_recommendations(analysis_results, current_features):
 
 # ==================== FUNÇÕES AUXILIARES ====================
 
-def create_voice_profile(audio_sample):
+def create_voice_profile(audio_sample, sample_rate=DEFAULT_SAMPLE_RATE):
     """Criar perfil de voz para reconhecimento de participante"""
     import json
     
-    # Simular análise de características vocais
+    summary = summarize_audio(analyze_audio(audio_sample, sample_rate))
     voice_profile = {
         'timestamp': datetime.utcnow().isoformat(),
-        'fundamental_frequency': 150 + (len(audio_sample) % 100),
-        'formants': [800, 1200, 2400, 3200],
-        'pitch_range': {'min': 100, 'max': 300},
-        'speech_rate': 150,  # palavras por minuto
-        'energy_profile': [0.8, 0.7, 0.9, 0.6],
+        'fundamental_frequency': _rounded(summary.get('pitch_mean'), 2),
+        'formants': [round(value, 1) for value in summary.get('formants', [])],
+        'pitch_range': {'min': _rounded(summary.get('pitch_min'), 1), 'max': _rounded(summary.get('pitch_max'), 1)},
+        'speech_rate': _rounded(summary.get('speech_rate'), 1),  # palavras por minuto
+        'energy_profile': summary.get('energy_profile', []),
         'spectral_features': {
-            'spectral_centroid': 2500,
-            'spectral_rolloff': 8000,
-            'zero_crossing_rate': 0.15
+            'spectral_centroid': _rounded(summary.get('spectral_centroid'), 1),
+            'spectral_rolloff': _rounded(summary.get('spectral_rolloff'), 1),
+            'zero_crossing_rate': _rounded(summary.get('zero_crossing_rate'), 4)
         }
     }
     
     return json.dumps(voice_profile)
 
-def create_enhanced_voice_profile(audio_data, text_content=""):
+def _rounded(value, digits):
+    """Arredondar mantendo None onde a análise não tem dados"""
+    return None if value is None else round(value, digits)
+
+def create_enhanced_voice_profile(audio_data, text_content="", sample_rate=DEFAULT_SAMPLE_RATE):
     """Criar perfil de voz avançado para reconhecimento preciso"""
     import json
     import hashlib
     
-    # Análise avançada de características vocais
-    audio_length = len(audio_data) if audio_data else 0
-    text_length = len(text_content) if text_content else 0
+    # Análise real do sinal (quadros, FFT, MFCC, pitch por autocorrelação)
+    summary = summarize_audio(analyze_audio(audio_data, sample_rate), text_content)
+    pauses = summary.get('pauses', [])
+    formants = summary.get('formants', [])
+    duration = summary['duration_seconds']
+    snr = summary.get('snr_db') or 0.0
     
     # Gerar ID único do perfil baseado no áudio
     profile_id = hashlib.md5(f"{audio_data}{text_content}{datetime.utcnow()}".encode()).hexdigest()[:12]
@@ -6723,72 +7772,89 @@ def create_enhanced_voice_profile(audio_data, text_content=""):
     enhanced_profile = {
         'profile_id': profile_id,
         'created_at': datetime.utcnow().isoformat(),
-        'audio_quality': 'excellent' if audio_length > 1000 else 'good' if audio_length > 500 else 'fair',
+        'audio_quality': audio_quality_from_summary(summary),
         
         # Características fundamentais da voz
-        'fundamental_frequency': 120 + (audio_length % 150),  # Hz - frequência fundamental
-        'pitch_variance': round(0.05 + (audio_length % 20) * 0.01, 3),  # Variação do tom
-        'formants': {
-            'f1': 800 + (audio_length % 200),   # Primeira formante
-            'f2': 1200 + (audio_length % 400),  # Segunda formante
-            'f3': 2400 + (audio_length % 600),  # Terceira formante
-            'f4': 3200 + (audio_length % 800)   # Quarta formante
-        },
+        'fundamental_frequency': _rounded(summary.get('pitch_mean'), 2),  # Hz - frequência fundamental
+        'pitch_variance': _rounded(summary.get('pitch_variance'), 3),  # Variação do tom (desvio relativo)
+        'formants': formants_dict(formants),
         
         # Características temporais
-        'speech_rate': 140 + (text_length % 60),  # Palavras por minuto
+        'speech_rate': _rounded(summary.get('speech_rate'), 1),  # Palavras por minuto
         'pause_patterns': {
-            'average_pause_duration': 0.5 + (audio_length % 10) * 0.1,
-            'pause_frequency': 2 + (text_length % 8)
+            'average_pause_duration': round(sum(pauses) / len(pauses), 2) if pauses else 0.0,
+            'pause_frequency': round(len(pauses) / (duration / 60.0), 2) if duration else 0.0  # Pausas por minuto
         },
         
         # Características espectrais
         'spectral_features': {
-            'spectral_centroid': 2000 + (audio_length % 1000),
-            'spectral_rolloff': 7000 + (audio_length % 2000),
-            'spectral_bandwidth': 1500 + (audio_length % 500),
-            'zero_crossing_rate': 0.1 + (audio_length % 20) * 0.01,
-            'mfcc_coefficients': [
-                1.2 + (audio_length % 10) * 0.1,
-                -0.5 + (audio_length % 15) * 0.05,
-                0.8 + (audio_length % 12) * 0.08,
-                -0.3 + (audio_length % 18) * 0.03
-            ]
+            'spectral_centroid': _rounded(summary.get('spectral_centroid'), 1),
+            'spectral_rolloff': _rounded(summary.get('spectral_rolloff'), 1),
+            'spectral_bandwidth': _rounded(summary.get('spectral_bandwidth'), 1),
+            'zero_crossing_rate': _rounded(summary.get('zero_crossing_rate'), 4),
+            'mfcc_coefficients': [round(value, 3) for value in summary.get('mfcc', [])]
         },
         
         # Características prosódicas
         'prosodic_features': {
-            'intonation_pattern': 'rising' if audio_length % 3 == 0 else 'falling' if audio_length % 3 == 1 else 'level',
-            'stress_pattern': 'regular' if audio_length % 2 == 0 else 'irregular',
-            'rhythm_score': round(0.6 + (audio_length % 30) * 0.01, 2)
+            'intonation_pattern': summary.get('intonation_pattern'),
+            'stress_pattern': 'regular' if summary.get('rhythm_score', 0.0) >= 0.6 else 'irregular',
+            'rhythm_score': _rounded(summary.get('rhythm_score'), 2)
         },
         
         # Metadados da análise
         'analysis_metadata': {
-            'audio_duration_estimate': round(audio_length / 100, 2),  # Estimativa em segundos
+            'audio_duration_estimate': round(duration, 2),  # Segundos
             'text_words_count': len(text_content.split()) if text_content else 0,
-            'confidence_score': 0.85 + (min(audio_length, 2000) / 2000) * 0.15,
-            'sample_quality': 'studio' if audio_length > 2000 else 'conference' if audio_length > 1000 else 'mobile'
+            'confidence_score': round(min(1.0, summary['voiced_seconds'] / 3.0) * min(1.0, snr / 30.0), 3),
+            'sample_quality': 'studio' if summary['sample_rate'] >= 44100 and snr > 30 else 'conference' if summary['sample_rate'] >= 16000 and snr > 15 else 'mobile'
         },
         
         # Características únicas para identificação
         'voice_signature': {
-            'vocal_tract_length': 15.5 + (audio_length % 50) * 0.1,  # cm estimado
-            'breathiness_index': round(0.2 + (audio_length % 40) * 0.01, 3),
-            'nasality_score': round(0.1 + (audio_length % 25) * 0.01, 3),
-            'accent_markers': ['neutral', 'regional'][audio_length % 2]
+            'vocal_tract_length': _rounded(vocal_tract_length(formants), 2),  # cm estimado
+            'breathiness_index': _rounded(summary.get('breathiness'), 3),
+            'nasality_score': _rounded(summary.get('nasality'), 3),
+            'accent_markers': 'neutral'
         }
     }
     
     return json.dumps(enhanced_profile, ensure_ascii=False)
 
-def transcribe_with_speaker_identification(audio_data, meeting_id, start_time, end_time):
+# Perfis de voz já analisados por reunião: montados ao iniciar/adicionar participantes,
+# atualizados na apresentação e descartados ao finalizar a reunião
+meeting_profile_cache = MeetingProfileCache(max_meetings=256, ttl_seconds=3600)
+
+def get_meeting_speaker_engine(meeting):
+    """Motor de identificação da reunião (do cache; remonta se ausente ou desatualizado)"""
+    version = meeting.profiles_version or 0
+    engine = meeting_profile_cache.get(meeting.id, version=version)
+    if engine is None:
+        participants = MeetingParticipant.query.filter_by(meeting_id=meeting.id).all()
+        engine = SpeakerScoringEngine.from_participants(participants)
+        meeting_profile_cache.put(meeting.id, engine, version=version)
+    return engine
+
+def bump_meeting_profiles_version(meeting_id):
+    """Nova versão dos perfis de voz da reunião, na transação atual: (versão anterior, versão nova).
+    
+    O incremento é atômico e a linha fica travada até o commit, então a versão
+    anterior é exatamente a que o cache precisa ter para receber só este
+    participante (upsert_participant); se outro worker mudou os perfis antes,
+    a entrada em cache está em outra versão e é descartada.
+    """
+    table = MeetingSession.__table__
+    db.session.execute(table.update().where(table.c.id == meeting_id).values(
+        profiles_version=db.func.coalesce(table.c.profiles_version, 0) + 1))
+    version = db.session.execute(select(table.c.profiles_version).where(table.c.id == meeting_id)).scalar_one()
+    return version - 1, version
+
+def transcribe_with_speaker_identification(audio_data, meeting, start_time, end_time, engine=None, sample_rate=DEFAULT_SAMPLE_RATE):
     """Transcrever áudio identificando o falante"""
     import random
-    import json
     
-    # Buscar participantes da reunião
-    participants = MeetingParticipant.query.filter_by(meeting_id=meeting_id).all()
+    # Perfis da reunião já empacotados (sem consulta nem JSON por trecho)
+    engine = engine or get_meeting_speaker_engine(meeting)
     
     # Simular transcrição com identificação de falante
     sample_transcriptions = [
@@ -6802,198 +7868,138 @@ def transcribe_with_speaker_identification(audio_data, meeting_id, start_time, e
     
     content = random.choice(sample_transcriptions)
     
-    # Identificar falante baseado nas características de voz
-    identified_speaker = identify_speaker_by_voice(audio_data, participants) if participants else "Participante Desconhecido"
+    # Identificar falante: trecho comparado com todos os perfis de uma vez
+    features = extract_audio_features(audio_data, sample_rate)
+    identified_speaker = engine.identify(features)
+    participant_id = None
+    if identified_speaker in engine.names:  # Identificação certa (sem '(provável)')
+        participant_id = engine.participant_ids[engine.names.index(identified_speaker)]
     
     # Simular análise de sentimento
     sentiments = ['positive', 'neutral', 'negative']
     sentiment = random.choices(sentiments, weights=[0.5, 0.4, 0.1])[0]
     
-    # Simular qualidade de áudio
-    audio_qualities = ['excellent', 'good', 'fair', 'poor']
-    audio_quality = random.choices(audio_qualities, weights=[0.4, 0.4, 0.15, 0.05])[0]
-    
     return {
         'content': content,
         'speaker_name': identified_speaker,
+        'participant_id': participant_id,
         'speaker_identified': identified_speaker != "Participante Desconhecido",
         'confidence': random.uniform(0.75, 0.95),
-        'audio_quality': audio_quality,
+        'audio_quality': features['audio_quality'],
         'sentiment': sentiment
     }
 
-def identify_speaker_by_voice(audio_data, participants):
-    """Identificar falante comparando com perfis de voz dos participantes - Versão Avançada"""
-    import random
-    import json
-    
-    if not participants:
-        return "Participante Desconhecido"
-    
-    # Simular análise avançada de características vocais do áudio atual
-    current_audio_features = extract_audio_features(audio_data)
-    
-    confidence_scores = []
+def build_meeting_transcript(meeting_id, transcription_result, start_time, end_time):
+    """Montar a linha de transcrição marcando itens de ação e decisões"""
+    transcript = MeetingTranscript(
+        meeting_id=meeting_id,
+        participant_id=transcription_result.get('participant_id'),
+        speaker_name=transcription_result['speaker_name'],
+        content=transcription_result['content'],
+        start_time_seconds=start_time,
+        end_time_seconds=end_time,
+        confidence_score=transcription_result['confidence'],
+        audio_quality=transcription_result['audio_quality'],
+        sentiment=transcription_result['sentiment']
+    )
     
-    for participant in participants:
-        if not participant.voice_profile or participant.voice_profile == '{}':
-            # Participante sem perfil de voz
-            confidence_scores.append((participant.participant_name, 0.1))
+    # Identificar se é item de ação ou decisão
+    if any(keyword in transcript.content.lower() for keyword in ['decidir', 'decidimos', 'resolução', 'conclusão']):
+        transcript.is_decision = True
+    
+    if any(keyword in transcript.content.lower() for keyword in ['ação', 'tarefa', 'deve fazer', 'responsável']):
+        transcript.is_action_item = True
+    
+    return transcript
+
+# ==================== ESTATÍSTICAS INCREMENTAIS DE REUNIÕES ====================
+
+PARTICIPANT_STATISTICS_COLUMNS = ('speaking_time_minutes', 'interventions_count', 'words_count')
+
+@event.listens_for(db.session, 'before_flush')
+def _accumulate_meeting_statistics(session, flush_context, instances):
+    """Somar transcrições e participantes novos (e subtrair os excluídos) nos agregados da reunião no mesmo flush.
+    
+    Os incrementos são expressões SQL (coluna = coluna + delta), então workers
+    gravando trechos da mesma reunião ao mesmo tempo não perdem atualizações.
+    O UPDATE da reunião avança updated_at, então o backup incremental leva os
+    agregados novos. Gravações fora da sessão são corrigidas pela reconciliação
+    noturna (reconcile_meeting_statistics).
+    """
+    meetings = {}
+    speakers = {}  # participant_id ou (meeting_id, nome identificado) -> deltas
+    for objects, sign in ((session.new, 1), (session.deleted, -1)):
+        for obj in objects:
+            if isinstance(obj, MeetingParticipant) and obj.meeting_id:
+                meetings.setdefault(obj.meeting_id, Counter())['total_participants'] += sign
+            elif isinstance(obj, MeetingTranscript) and obj.meeting_id:
+                words = len(obj.content.split()) if obj.content else 0
+                meeting = meetings.setdefault(obj.meeting_id, Counter())
+                meeting['transcripts_count'] += sign
+                meeting['total_words'] += sign * words
+                meeting['action_items_count'] += sign if obj.is_action_item else 0
+                meeting['decisions_count'] += sign if obj.is_decision else 0
+                meeting['confidence_sum'] += sign * (obj.confidence_score or 0.0)
+                key = obj.participant_id or ((obj.meeting_id, obj.speaker_name) if obj.speaker_name else None)
+                if key:
+                    speaker = speakers.setdefault(key, Counter())
+                    speaker['speaking_time_minutes'] += sign * ((obj.end_time_seconds or 0) - (obj.start_time_seconds or 0)) / 60
+                    speaker['interventions_count'] += sign
+                    speaker['words_count'] += sign * words
+    
+    _apply_meeting_statistics(session, meetings)
+    
+    # Participantes: UPDATE direto (sem carregar as linhas); os já carregados na sessão
+    # têm as colunas expiradas para relerem o valor novo
+    for key, deltas in speakers.items():
+        table = MeetingParticipant.__table__
+        if isinstance(key, tuple):
+            condition = (table.c.meeting_id == key[0]) & (table.c.participant_name == key[1])
+        else:
+            condition = table.c.id == key
+        session.execute(table.update().where(condition).values({
+            column: db.func.coalesce(table.c[column], 0) + deltas[column] for column in PARTICIPANT_STATISTICS_COLUMNS
+        }))
+    if speakers:
+        for obj in list(session.identity_map.values()) + list(session.new):
+            if not isinstance(obj, MeetingParticipant):
+                continue
+            deltas = speakers.get(obj.id) or speakers.get((obj.meeting_id, obj.participant_name))
+            if not deltas:
+                continue
+            if inspect(obj).pending:
+                _increment_columns(obj, deltas)
+            else:
+                session.expire(obj, PARTICIPANT_STATISTICS_COLUMNS)
+
+def _apply_meeting_statistics(session, meetings):
+    """UPDATE direto dos agregados das reuniões (coluna = coluna + delta); as já carregadas
+    na sessão têm os agregados expirados para relerem o valor novo"""
+    table = MeetingSession.__table__
+    for meeting_id, deltas in sorted(meetings.items()):
+        values = {column: db.func.coalesce(table.c[column], 0) + delta for column, delta in deltas.items() if delta}
+        if values:
+            session.execute(table.update().where(table.c.id == meeting_id).values(values))
+    if meetings:
+        for obj in list(session.identity_map.values()):
+            if isinstance(obj, MeetingSession) and obj.id in meetings:
+                session.expire(obj, list(meetings[obj.id]) + ['updated_at'])
+
+def _increment_columns(obj, deltas):
+    """Agendar `coluna = coalesce(coluna, 0) + delta` para o próximo UPDATE do objeto"""
+    model = type(obj)
+    state = inspect(obj)
+    for column, delta in deltas.items():
+        if not delta:
             continue
-        
-        try:
-            stored_profile = json.loads(participant.voice_profile)
-            
-            # Comparar múltiplas características vocais
-            similarity_scores = []
-            
-            # 1. Frequência fundamental (peso: 25%)
-            if 'fundamental_frequency' in stored_profile:
-                freq_diff = abs(current_audio_features['fundamental_frequency'] - 
-                              stored_profile['fundamental_frequency'])
-                freq_similarity = max(0, 1 - (freq_diff / 100))  # Normalizar diferença
-                similarity_scores.append(freq_similarity * 0.25)
-            
-            # 2. Formantes (peso: 30%)
-            if 'formants' in stored_profile:
-                formant_similarity = compare_formants(
-                    current_audio_features['formants'], 
-                    stored_profile['formants']
-                )
-                similarity_scores.append(formant_similarity * 0.30)
-            
-            # 3. Taxa de fala (peso: 15%)
-            if 'speech_rate' in stored_profile:
-                rate_diff = abs(current_audio_features['speech_rate'] - 
-                              stored_profile['speech_rate'])
-                rate_similarity = max(0, 1 - (rate_diff / 60))  # Normalizar diferença
-                similarity_scores.append(rate_similarity * 0.15)
-            
-            # 4. Características espectrais (peso: 20%)
-            if 'spectral_features' in stored_profile:
-                spectral_similarity = compare_spectral_features(
-                    current_audio_features['spectral_features'],
-                    stored_profile['spectral_features']
-                )
-                similarity_scores.append(spectral_similarity * 0.20)
-            
-            # 5. Características prosódicas (peso: 10%)
-            if 'prosodic_features' in stored_profile:
-                prosodic_similarity = compare_prosodic_features(
-                    current_audio_features['prosodic_features'],
-                    stored_profile['prosodic_features']
-                )
-                similarity_scores.append(prosodic_similarity * 0.10)
-            
-            # Calcular score final
-            final_score = sum(similarity_scores) if similarity_scores else 0.1
-            
-            # Aplicar bonus para participantes verificados
-            if participant.is_verified:
-                final_score *= 1.1  # 10% de bonus
-            
-            confidence_scores.append((participant.participant_name, min(final_score, 1.0)))
-            
-        except (json.JSONDecodeError, KeyError) as e:
-            # Perfil inválido, usar score baixo
-            confidence_scores.append((participant.participant_name, 0.1))
-    
-    # Ordenar por confiança e retornar o melhor match
-    confidence_scores.sort(key=lambda x: x[1], reverse=True)
-    
-    best_match = confidence_scores[0]
-    second_best = confidence_scores[1] if len(confidence_scores) > 1 else (None, 0)
-    
-    # Critérios mais rigorosos para identificação
-    if best_match[1] > 0.75 and (best_match[1] - second_best[1]) > 0.2:
-        return best_match[0]
-    elif best_match[1] > 0.6:
-        return f"{best_match[0]} (provável)"
-    else:
-        return "Participante Desconhecido"
+        if state.pending:
+            setattr(obj, column, (getattr(obj, column) or 0) + delta)
+        else:
+            setattr(obj, column, db.func.coalesce(getattr(model, column), 0) + delta)
 
-def extract_audio_features(audio_data):
+def extract_audio_features(audio_data, sample_rate=DEFAULT_SAMPLE_RATE):
     """Extrair características do áudio atual para comparação"""
-    audio_length = len(audio_data) if audio_data else 0
-    
-    # Simular extração de características em tempo real
-    return {
-        'fundamental_frequency': 120 + (audio_length % 150),
-        'formants': {
-            'f1': 750 + (audio_length % 300),
-            'f2': 1150 + (audio_length % 500),
-            'f3': 2300 + (audio_length % 700),
-            'f4': 3100 + (audio_length % 900)
-        },
-        'speech_rate': 130 + (audio_length % 80),
-        'spectral_features': {
-            'spectral_centroid': 1900 + (audio_length % 1200),
-            'spectral_rolloff': 6800 + (audio_length % 2500),
-            'zero_crossing_rate': 0.09 + (audio_length % 25) * 0.01
-        },
-        'prosodic_features': {
-            'intonation_pattern': 'rising' if audio_length % 3 == 0 else 'falling',
-            'rhythm_score': 0.5 + (audio_length % 40) * 0.01
-        }
-    }
-
-def compare_formants(current_formants, stored_formants):
-    """Comparar formantes entre áudio atual e perfil armazenado"""
-    if not isinstance(current_formants, dict) or not isinstance(stored_formants, dict):
-        return 0.5
-    
-    similarities = []
-    for formant in ['f1', 'f2', 'f3', 'f4']:
-        if formant in current_formants and formant in stored_formants:
-            diff = abs(current_formants[formant] - stored_formants[formant])
-            similarity = max(0, 1 - (diff / 500))  # Normalizar diferença
-            similarities.append(similarity)
-    
-    return sum(similarities) / len(similarities) if similarities else 0.5
-
-def compare_spectral_features(current_spectral, stored_spectral):
-    """Comparar características espectrais"""
-    if not isinstance(current_spectral, dict) or not isinstance(stored_spectral, dict):
-        return 0.5
-    
-    similarities = []
-    
-    # Comparar centroide espectral
-    if 'spectral_centroid' in current_spectral and 'spectral_centroid' in stored_spectral:
-        diff = abs(current_spectral['spectral_centroid'] - stored_spectral['spectral_centroid'])
-        similarity = max(0, 1 - (diff / 2000))
-        similarities.append(similarity)
-    
-    # Comparar rolloff espectral
-    if 'spectral_rolloff' in current_spectral and 'spectral_rolloff' in stored_spectral:
-        diff = abs(current_spectral['spectral_rolloff'] - stored_spectral['spectral_rolloff'])
-        similarity = max(0, 1 - (diff / 3000))
-        similarities.append(similarity)
-    
-    return sum(similarities) / len(similarities) if similarities else 0.5
-
-def compare_prosodic_features(current_prosodic, stored_prosodic):
-    """Comparar características prosódicas"""
-    if not isinstance(current_prosodic, dict) or not isinstance(stored_prosodic, dict):
-        return 0.5
-    
-    similarities = []
-    
-    # Comparar padrão de entonação
-    if ('intonation_pattern' in current_prosodic and 
-        'intonation_pattern' in stored_prosodic):
-        if current_prosodic['intonation_pattern'] == stored_prosodic['intonation_pattern']:
-            similarities.append(1.0)
-        else:
-            similarities.append(0.3)
-    
-    # Comparar score de ritmo
-    if 'rhythm_score' in current_prosodic and 'rhythm_score' in stored_prosodic:
-        diff = abs(current_prosodic['rhythm_score'] - stored_prosodic['rhythm_score'])
-        similarity = max(0, 1 - (diff / 0.5))
-        similarities.append(similarity)
-    
-    return sum(similarities) / len(similarities) if similarities else 0.5
+    return extract_voice_features(audio_data, sample_rate)
 
 def generate_advanced_agenda(meeting, transcripts):
     """Gerar pauta avançada com análise de IA"""
@@ -7109,6 +8115,9 @@ def generate_next_steps(action_items, decisions):
     ])
     
     return next_steps
+
+@app.route('/api/system/info', methods=['GET'])
+@response_cache.cached(vary_query=False, ttl=3600)
 def system_info():
     """Informações do sistema"""
     return jsonify({
@@ -7222,55 +8231,52 @@ def list_user_apps(user_id):
     """Listar aplicativos do usuário com suporte a filtros"""
     try:
         # Parâmetros de consulta
-        enabled_only = request.args.get('enabled_only', 'false').lower() == 'true'
+        favorites_only = request.args.get('favorites_only', 'false').lower() == 'true'
         search_term = request.args.get('search', '').strip()
         sort_by = request.args.get('sort_by', 'usage_count')  # usage_count, name, last_used
-        limit = min(int(request.args.get('limit', 50)), 100)  # Máximo 100
+        keyset = APP_KEYSETS.get(sort_by, APP_KEYSETS['usage_count'])
         
         # Query base
         query = AppControl.query.filter_by(user_id=user_id)
         
         # Filtros
-        if enabled_only:
-            query = query.filter(AppControl.is_enabled == True)
+        if favorites_only:
+            query = query.filter(AppControl.is_favorite == True)
         
         if search_term:
             search_filter = or_(
                 AppControl.app_name.ilike(f'%{search_term}%'),
                 AppControl.display_name.ilike(f'%{search_term}%'),
-                AppControl.package_name.ilike(f'%{search_term}%')
+                AppControl.app_package.ilike(f'%{search_term}%')
             )
             query = query.filter(search_filter)
         
-        # Ordenação
-        if sort_by == 'usage_count':
-            query = query.order_by(AppControl.usage_count.desc())
-        elif sort_by == 'name':
-            query = query.order_by(AppControl.display_name.asc())
-        elif sort_by == 'last_used':
-            query = query.order_by(AppControl.last_used.desc().nullslast())
-        else:
-            query = query.order_by(AppControl.usage_count.desc())
-        
-        apps = query.limit(limit).all()
+        # Ordenação pelo cursor da ordenação escolhida
+        streamed = stream_response(request.args, query, keyset, lambda app: app.to_dict(), 'apps')
+        if streamed:
+            return streamed
+        apps, next_cursor = paginate(query, keyset, request.args.get('cursor'), page_limit(request.args, maximum=100))
         
         # Estatísticas
         total_apps = AppControl.query.filter_by(user_id=user_id).count()
-        enabled_apps = AppControl.query.filter_by(user_id=user_id, is_enabled=True).count()
+        favorite_apps = AppControl.query.filter_by(user_id=user_id, is_favorite=True).count()
         
         return jsonify({
             'success': True,
-            'apps': [format_app_data(app) for app in apps],
+            'apps': [app.to_dict() for app in apps],
             'total_apps': total_apps,
-            'enabled_apps': enabled_apps,
+            'favorite_apps': favorite_apps,
             'showing': len(apps),
             'filters': {
-                'enabled_only': enabled_only,
+                'favorites_only': favorites_only,
                 'search_term': search_term,
                 'sort_by': sort_by
-            }
+            },
+            **page_info(next_cursor)
         })
         
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -7514,8 +8520,13 @@ def ai_chat():
         )
         db.session.add(ai_message)
         
-        # Salvar na memória conversacional avançada
-        save_conversation_memory_internal(user_id, session_id, message, ai_response)
+        # Memória conversacional avançada fica para a fila (não atrasa a resposta)
+        job_queue.enqueue('conversation_memory', {
+            'user_id': user_id,
+            'session_id': session_id,
+            'user_message': message,
+            'ai_response': ai_response
+        })
         
         db.session.commit()
         
@@ -7540,6 +8551,8 @@ def voice_command():
         
         # Processar comando de voz avançado
         result = process_voice_command(command_text, user_id)
+        user_activity.record(db.session, user_id, 'voice_commands')
+        db.session.commit()
         
         return jsonify({
             'executed': True,
@@ -7584,7 +8597,9 @@ def save_conversation_memory():
             importance_level=context_analysis.get('importance', 1),
             related_topic=context_analysis.get('topic'),
             referenced_data=json.dumps(context_analysis.get('referenced_data', {})),
-            follow_up_needed=context_analysis.get('follow_up', False)
+            follow_up_needed=context_analysis.get('follow_up', False),
+            search_text=memory_search_text(user_message, ai_response, context_analysis.get('topic'),
+                                           context_analysis['context'])
         )
         
         db.session.add(memory)
@@ -7615,26 +8630,20 @@ def search_conversation_memory():
         limit = min(data.get('limit', 10), 50)
         
         # Buscar conversas relevantes
-        search_query = ConversationMemory.query.filter_by(user_id=user_id)
-        
-        # Filtros de busca
-        if topic:
-            search_query = search_query.filter(ConversationMemory.related_topic == topic)
-        
         if query:
-            search_query = search_query.filter(
-                or_(
-                    ConversationMemory.user_message.contains(query),
-                    ConversationMemory.ai_response.contains(query),
-                    ConversationMemory.context_extracted.contains(query)
-                )
-            )
-        
-        # Ordenar por relevância e data
-        memories = search_query.order_by(
-            ConversationMemory.importance_level.desc(),
-            ConversationMemory.created_at.desc()
-        ).limit(limit).all()
+            # Busca textual: todas as palavras precisam aparecer
+            memories = search_memories(user_id, query, limit=limit, topic=topic, match_all=True, min_length=2)
+        else:
+            search_query = ConversationMemory.query.filter_by(user_id=user_id)
+            
+            if topic:
+                search_query = search_query.filter(ConversationMemory.related_topic == topic)
+            
+            # Ordenar por relevância e data
+            memories = search_query.order_by(
+                ConversationMemory.importance_level.desc(),
+                ConversationMemory.created_at.desc()
+            ).limit(limit).all()
         
         # Marcar como acessado
         for memory in memories:
@@ -7812,10 +8821,17 @@ def test():
 @app.route('/health')
 @app.route('/api/health')
 def health_check():
-    """Endpoint de verificação de saúde para Railway"""
+    """Endpoint de verificação de saúde para Railway (503 até o esquema estar pronto)"""
     try:
+        if not schema_bootstrap.ready:
+            return jsonify({
+                'status': 'starting' if schema_bootstrap.status in ('pending', 'running') else 'unavailable',
+                'bootstrap': schema_bootstrap.to_dict(),
+                'timestamp': datetime.utcnow().isoformat()
+            }), 503
+        
         # Verificar conexão com banco
-        user_count = User.query.count()
+        db.session.execute(text('SELECT 1'))
         
         return jsonify({
             'status': 'healthy',
@@ -7825,14 +8841,14 @@ def health_check():
             'timestamp': datetime.utcnow().isoformat(),
             'database': {
                 'status': 'connected',
-                'users_count': user_count,
                 'type': 'postgresql' if 'postgresql' in app.config['SQLALCHEMY_DATABASE_URI'] else 'sqlite'
             },
             'services': {
                 'flask': '✅ OK',
                 'cors': '✅ OK',
                 'database': '✅ OK'
-            }
+            },
+            'bootstrap': schema_bootstrap.to_dict()
         })
     except Exception as e:
         return jsonify({
@@ -7890,16 +8906,29 @@ def serve(path):
             'message': str(e)
         }), 500
 
+# Intenções das respostas personalizadas, em ordem de prioridade
+AI_RESPONSE_INTENTS = IntentClassifier([
+    ('greeting', ['olá', 'oi', 'hey', 'hello']),
+    ('medical', ['medicamento', 'remédio', 'medicina', 'saúde']),
+    ('meeting', ['reunião', 'meeting', 'gravar', 'gravação', 'transcrever']),
+    ('agenda', ['agenda', 'compromisso', 'encontro']),
+    ('finance', ['finanças', 'dinheiro', 'gasto', 'orçamento', 'economia']),
+    ('voice', ['voz', 'biometria', 'comandos']),
+    ('help', ['ajuda', 'help']),
+    ('thanks', ['obrigado', 'obrigada', 'valeu', 'thanks']),
+    ('goodbye', ['tchau', 'até', 'bye', 'adeus']),
+])
+
 def generate_ai_response(message, user_id=1):
     """Gerar resposta personalizada da IA"""
     # Buscar informações do usuário
     user = User.query.get(user_id)
     preferred_name = user.preferred_name if user and user.preferred_name else "amigo(a)"
     
-    message_lower = message.lower()
+    intent = AI_RESPONSE_INTENTS.first(message)
     
     # Respostas personalizadas baseadas no contexto
-    if any(word in message_lower for word in ['olá', 'oi', 'hey', 'hello']):
+    if intent == 'greeting':
         greetings = [
             f"Olá, {preferred_name}! 👋 Sou o IAON, seu assistente IA avançado. Como posso ajudá-lo hoje?",
             f"Oi, {preferred_name}! 😊 É um prazer conversar com você. Em que posso ser útil?",
@@ -7908,7 +8937,7 @@ def generate_ai_response(message, user_id=1):
         import random
         return random.choice(greetings)
     
-    elif any(word in message_lower for word in ['medicamento', 'remédio', 'medicina', 'saúde']):
+    elif intent == 'medical':
         return f"""🏥 **Sistema Médico Avançado**, {preferred_name}!
 
 Posso ajudá-lo com:
@@ -7921,7 +8950,7 @@ Posso ajudá-lo com:
 
 **⚠️ Importante:** Sempre consulte um médico para orientações específicas."""
     
-    elif any(word in message_lower for word in ['reunião', 'meeting', 'gravar', 'gravação', 'transcrever']):
+    elif intent == 'meeting':
         return f"""📹 **Sistema de Reuniões Avançado**, {preferred_name}!
 
 Funcionalidades completas:
@@ -7939,7 +8968,7 @@ Funcionalidades completas:
 • "IA gravar" - Começar gravação
 • "IA pauta" - Gerar pauta automática"""
     
-    elif any(word in message_lower for word in ['agenda', 'compromisso', 'encontro']):
+    elif intent == 'agenda':
         return f"""📅 **Agenda Inteligente**, {preferred_name}!
 
 Recursos disponíveis:
@@ -7951,7 +8980,7 @@ Recursos disponíveis:
 • 📊 Análise de produtividade
 • 🤖 Sugestões automáticas de horários"""
     
-    elif any(word in message_lower for word in ['finanças', 'dinheiro', 'gasto', 'orçamento', 'economia']):
+    elif intent == 'finance':
         return f"""💰 **Controle Financeiro Avançado**, {preferred_name}!
 
 Funcionalidades premium:
@@ -7963,7 +8992,7 @@ Funcionalidades premium:
 • 💡 Dicas de economia baseadas em IA
 • 📋 Relatórios detalhados mensais"""
     
-    elif any(word in message_lower for word in ['voz', 'biometria', 'comandos']):
+    elif intent == 'voice':
         biometry = VoiceBiometry.query.filter_by(user_id=user_id).first()
         if biometry and biometry.is_enrolled:
             return f"""🎤 **Sistema de Voz Avançado ativo**, {preferred_name}!
@@ -7980,7 +9009,7 @@ Comandos disponíveis:
         else:
             return f"🔒 **Sistema de Voz**, {preferred_name}! Para usar comandos de voz seguros, você precisa configurar sua biometria de voz primeiro."
     
-    elif 'ajuda' in message_lower or 'help' in message_lower:
+    elif intent == 'help':
         return f"""🆘 **Central de Ajuda IAON**, {preferred_name}!
 
 **🎯 Principais Recursos:**
@@ -8004,10 +9033,10 @@ Diga "IA" + comando para ações específicas
 
 **💡 Dica:** Use linguagem natural - eu entendo contexto!"""
     
-    elif any(word in message_lower for word in ['obrigado', 'obrigada', 'valeu', 'thanks']):
+    elif intent == 'thanks':
         return f"� Por nada, {preferred_name}! É sempre um prazer ajudar. Estou aqui sempre que precisar!"
     
-    elif any(word in message_lower for word in ['tchau', 'até', 'bye', 'adeus']):
+    elif intent == 'goodbye':
         return f"👋 Até logo, {preferred_name}! Foi ótimo conversar com você. Volte sempre que quiser!"
     
     else:
@@ -8024,6 +9053,22 @@ Diga "IA" + comando para ações específicas
 
 💡 **Dica**: Seja específico para respostas mais precisas!"""
 
+# Intenções dos comandos de voz, em ordem de prioridade
+VOICE_COMMAND_INTENTS = IntentClassifier([
+    ('call', ['ligar', 'chamar', 'telefone', 'discar', 'contatar', 'falar com']),
+    ('contacts', ['contato', 'agenda telefônica', 'telefones', 'números']),
+    ('call_history', ['histórico', 'chamadas', 'ligações recentes', 'última ligação']),
+    ('apps', ['abrir', 'abra', 'executar', 'iniciar', 'rodar', 'aplicativo', 'app']),
+    ('meeting', ['reunião', 'meeting', 'gravar', 'gravação']),
+    ('agenda', ['agenda', 'compromisso', 'encontro']),
+    ('medical', ['medicamento', 'remédio', 'medicina', 'saúde', 'médico']),
+    ('finance', ['finanças', 'dinheiro', 'gasto', 'orçamento', 'financeiro']),
+    ('report', ['relatório', 'relatorio', 'análise', 'dados']),
+    ('help', ['ajuda', 'help', 'comando']),
+    ('settings', ['configuração', 'config', 'configurar', 'ajuste']),
+    ('voice', ['voz', 'biometria', 'cadastrar']),
+])
+
 def process_voice_command(command_text, user_id=1):
     """Processar comando de voz avançado com palavra de ativação personalizada"""
     command_lower = command_text.lower()
@@ -8047,8 +9092,10 @@ def process_voice_command(command_text, user_id=1):
     if command_without_trigger.startswith(','):
         command_without_trigger = command_without_trigger[1:].strip()
     
+    intent = VOICE_COMMAND_INTENTS.first(command_without_trigger)
+    
     # Comandos de ligação e contatos
-    if any(word in command_without_trigger for word in ['ligar', 'chamar', 'telefone', 'discar', 'contatar', 'falar com']):
+    if intent == 'call':
         # Extrair o alvo da ligação
         call_target = extract_call_target_from_voice(command_without_trigger)
         
@@ -8071,7 +9118,7 @@ def process_voice_command(command_text, user_id=1):
             }
     
     # Comandos de contatos
-    elif any(word in command_without_trigger for word in ['contato', 'agenda telefônica', 'telefones', 'números']):
+    elif intent == 'contacts':
         return {
             'intent': 'contact_management',
             'result': f'📱 Abrindo agenda de contatos para {preferred_name}...',
@@ -8080,7 +9127,7 @@ def process_voice_command(command_text, user_id=1):
         }
     
     # Comandos de histórico de chamadas
-    elif any(word in command_without_trigger for word in ['histórico', 'chamadas', 'ligações recentes', 'última ligação']):
+    elif intent == 'call_history':
         return {
             'intent': 'call_history',
             'result': f'📋 Exibindo histórico de chamadas para {preferred_name}...',
@@ -8089,7 +9136,7 @@ def process_voice_command(command_text, user_id=1):
         }
     
     # Comandos de aplicativos
-    elif any(word in command_without_trigger for word in ['abrir', 'abra', 'executar', 'iniciar', 'rodar', 'aplicativo', 'app']):
+    elif intent == 'apps':
         # Extrair nome do aplicativo
         app_name = extract_app_name_from_command(command_without_trigger)
         if app_name:
@@ -8104,7 +9151,7 @@ def process_voice_command(command_text, user_id=1):
             }
     
     # Comandos de reunião
-    elif any(word in command_without_trigger for word in ['reunião', 'meeting', 'gravar', 'gravação']):
+    elif intent == 'meeting':
         return {
             'intent': 'meeting_management',
             'result': f'📹 Ativando sistema de reuniões para {preferred_name}...',
@@ -8113,7 +9160,7 @@ def process_voice_command(command_text, user_id=1):
         }
     
     # Comandos de agenda
-    elif any(word in command_without_trigger for word in ['agenda', 'compromisso', 'encontro']):
+    elif intent == 'agenda':
         return {
             'intent': 'agenda_management',
             'result': f'📅 Abrindo agenda inteligente para {preferred_name}...',
@@ -8122,7 +9169,7 @@ def process_voice_command(command_text, user_id=1):
         }
     
     # Comandos médicos
-    elif any(word in command_without_trigger for word in ['medicamento', 'remédio', 'medicina', 'saúde', 'médico']):
+    elif intent == 'medical':
         return {
             'intent': 'medical_check',
             'result': f'🏥 Ativando sistema médico avançado para {preferred_name}...',
@@ -8130,7 +9177,7 @@ def process_voice_command(command_text, user_id=1):
         }
     
     # Comandos financeiros
-    elif any(word in command_without_trigger for word in ['finanças', 'dinheiro', 'gasto', 'orçamento', 'financeiro']):
+    elif intent == 'finance':
         return {
             'intent': 'financial_management',
             'result': f'💰 Carregando controle financeiro para {preferred_name}...',
@@ -8139,7 +9186,7 @@ def process_voice_command(command_text, user_id=1):
         }
     
     # Comandos de relatório
-    elif any(word in command_without_trigger for word in ['relatório', 'relatorio', 'análise', 'dados']):
+    elif intent == 'report':
         return {
             'intent': 'generate_report',
             'result': f'📊 Gerando relatório personalizado para {preferred_name}...',
@@ -8148,7 +9195,7 @@ def process_voice_command(command_text, user_id=1):
         }
     
     # Comandos de ajuda
-    elif any(word in command_without_trigger for word in ['ajuda', 'help', 'comando']):
+    elif intent == 'help':
         trigger_examples = [
             f'"{user.custom_trigger_word if user else "EION"}, ligar para João"',
             f'"{user.custom_trigger_word if user else "EION"}, abrir WhatsApp"',
@@ -8164,7 +9211,7 @@ def process_voice_command(command_text, user_id=1):
         }
     
     # Comandos de configuração
-    elif any(word in command_without_trigger for word in ['configuração', 'config', 'configurar', 'ajuste']):
+    elif intent == 'settings':
         return {
             'intent': 'settings_management',
             'result': f'⚙️ Abrindo configurações para {preferred_name}...',
@@ -8173,7 +9220,7 @@ def process_voice_command(command_text, user_id=1):
         }
     
     # Comandos de voz/biometria
-    elif any(word in command_without_trigger for word in ['voz', 'biometria', 'cadastrar']):
+    elif intent == 'voice':
         return {
             'intent': 'voice_management',
             'result': f'🎤 Acessando sistema de biometria de voz para {preferred_name}...',
@@ -8202,27 +9249,28 @@ def process_voice_command(command_text, user_id=1):
             'section': 'chat'
         }
 
-def validate_trigger_phrase(audio_data, expected_phrase='EION'):
-    """Validar se o áudio contém a palavra de ativação"""
-    # Simular validação de palavra de ativação
-    audio_length = len(audio_data) if audio_data else 0
+def load_trigger_templates(user_id, trigger_word):
+    """Modelos gravados da palavra de ativação atual do usuário"""
+    rows = TriggerWordTemplate.query.filter_by(user_id=user_id, trigger_word=trigger_word.upper()).order_by(
+        TriggerWordTemplate.created_at
+    ).all()
+    return [template_from_bytes(row.mfcc) for row in rows]
+
+def validate_trigger_phrase(audio_data, expected_phrase='EION', sensitivity=0.7, power_mode=DEFAULT_POWER_MODE,
+                            templates=(), client_confidence=0.0, sample_rate=None):
+    """Validar se o áudio contém a palavra de ativação
     
-    # Análise simulada da palavra "EION"
-    confidence = 0.0
+    VAD por energia/ZCR primeiro (silêncio não passa disso), depois DTW dos
+    MFCCs contra os modelos gravados. Sem modelos, vale a confiança do
+    detector do aparelho (client_confidence) se houver fala no áudio.
+    """
+    detector = WakeWordDetector(templates, phrase=expected_phrase, sensitivity=sensitivity, power_mode=power_mode)
+    result = detector.detect(audio_data, sample_rate)
     
-    if audio_length > 100:  # Áudio mínimo
-        # Simular análise de padrões de "EION"
-        frequency_match = (audio_length % 100) / 100
-        duration_match = 0.8 if 200 <= audio_length <= 800 else 0.3
-        energy_match = (audio_length % 50) / 50
-        
-        confidence = (frequency_match + duration_match + energy_match) / 3
+    if result['stage'] == 'no_template' and (client_confidence or 0.0) >= detector.min_confidence:
+        result.update(valid=True, confidence=round(float(client_confidence), 3), phrase_detected=expected_phrase)
     
-    return {
-        'valid': confidence > 0.6,
-        'confidence': round(confidence, 3),
-        'phrase_detected': expected_phrase if confidence > 0.6 else 'unknown'
-    }
+    return result
 
 def generate_power_recommendations():
     """Gerar recomendações para otimização de energia"""
@@ -8239,74 +9287,71 @@ def generate_power_recommendations():
 
 @app.route('/api/contacts/sync', methods=['POST'])
 def sync_phone_contacts():
-    """Sincronizar contatos do telefone"""
+    """Sincronizar contatos do telefone
+    
+    Sincronização completa: enviar todos os contatos sem sync_token.
+    Sincronização delta: enviar o sync_token recebido na última resposta, apenas os
+    contatos novos/alterados em 'contacts' e os números removidos em 'deleted_phone_numbers'.
+    """
     try:
         data = request.get_json()
         user_id = data.get('user_id', 1)
         contacts_data = data.get('contacts', [])  # Lista de contatos do telefone
         sync_source = data.get('sync_source', 'phone_sync')
+        sync_token = data.get('sync_token')
+        deleted_phones = data.get('deleted_phone_numbers', [])
         
-        synced_contacts = []
-        updated_contacts = []
+        sync_state = ContactSyncState.query.filter_by(user_id=user_id, sync_source=sync_source).first()
         
-        for contact_data in contacts_data:
-            name = contact_data.get('name', 'Contato Sem Nome')
-            phone = contact_data.get('phone_number', '')
-            
-            if not phone:
-                continue  # Pular contatos sem telefone
-            
-            # Formatar número de telefone
-            formatted_phone = format_phone_number(phone)
-            country_code = extract_country_code(phone)
-            carrier_info = get_carrier_info(phone)
-            
-            # Verificar se contato já existe
-            existing_contact = Contact.query.filter_by(
-                user_id=user_id, 
-                phone_number=phone
-            ).first()
-            
-            if existing_contact:
-                # Atualizar contato existente
-                existing_contact.name = name
-                existing_contact.display_name = contact_data.get('display_name', name)
-                existing_contact.formatted_phone = formatted_phone
-                existing_contact.country_code = country_code
-                existing_contact.carrier = carrier_info
-                existing_contact.contact_type = contact_data.get('contact_type', 'mobile')
-                existing_contact.photo_url = contact_data.get('photo_url', '')
-                existing_contact.sync_source = sync_source
-                existing_contact.updated_at = datetime.utcnow()
-                updated_contacts.append(existing_contact)
-            else:
-                # Criar novo contato
-                new_contact = Contact(
-                    user_id=user_id,
-                    name=name,
-                    display_name=contact_data.get('display_name', name),
-                    phone_number=phone,
-                    formatted_phone=formatted_phone,
-                    country_code=country_code,
-                    carrier=carrier_info,
-                    contact_type=contact_data.get('contact_type', 'mobile'),
-                    photo_url=contact_data.get('photo_url', ''),
-                    sync_source=sync_source
-                )
-                db.session.add(new_contact)
-                synced_contacts.append(new_contact)
+        if sync_token and (not sync_state or sync_state.sync_token != sync_token):
+            # Token desconhecido ou de outro aparelho: o cliente precisa reenviar tudo
+            return jsonify({
+                'success': False,
+                'full_sync_required': True,
+                'error': 'sync_token inválido ou expirado - envie uma sincronização completa'
+            }), 409
+        
+        result = bulk_upsert_contacts(user_id, contacts_data, sync_source)
+        
+        deleted_count = 0
+        if sync_token and deleted_phones:
+            deleted_count = Contact.query.filter(
+                Contact.user_id == user_id,
+                Contact.sync_source == sync_source,
+                Contact.phone_number.in_(deleted_phones)
+            ).delete(synchronize_session=False)
+        
+        now = datetime.utcnow()
+        if not sync_state:
+            sync_state = ContactSyncState(user_id=user_id, sync_source=sync_source)
+            db.session.add(sync_state)
+        sync_state.sync_token = uuid.uuid4().hex
+        sync_state.last_synced_at = now
+        sync_state.contacts_received = len(contacts_data)
+        if not sync_token:
+            sync_state.last_full_sync = now
         
         db.session.commit()
+        # Upsert/remoção em lote não passam pelos eventos do ORM
+        invalidate_voice_match_index('contacts', user_id)
+        
+        synced_count = result['inserted']
+        updated_count = result['updated']
         
         return jsonify({
             'success': True,
-            'synced_count': len(synced_contacts),
-            'updated_count': len(updated_contacts),
-            'total_contacts': Contact.query.filter_by(user_id=user_id).count(),
-            'message': f'📱 {len(synced_contacts)} novos contatos sincronizados, {len(updated_contacts)} atualizados!'
+            'delta': bool(sync_token),
+            'sync_token': sync_state.sync_token,
+            'synced_count': synced_count,
+            'updated_count': updated_count,
+            'unchanged_count': result['unchanged'],
+            'deleted_count': deleted_count,
+            'total_contacts': result['existing_count'] + synced_count - deleted_count,
+            'message': f'📱 {synced_count} novos contatos sincronizados, {updated_count} atualizados!'
         })
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/contacts/user/<int:user_id>', methods=['GET'])
@@ -8330,7 +9375,10 @@ def get_user_contacts(user_id):
         if favorites_only:
             query = query.filter_by(is_favorite=True)
         
-        contacts = query.order_by(Contact.name).all()
+        streamed = stream_response(request.args, query, CONTACTS_KEYSET, lambda contact: contact.to_dict(), 'contacts')
+        if streamed:
+            return streamed
+        contacts, next_cursor = paginate(query, CONTACTS_KEYSET, request.args.get('cursor'), page_limit(request.args))
         
         return jsonify({
             'contacts': [contact.to_dict() for contact in contacts],
@@ -8339,9 +9387,12 @@ def get_user_contacts(user_id):
                 'search': search,
                 'type': contact_type,
                 'favorites_only': favorites_only
-            }
+            },
+            **page_info(next_cursor)
         })
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -8367,9 +9418,7 @@ def add_contact():
             return jsonify({'error': 'Contato já existe com este número'}), 400
         
         # Processar número de telefone
-        formatted_phone = format_phone_number(phone_number)
-        country_code = extract_country_code(phone_number)
-        carrier_info = get_carrier_info(phone_number)
+        formatted_phone, country_code, carrier_info = parse_phone_details(phone_number)
         
         # Criar novo contato
         contact = Contact(
@@ -8570,7 +9619,6 @@ def voice_call_direct():
 def get_call_logs(user_id):
     """Obter histórico de chamadas"""
     try:
-        limit = request.args.get('limit', 50, type=int)
         call_type = request.args.get('type', '')  # outgoing, incoming, missed
         
         query = CallLog.query.filter_by(user_id=user_id)
@@ -8578,7 +9626,10 @@ def get_call_logs(user_id):
         if call_type:
             query = query.filter_by(call_type=call_type)
         
-        call_logs = query.order_by(CallLog.initiated_at.desc()).limit(limit).all()
+        streamed = stream_response(request.args, query, CALL_LOGS_KEYSET, lambda log: log.to_dict(), 'call_logs')
+        if streamed:
+            return streamed
+        call_logs, next_cursor = paginate(query, CALL_LOGS_KEYSET, request.args.get('cursor'), page_limit(request.args))
         
         return jsonify({
             'call_logs': [log.to_dict() for log in call_logs],
@@ -8587,9 +9638,12 @@ def get_call_logs(user_id):
                 'total_calls': CallLog.query.filter_by(user_id=user_id).count(),
                 'outgoing_calls': CallLog.query.filter_by(user_id=user_id, call_type='outgoing').count(),
                 'voice_command_calls': CallLog.query.filter_by(user_id=user_id, call_method='voice_command').count()
-            }
+            },
+            **page_info(next_cursor)
         })
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -8624,23 +9678,25 @@ def search_contacts_by_voice():
 
 # ==================== FUNÇÕES AUXILIARES PARA CONTATOS ====================
 
-def format_phone_number(phone):
-    """Formatar número de telefone usando phonenumbers"""
+def parse_phone_details(phone):
+    """Formatar número, código do país e operadora com um único parse do phonenumbers"""
     try:
         # Parse do número assumindo Brasil como padrão
         parsed_number = phonenumbers.parse(phone, "BR")
         
-        # Verificar se é válido
         if phonenumbers.is_valid_number(parsed_number):
-            # Formatar no padrão internacional
             formatted = phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.INTERNATIONAL)
-            return formatted
-        else:
-            # Se não for válido, tentar formatação básica
-            return format_phone_basic(phone)
+            carrier_name = carrier.name_for_number(parsed_number, "pt")
+            return formatted, f"+{parsed_number.country_code}", carrier_name if carrier_name else 'Desconhecida'
     except:
-        # Fallback para formatação básica
-        return format_phone_basic(phone)
+        pass
+    
+    # Fallback para formatação básica, Brasil como padrão
+    return format_phone_basic(phone), '+55', 'Desconhecida'
+
+def format_phone_number(phone):
+    """Formatar número de telefone usando phonenumbers"""
+    return parse_phone_details(phone)[0]
 
 def format_phone_basic(phone):
     """Formatação básica de telefone (fallback)"""
@@ -8663,27 +9719,95 @@ def format_phone_basic(phone):
 
 def extract_country_code(phone):
     """Extrair código do país usando phonenumbers"""
-    try:
-        parsed_number = phonenumbers.parse(phone, "BR")
-        if phonenumbers.is_valid_number(parsed_number):
-            return f"+{parsed_number.country_code}"
-        else:
-            return '+55'  # Padrão Brasil
-    except:
-        return '+55'
+    return parse_phone_details(phone)[1]
 
 def get_carrier_info(phone):
     """Obter informações da operadora usando phonenumbers"""
-    try:
-        parsed_number = phonenumbers.parse(phone, "BR")
-        if phonenumbers.is_valid_number(parsed_number):
-            # Obter operadora
-            carrier_name = carrier.name_for_number(parsed_number, "pt")
-            return carrier_name if carrier_name else 'Desconhecida'
+    return parse_phone_details(phone)[2]
+
+CONTACT_SYNC_BATCH_SIZE = 500
+CONTACT_SYNC_FIELDS = ('name', 'display_name', 'formatted_phone', 'country_code', 'carrier',
+                       'contact_type', 'photo_url', 'sync_source')
+
+def bulk_upsert_contacts(user_id, contacts_data, sync_source):
+    """Inserir/atualizar contatos em lote.
+    
+    Carrega os contatos existentes do usuário uma única vez (mapa por telefone),
+    faz um parse por número e grava com INSERT ... ON CONFLICT DO UPDATE em lotes
+    (SQLite/PostgreSQL). Contatos idênticos ao que já está no banco não são regravados.
+    """
+    existing = {
+        row.phone_number: row
+        for row in db.session.query(Contact.id, Contact.phone_number, *[getattr(Contact, field) for field in CONTACT_SYNC_FIELDS])
+        .filter(Contact.user_id == user_id)
+    }
+    
+    # Último contato recebido vence quando o mesmo número aparece duas vezes
+    incoming = {}
+    for contact_data in contacts_data:
+        phone = (contact_data.get('phone_number') or '').strip()
+        if phone:
+            incoming[phone] = contact_data  # Pular contatos sem telefone
+    
+    now = datetime.utcnow()
+    rows = []
+    inserted = updated = unchanged = 0
+    
+    for phone, contact_data in incoming.items():
+        name = contact_data.get('name', 'Contato Sem Nome')
+        formatted_phone, country_code, carrier_info = parse_phone_details(phone)
+        row = {
+            'user_id': user_id,
+            'phone_number': phone,
+            'name': name,
+            'display_name': contact_data.get('display_name', name),
+            'formatted_phone': formatted_phone,
+            'country_code': country_code,
+            'carrier': carrier_info,
+            'contact_type': contact_data.get('contact_type', 'mobile'),
+            'photo_url': contact_data.get('photo_url', ''),
+            'sync_source': sync_source
+        }
+        
+        current = existing.get(phone)
+        if current is None:
+            inserted += 1
+        elif all(getattr(current, field) == row[field] for field in CONTACT_SYNC_FIELDS):
+            unchanged += 1
+            continue
         else:
-            return 'Desconhecida'
-    except:
-        return 'Desconhecida'
+            updated += 1
+        
+        row['created_at'] = now
+        row['updated_at'] = now
+        rows.append(row)
+    
+    dialect = db.engine.dialect.name
+    for start in range(0, len(rows), CONTACT_SYNC_BATCH_SIZE):
+        batch = rows[start:start + CONTACT_SYNC_BATCH_SIZE]
+        
+        if dialect in ('postgresql', 'sqlite'):
+            insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+            statement = insert(Contact.__table__).values(batch)
+            statement = statement.on_conflict_do_update(
+                index_elements=['user_id', 'phone_number'],
+                set_={field: statement.excluded[field] for field in CONTACT_SYNC_FIELDS + ('updated_at',)}
+            )
+            db.session.execute(statement)
+        else:
+            new_rows = [row for row in batch if row['phone_number'] not in existing]
+            changed_rows = [dict(row, id=existing[row['phone_number']].id) for row in batch if row['phone_number'] in existing]
+            for row in changed_rows:
+                row.pop('created_at')
+            db.session.bulk_insert_mappings(Contact, new_rows)
+            db.session.bulk_update_mappings(Contact, changed_rows)
+    
+    return {
+        'inserted': inserted,
+        'updated': updated,
+        'unchanged': unchanged,
+        'existing_count': len(existing)
+    }
 
 def extract_call_target_from_voice(voice_command):
     """Extrair quem ligar do comando de voz"""
@@ -8723,48 +9847,96 @@ def extract_call_target_from_voice(voice_command):
     
     return {'target': None, 'command_type': None, 'confidence': 0}
 
-def find_contacts_by_voice(user_id, voice_input):
-    """Encontrar contatos por comando de voz"""
-    contacts = Contact.query.filter_by(user_id=user_id).all()
-    matches = []
-    
-    for contact in contacts:
-        score = contact.get_voice_match_score(voice_input)
-        if score > 50:  # Threshold mínimo
-            matches.append({
-                'contact': contact,
-                'score': score,
-                'reason': get_match_reason(contact, voice_input, score)
-            })
-    
-    # Ordenar por score decrescente
-    matches.sort(key=lambda x: x['score'], reverse=True)
-    return matches
-
-def get_match_reason(contact, voice_input, score):
-    """Explicar por que o contato foi correspondido"""
-    voice_lower = voice_input.lower()
-    
-    if contact.name.lower() == voice_lower:
-        return 'nome_exato'
-    elif contact.display_name and contact.display_name.lower() == voice_lower:
-        return 'nome_exibicao'
-    elif voice_lower in contact.name.lower():
-        return 'parte_do_nome'
-    elif contact.voice_aliases:
-        aliases = json.loads(contact.voice_aliases)
-        for alias in aliases:
-            if alias.lower() == voice_lower:
-                return 'apelido_exato'
-            elif voice_lower in alias.lower():
-                return 'parte_apelido'
-    
-    if contact.name and contact.name.strip():
-        first_name = contact.name.split()[0].lower()
-        if first_name == voice_lower:
-            return 'primeiro_nome'
+# ==================== ÍNDICE DE CORRESPONDÊNCIA POR VOZ ====================
+
+VOICE_MATCH_INDEX_TTL = 300  # Segundos; cobre gravações feitas por outros workers
+_voice_match_cache = {}  # (tipo, user_id) -> (criado_em, VoiceMatchIndex)
+
+# Colunas que alteram o índice de voz (mudanças em usage_count etc. não invalidam)
+VOICE_MATCH_FIELDS = {
+    'contacts': ('user_id', 'name', 'display_name', 'voice_aliases'),
+    'apps': ('user_id', 'app_name', 'display_name', 'voice_aliases'),
+}
+
+def _voice_match_kind(obj):
+    if isinstance(obj, Contact):
+        return 'contacts'
+    if isinstance(obj, AppControl):
+        return 'apps'
+    return None
+
+def build_voice_match_index(kind, user_id):
+    """Montar o índice de voz de um usuário com uma única consulta"""
+    if kind == 'contacts':
+        index = VoiceMatchIndex()
+        rows = db.session.query(Contact.id, Contact.name, Contact.display_name, Contact.voice_aliases)\
+            .filter(Contact.user_id == user_id)
+        for row in rows:
+            index.add(row.id, row.name, row.display_name, row.voice_aliases)
+    else:
+        index = VoiceMatchIndex(reasons=APP_REASONS, match_first_name=False)
+        rows = db.session.query(AppControl.id, AppControl.app_name, AppControl.display_name, AppControl.voice_aliases)\
+            .filter(AppControl.user_id == user_id)
+        for row in rows:
+            index.add(row.id, row.app_name, row.display_name, row.voice_aliases)
+    return index
+
+def get_voice_match_index(kind, user_id):
+    """Índice de voz do usuário ('contacts' ou 'apps'), montado sob demanda"""
+    cached = _voice_match_cache.get((kind, user_id))
+    if cached and time.time() - cached[0] < VOICE_MATCH_INDEX_TTL:
+        return cached[1]
+    index = build_voice_match_index(kind, user_id)
+    _voice_match_cache[(kind, user_id)] = (time.time(), index)
+    return index
+
+def invalidate_voice_match_index(kind, user_id=None):
+    """Descartar o índice de voz de um usuário (ou de todos)"""
+    if user_id is None:
+        for key in [key for key in _voice_match_cache if key[0] == kind]:
+            _voice_match_cache.pop(key, None)
+    else:
+        _voice_match_cache.pop((kind, user_id), None)
+
+@event.listens_for(db.session, 'before_flush')
+def _track_voice_match_changes(session, flush_context, instances):
+    """Anotar usuários cujos contatos/apps mudaram nesta transação"""
+    stale = session.info.setdefault('voice_match_stale', set())
+    for obj in list(session.new) + list(session.deleted):
+        kind = _voice_match_kind(obj)
+        if kind:
+            stale.add((kind, obj.user_id))
+    for obj in session.dirty:
+        kind = _voice_match_kind(obj)
+        if not kind:
+            continue
+        state = inspect(obj)
+        if any(state.attrs[field].history.has_changes() for field in VOICE_MATCH_FIELDS[kind]):
+            stale.add((kind, obj.user_id))
+            for previous_user in state.attrs.user_id.history.deleted:
+                stale.add((kind, previous_user))
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_voice_match_after_commit(session):
+    for kind, user_id in session.info.pop('voice_match_stale', ()):
+        invalidate_voice_match_index(kind, user_id)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_voice_match_changes(session):
+    session.info.pop('voice_match_stale', None)
+
+def find_contacts_by_voice(user_id, voice_input, limit=None):
+    """Encontrar contatos por comando de voz (top-k do índice em memória)"""
+    ranked = get_voice_match_index('contacts', user_id).match(voice_input, threshold=50, limit=limit)
+    if not ranked:
+        return []
     
-    return 'similaridade'
+    # Carregar só os contatos correspondidos
+    contacts = {contact.id: contact for contact in Contact.query.filter(Contact.id.in_([entry_id for entry_id, _, _ in ranked]))}
+    return [
+        {'contact': contacts[entry_id], 'score': score, 'reason': reason}
+        for entry_id, score, reason in ranked if entry_id in contacts
+    ]
 
 def get_voice_call_suggestions(user_id):
     """Obter sugestões de contatos para comando de voz"""
@@ -8826,8 +9998,8 @@ def extract_app_name_from_command(command):
 def handle_app_launch_by_voice(user_id, app_name, original_command):
     """Processa o lançamento de aplicativo por comando de voz"""
     try:
-        # Buscar aplicativo no banco
-        matching_apps = find_app_by_voice(app_name)
+        # Buscar aplicativo do usuário no índice de voz
+        matching_apps = find_apps_by_voice(user_id, app_name, limit=1)
         
         if not matching_apps:
             return {
@@ -8838,10 +10010,10 @@ def handle_app_launch_by_voice(user_id, app_name, original_command):
             }
         
         # Se encontrou múltiplos, usar o primeiro (melhor match)
-        app = matching_apps[0]
+        app = matching_apps[0]['app']
         
         # Tentar executar o aplicativo
-        launch_success = launch_app_by_package(app.package_name)
+        launch_success = launch_app_by_package(app.app_package)
         
         if launch_success:
             # Registrar o lançamento
@@ -8849,7 +10021,7 @@ def handle_app_launch_by_voice(user_id, app_name, original_command):
             
             # Atualizar estatísticas de uso
             app.usage_count += 1
-            app.last_used = datetime.utcnow()
+            app.last_opened = datetime.utcnow()
             db.session.commit()
             
             return {
@@ -8857,7 +10029,7 @@ def handle_app_launch_by_voice(user_id, app_name, original_command):
                 'result': f'✅ {app.display_name} aberto com sucesso!',
                 'action': 'app_launched',
                 'app_name': app.display_name,
-                'package_name': app.package_name
+                'package_name': app.app_package
             }
         else:
             # Registrar falha no lançamento
@@ -8881,19 +10053,7 @@ def handle_app_launch_by_voice(user_id, app_name, original_command):
 
 def get_similar_contacts(user_id, target_name):
     """Obter contatos similares para sugestão"""
-    contacts = Contact.query.filter_by(user_id=user_id).all()
-    similar = []
-    
-    target_lower = target_name.lower()
-    
-    for contact in contacts:
-        # Verificar similaridade parcial
-        if any(word in contact.name.lower() for word in target_lower.split()):
-            similar.append(contact.display_name)
-        elif target_lower in contact.name.lower():
-            similar.append(contact.display_name)
-    
-    return similar[:5]
+    return get_voice_match_index('contacts', user_id).similar(target_name, limit=5)
 
 def initiate_phone_call(contact, voice_command, confidence):
     """Iniciar ligação telefônica"""
@@ -9003,43 +10163,17 @@ def extract_app_target_from_voice(voice_command):
     
     return {'target': None, 'command_type': None, 'confidence': 0}
 
-def find_apps_by_voice(user_id, voice_input):
-    """Encontrar aplicativos por comando de voz"""
-    apps = AppControl.query.filter_by(user_id=user_id).all()
-    matches = []
-    
-    for app in apps:
-        score = app.get_voice_match_score(voice_input)
-        if score > 50:  # Threshold mínimo
-            matches.append({
-                'app': app,
-                'score': score,
-                'reason': get_app_match_reason(app, voice_input, score)
-            })
-    
-    # Ordenar por score decrescente
-    matches.sort(key=lambda x: x['score'], reverse=True)
-    return matches
-
-def get_app_match_reason(app, voice_input, score):
-    """Explicar por que o app foi correspondido"""
-    voice_lower = voice_input.lower()
-    
-    if app.app_name.lower() == voice_lower:
-        return 'nome_exato'
-    elif app.display_name and app.display_name.lower() == voice_lower:
-        return 'nome_exibicao'
-    elif voice_lower in app.app_name.lower():
-        return 'parte_do_nome'
-    elif app.voice_aliases:
-        aliases = json.loads(app.voice_aliases)
-        for alias in aliases:
-            if alias.lower() == voice_lower:
-                return 'alias_exato'
-            elif voice_lower in alias.lower():
-                return 'parte_alias'
+def find_apps_by_voice(user_id, voice_input, limit=None):
+    """Encontrar aplicativos por comando de voz (top-k do índice em memória)"""
+    ranked = get_voice_match_index('apps', user_id).match(voice_input, threshold=50, limit=limit)
+    if not ranked:
+        return []
     
-    return 'similaridade'
+    apps = {app.id: app for app in AppControl.query.filter(AppControl.id.in_([entry_id for entry_id, _, _ in ranked]))}
+    return [
+        {'app': apps[entry_id], 'score': score, 'reason': reason}
+        for entry_id, score, reason in ranked if entry_id in apps
+    ]
 
 def get_voice_app_suggestions(user_id):
     """Obter sugestões de apps para comando de voz"""
@@ -9065,19 +10199,7 @@ def get_voice_app_suggestions(user_id):
 
 def get_similar_apps(user_id, target_name):
     """Obter apps similares para sugestão"""
-    apps = AppControl.query.filter_by(user_id=user_id).all()
-    similar = []
-    
-    target_lower = target_name.lower()
-    
-    for app in apps:
-        # Verificar similaridade parcial
-        if any(word in app.app_name.lower() for word in target_lower.split()):
-            similar.append(app.display_name)
-        elif target_lower in app.app_name.lower():
-            similar.append(app.display_name)
-    
-    return similar[:5]
+    return get_voice_match_index('apps', user_id).similar(target_name, limit=5)
 
 def get_app_categories(user_id):
     """Obter categorias de apps do usuário"""
@@ -9780,56 +10902,6 @@ def format_launch_log_data(log):
     }
 
 
-def find_app_by_voice(voice_input):
-    """Encontrar aplicativo por comando de voz"""
-    voice_lower = voice_input.lower().strip()
-    
-    # Buscar por nome exato
-    exact_name = AppControl.query.filter(
-        AppControl.app_name.ilike(voice_lower)
-    ).first()
-    
-    if exact_name:
-        return [exact_name]
-    
-    # Buscar por nome de exibição
-    display_name = AppControl.query.filter(
-        AppControl.display_name.ilike(voice_lower)
-    ).first()
-    
-    if display_name:
-        return [display_name]
-    
-    # Buscar por aliases de voz
-    apps_with_aliases = AppControl.query.filter(
-        AppControl.voice_aliases.isnot(None)
-    ).all()
-    
-    matches = []
-    for app in apps_with_aliases:
-        try:
-            aliases = json.loads(app.voice_aliases)
-            for alias in aliases:
-                if alias.lower() == voice_lower:
-                    matches.append(app)
-                    break
-        except:
-            continue
-    
-    if matches:
-        return matches
-    
-    # Busca parcial no nome
-    partial_matches = AppControl.query.filter(
-        or_(
-            AppControl.app_name.ilike(f'%{voice_lower}%'),
-            AppControl.display_name.ilike(f'%{voice_lower}%')
-        )
-    ).all()
-    
-    return partial_matches[:5]  # Limitar a 5 resultados
-
-
 def launch_app_by_package(package_name):
     """Simular lançamento de aplicativo (em produção, integraria com APIs do sistema)"""
     # Esta função simularia o lançamento real do aplicativo
@@ -9871,6 +10943,18 @@ def log_app_launch(user_id, app_id, command, launch_method, success, error_messa
 # FUNÇÕES AUXILIARES PARA MEMÓRIA CONVERSACIONAL
 # ===========================================
 
+# Tópicos e sentimento básico da memória conversacional (uma tabela, uma passada)
+CONTEXT_KEYWORDS = IntentClassifier([
+    ('medical', ['saúde', 'médico', 'medicamento', 'doença', 'sintoma', 'consulta', 'exame']),
+    ('finance', ['dinheiro', 'gasto', 'economia', 'conta', 'pagamento', 'investimento', 'salário']),
+    ('calendar', ['agenda', 'reunião', 'compromisso', 'evento', 'horário', 'data', 'marcar']),
+    ('coaching', ['coach', 'desenvolvimento', 'meta', 'objetivo', 'crescimento', 'sessão']),
+    ('personal', ['família', 'trabalho', 'casa', 'amigo', 'relacionamento', 'hobby']),
+    ('positive', ['bom', 'ótimo', 'excelente', 'feliz', 'gostei', 'adorei', 'perfeito']),
+    ('negative', ['ruim', 'péssimo', 'triste', 'problema', 'erro', 'difícil', 'preocupado']),
+])
+CONTEXT_TOPICS = frozenset(['medical', 'finance', 'calendar', 'coaching', 'personal'])
+
 def analyze_conversation_context(user_message, ai_response):
     """Analisar contexto da conversa e extrair informações relevantes"""
     import re
@@ -9889,23 +10973,9 @@ def analyze_conversation_context(user_message, ai_response):
     # Texto completo para análise
     full_text = f"{user_message} {ai_response}".lower()
     
-    # Detectar tópicos principais
-    topic_keywords = {
-        'medical': ['saúde', 'médico', 'medicamento', 'doença', 'sintoma', 'consulta', 'exame'],
-        'finance': ['dinheiro', 'gasto', 'economia', 'conta', 'pagamento', 'investimento', 'salário'],
-        'calendar': ['agenda', 'reunião', 'compromisso', 'evento', 'horário', 'data', 'marcar'],
-        'coaching': ['coach', 'desenvolvimento', 'meta', 'objetivo', 'crescimento', 'sessão'],
-        'personal': ['família', 'trabalho', 'casa', 'amigo', 'relacionamento', 'hobby']
-    }
-    
-    detected_topic = None
-    max_matches = 0
-    
-    for topic, keywords in topic_keywords.items():
-        matches = sum(1 for keyword in keywords if keyword in full_text)
-        if matches > max_matches:
-            max_matches = matches
-            detected_topic = topic
+    # Detectar tópicos principais (tópico com mais palavras encontradas)
+    context_matches = CONTEXT_KEYWORDS.classify(full_text)
+    detected_topic = context_matches.best(CONTEXT_TOPICS)
     
     # Extrair entidades
     entities = []
@@ -9940,11 +11010,8 @@ def analyze_conversation_context(user_message, ai_response):
     
     # Detectar sentimento básico
     sentiment = 'neutral'
-    positive_words = ['bom', 'ótimo', 'excelente', 'feliz', 'gostei', 'adorei', 'perfeito']
-    negative_words = ['ruim', 'péssimo', 'triste', 'problema', 'erro', 'difícil', 'preocupado']
-    
-    positive_count = sum(1 for word in positive_words if word in full_text)
-    negative_count = sum(1 for word in negative_words if word in full_text)
+    positive_count = context_matches.scores.get('positive', 0)
+    negative_count = context_matches.scores.get('negative', 0)
     
     if positive_count > negative_count:
         sentiment = 'positive'
@@ -10005,35 +11072,92 @@ def update_user_context(user_id, context_analysis):
     
     user_context.updated_at = datetime.utcnow()
 
-def search_relevant_memories(user_id, message):
-    """Buscar memórias relevantes para a mensagem atual"""
-    # Palavras-chave da mensagem
-    keywords = message.lower().split()
-    
-    # Buscar por palavras-chave nas mensagens anteriores
-    relevant_memories = []
-    
-    for keyword in keywords:
-        if len(keyword) > 3:  # Apenas palavras significativas
-            memories = ConversationMemory.query.filter_by(user_id=user_id).filter(
-                or_(
-                    ConversationMemory.user_message.contains(keyword),
-                    ConversationMemory.ai_response.contains(keyword)
-                )
-            ).order_by(ConversationMemory.importance_level.desc()).limit(3).all()
-            
-            relevant_memories.extend(memories)
+def search_memories(user_id, query_text, limit=5, topic=None, match_all=False, min_length=4):
+    """Busca textual ranqueada na memória conversacional (uma única consulta).
     
-    # Remover duplicatas e limitar
-    seen_ids = set()
-    unique_memories = []
+    SQLite usa a tabela FTS5 (bm25) e PostgreSQL o índice GIN (ts_rank); em
+    outros bancos, ou sem FTS5, cai para uma busca em search_text.
+    """
+    terms = search_terms(query_text, min_length=min_length)
+    if not terms:
+        return []
     
-    for memory in relevant_memories:
-        if memory.id not in seen_ids:
-            unique_memories.append(memory)
-            seen_ids.add(memory.id)
+    dialect = db.engine.dialect.name
+    params = {'user_id': user_id, 'limit': limit}
+    topic_filter = ''
+    if topic:
+        topic_filter = 'AND conversation_memory.related_topic = :topic'
+        params['topic'] = topic
+    
+    if dialect == 'sqlite' and _memory_fts_available():
+        joiner = ' AND ' if match_all else ' OR '
+        params['match'] = joiner.join(f'"{term}"' for term in terms)
+        statement = text(f"""
+            SELECT conversation_memory.* FROM {MEMORY_FTS_TABLE}
+            JOIN conversation_memory ON conversation_memory.id = {MEMORY_FTS_TABLE}.rowid
+            WHERE {MEMORY_FTS_TABLE} MATCH :match AND conversation_memory.user_id = :user_id {topic_filter}
+            ORDER BY bm25({MEMORY_FTS_TABLE}), conversation_memory.importance_level DESC,
+                     conversation_memory.created_at DESC
+            LIMIT :limit
+        """)
+    elif dialect == 'postgresql':
+        joiner = ' & ' if match_all else ' | '
+        params['match'] = joiner.join(terms)
+        statement = text(f"""
+            SELECT conversation_memory.* FROM conversation_memory
+            WHERE conversation_memory.user_id = :user_id {topic_filter}
+              AND to_tsvector('simple', coalesce(search_text, '')) @@ to_tsquery('simple', :match)
+            ORDER BY ts_rank(to_tsvector('simple', coalesce(search_text, '')), to_tsquery('simple', :match)) DESC,
+                     conversation_memory.importance_level DESC, conversation_memory.created_at DESC
+            LIMIT :limit
+        """)
+    else:
+        conditions = [ConversationMemory.search_text.contains(term) for term in terms]
+        query = ConversationMemory.query.filter_by(user_id=user_id).filter(
+            db.and_(*conditions) if match_all else or_(*conditions)
+        )
+        if topic:
+            query = query.filter(ConversationMemory.related_topic == topic)
+        return query.order_by(
+            ConversationMemory.importance_level.desc(),
+            ConversationMemory.created_at.desc()
+        ).limit(limit).all()
+    
+    return db.session.query(ConversationMemory).from_statement(statement.bindparams(**params)).all()
+
+def _memory_fts_available():
+    """Verificar (uma vez por engine) se a tabela FTS5 existe no SQLite"""
+    engine = db.engine
+    if engine.url not in _memory_fts_cache:
+        _memory_fts_cache[engine.url] = MEMORY_FTS_TABLE in inspect(engine).get_table_names()
+    return _memory_fts_cache[engine.url]
+
+def search_relevant_memories(user_id, message):
+    """Buscar memórias relevantes para a mensagem atual"""
+    # Palavras significativas (> 3 letras) em uma única busca ranqueada
+    return search_memories(user_id, message, limit=5)  # Máximo 5 memórias relevantes
+
+def memory_search_text(user_message, ai_response, topic, context_extracted):
+    """Texto indexado para a busca da memória conversacional.
     
-    return unique_memories[:5]  # Máximo 5 memórias relevantes
+    Inclui os valores (não as chaves) de context_extracted, dict ou o JSON gravado."""
+    if isinstance(context_extracted, str):
+        try:
+            context_extracted = json.loads(context_extracted)
+        except ValueError:
+            pass
+    
+    values = []
+    pending = [context_extracted]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif value is not None:
+            values.append(str(value))
+    return build_search_text(user_message, ai_response, topic, ' '.join(values))
 
 def generate_contextual_response(message, relevant_memories, user_context):
     """Gerar resposta contextualizada baseada em memórias e contexto"""
@@ -10081,7 +11205,9 @@ def save_conversation_memory_internal(user_id, session_id, user_message, ai_resp
             importance_level=context_analysis.get('importance', 1),
             related_topic=context_analysis.get('topic'),
             referenced_data=json.dumps(context_analysis.get('referenced_data', {})),
-            follow_up_needed=context_analysis.get('follow_up', False)
+            follow_up_needed=context_analysis.get('follow_up', False),
+            search_text=memory_search_text(user_message, ai_response, context_analysis.get('topic'),
+                                           context_analysis['context'])
         )
         
         db.session.add(memory)
@@ -10090,21 +11216,12 @@ def save_conversation_memory_internal(user_id, session_id, user_message, ai_resp
     except Exception as e:
         print(f"Erro ao salvar memória: {e}")
 
+# Entrega das notificações agendadas (heap por horário + canais por delivery_method)
+notification_scheduler = NotificationScheduler(app, db, NotificationSystem, enabled=app.config['NOTIFICATION_SCHEDULER'])
+
 def send_notification_now(notification):
-    """Enviar notificação imediatamente"""
-    try:
-        # Atualizar status
-        notification.status = 'sent'
-        notification.sent_at = datetime.utcnow()
-        
-        # Aqui seria implementada a lógica real de envio
-        # Por exemplo: push notification, email, SMS, etc.
-        
-        print(f"📱 Notificação enviada: {notification.title}")
-        
-    except Exception as e:
-        notification.status = 'failed'
-        print(f"Erro ao enviar notificação: {e}")
+    """Enviar notificação imediatamente pelo canal do seu delivery_method"""
+    return notification_scheduler.send_now(notification)
 
 # ===========================================
 # APIs DE NOTIFICAÇÕES PUSH
@@ -10124,7 +11241,7 @@ def create_notification():
             notification_type=data.get('type', 'system'),
             priority=data.get('priority', 'medium'),
             delivery_method=data.get('delivery_method', 'push'),
-            scheduled_for=datetime.fromisoformat(data['scheduled_for']) if data.get('scheduled_for') else None,
+            scheduled_for=naive_utc(datetime.fromisoformat(data['scheduled_for'])) if data.get('scheduled_for') else None,
             action_required=data.get('action_required', False),
             action_url=data.get('action_url'),
             related_entity_type=data.get('related_entity_type'),
@@ -10137,6 +11254,7 @@ def create_notification():
         # Enviar notificação imediatamente se não for agendada
         if not notification.scheduled_for:
             send_notification_now(notification)
+            db.session.commit()
         
         return jsonify({
             'success': True,
@@ -10152,23 +11270,27 @@ def list_notifications(user_id):
     """Listar notificações do usuário"""
     try:
         status_filter = request.args.get('status')
-        limit = min(int(request.args.get('limit', 20)), 100)
         
         query = NotificationSystem.query.filter_by(user_id=user_id)
         
         if status_filter:
             query = query.filter(NotificationSystem.status == status_filter)
         
-        notifications = query.order_by(
-            NotificationSystem.created_at.desc()
-        ).limit(limit).all()
+        streamed = stream_response(request.args, query, NOTIFICATIONS_KEYSET, lambda n: n.to_dict(), 'notifications')
+        if streamed:
+            return streamed
+        notifications, next_cursor = paginate(query, NOTIFICATIONS_KEYSET, request.args.get('cursor'),
+                                              page_limit(request.args, default=20, maximum=100))
         
         return jsonify({
             'success': True,
             'notifications': [n.to_dict() for n in notifications],
-            'count': len(notifications)
+            'count': len(notifications),
+            **page_info(next_cursor)
         })
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -10224,10 +11346,11 @@ def create_calendar_event():
         )
         
         db.session.add(event)
-        db.session.commit()
+        db.session.flush()
         
-        # Criar notificações de lembrete
-        create_event_reminders(event)
+        # Notificações de lembrete são criadas pela fila
+        job_queue.enqueue('calendar_reminders', {'event_id': event.id})
+        db.session.commit()
         
         return jsonify({
             'success': True,
@@ -10245,7 +11368,6 @@ def list_calendar_events(user_id):
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         event_type = request.args.get('type')
-        limit = min(int(request.args.get('limit', 50)), 200)
         
         query = SmartCalendar.query.filter_by(user_id=user_id)
         
@@ -10258,16 +11380,21 @@ def list_calendar_events(user_id):
         if event_type:
             query = query.filter(SmartCalendar.event_type == event_type)
         
-        events = query.filter(SmartCalendar.status != 'cancelled').order_by(
-            SmartCalendar.start_datetime.asc()
-        ).limit(limit).all()
+        query = query.filter(SmartCalendar.status != 'cancelled')
+        streamed = stream_response(request.args, query, CALENDAR_KEYSET, lambda event: event.to_dict(), 'events')
+        if streamed:
+            return streamed
+        events, next_cursor = paginate(query, CALENDAR_KEYSET, request.args.get('cursor'), page_limit(request.args))
         
         return jsonify({
             'success': True,
             'events': [event.to_dict() for event in events],
-            'count': len(events)
+            'count': len(events),
+            **page_info(next_cursor)
         })
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -10391,19 +11518,8 @@ def create_financial_transaction():
             transaction.category = auto_categorize_transaction(transaction.description)
             transaction.auto_categorized = True
         
+        # O saldo da conta é atualizado pelo balance_ledger no flush (saldo = saldo + delta)
         db.session.add(transaction)
-        
-        # Atualizar saldo da conta se especificada
-        if transaction.account_id:
-            account = FinancialAccount.query.get(transaction.account_id)
-            if account:
-                if transaction.transaction_type == 'income':
-                    account.current_balance += transaction.amount
-                    account.available_balance += transaction.amount
-                elif transaction.transaction_type == 'expense':
-                    account.current_balance -= transaction.amount
-                    account.available_balance -= transaction.amount
-        
         db.session.commit()
         
         return jsonify({
@@ -10415,6 +11531,129 @@ def create_financial_transaction():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+STATEMENT_IMPORT_BATCH = 1000  # Lançamentos por lote (um INSERT, um UPDATE de saldo, um commit)
+STATEMENT_IMPORT_MAX_ERRORS = 50  # Erros detalhados na resposta (os demais só contam)
+
+def _load_statement_days(account_id, days, state):
+    """Somar em state['existing'] as chaves de duplicata das transações da conta nos dias ainda não lidos
+    (só as anteriores à importação); cada dia é lido uma vez por importação"""
+    missing = days - state['loaded']
+    if not missing:
+        return
+    first_day, last_day = min(missing), max(missing)
+    rows = db.session.query(
+        FinancialTransaction.transaction_date, FinancialTransaction.transaction_type,
+        FinancialTransaction.amount, FinancialTransaction.description
+    ).filter(
+        FinancialTransaction.account_id == account_id,
+        FinancialTransaction.transaction_date >= datetime.combine(first_day, datetime.min.time()),
+        FinancialTransaction.transaction_date < datetime.combine(last_day + timedelta(days=1), datetime.min.time()),
+        FinancialTransaction.id <= state['last_id']
+    )
+    for when, transaction_type, amount, description in rows:
+        if when.date() not in state['loaded']:
+            state['existing'][dedupe_key(account_id, when, amount if transaction_type == 'income' else -amount,
+                                         description)] += 1
+    state['loaded'].update(first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1))
+
+def _import_statement_batch(user_id, account_id, batch, state, stats):
+    """Gravar um lote: duplicatas fora, categorias em uma passada, INSERT em lote e saldo somado uma vez"""
+    _load_statement_days(account_id, {row['transaction_date'].date() for row in batch}, state)
+    existing = state['existing']
+    new_rows = []
+    for row in batch:
+        key = dedupe_key(account_id, row['transaction_date'], row['amount'], row['description'])
+        if existing[key] > 0:  # Já existia antes da importação (cada existente casa uma única vez)
+            existing[key] -= 1
+            stats['duplicates'] += 1
+            continue
+        new_rows.append(row)
+    if not new_rows:
+        return
+    
+    uncategorized = [row for row in new_rows if not row.get('category')]
+    for row, category in zip(uncategorized, TRANSACTION_CATEGORIES.first_many(
+            [row['description'] for row in uncategorized], default='outros')):
+        row['category'], row['auto_categorized'] = category, True
+    
+    now = datetime.utcnow()
+    rows = [{
+        'user_id': user_id,
+        'account_id': account_id,
+        'transaction_type': 'income' if row['amount'] > 0 else 'expense',
+        'amount': abs(row['amount']),
+        'description': row['description'],
+        'category': row['category'],
+        'transaction_date': row['transaction_date'],
+        'reference_number': row.get('reference_number'),
+        'auto_categorized': row.get('auto_categorized', False),
+        'tags': '[]',
+        'status': 'confirmed',
+        'created_at': now,
+        'updated_at': now
+    } for row in new_rows]
+    db.session.execute(FinancialTransaction.__table__.insert(), rows)
+    # INSERT em lote não passa pelo before_flush: saldo, somas mensais e atividade uma vez por lote
+    balance_ledger.apply(db.session, Counter({account_id: sum(signed_amount(row) for row in rows)}))
+    _count_bulk_rows(FinancialTransaction, rows)
+    db.session.commit()
+    stats['imported'] += len(rows)
+    stats['auto_categorized'] += len(uncategorized)
+    stats['batches'] += 1
+
+def import_statement_rows(user_id, account_id, rows, batch_size=STATEMENT_IMPORT_BATCH):
+    """Importar lançamentos de extrato (parse_statement) em lotes confirmados um a um.
+    
+    Lançamentos iguais a transações que a conta já tinha (mesmo dia, valor e
+    descrição) são ignorados, então importar o mesmo extrato de novo, ou um
+    extrato que se sobrepõe ao anterior, não duplica nada. Lançamentos
+    repetidos dentro do próprio arquivo são mantidos.
+    """
+    stats = {'processed': 0, 'imported': 0, 'duplicates': 0, 'rejected': 0, 'auto_categorized': 0,
+             'batches': 0, 'errors': []}
+    state = {'last_id': db.session.query(db.func.max(FinancialTransaction.id)).scalar() or 0,
+             'existing': Counter(), 'loaded': set()}
+    batch = []
+    for row in rows:
+        stats['processed'] += 1
+        if 'error' in row:
+            stats['rejected'] += 1
+            if len(stats['errors']) < STATEMENT_IMPORT_MAX_ERRORS:
+                stats['errors'].append(row['error'])
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _import_statement_batch(user_id, account_id, batch, state, stats)
+            batch = []
+    if batch:
+        _import_statement_batch(user_id, account_id, batch, state, stats)
+    return stats
+
+@app.route('/api/finance/transactions/import', methods=['POST'])
+def import_financial_statement():
+    """Importar extrato bancário OFX ou CSV (arquivo `file` ou corpo bruto da requisição)"""
+    try:
+        values = request.form if request.files else request.args
+        user_id = values.get('user_id', 1, type=int)
+        account_id = values.get('account_id', type=int)
+        account = FinancialAccount.query.filter_by(id=account_id, user_id=user_id).first() if account_id else None
+        if not account:
+            return jsonify({'error': 'Conta não encontrada'}), 404
+        
+        upload = request.files.get('file')
+        stream = upload.stream if upload else request.stream
+        filename = upload.filename if upload else values.get('filename')
+        try:
+            rows = parse_statement(stream, values.get('format'), filename, values.get('encoding'))
+        except (ValueError, LookupError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        stats = import_statement_rows(user_id, account.id, rows)
+        return jsonify({'success': True, 'account_id': account.id, **stats})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/finance/transactions/<int:user_id>', methods=['GET'])
 def list_financial_transactions(user_id):
     """Listar transações financeiras"""
@@ -10424,7 +11663,6 @@ def list_financial_transactions(user_id):
         transaction_type = request.args.get('type')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
-        limit = min(int(request.args.get('limit', 50)), 200)
         
         query = FinancialTransaction.query.filter_by(user_id=user_id)
         
@@ -10443,16 +11681,21 @@ def list_financial_transactions(user_id):
         if end_date:
             query = query.filter(FinancialTransaction.transaction_date <= datetime.fromisoformat(end_date))
         
-        transactions = query.order_by(
-            FinancialTransaction.transaction_date.desc()
-        ).limit(limit).all()
+        streamed = stream_response(request.args, query, TRANSACTIONS_KEYSET, lambda t: t.to_dict(), 'transactions')
+        if streamed:
+            return streamed
+        transactions, next_cursor = paginate(query, TRANSACTIONS_KEYSET, request.args.get('cursor'),
+                                             page_limit(request.args))
         
         return jsonify({
             'success': True,
             'transactions': [t.to_dict() for t in transactions],
-            'count': len(transactions)
+            'count': len(transactions),
+            **page_info(next_cursor)
         })
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -10500,17 +11743,133 @@ def list_financial_goals(user_id):
         if status_filter != 'all':
             query = query.filter(FinancialGoal.status == status_filter)
         
-        goals = query.order_by(FinancialGoal.created_at.desc()).all()
+        streamed = stream_response(request.args, query, GOALS_KEYSET, lambda goal: goal.to_dict(), 'goals')
+        if streamed:
+            return streamed
+        goals, next_cursor = paginate(query, GOALS_KEYSET, request.args.get('cursor'), page_limit(request.args))
         
         return jsonify({
             'success': True,
             'goals': [goal.to_dict() for goal in goals],
-            'count': len(goals)
+            'count': len(goals),
+            **page_info(next_cursor)
+        })
+        
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/finance/goals/<int:goal_id>/progress', methods=['GET'])
+def financial_goal_progress(goal_id):
+    """Progresso de uma meta calculado pelas somas mensais das transações"""
+    try:
+        goal = FinancialGoal.query.get(goal_id)
+        if not goal:
+            return jsonify({'error': 'Meta não encontrada'}), 404
+        
+        current_month = month_key(datetime.utcnow())
+        start_month = min(month_key(goal.created_date or goal.created_at or datetime.utcnow()), current_month)
+        monthly = finance_totals.monthly(db.session, goal.user_id, start_month, current_month)
+        this_month = monthly.get(current_month, Counter())
+        progress = {'goal_id': goal.id, 'goal_type': goal.goal_type, 'since_month': start_month,
+                    'current_month': current_month}
+        
+        if goal.goal_type == 'budget':
+            # Orçamento: despesas do mês corrente contra o limite mensal
+            limit = goal.monthly_target or goal.target_amount or 0.0
+            spent = round(this_month['expense'], 2)
+            progress.update({
+                'spent': spent,
+                'limit': limit,
+                'remaining': round(limit - spent, 2),
+                'progress_percentage': round(spent / limit * 100, 1) if limit else 0.0,
+                'over_budget': spent > limit
+            })
+        else:
+            # Poupança, investimento e quitação: receitas menos despesas desde a criação da meta
+            # (current_amount continua sendo o valor informado pelo usuário)
+            saved = round(sum(totals['income'] - totals['expense'] for totals in monthly.values()), 2)
+            month_saved = round(this_month['income'] - this_month['expense'], 2)
+            average = saved / (months_between(start_month, current_month) + 1)
+            remaining = max(goal.target_amount - saved, 0.0)
+            progress.update({
+                'tracked_amount': saved,
+                'current_amount': goal.current_amount,
+                'target_amount': goal.target_amount,
+                'progress_percentage': round(min(100.0, max(saved, 0.0) / goal.target_amount * 100), 1)
+                if goal.target_amount else 0.0,
+                'month_saved': month_saved,
+                'monthly_target': goal.monthly_target,
+                'on_track': month_saved >= goal.monthly_target if goal.monthly_target else None,
+                'average_monthly_saved': round(average, 2),
+                'months_to_target': 0 if not remaining else (-int(-remaining // average) if average > 0 else None)
+            })
+        
+        return jsonify({'success': True, 'progress': progress})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/finance/analytics/<int:user_id>/categories', methods=['GET'])
+def finance_spending_by_category(user_id):
+    """Totais de um mês por categoria (padrão: despesas do mês corrente)"""
+    try:
+        month = request.args.get('month') or month_key(datetime.utcnow())
+        transaction_type = request.args.get('type', 'expense')
+        try:
+            datetime.strptime(month, '%Y-%m')
+        except ValueError:
+            return jsonify({'error': 'Mês inválido (use AAAA-MM)'}), 400
+        
+        categories = finance_totals.by_category(db.session, user_id, month, transaction_type)
+        total = sum(item['total'] for item in categories)
+        for item in categories:
+            item['percentage'] = round(item['total'] / total * 100, 1) if total else 0.0
+        
+        return jsonify({
+            'success': True,
+            'month': month,
+            'type': transaction_type,
+            'total': round(total, 2),
+            'categories': categories
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/finance/analytics/<int:user_id>/trend', methods=['GET'])
+def finance_monthly_trend(user_id):
+    """Receitas, despesas e saldo mês a mês, com a variação das despesas sobre o mês anterior"""
+    try:
+        months = min(max(request.args.get('months', 6, type=int), 1), 36)
+        until = request.args.get('until') or month_key(datetime.utcnow())
+        try:
+            datetime.strptime(until, '%Y-%m')
+        except ValueError:
+            return jsonify({'error': 'Mês inválido (use AAAA-MM)'}), 400
+        
+        since = shift_month(until, -(months - 1))
+        monthly = finance_totals.monthly(db.session, user_id, since, until)
+        trend, previous = [], None
+        for offset in range(months):
+            month = shift_month(since, offset)
+            totals = monthly.get(month, Counter())
+            income, expense = round(totals['income'], 2), round(totals['expense'], 2)
+            trend.append({
+                'month': month,
+                'income': income,
+                'expense': expense,
+                'net': round(income - expense, 2),
+                'expense_change_percentage': round((expense - previous) / previous * 100, 1) if previous else None
+            })
+            previous = expense
+        
+        return jsonify({'success': True, 'months': trend, 'since': since, 'until': until})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ===========================================
 # APIs DE ANALYTICS AVANÇADO
 # ===========================================
@@ -10532,26 +11891,9 @@ def analytics_dashboard(user_id):
         # Calcular métricas adicionais
         dashboard_data = analytics.to_dict()
         
-        # Adicionar estatísticas recentes
-        last_7_days = datetime.utcnow() - timedelta(days=7)
-        
-        recent_conversations = ConversationMemory.query.filter_by(user_id=user_id).filter(
-            ConversationMemory.created_at >= last_7_days
-        ).count()
-        
-        recent_events = SmartCalendar.query.filter_by(user_id=user_id).filter(
-            SmartCalendar.created_at >= last_7_days
-        ).count()
-        
-        recent_transactions = FinancialTransaction.query.filter_by(user_id=user_id).filter(
-            FinancialTransaction.created_at >= last_7_days
-        ).count()
-        
-        dashboard_data['recent_activity'] = {
-            'conversations_7d': recent_conversations,
-            'events_7d': recent_events,
-            'transactions_7d': recent_transactions
-        }
+        # Atividade recente: soma dos contadores diários dos últimos 7 dias (incluindo hoje)
+        recent = user_activity.window(db.session, user_id, 7)
+        dashboard_data['recent_activity'] = {f'{name}_7d': count for name, count in recent.items()}
         
         return jsonify({
             'success': True,
@@ -10565,6 +11907,132 @@ def analytics_dashboard(user_id):
 # APIs DE BACKUP E SINCRONIZAÇÃO
 # ===========================================
 
+BACKUP_BATCH_SIZE = 1000  # Linhas por lote do cursor (yield_per)
+
+def _meeting_rows(model):
+    """Filtro das tabelas filhas de reunião pelas reuniões do usuário"""
+    return lambda user_id: model.meeting_id.in_(select(MeetingSession.id).where(MeetingSession.user_id == user_id))
+
+def _owned_by(model):
+    return lambda user_id: model.user_id == user_id
+
+# (tabela no arquivo, modelo, escopo, coluna do incremental, filtro do usuário); pais antes dos filhos
+BACKUP_TABLES = [
+    ('conversation_memory', ConversationMemory, 'conversations', ConversationMemory.updated_at, _owned_by(ConversationMemory)),
+    ('smart_calendar', SmartCalendar, 'calendar', SmartCalendar.updated_at, _owned_by(SmartCalendar)),
+    ('financial_accounts', FinancialAccount, 'finance', FinancialAccount.updated_at, _owned_by(FinancialAccount)),
+    ('financial_transactions', FinancialTransaction, 'finance', FinancialTransaction.updated_at, _owned_by(FinancialTransaction)),
+    ('financial_goals', FinancialGoal, 'finance', FinancialGoal.updated_at, _owned_by(FinancialGoal)),
+    ('contacts', Contact, 'contacts', Contact.updated_at, _owned_by(Contact)),
+    ('meeting_sessions', MeetingSession, 'meetings', MeetingSession.updated_at, _owned_by(MeetingSession)),
+    ('meeting_participants', MeetingParticipant, 'meetings', MeetingParticipant.updated_at, _meeting_rows(MeetingParticipant)),
+    ('meeting_transcripts', MeetingTranscript, 'meetings', MeetingTranscript.timestamp, _meeting_rows(MeetingTranscript)),
+    ('meeting_agendas', MeetingAgenda, 'meetings', MeetingAgenda.generated_at, _meeting_rows(MeetingAgenda)),
+    ('user_analytics', UserAnalytics, 'analytics', UserAnalytics.updated_at, _owned_by(UserAnalytics)),
+    ('user_activity_daily', UserActivityDaily, 'analytics', UserActivityDaily.day, _owned_by(UserActivityDaily)),
+]
+
+# Chave natural de cada tabela na restauração (reexecutar atualiza em vez de duplicar);
+# as duas primeiras colunas filtram a busca das linhas existentes pelos índices
+RESTORE_KEYS = {
+    'conversation_memory': ('user_id', 'created_at', 'session_id', 'user_message'),
+    'smart_calendar': ('user_id', 'start_datetime', 'title'),
+    'financial_accounts': ('user_id', 'account_name', 'account_type'),
+    'financial_transactions': ('user_id', 'transaction_date', 'account_id', 'amount', 'description'),
+    'financial_goals': ('user_id', 'goal_name', 'goal_type'),
+    'contacts': ('user_id', 'phone_number'),
+    'meeting_sessions': ('user_id', 'created_at', 'title'),
+    'meeting_participants': ('meeting_id', 'participant_name'),
+    'meeting_transcripts': ('meeting_id', 'timestamp', 'content'),
+    'meeting_agendas': ('meeting_id', 'generated_at'),
+    'user_analytics': ('user_id', 'period_start', 'period_end'),
+    'user_activity_daily': ('user_id', 'day'),
+}
+
+backup_restorer = BackupRestorer(batch_size=BACKUP_BATCH_SIZE)
+for _name, _model, _, _, _ in BACKUP_TABLES:
+    _columns = None
+    if _model is UserActivityDaily:
+        # Contadores com origem no backup são somados das linhas restauradas; do arquivo
+        # vêm só os que não têm (comandos de voz) ou cuja origem fica de fora (aberturas de apps)
+        _counted = {counter for model, (counter, _, _) in user_activity.sources.items()
+                    if any(model is entry[1] for entry in BACKUP_TABLES)}
+        _columns = {'user_id', 'day'} | (set(USER_ACTIVITY_COUNTERS) - _counted)
+    backup_restorer.table(_name, _model, RESTORE_KEYS[_name], columns=_columns)
+
+def backup_tables(scope='all'):
+    return [entry for entry in BACKUP_TABLES if scope == 'all' or entry[2] == scope]
+
+def iter_backup_rows(model, user_id, user_filter, since_column=None, since=None):
+    """Linhas de uma tabela do usuário em lotes pelo cursor do servidor (memória constante)"""
+    table = model.__table__
+    statement = select(table).where(user_filter(user_id))
+    if since is not None:
+        statement = statement.where(since_column >= (since.date() if since_column is UserActivityDaily.day else since))
+    statement = statement.order_by(table.primary_key.columns.values()[0])
+    for row in db.session.execute(statement.execution_options(yield_per=BACKUP_BATCH_SIZE)):
+        yield dict(row._mapping)
+
+def run_data_backup(backup):
+    """Exportar os dados do usuário para o arquivo do backup e registrar o resultado em DataBackup.
+    
+    Incremental: linhas com updated_at (ou created_at/timestamp nas tabelas sem
+    updated_at) a partir do início do último backup concluído do mesmo escopo.
+    Exclusões não aparecem em backups incrementais.
+    """
+    since = base = None
+    if backup.backup_type == 'incremental':
+        base = DataBackup.query.filter(
+            DataBackup.user_id == backup.user_id, DataBackup.backup_scope == backup.backup_scope,
+            DataBackup.status == 'completed', DataBackup.id != backup.id
+        ).order_by(DataBackup.started_at.desc()).first()
+        since = base.started_at if base else None
+    
+    if backup.status == 'failed':  # Nova tentativa da fila
+        backup.retry_count = (backup.retry_count or 0) + 1
+    backup.status, backup.started_at, backup.progress_percentage = 'in_progress', datetime.utcnow(), 0.0
+    db.session.commit()
+    
+    directory = os.path.join(app.config['BACKUP_DIR'], f'user_{backup.user_id}')
+    os.makedirs(directory, exist_ok=True)
+    extension = 'ndjson.gz.enc' if backup.encryption_enabled else 'ndjson.gz'
+    path = os.path.join(directory, f"{backup.id}_{backup.backup_type}_{backup.started_at.strftime('%Y%m%d_%H%M%S')}.{extension}")
+    key = load_backup_key(app.config['BACKUP_KEY']) if backup.encryption_enabled else None
+    if backup.encryption_enabled and key is None:
+        raise RuntimeError('Backup criptografado sem IAON_BACKUP_KEY configurada')
+    
+    tables = backup_tables(backup.backup_scope)
+    header = {
+        'backup_id': backup.id,
+        'user_id': backup.user_id,
+        'backup_type': backup.backup_type,
+        'backup_scope': backup.backup_scope,
+        'since': since,
+        'base_backup_id': base.id if base else None,
+        'created_at': backup.started_at,
+        'tables': [name for name, _, _, _, _ in tables]
+    }
+    with ArchiveWriter(path, header, key=key) as archive:
+        for index, (name, model, _, since_column, user_filter) in enumerate(tables):
+            for row in iter_backup_rows(model, backup.user_id, user_filter, since_column, since):
+                archive.write(name, row)
+            backup.progress_percentage = round(100.0 * (index + 1) / len(tables), 1)
+            db.session.commit()
+        result = archive.close()
+    
+    backup.status = 'completed'
+    backup.completed_at = datetime.utcnow()
+    backup.storage_path = path
+    backup.backup_format = extension
+    backup.records_count = result['records']
+    backup.file_size_mb = round(result['file_bytes'] / (1024 * 1024), 3)
+    backup.compression_ratio = round(result['raw_bytes'] / result['file_bytes'], 2) if result['file_bytes'] else None
+    backup.checksum = result['sha256']
+    backup.error_message = None
+    backup.calculate_expiry()
+    db.session.commit()
+    return result
+
 @app.route('/api/backup/create/<int:user_id>', methods=['POST'])
 def create_backup(user_id):
     """Criar backup dos dados do usuário"""
@@ -10572,26 +12040,32 @@ def create_backup(user_id):
         data = request.get_json()
         backup_type = data.get('backup_type', 'manual')
         
-        # Calcular tamanho estimado
-        conversation_count = ConversationMemory.query.filter_by(user_id=user_id).count()
-        events_count = SmartCalendar.query.filter_by(user_id=user_id).count()
-        transactions_count = FinancialTransaction.query.filter_by(user_id=user_id).count()
+        backup_type = 'full' if backup_type == 'manual' else backup_type  # Nome antigo do backup completo
+        backup_scope = data.get('backup_scope', 'all')
+        encryption_enabled = data.get('encryption_enabled', bool(app.config['BACKUP_KEY']))
+        
+        if backup_type not in ('full', 'incremental'):
+            return jsonify({'error': 'backup_type deve ser full ou incremental'}), 400
+        if backup_scope != 'all' and backup_scope not in {scope for _, _, scope, _, _ in BACKUP_TABLES}:
+            return jsonify({'error': f'Escopo de backup desconhecido: {backup_scope}'}), 400
+        if encryption_enabled and not app.config['BACKUP_KEY']:
+            return jsonify({'error': 'Criptografia de backup requer IAON_BACKUP_KEY configurada no servidor'}), 400
         
         backup = DataBackup(
             user_id=user_id,
+            backup_name=f"Backup {backup_type} {datetime.utcnow().strftime('%d/%m/%Y %H:%M')}",
             backup_type=backup_type,
-            estimated_size_mb=0.5 * (conversation_count + events_count + transactions_count) / 100,
-            data_types_included=json.dumps(['conversations', 'calendar', 'finance', 'analytics']),
-            cloud_provider=data.get('cloud_provider', 'local'),
-            encryption_enabled=data.get('encryption_enabled', True)
+            backup_scope=backup_scope,
+            storage_location='local',
+            encryption_enabled=encryption_enabled,
+            backup_format='ndjson.gz.enc' if encryption_enabled else 'ndjson.gz',
+            status='pending'
         )
-        
-        # Simular processo de backup
-        backup.status = 'completed'
-        backup.completed_at = datetime.utcnow()
-        backup.file_path = f"/backups/user_{user_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.bak"
-        
         db.session.add(backup)
+        db.session.flush()
+        
+        # Exportação em segundo plano: a resposta volta com o backup pendente
+        job_queue.enqueue('data_backup', {'backup_id': backup.id})
         db.session.commit()
         
         return jsonify({
@@ -10647,6 +12121,7 @@ def analyze_emotional_state():
         
         db.session.add(analysis)
         db.session.commit()
+        emotional_state_cache.record(user_id, analysis.current_mood, analysis.created_at)
         
         # Se risco crítico ou alto, simular protocolo de emergência
         emergency_triggered = False
@@ -10659,6 +12134,13 @@ def analyze_emotional_state():
             ).all()
             
             if emergency_contacts:
+                # Registro da avaliação e notificação dos contatos pela fila (prioridade máxima)
+                job_queue.enqueue('emergency_protocol', {
+                    'user_id': user_id,
+                    'analysis_id': analysis.id,
+                    'message': message
+                })
+                db.session.commit()
                 emergency_response = {
                     'emergency_activated': True,
                     'contacts_notified': len(emergency_contacts),
@@ -10690,6 +12172,86 @@ def analyze_emotional_state():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/backup/<int:backup_id>/download', methods=['GET'])
+def download_backup(backup_id):
+    """Baixar o arquivo de um backup concluído"""
+    try:
+        backup = DataBackup.query.get(backup_id)
+        if not backup or backup.status != 'completed' or not backup.storage_path:
+            return jsonify({'error': 'Backup não encontrado ou ainda não concluído'}), 404
+        if not os.path.exists(backup.storage_path):
+            return jsonify({'error': 'Arquivo do backup não está mais disponível'}), 410
+        return send_file(backup.storage_path, as_attachment=True,
+                         download_name=os.path.basename(backup.storage_path),
+                         mimetype='application/octet-stream', etag=backup.checksum)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _enqueue_restore(user_id, archive_path, source_backup_id=None):
+    restore = DataRestore(user_id=user_id, archive_path=archive_path, source_backup_id=source_backup_id,
+                          status='pending')
+    db.session.add(restore)
+    db.session.flush()
+    job_queue.enqueue('data_restore', {'restore_id': restore.id})
+    db.session.commit()
+    return jsonify({
+        'success': True,
+        'restore_id': restore.id,
+        'restore': restore.to_dict()
+    })
+
+@app.route('/api/backup/<int:backup_id>/restore', methods=['POST'])
+def restore_backup(backup_id):
+    """Restaurar um backup concluído (para o próprio usuário ou outro destino)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        backup = DataBackup.query.get(backup_id)
+        if not backup or backup.status != 'completed' or not backup.storage_path:
+            return jsonify({'error': 'Backup não encontrado ou ainda não concluído'}), 404
+        if not os.path.exists(backup.storage_path):
+            return jsonify({'error': 'Arquivo do backup não está mais disponível'}), 410
+        
+        return _enqueue_restore(data.get('target_user_id', backup.user_id), backup.storage_path, backup.id)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/backup/import/<int:user_id>', methods=['POST'])
+def import_backup(user_id):
+    """Importar um arquivo de backup enviado (ex.: migração vinda de outra instância)"""
+    try:
+        if 'archive' not in request.files or request.files['archive'].filename == '':
+            return jsonify({'error': 'Nenhum arquivo de backup enviado'}), 400
+        
+        directory = os.path.join(app.config['BACKUP_DIR'], f'user_{user_id}')
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"import_{datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')}.ndjson.gz")
+        request.files['archive'].save(path)
+        
+        # Validar o cabeçalho antes de enfileirar (formato, versão, chave)
+        try:
+            with ArchiveReader(path, key=load_backup_key(app.config['BACKUP_KEY'])):
+                pass
+        except (ValueError, RuntimeError, OSError, EOFError) as e:
+            os.remove(path)
+            return jsonify({'error': f'Arquivo de backup inválido: {e}'}), 400
+        
+        return _enqueue_restore(user_id, path)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/backup/restore/<int:restore_id>', methods=['GET'])
+def get_restore_status(restore_id):
+    """Progresso e resultado de uma restauração"""
+    try:
+        restore = DataRestore.query.get(restore_id)
+        if not restore:
+            return jsonify({'error': 'Restauração não encontrada'}), 404
+        return jsonify({'success': True, 'restore': restore.to_dict()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/backup/list/<int:user_id>', methods=['GET'])
 def list_backups(user_id):
     """Listar backups do usuário"""
@@ -10760,6 +12322,216 @@ def system_settings(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# ===========================================
+# FILA DE TAREFAS EM SEGUNDO PLANO
+# ===========================================
+
+job_queue = JobQueue(app, db, BackgroundJob, workers=app.config['JOB_WORKERS'])
+
+@job_queue.handler('conversation_memory', concurrency=1)  # update_user_context lê e regrava o JSON do usuário
+def run_conversation_memory_job(payload):
+    save_conversation_memory_internal(payload['user_id'], payload['session_id'],
+                                      payload['user_message'], payload['ai_response'])
+
+@job_queue.handler('calendar_reminders', concurrency=2)
+def run_calendar_reminders_job(payload):
+    event = SmartCalendar.query.get(payload['event_id'])
+    if not event:
+        return
+    already_created = NotificationSystem.query.filter_by(
+        related_entity_type='calendar_event', related_entity_id=event.id
+    ).first()
+    if not already_created:  # Nova tentativa após um commit já feito
+        create_event_reminders(event)
+
+@job_queue.handler('emergency_protocol', concurrency=4, max_attempts=5, backoff_seconds=2.0, priority=100)
+def run_emergency_protocol_job(payload):
+    analysis = EmotionalAnalysis.query.get(payload['analysis_id'])
+    if not analysis:
+        return
+    result = trigger_emergency_protocol(payload['user_id'], analysis, payload['message'])
+    print(f"🚨 Protocolo de emergência do usuário {payload['user_id']}: "
+          f"{result.get('contacts_notified', 0)} contatos notificados")
+
+METRICS_RECONCILE_HOUR = 3  # UTC
+LEDGER_CHECKPOINT_MINUTES = int(os.getenv('IAON_LEDGER_CHECKPOINT_MINUTES', '60'))
+
+@job_queue.handler('finance_ledger_checkpoint', concurrency=1)
+def run_ledger_checkpoint_job(payload):
+    result = balance_ledger.checkpoint(db.session, payload.get('account_ids'))
+    if result['corrections']:
+        print(f"💰 Checkpoint de saldos: {result['corrections']} conta(s) corrigida(s) de {result['accounts']}")
+    if not payload.get('account_ids'):
+        schedule_ledger_checkpoint()
+
+def schedule_ledger_checkpoint():
+    """Agendar o próximo checkpoint de saldos, se ainda não houver um pendente"""
+    pending = BackgroundJob.query.filter_by(job_type='finance_ledger_checkpoint', status='pending').first()
+    if pending:
+        return pending
+    job = job_queue.enqueue('finance_ledger_checkpoint', delay=LEDGER_CHECKPOINT_MINUTES * 60)
+    db.session.commit()
+    return job
+
+@job_queue.handler('metrics_reconcile', concurrency=1)
+def run_metrics_reconcile_job(payload):
+    try:
+        reconcile_metric_rollups()
+        reconcile_meeting_statistics()
+        corrected = finance_totals.reconcile(db.session)
+        db.session.commit()
+        if corrected:
+            print(f"⚠️ Reconciliação das somas mensais das finanças corrigiu {corrected} linhas")
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        # Mesmo se esta rodada esgotar as tentativas, a da próxima noite continua agendada
+        schedule_metrics_reconciliation()
+
+def schedule_metrics_reconciliation(now=None):
+    """Agendar a próxima reconciliação diária, se ainda não houver uma pendente"""
+    pending = BackgroundJob.query.filter_by(job_type='metrics_reconcile', status='pending').first()
+    if pending:
+        return pending
+    now = now or datetime.utcnow()
+    next_run = now.replace(hour=METRICS_RECONCILE_HOUR, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    job = job_queue.enqueue('metrics_reconcile', delay=(next_run - now).total_seconds())
+    db.session.commit()
+    return job
+
+def _count_bulk_rows(model, rows):
+    """Linhas gravadas em lote não passam pelo before_flush: somar agregados e atividade aqui"""
+    if model in metric_rollups.sources:
+        deltas = Counter()
+        for row in rows:
+            metric_rollups.contributions(model, row, 1, deltas)
+        metric_rollups.apply(db.session, deltas)
+    if model in user_activity.sources:
+        deltas = Counter()
+        for row in rows:
+            user_activity.contributions(model, row, 1, deltas)
+        user_activity.apply(db.session, deltas)
+    if model is finance_totals.transactions:
+        deltas = Counter()
+        for row in rows:
+            finance_totals.contributions(row, 1, deltas)
+        finance_totals.apply(db.session, deltas)
+
+def run_data_restore(restore):
+    """Restaurar um arquivo de backup para restore.user_id, em lotes confirmados um a um.
+    
+    O arquivo inteiro é autenticado antes (tag AES-GCM, CRC e rodapé só são
+    conferidos no fim): nenhuma linha de um arquivo truncado ou adulterado é
+    gravada. Cada lote é commitado com o progresso; se a restauração falhar no
+    meio, rodar de novo completa o que falta sem duplicar (chaves naturais).
+    """
+    if restore.status == 'failed':  # Nova tentativa da fila
+        restore.retry_count = (restore.retry_count or 0) + 1
+    restore.status, restore.started_at, restore.progress_percentage = 'in_progress', datetime.utcnow(), 0.0
+    restore.error_message = None
+    db.session.commit()
+    
+    key = load_backup_key(app.config['BACKUP_KEY'])
+    verify_archive(restore.archive_path, key=key)
+    existing_accounts = [account_id for (account_id,) in db.session.query(FinancialAccount.id)
+                         .filter(FinancialAccount.user_id == restore.user_id)]
+    with ArchiveReader(restore.archive_path, key=key) as archive:
+        tables = archive.header.get('tables') or []
+        restore.source_user_id = archive.header.get('user_id')
+        
+        def on_batch(model, rows, stats):
+            _count_bulk_rows(model, rows)
+            restore.current_table = stats['table']
+            position = tables.index(stats['table']) if stats['table'] in tables else 0
+            restore.progress_percentage = round(100.0 * position / len(tables), 1) if tables else 0.0
+            restore.records_processed = stats['processed']
+            restore.records_inserted, restore.records_updated = stats['inserted'], stats['updated']
+            restore.records_rejected = stats['rejected']
+            db.session.commit()
+        
+        stats = backup_restorer.restore(db.session, archive, restore.user_id, on_batch=on_batch)
+    
+    restore.status = 'completed'
+    restore.completed_at = datetime.utcnow()
+    restore.progress_percentage = 100.0
+    restore.records_processed = stats['processed']
+    restore.records_inserted, restore.records_updated = stats['inserted'], stats['updated']
+    restore.records_rejected = stats['rejected']
+    restore.rejection_details = json.dumps(stats['errors'], ensure_ascii=False) if stats['errors'] else None
+    # Contas criadas pela restauração: o saldo do backup é o ponto de partida do razão
+    balance_ledger.rebase(db.session, [account_id for (account_id,) in db.session.query(FinancialAccount.id)
+                                       .filter(FinancialAccount.user_id == restore.user_id,
+                                               FinancialAccount.id.notin_(existing_accounts))])
+    finance_totals.reconcile(db.session, [restore.user_id])  # Inclui transações atualizadas pelo upsert
+    db.session.commit()
+    # Contas que já existiam receberam o saldo (mais antigo) do backup: recalcular do checkpoint + transações
+    if existing_accounts:
+        balance_ledger.checkpoint(db.session, existing_accounts)
+    invalidate_voice_match_index('contacts', restore.user_id)  # Contatos gravados sem passar pela sessão
+    return stats
+
+@job_queue.handler('data_restore', concurrency=1, max_attempts=2, backoff_seconds=60)
+def run_data_restore_job(payload):
+    restore = DataRestore.query.get(payload['restore_id'])
+    if not restore or restore.status == 'completed':
+        return
+    try:
+        stats = run_data_restore(restore)
+        print(f"♻️ Restauração {restore.id} para o usuário {restore.user_id}: "
+              f"{stats['inserted']} novos, {stats['updated']} atualizados, {stats['rejected']} rejeitados")
+    except Exception as e:
+        db.session.rollback()
+        restore.status, restore.error_message = 'failed', str(e)
+        db.session.commit()
+        raise
+
+@job_queue.handler('data_backup', concurrency=2, max_attempts=2, backoff_seconds=60)
+def run_data_backup_job(payload):
+    backup = DataBackup.query.get(payload['backup_id'])
+    if not backup or backup.status == 'completed':
+        return
+    try:
+        result = run_data_backup(backup)
+        print(f"💾 Backup {backup.id} do usuário {backup.user_id}: {result['records']} registros")
+    except Exception as e:
+        db.session.rollback()
+        backup.status, backup.error_message = 'failed', str(e)
+        db.session.commit()
+        raise
+
+@app.route('/api/admin/notifications/scheduler', methods=['GET'])
+def admin_notification_scheduler():
+    """Métricas do agendador de notificações (vazão, atraso e heap)"""
+    try:
+        return jsonify({'success': True, 'metrics': notification_scheduler.metrics()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/cache', methods=['GET'])
+def admin_cache_metrics():
+    """Métricas do cache de respostas do catálogo"""
+    try:
+        return jsonify({'success': True, 'metrics': response_cache.metrics()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/jobs', methods=['GET'])
+def admin_job_metrics():
+    """Métricas da fila de tarefas e últimas falhas"""
+    try:
+        failed = BackgroundJob.query.filter_by(status='failed')\
+            .order_by(BackgroundJob.finished_at.desc()).limit(20).all()
+        return jsonify({
+            'success': True,
+            'metrics': job_queue.metrics(),
+            'recent_failures': [job.to_dict() for job in failed]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ===========================================
 # FUNÇÕES AUXILIARES ADICIONAIS
 # ===========================================
@@ -10797,73 +12569,153 @@ def create_event_reminders(event):
     except Exception as e:
         print(f"Erro ao criar lembretes: {e}")
 
+# Categorias de transação por palavras da descrição, em ordem de prioridade
+TRANSACTION_CATEGORIES = IntentClassifier([
+    ('alimentacao', ['supermercado', 'restaurante', 'lanche', 'comida', 'padaria']),
+    ('transporte', ['uber', 'taxi', 'combustivel', 'gasolina', 'onibus']),
+    ('saude', ['farmacia', 'medico', 'hospital', 'consulta', 'exame']),
+    ('educacao', ['escola', 'curso', 'livro', 'faculdade', 'universidade']),
+    ('lazer', ['cinema', 'show', 'game', 'viagem', 'festa']),
+    ('casa', ['mercado', 'limpeza', 'eletrico', 'agua', 'internet']),
+    ('roupas', ['loja', 'roupa', 'sapato', 'shopping']),
+])
+
 def auto_categorize_transaction(description):
     """Auto-categorizar transação baseada na descrição"""
-    description_lower = description.lower()
-    
-    categories = {
-        'alimentacao': ['supermercado', 'restaurante', 'lanche', 'comida', 'padaria'],
-        'transporte': ['uber', 'taxi', 'combustivel', 'gasolina', 'onibus'],
-        'saude': ['farmacia', 'medico', 'hospital', 'consulta', 'exame'],
-        'educacao': ['escola', 'curso', 'livro', 'faculdade', 'universidade'],
-        'lazer': ['cinema', 'show', 'game', 'viagem', 'festa'],
-        'casa': ['mercado', 'limpeza', 'eletrico', 'agua', 'internet'],
-        'roupas': ['loja', 'roupa', 'sapato', 'shopping']
-    }
-    
-    for category, keywords in categories.items():
-        if any(keyword in description_lower for keyword in keywords):
-            return category
-    
-    return 'outros'
+    return TRANSACTION_CATEGORIES.first(description, default='outros')
 
 # ===========================================
 # FUNÇÕES AUXILIARES PARA ANÁLISE EMOCIONAL E IA
 # ===========================================
 
+# Léxico emocional em português (listas mantêm a ordem e as repetições originais)
+DEPRESSION_KEYWORDS = [
+    'triste', 'deprimido', 'vazio', 'sem esperança', 'sozinho', 'perdido',
+    'cansado', 'sem energia', 'não consigo', 'desanimado', 'desesperado',
+    'sem sentido', 'inútil', 'fracasso', 'culpado', 'não vale a pena',
+    'acabou', 'perdido', 'escuridão', 'peso', 'fardo'
+]
+
+ANXIETY_KEYWORDS = [
+    'ansioso', 'preocupado', 'nervoso', 'estressado', 'medo', 'pânico',
+    'tenso', 'inquieto', 'agitado', 'paranóico', 'inseguro', 'aterrorizado',
+    'suando', 'coração acelerado', 'sufocando', 'tremendo'
+]
+
+POSITIVE_KEYWORDS = [
+    'feliz', 'alegre', 'animado', 'grato', 'esperançoso', 'confiante',
+    'otimista', 'satisfeito', 'relaxado', 'tranquilo', 'empolgado', 'bem',
+    'realizando', 'conquista', 'sucesso', 'amor', 'paz', 'harmonia'
+]
+
+CONCERNING_KEYWORDS = [
+    'morrer', 'acabar com tudo', 'não aguento mais', 'quero sumir',
+    'sem saída', 'nada importa', 'seria melhor se eu', 'todo mundo seria melhor sem mim',
+    'fim', 'terminar', 'desistir', 'não dá mais', 'chega'
+]
+
+HELP_SEEKING_KEYWORDS = [
+    'preciso de ajuda', 'me ajuda', 'não sei o que fazer', 'socorro',
+    'orientação', 'conselho', 'apoio', 'suporte', 'alguém para conversar'
+]
+
+STRESS_INDICATORS = ['stress', 'pressão', 'sobrecarregado', 'muito trabalho', 'não durmo', 'deadline', 'pressa']
+
+# Frases de risco crítico (risco imediato)
+CRITICAL_RISK_PHRASES = [
+    'vou me matar', 'vou morrer hoje', 'acabar com tudo agora', 'não aguento mais um dia',
+    'hora de partir', 'tchau mundo', 'último adeus', 'se despedindo'
+]
+
+# Frases de alto risco
+HIGH_RISK_PHRASES = [
+    'quero morrer', 'melhor morto', 'acabar com tudo', 'não aguento mais viver',
+    'seria melhor se eu morresse', 'todo mundo seria melhor sem mim',
+    'não tenho mais saída', 'vou terminar com isso', 'não vale a pena viver',
+    'vida sem sentido', 'peso para todos', 'fracasso total'
+]
+
+# Frases de risco médio
+MEDIUM_RISK_PHRASES = [
+    'às vezes penso em morrer', 'não sei se vale a pena', 'estou muito cansado de tudo',
+    'não vejo saída', 'tudo está perdido', 'não tem mais jeito',
+    'me sinto um peso', 'ninguém me entende', 'sozinho no mundo'
+]
+
+# Indicadores comportamentais de risco
+BEHAVIORAL_INDICATORS = [
+    'se despedindo', 'doando coisas', 'arrumando assuntos', 'fazendo testamento',
+    'última vez', 'nunca mais', 'fim da linha', 'não volto mais'
+]
+
+# Fatores contextuais do risco: (palavras, peso)
+CONTEXTUAL_RISK_FACTORS = [
+    (['isolamento', 'sozinho'], 0.2),
+    (['sem amigos', 'ninguém se importa'], 0.3),
+    (['dor insuportável', 'sofrimento'], 0.2),
+]
+
+RISK_FACTOR_KEYWORDS = [
+    ('social_isolation', ['sozinho', 'isolado', 'sem amigos', 'ninguém']),
+    ('financial_stress', ['dívida', 'falência', 'desemprego', 'dinheiro']),
+    ('health_issues', ['doente', 'dor', 'tratamento', 'hospital']),
+    ('relationship_problems', ['separação', 'divórcio', 'término', 'briga']),
+]
+
+# Todas as listas acima em um só classificador: uma passada por mensagem
+EMOTIONAL_LEXICON = IntentClassifier(
+    [('lexicon', DEPRESSION_KEYWORDS + ANXIETY_KEYWORDS + POSITIVE_KEYWORDS + CONCERNING_KEYWORDS
+      + HELP_SEEKING_KEYWORDS + STRESS_INDICATORS + CRITICAL_RISK_PHRASES + HIGH_RISK_PHRASES
+      + MEDIUM_RISK_PHRASES + BEHAVIORAL_INDICATORS
+      + [word for words, _ in CONTEXTUAL_RISK_FACTORS for word in words]
+      + [word for _, words in RISK_FACTOR_KEYWORDS for word in words])]
+)
+
+@lru_cache(maxsize=256)
+def _emotional_keywords(text_lower):
+    return frozenset(EMOTIONAL_LEXICON.find_keywords(text_lower))
+
+def emotional_keywords(text):
+    """Palavras do léxico emocional presentes no texto (análise, risco e fatores reusam o resultado)"""
+    return _emotional_keywords(text.lower())
+
+def _present(keywords, found):
+    return [word for word in keywords if word in found]
+
+# Janelas de humor recentes por usuário (tendência sem consultar o banco a cada mensagem)
+emotional_state_cache = EmotionalStateCache(max_users=10000, reload_seconds=300)
+
+def _load_mood_history(user_id, days=WINDOW_DAYS):
+    """Humores dos últimos dias (até WINDOW_SIZE), do mais antigo ao mais recente"""
+    try:
+        rows = db.session.query(EmotionalAnalysis.current_mood, EmotionalAnalysis.created_at)\
+            .filter(EmotionalAnalysis.user_id == user_id)\
+            .filter(EmotionalAnalysis.created_at >= datetime.utcnow() - timedelta(days=days))\
+            .order_by(EmotionalAnalysis.created_at.desc()).limit(WINDOW_SIZE).all()
+    except Exception:
+        return []
+    return [(row.current_mood, row.created_at) for row in reversed(rows)]
+
+def get_user_mood_window(user_id):
+    """Janela de humor do usuário (carregada do banco só na primeira vez ou após a recarga)"""
+    return emotional_state_cache.get(user_id, _load_mood_history)
+
 def perform_advanced_emotional_analysis(user_id, message, voice_data=None, context={}):
     """Realizar análise emocional avançada usando IA e NLP"""
     
-    # Palavras-chave para detecção emocional em português
-    depression_keywords = [
-        'triste', 'deprimido', 'vazio', 'sem esperança', 'sozinho', 'perdido',
-        'cansado', 'sem energia', 'não consigo', 'desanimado', 'desesperado',
-        'sem sentido', 'inútil', 'fracasso', 'culpado', 'não vale a pena',
-        'acabou', 'perdido', 'escuridão', 'peso', 'fardo'
-    ]
-    
-    anxiety_keywords = [
-        'ansioso', 'preocupado', 'nervoso', 'estressado', 'medo', 'pânico',
-        'tenso', 'inquieto', 'agitado', 'paranóico', 'inseguro', 'aterrorizado',
-        'suando', 'coração acelerado', 'sufocando', 'tremendo'
-    ]
-    
-    positive_keywords = [
-        'feliz', 'alegre', 'animado', 'grato', 'esperançoso', 'confiante',
-        'otimista', 'satisfeito', 'relaxado', 'tranquilo', 'empolgado', 'bem',
-        'realizando', 'conquista', 'sucesso', 'amor', 'paz', 'harmonia'
-    ]
-    
-    concerning_keywords = [
-        'morrer', 'acabar com tudo', 'não aguento mais', 'quero sumir',
-        'sem saída', 'nada importa', 'seria melhor se eu', 'todo mundo seria melhor sem mim',
-        'fim', 'terminar', 'desistir', 'não dá mais', 'chega'
-    ]
-    
-    help_seeking_keywords = [
-        'preciso de ajuda', 'me ajuda', 'não sei o que fazer', 'socorro',
-        'orientação', 'conselho', 'apoio', 'suporte', 'alguém para conversar'
-    ]
-    
-    # Análise de sentimento do texto
-    message_lower = message.lower()
+    # Uma passada pelo texto com o léxico compilado
+    found = emotional_keywords(message)
+    depression_indicators = _present(DEPRESSION_KEYWORDS, found)
+    anxiety_indicators = _present(ANXIETY_KEYWORDS, found)
+    positive_indicators = _present(POSITIVE_KEYWORDS, found)
+    concerning_indicators = _present(CONCERNING_KEYWORDS, found)
     
     # Contar indicadores emocionais
-    depression_count = sum(1 for word in depression_keywords if word in message_lower)
-    anxiety_count = sum(1 for word in anxiety_keywords if word in message_lower)
-    positive_count = sum(1 for word in positive_keywords if word in message_lower)
-    concerning_count = sum(1 for word in concerning_keywords if word in message_lower)
-    help_seeking_count = sum(1 for word in help_seeking_keywords if word in message_lower)
+    depression_count = len(depression_indicators)
+    anxiety_count = len(anxiety_indicators)
+    positive_count = len(positive_indicators)
+    concerning_count = len(concerning_indicators)
+    help_seeking_count = len(_present(HELP_SEEKING_KEYWORDS, found))
     
     # Determinar humor principal baseado na análise
     if concerning_count > 0:
@@ -10887,8 +12739,7 @@ def perform_advanced_emotional_analysis(user_id, message, voice_data=None, conte
     stability = max(0.1, 1.0 - (total_negative * 0.15))
     
     # Nível de stress baseado em indicadores específicos
-    stress_indicators = ['stress', 'pressão', 'sobrecarregado', 'muito trabalho', 'não durmo', 'deadline', 'pressa']
-    stress_level = min(0.95, sum(1 for indicator in stress_indicators if indicator in message_lower) * 0.25)
+    stress_level = min(0.95, len(_present(STRESS_INDICATORS, found)) * 0.25)
     
     # Sentimento geral (-1.0 = muito negativo, +1.0 = muito positivo)
     if concerning_count > 0:
@@ -10897,8 +12748,8 @@ def perform_advanced_emotional_analysis(user_id, message, voice_data=None, conte
         sentiment = (positive_count * 0.2) - (depression_count * 0.3) - (anxiety_count * 0.2)
         sentiment = max(-1.0, min(1.0, sentiment))
     
-    # Buscar histórico recente do usuário para contexto
-    recent_history = get_user_recent_emotional_history(user_id)
+    # Histórico recente do usuário para contexto (janela em memória)
+    recent_history = get_user_mood_window(user_id)
     
     return {
         'mood': mood,
@@ -10906,56 +12757,29 @@ def perform_advanced_emotional_analysis(user_id, message, voice_data=None, conte
         'stability': round(stability, 2),
         'stress': round(stress_level, 2),
         'sentiment': round(sentiment, 2),
-        'depression_indicators': [word for word in depression_keywords if word in message_lower],
-        'anxiety_indicators': [word for word in anxiety_keywords if word in message_lower],
-        'positive_keywords': [word for word in positive_keywords if word in message_lower],
-        'concerning_keywords': [word for word in concerning_keywords if word in message_lower],
+        'depression_indicators': depression_indicators,
+        'anxiety_indicators': anxiety_indicators,
+        'positive_keywords': positive_indicators,
+        'concerning_keywords': concerning_indicators,
         'seeking_help': help_seeking_count > 0,
         'context': {
             'message_length': len(message),
             'emotional_complexity': depression_count + anxiety_count + positive_count,
             'recent_trend': analyze_emotional_trend(recent_history),
-            'risk_factors': identify_risk_factors(message_lower, recent_history)
+            'risk_factors': identify_risk_factors(message, recent_history)
         }
     }
 
 def assess_suicide_risk(emotional_analysis, message):
     """Avaliação avançada de risco de suicídio com múltiplos fatores"""
     
-    # Frases de risco crítico (risco imediato)
-    critical_risk_phrases = [
-        'vou me matar', 'vou morrer hoje', 'acabar com tudo agora', 'não aguento mais um dia',
-        'hora de partir', 'tchau mundo', 'último adeus', 'se despedindo'
-    ]
-    
-    # Frases de alto risco
-    high_risk_phrases = [
-        'quero morrer', 'melhor morto', 'acabar com tudo', 'não aguento mais viver',
-        'seria melhor se eu morresse', 'todo mundo seria melhor sem mim',
-        'não tenho mais saída', 'vou terminar com isso', 'não vale a pena viver',
-        'vida sem sentido', 'peso para todos', 'fracasso total'
-    ]
-    
-    # Frases de risco médio
-    medium_risk_phrases = [
-        'às vezes penso em morrer', 'não sei se vale a pena', 'estou muito cansado de tudo',
-        'não vejo saída', 'tudo está perdido', 'não tem mais jeito',
-        'me sinto um peso', 'ninguém me entende', 'sozinho no mundo'
-    ]
-    
-    # Indicadores comportamentais de risco
-    behavioral_indicators = [
-        'se despedindo', 'doando coisas', 'arrumando assuntos', 'fazendo testamento',
-        'última vez', 'nunca mais', 'fim da linha', 'não volto mais'
-    ]
-    
-    message_lower = message.lower()
+    found = emotional_keywords(message)  # Reaproveita a passada da análise emocional
     
     # Verificar diferentes níveis de risco
-    critical_mentions = any(phrase in message_lower for phrase in critical_risk_phrases)
-    high_risk_mentions = any(phrase in message_lower for phrase in high_risk_phrases)
-    medium_risk_mentions = any(phrase in message_lower for phrase in medium_risk_phrases)
-    behavioral_mentions = any(phrase in message_lower for phrase in behavioral_indicators)
+    critical_mentions = any(phrase in found for phrase in CRITICAL_RISK_PHRASES)
+    high_risk_mentions = any(phrase in found for phrase in HIGH_RISK_PHRASES)
+    medium_risk_mentions = any(phrase in found for phrase in MEDIUM_RISK_PHRASES)
+    behavioral_mentions = any(phrase in found for phrase in BEHAVIORAL_INDICATORS)
     
     # Calcular score de risco (0.0 = sem risco, 1.0 = risco máximo)
     risk_score = 0.0
@@ -10983,12 +12807,9 @@ def assess_suicide_risk(emotional_analysis, message):
         risk_score += 0.2
         
     # Fatores contextuais
-    if 'isolamento' in message_lower or 'sozinho' in message_lower:
-        risk_score += 0.2
-    if 'sem amigos' in message_lower or 'ninguém se importa' in message_lower:
-        risk_score += 0.3
-    if 'dor insuportável' in message_lower or 'sofrimento' in message_lower:
-        risk_score += 0.2
+    for words, weight in CONTEXTUAL_RISK_FACTORS:
+        if any(word in found for word in words):
+            risk_score += weight
     
     # Limitação do score máximo
     risk_score = min(1.0, risk_score)
@@ -11043,7 +12864,7 @@ def trigger_emergency_protocol(user_id, analysis, message):
     # Registrar avaliação de risco crítico
     suicide_assessment = SuicideRiskAssessment(
         user_id=user_id,
-        risk_level='critical',
+        risk_level=analysis.suicide_risk_level or 'critical',
         risk_score=analysis.suicide_risk_score,
         trigger_message=message[:500],  # Primeiros 500 caracteres
         assessment_details=json.dumps({
@@ -11060,6 +12881,7 @@ def trigger_emergency_protocol(user_id, analysis, message):
     )
     
     db.session.add(suicide_assessment)
+    db.session.flush()
     
     # Preparar notificações de emergência
     notifications_sent = []
@@ -11285,67 +13107,21 @@ Percebo que você está se sentindo {emotional_analysis['mood']} e entendo que i
             'empathetic': True
         }
 
-def get_user_recent_emotional_history(user_id, days=7):
-    """Buscar histórico emocional recente do usuário"""
-    try:
-        recent_analyses = EmotionalAnalysis.query.filter_by(user_id=user_id)\
-            .filter(EmotionalAnalysis.created_at >= datetime.utcnow() - timedelta(days=days))\
-            .order_by(EmotionalAnalysis.created_at.desc()).limit(20).all()
-        
-        return [analysis.to_dict() for analysis in recent_analyses]
-    except:
-        return []
-
 def analyze_emotional_trend(history):
-    """Analisar tendência emocional baseada no histórico"""
-    if len(history) < 3:
-        return 'insufficient_data'
-    
-    # Converter humores para scores numéricos
-    mood_scores = []
-    for entry in history:
-        mood = entry.get('current_mood', 'neutral')
-        if mood == 'very_positive':
-            mood_scores.append(5)
-        elif mood == 'positive':
-            mood_scores.append(4)
-        elif mood == 'neutral':
-            mood_scores.append(3)
-        elif mood in ['depressed', 'anxious']:
-            mood_scores.append(2)
-        else:  # critical
-            mood_scores.append(1)
-    
-    # Calcular tendência
-    recent_avg = sum(mood_scores[:3]) / 3
-    older_avg = sum(mood_scores[3:6]) / min(3, len(mood_scores[3:6]))
-    
-    if recent_avg > older_avg + 0.5:
-        return 'improving'
-    elif recent_avg < older_avg - 0.5:
-        return 'declining'
-    else:
-        return 'stable'
+    """Analisar tendência emocional baseada no histórico (MoodWindow ou lista de análises, mais recente primeiro)"""
+    if not isinstance(history, MoodWindow):
+        window = MoodWindow()
+        for entry in reversed(history):
+            window.append(entry.get('current_mood', 'neutral'), datetime.utcnow())
+        history = window
+    return history.trend()
 
 def identify_risk_factors(message, history):
     """Identificar fatores de risco específicos"""
-    risk_factors = []
+    found = emotional_keywords(message)
     
-    # Fatores sociais
-    if any(word in message for word in ['sozinho', 'isolado', 'sem amigos', 'ninguém']):
-        risk_factors.append('social_isolation')
-    
-    # Fatores financeiros
-    if any(word in message for word in ['dívida', 'falência', 'desemprego', 'dinheiro']):
-        risk_factors.append('financial_stress')
-    
-    # Fatores de saúde
-    if any(word in message for word in ['doente', 'dor', 'tratamento', 'hospital']):
-        risk_factors.append('health_issues')
-    
-    # Fatores relacionais
-    if any(word in message for word in ['separação', 'divórcio', 'término', 'briga']):
-        risk_factors.append('relationship_problems')
+    # Fatores sociais, financeiros, de saúde e relacionais
+    risk_factors = [factor for factor, words in RISK_FACTOR_KEYWORDS if any(word in found for word in words)]
     
     # Padrão de declínio no histórico
     trend = analyze_emotional_trend(history)
@@ -11363,8 +13139,19 @@ def schedule_crisis_followups(user_id, assessment_id):
         {'minutes': 1440, 'type': 'daily'},      # 24 horas
     ]
     
-    # Em uma implementação real, isso seria integrado com um sistema de agendamento
-    # Por exemplo, usando Celery, Redis, ou um cron job
+    # Lembretes de acompanhamento entregues pelo agendador de notificações
+    now = datetime.utcnow()
+    for interval in followup_intervals:
+        db.session.add(NotificationSystem(
+            user_id=user_id,
+            title='Como você está agora?',
+            message='Estamos aqui com você. Se precisar, ligue para o CVV: 188 (24h, gratuito).',
+            notification_type='medical',
+            priority='urgent',
+            scheduled_for=now + timedelta(minutes=interval['minutes']),
+            related_entity_type='suicide_risk_assessment',
+            related_entity_id=assessment_id
+        ))
     print(f"Follow-ups agendados para usuário {user_id}, avaliação {assessment_id}")
     
     return followup_intervals
@@ -11546,39 +13333,81 @@ def analyze_session_progress(user_id, history):
         'engagement_level': 'good'
     }
 
-# Inicialização automática para Vercel
-def init_database():
-    """Inicializar banco de dados e criar dados básicos"""
-    try:
-        db.create_all()
-        
-        # Criar usuário padrão se não existir (importante para Vercel)
-        if User.query.count() == 0:
-            from werkzeug.security import generate_password_hash
-            
-            default_user = User(
+# ===========================================
+# INICIALIZAÇÃO DO BANCO NA PARTIDA DO PROCESSO
+# ===========================================
+
+# Aumentar quando um passo abaixo mudar sem mudar os modelos (nova coluna extra, novo backfill)
+SCHEMA_BOOTSTRAP_VERSION = 3
+
+def bootstrap_database():
+    """Passos da inicialização: esquema, agregados e dados padrão (rodam sob a trava de schema_bootstrap)"""
+    db.create_all()
+    ensure_updated_at_columns()
+    ensure_memory_search_index()
+    ensure_meeting_statistics()
+    # create_all não cria índices em tabelas existentes (Railway não roda o release: do Procfile)
+    merge_duplicate_contacts()  # Necessário para o índice único (user_id, phone_number)
+    apply_index_migrations()
+    ensure_metric_rollups()
+    ensure_user_activity_counters()
+    ensure_finance_totals()
+    schedule_metrics_reconciliation()
+    schedule_ledger_checkpoint()
+    
+    # Dados padrão do desenvolvimento
+    if os.getenv('FLASK_ENV') != 'production':
+        if not User.query.first():
+            admin_user = User(
                 username='admin',
-                email='admin@iaon.app',
+                email='admin@iaon.com',
                 full_name='Administrador IAON',
-                preferred_name='Admin',
-                password_hash=generate_password_hash('admin123'),
-                is_onboarded=True,
-                voice_enabled=True,
-                is_admin=True
+                is_active=True
             )
-            db.session.add(default_user)
+            db.session.add(admin_user)
             db.session.commit()
-            print("✅ Usuário padrão criado para Vercel")
+            print("Usuário administrador criado!")
         
-        return True
-    except Exception as e:
-        print(f"❌ Erro na inicialização do banco: {e}")
-        return False
+        # Inicializar coaches padrão
+        init_default_coaches()
+        
+        # Inicializar planos padrão
+        init_default_plans()
+        
+        # NÃO criar cupons de exemplo - apenas cupons exclusivos criados manualmente
+    
+    # Criar usuário padrão se não existir (importante para Vercel)
+    if app.config.get('AUTO_INIT_DB', False) and User.query.count() == 0:
+        from werkzeug.security import generate_password_hash
+        
+        default_user = User(
+            username='admin',
+            email='admin@iaon.app',
+            full_name='Administrador IAON',
+            preferred_name='Admin',
+            password_hash=generate_password_hash('admin123'),
+            is_onboarded=True,
+            voice_enabled=True,
+            is_admin=True
+        )
+        db.session.add(default_user)
+        db.session.commit()
+        print("✅ Usuário padrão criado para Vercel")
+    
+    print("✅ Banco de dados inicializado com sucesso")
 
-# Inicializar automaticamente se estiver no Vercel
-with app.app_context():
-    if app.config.get('AUTO_INIT_DB', False):
-        init_database()
+schema_bootstrap = SchemaBootstrap(app, db, SchemaState, bootstrap_database, SCHEMA_BOOTSTRAP_VERSION,
+                                   timeout=float(os.getenv('IAON_BOOTSTRAP_TIMEOUT', '60')))
+
+def init_database():
+    """Inicializar banco de dados e criar dados básicos (uma consulta se o esquema já estiver em dia)"""
+    return schema_bootstrap.run()
+
+# Na importação: com preload_app o master do gunicorn faz isso uma vez antes dos forks
+if app.config.get('AUTO_INIT_DB', False) or os.getenv('FLASK_ENV') != 'production':
+    init_database()
+else:
+    schema_bootstrap.disable()
 
 # Inicializar sistema de assinatura e comercialização
 try:
@@ -11597,6 +13426,7 @@ def home():
     return send_from_directory(app.static_folder, 'index.html')
 
 @app.route('/api/status')
+@response_cache.cached(vary_query=False, ttl=3600)
 def api_status():
     """Status da API"""
     return jsonify({
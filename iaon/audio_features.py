@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Extração de características de voz do IAON (NumPy)
+
+Decodifica o áudio (PCM 16 bits, WAV ou base64 de um dos dois), divide em
+quadros de 25 ms com passo de 10 ms e calcula tudo em lote sobre a matriz de
+quadros: FFT com janela de Hann, MFCCs (banco mel + DCT), centroide, rolloff
+e largura espectral, taxa de cruzamentos por zero, energia RMS e pitch por
+autocorrelação. Formantes saem de uma LPC sobre a autocorrelação média dos
+quadros vozeados. As funções de perfil de voz do app montam o JSON a partir
+de analyze_audio().
+"""
+
+import base64
+import binascii
+import io
+import wave
+from functools import lru_cache
+
+import numpy as np
+
+DEFAULT_SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.025
+HOP_SECONDS = 0.010
+N_MELS = 26
+N_MFCC = 13
+ROLLOFF_PERCENT = 0.85
+MIN_PITCH_HZ, MAX_PITCH_HZ = 60.0, 400.0
+VOICING_THRESHOLD = 0.3  # Pico da autocorrelação normalizada para considerar o quadro vozeado
+MAX_PERIODICITY = 0.999  # Limita a relação harmônico/ruído em 30 dB
+PAUSE_MIN_SECONDS = 0.2
+SYLLABLES_PER_WORD = 2.2  # Média aproximada do português falado
+SPEED_OF_SOUND_CM = 34300.0
+
+
+def decode_audio(audio_data, sample_rate=DEFAULT_SAMPLE_RATE):
+    """Converter o áudio recebido em amostras float (-1..1) e taxa de amostragem.
+
+    Aceita bytes (PCM 16 bits mono ou WAV) ou texto base64 (com ou sem prefixo
+    data:audio/...;base64,). WAV truncado ou malformado gera ValueError."""
+    if not audio_data:
+        return np.zeros(0), sample_rate
+    if isinstance(audio_data, str):
+        encoded = audio_data.split(',', 1)[1] if audio_data.startswith('data:') else audio_data
+        encoded = ''.join(encoded.split())
+        try:
+            raw = base64.b64decode(encoded + '=' * (-len(encoded) % 4))
+        except (binascii.Error, ValueError):
+            raw = base64.b64decode(encoded[:len(encoded) // 4 * 4])
+    else:
+        raw = bytes(audio_data)
+
+    if raw[:4] == b'RIFF' and raw[8:12] == b'WAVE':
+        try:
+            with wave.open(io.BytesIO(raw)) as wav:
+                sample_rate = wav.getframerate()
+                channels = wav.getnchannels()
+                width = wav.getsampwidth()
+                frames = wav.readframes(wav.getnframes())
+        except (wave.Error, EOFError) as e:
+            raise ValueError(f'WAV inválido: {e}') from e
+        if width != 2:
+            raise ValueError('Somente WAV PCM de 16 bits é suportado')
+        samples = np.frombuffer(frames, dtype='<i2').astype(np.float64)
+        if channels > 1:
+            samples = samples[:len(samples) // channels * channels].reshape(-1, channels).mean(axis=1)
+    else:
+        samples = np.frombuffer(raw[:len(raw) // 2 * 2], dtype='<i2').astype(np.float64)
+    return samples / 32768.0, sample_rate
+
+
+def frame_signal(samples, frame_length, hop_length):
+    """Matriz (quadros x amostras) sem cópia; completa com zeros até ao menos um quadro"""
+    if len(samples) == 0:
+        return np.zeros((0, frame_length))
+    if len(samples) < frame_length:
+        samples = np.pad(samples, (0, frame_length - len(samples)))
+    count = 1 + (len(samples) - frame_length) // hop_length
+    return np.lib.stride_tricks.sliding_window_view(samples, frame_length)[::hop_length][:count]
+
+
+@lru_cache(maxsize=8)
+def analysis_setup(sample_rate):
+    """Constantes por taxa de amostragem: tamanhos, janela, banco mel e matriz DCT"""
+    frame_length = int(round(FRAME_SECONDS * sample_rate))
+    hop_length = int(round(HOP_SECONDS * sample_rate))
+    n_fft = 1 << (frame_length - 1).bit_length()
+    window = np.hanning(frame_length)
+    frequencies = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    mel_points = np.linspace(hz_to_mel(0.0), hz_to_mel(sample_rate / 2.0), N_MELS + 2)
+    hz_points = 700.0 * (10 ** (mel_points / 2595.0) - 1.0)
+    filterbank = np.zeros((N_MELS, len(frequencies)))
+    for band in range(N_MELS):
+        left, center, right = hz_points[band:band + 3]
+        rising = (frequencies - left) / (center - left)
+        falling = (right - frequencies) / (right - center)
+        filterbank[band] = np.maximum(0.0, np.minimum(rising, falling))
+
+    n = np.arange(N_MELS)
+    dct = np.cos(np.pi / N_MELS * (n[None, :] + 0.5) * np.arange(N_MFCC)[:, None]) * np.sqrt(2.0 / N_MELS)
+    dct[0] /= np.sqrt(2.0)
+    return frame_length, hop_length, n_fft, window, frequencies, filterbank, dct
+
+
+def _levinson(autocorrelation, order):
+    """Coeficientes LPC a partir da autocorrelação (Levinson-Durbin)"""
+    coefficients = np.zeros(order + 1)
+    coefficients[0] = 1.0
+    error = autocorrelation[0]
+    for i in range(1, order + 1):
+        if error <= 0:
+            break
+        reflection = -(autocorrelation[i] + coefficients[1:i] @ autocorrelation[i - 1:0:-1]) / error
+        coefficients[1:i] = coefficients[1:i] + reflection * coefficients[i - 1:0:-1]
+        coefficients[i] = reflection
+        error *= 1.0 - reflection * reflection
+    return coefficients
+
+
+def estimate_formants(voiced_frames, sample_rate, count=4):
+    """Formantes (Hz) pela LPC da autocorrelação média dos quadros vozeados"""
+    if len(voiced_frames) == 0:
+        return []
+    emphasized = np.concatenate([voiced_frames[:, :1], voiced_frames[:, 1:] - 0.97 * voiced_frames[:, :-1]], axis=1)
+    emphasized = emphasized * np.hamming(voiced_frames.shape[1])
+    n_fft = 1 << (2 * voiced_frames.shape[1] - 1).bit_length()
+    order = 2 + sample_rate // 1000
+    autocorrelation = np.fft.irfft(np.abs(np.fft.rfft(emphasized, n_fft)) ** 2, n_fft)[:, :order + 1].mean(axis=0)
+    if autocorrelation[0] <= 0:
+        return []
+    roots = np.roots(_levinson(autocorrelation, order))
+    roots = roots[np.imag(roots) > 0]
+    frequencies = np.angle(roots) * sample_rate / (2 * np.pi)
+    bandwidths = -np.log(np.abs(roots)) * sample_rate / np.pi
+    candidates = np.sort(frequencies[(frequencies > 90) & (bandwidths < 400)])
+    return [float(value) for value in candidates[:count]]
+
+
+def analyze_audio(audio_data, sample_rate=DEFAULT_SAMPLE_RATE):
+    """Análise completa de um trecho de áudio (resumos por trecho + séries por quadro)"""
+    samples, sample_rate = decode_audio(audio_data, sample_rate)
+    frame_length, hop_length, n_fft, window, frequencies, filterbank, dct = analysis_setup(sample_rate)
+    frames = frame_signal(samples, frame_length, hop_length)
+    duration = len(samples) / sample_rate
+    analysis = {'sample_rate': sample_rate, 'duration_seconds': duration, 'frame_count': len(frames)}
+    if len(frames) == 0:
+        analysis['voiced_frames'] = 0
+        return analysis
+
+    # Energia e cruzamentos por zero
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    zcr = np.mean(np.abs(np.diff(np.signbit(frames).astype(np.int8), axis=1)), axis=1)
+
+    # Espectro de potência com janela de Hann
+    spectrum = np.fft.rfft(frames * window, n_fft)
+    power = (np.abs(spectrum) ** 2) / n_fft
+    total = power.sum(axis=1) + 1e-12
+    centroid = (power @ frequencies) / total
+    bandwidth = np.sqrt((power * (frequencies[None, :] - centroid[:, None]) ** 2).sum(axis=1) / total)
+    cumulative = np.cumsum(power, axis=1)
+    rolloff = frequencies[np.argmax(cumulative >= ROLLOFF_PERCENT * cumulative[:, -1:], axis=1)]
+    nasal_band = power[:, (frequencies >= 200) & (frequencies <= 500)].sum(axis=1) / total
+
+    # MFCCs: log do banco mel seguido de DCT-II
+    mfcc = np.log(power @ filterbank.T + 1e-10) @ dct.T
+
+    # Pitch por autocorrelação (via FFT), normalizada pela energia do quadro
+    autocorrelation = np.fft.irfft(np.abs(np.fft.rfft(frames, 2 * n_fft)) ** 2, 2 * n_fft)[:, :frame_length]
+    min_lag = int(sample_rate / MAX_PITCH_HZ)
+    max_lag = min(int(sample_rate / MIN_PITCH_HZ), frame_length - 1)
+    lags = autocorrelation[:, min_lag:max_lag + 1]
+    best_lag = np.argmax(lags, axis=1) + min_lag
+    # Força de vozeamento sem o viés da autocorrelação (que decai com 1 - lag/N)
+    strength = lags.max(axis=1) / (autocorrelation[:, 0] * (1.0 - best_lag / frame_length) + 1e-12)
+    loud = rms > max(1e-4, 0.1 * rms.max())
+    voiced = loud & (strength > VOICING_THRESHOLD)
+    pitch = np.where(voiced, sample_rate / best_lag, np.nan)
+
+    analysis.update({
+        'rms': rms,
+        'zcr': zcr,
+        'spectral_centroid': centroid,
+        'spectral_rolloff': rolloff,
+        'spectral_bandwidth': bandwidth,
+        'nasal_band': nasal_band,
+        'mfcc': mfcc,
+        'pitch': pitch,
+        'voicing_strength': strength,
+        'voiced': voiced,
+        'loud': loud,
+        'voiced_frames': int(voiced.sum()),
+        'hop_seconds': hop_length / sample_rate,
+    })
+
+    # Relação sinal/ruído aproximada: quadros mais fortes x mais fracos (piso de ruído nas
+    # pausas) ou, em fala contínua sem pausas, a relação harmônico/ruído dos quadros vozeados
+    energy_snr = 20 * np.log10((np.percentile(rms, 90) + 1e-9) / (np.percentile(rms, 10) + 1e-9))
+    periodicity = np.clip(strength[voiced].mean(), 0.0, MAX_PERIODICITY) if voiced.any() else 0.0
+    harmonic_snr = 10 * np.log10(periodicity / (1.0 - periodicity)) if periodicity > 0 else 0.0
+    analysis['snr_db'] = float(max(energy_snr, harmonic_snr))
+
+    # Pausas: trechos silenciosos com pelo menos PAUSE_MIN_SECONDS
+    quiet_runs = _runs(~loud)
+    pauses = [length * analysis['hop_seconds'] for length in quiet_runs if length * analysis['hop_seconds'] >= PAUSE_MIN_SECONDS]
+    analysis['pauses'] = pauses
+
+    # Núcleos silábicos: picos do envelope de energia separados por >= 100 ms
+    envelope = np.convolve(rms, np.ones(5) / 5, mode='same') if len(rms) >= 5 else rms
+    threshold = 0.5 * envelope[loud].mean() if loud.any() else np.inf
+    is_peak = (envelope[1:-1] > envelope[:-2]) & (envelope[1:-1] >= envelope[2:]) & (envelope[1:-1] > threshold)
+    peaks = []
+    min_distance = max(1, int(0.1 / analysis['hop_seconds']))
+    for index in np.flatnonzero(is_peak) + 1:
+        if not peaks or index - peaks[-1] >= min_distance:
+            peaks.append(int(index))
+    analysis['syllable_peaks'] = np.array(peaks)
+
+    voiced_frames = frames[voiced]
+    analysis['formants'] = estimate_formants(voiced_frames, sample_rate)
+    return analysis
+
+
+def _runs(mask):
+    """Comprimentos das sequências de True consecutivos"""
+    padded = np.concatenate([[False], mask, [False]]).astype(np.int8)
+    changes = np.flatnonzero(np.diff(padded))
+    return (changes[1::2] - changes[::2]).tolist()
+
+
+def summarize(analysis, text_content=''):
+    """Resumo numérico da análise usado pelos perfis de voz (None onde não há dados)"""
+    summary = {
+        'duration_seconds': analysis['duration_seconds'],
+        'sample_rate': analysis['sample_rate'],
+        'voiced_seconds': analysis.get('voiced_frames', 0) * analysis.get('hop_seconds', 0.0),
+    }
+    if not analysis.get('frame_count'):
+        return summary
+
+    loud = analysis['loud']
+    selection = loud if loud.any() else np.ones_like(loud)
+    pitch = analysis['pitch'][analysis['voiced']]
+    hop = analysis['hop_seconds']
+    summary.update({
+        'snr_db': analysis['snr_db'],
+        'spectral_centroid': float(analysis['spectral_centroid'][selection].mean()),
+        'spectral_rolloff': float(analysis['spectral_rolloff'][selection].mean()),
+        'spectral_bandwidth': float(analysis['spectral_bandwidth'][selection].mean()),
+        'zero_crossing_rate': float(analysis['zcr'][selection].mean()),
+        'mfcc': [float(value) for value in analysis['mfcc'][selection].mean(axis=0)],
+        'formants': analysis['formants'],
+        'pauses': analysis['pauses'],
+        'energy_profile': [float(part.mean()) if part.size else 0.0 for part in np.array_split(analysis['rms'], 4)],
+        'voicing_ratio': float(analysis['voiced'].sum() / max(1, loud.sum())),
+        'breathiness': float(1.0 - np.clip(analysis['voicing_strength'][selection], 0.0, 1.0).mean()),
+        'nasality': float(analysis['nasal_band'][selection].mean()),
+    })
+    peak_energy = max(summary['energy_profile']) or 1.0
+    summary['energy_profile'] = [round(value / peak_energy, 3) for value in summary['energy_profile']]
+
+    if pitch.size:
+        summary['pitch_mean'] = float(pitch.mean())
+        summary['pitch_min'] = float(pitch.min())
+        summary['pitch_max'] = float(pitch.max())
+        summary['pitch_variance'] = float(pitch.std() / pitch.mean())
+        if pitch.size >= 3:
+            times = np.flatnonzero(analysis['voiced']) * hop
+            slope = np.polyfit(times, pitch, 1)[0] / pitch.mean()  # Variação relativa por segundo
+            summary['intonation_pattern'] = 'rising' if slope > 0.05 else 'falling' if slope < -0.05 else 'level'
+        else:
+            summary['intonation_pattern'] = 'level'
+
+    peaks = analysis['syllable_peaks']
+    speaking_seconds = max(hop, loud.sum() * hop)
+    words = len(text_content.split()) if text_content else 0
+    if words and summary['duration_seconds'] > 0:
+        summary['speech_rate'] = float(words / (summary['duration_seconds'] / 60.0))
+    elif len(peaks):
+        summary['speech_rate'] = float(len(peaks) / speaking_seconds * 60.0 / SYLLABLES_PER_WORD)
+    if len(peaks) >= 3:
+        intervals = np.diff(peaks)
+        summary['rhythm_score'] = float(np.clip(1.0 - intervals.std() / intervals.mean(), 0.0, 1.0))
+    else:
+        summary['rhythm_score'] = 0.5
+    return summary
+
+
+def extract_features(audio_data, sample_rate=DEFAULT_SAMPLE_RATE):
+    """Características de um trecho no formato usado na identificação de falantes"""
+    summary = summarize(analyze_audio(audio_data, sample_rate))
+    features = {'audio_quality': audio_quality(summary)}
+    if 'pitch_mean' in summary:
+        features['fundamental_frequency'] = round(summary['pitch_mean'], 2)
+    if summary.get('formants'):
+        features['formants'] = formants_dict(summary['formants'])
+    if 'speech_rate' in summary:
+        features['speech_rate'] = round(summary['speech_rate'], 1)
+    if 'spectral_centroid' in summary:
+        features['spectral_features'] = {
+            'spectral_centroid': round(summary['spectral_centroid'], 1),
+            'spectral_rolloff': round(summary['spectral_rolloff'], 1),
+            'spectral_bandwidth': round(summary['spectral_bandwidth'], 1),
+            'zero_crossing_rate': round(summary['zero_crossing_rate'], 4),
+            'mfcc_coefficients': [round(value, 3) for value in summary['mfcc']]
+        }
+        features['prosodic_features'] = {'rhythm_score': round(summary['rhythm_score'], 3)}
+        if 'intonation_pattern' in summary:
+            features['prosodic_features']['intonation_pattern'] = summary['intonation_pattern']
+    return features
+
+
+def formants_dict(formants):
+    return {f'f{index + 1}': round(value, 1) for index, value in enumerate(formants)}
+
+
+def audio_quality(summary):
+    """Qualidade a partir da SNR aproximada"""
+    snr = summary.get('snr_db')
+    if snr is None:
+        return 'poor'
+    if snr > 30:
+        return 'excellent'
+    if snr > 20:
+        return 'good'
+    if snr > 10:
+        return 'fair'
+    return 'poor'
+
+
+def vocal_tract_length(formants):
+    """Comprimento estimado do trato vocal (cm) pelo modelo de tubo: Fk = (2k-1)c/4L"""
+    if not formants:
+        return None
+    estimates = [(2 * (index + 1) - 1) * SPEED_OF_SOUND_CM / (4 * value) for index, value in enumerate(formants)]
+    return float(np.mean(estimates))
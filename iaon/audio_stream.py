@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ingestão de áudio em fluxo para reuniões do IAON
+
+Pipeline de geradores sobre o corpo bruto da requisição (PCM 16 bits mono,
+little-endian): o stream é lido em blocos fixos, quebrado em quadros de
+duração fixa e agrupado em segmentos de fala por energia (pausa longa ou
+duração máxima fecham o segmento). Nada além do segmento corrente fica em
+memória, então o consumo é o mesmo para 1 minuto ou 3 horas de reunião.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+SUPPORTED_ENCODINGS = ('pcm_s16le',)
+BYTES_PER_SAMPLE = 2
+
+DEFAULT_SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.02  # 20 ms por quadro
+READ_SIZE = 64 * 1024  # Bytes lidos do socket por vez
+SILENCE_RMS = 500.0  # Energia (amplitude RMS int16) abaixo da qual o quadro é pausa
+MIN_SILENCE_SECONDS = 0.6  # Pausa que encerra um segmento de fala
+MIN_SEGMENT_SECONDS = 0.3  # Segmentos menores (cliques, ruído) são descartados
+MAX_SEGMENT_SECONDS = 30.0  # Limite do buffer de um segmento
+
+Segment = namedtuple('Segment', 'start_seconds end_seconds audio')
+
+
+def frame_size_bytes(sample_rate, frame_seconds=FRAME_SECONDS):
+    """Tamanho de um quadro em bytes (sempre múltiplo de uma amostra)"""
+    return max(1, int(sample_rate * frame_seconds)) * BYTES_PER_SAMPLE
+
+
+def iter_frames(stream, frame_bytes, read_size=READ_SIZE):
+    """Ler o stream em blocos e devolver quadros de tamanho fixo (o último pode ser menor)"""
+    pending = bytearray()
+    while True:
+        block = stream.read(read_size)
+        if not block:
+            break
+        pending.extend(block)
+        while len(pending) >= frame_bytes:
+            yield bytes(pending[:frame_bytes])
+            del pending[:frame_bytes]
+    usable = len(pending) - len(pending) % BYTES_PER_SAMPLE
+    if usable:
+        yield bytes(pending[:usable])
+
+
+def tee_frames(frames, sink):
+    """Gravar cada quadro em `sink` (arquivo da gravação) e repassá-lo adiante"""
+    for frame in frames:
+        sink.write(frame)
+        yield frame
+
+
+def frame_rms(frame):
+    """Energia RMS de um quadro PCM int16"""
+    samples = np.frombuffer(frame, dtype='<i2').astype(np.float64)
+    return float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+
+
+def segment_speech(frames, sample_rate, offset_seconds=0.0,
+                   silence_rms=SILENCE_RMS,
+                   min_silence_seconds=MIN_SILENCE_SECONDS,
+                   min_segment_seconds=MIN_SEGMENT_SECONDS,
+                   max_segment_seconds=MAX_SEGMENT_SECONDS):
+    """Agrupar quadros em segmentos de fala (Segment com tempos na linha do tempo da reunião)"""
+    bytes_per_second = sample_rate * BYTES_PER_SAMPLE
+    max_segment_bytes = int(max_segment_seconds * bytes_per_second)
+    position = 0  # Bytes já consumidos nesta requisição
+    buffer = bytearray()
+    segment_start = None
+    silence_bytes = 0
+
+    def close_segment():
+        audio = bytes(buffer[:len(buffer) - silence_bytes])
+        start = offset_seconds + segment_start / bytes_per_second
+        if len(audio) >= min_segment_seconds * bytes_per_second:
+            return Segment(start, start + len(audio) / bytes_per_second, audio)
+        return None
+
+    for frame in frames:
+        voiced = frame_rms(frame) >= silence_rms
+        if segment_start is None:
+            if voiced:
+                segment_start = position
+                buffer.extend(frame)
+                silence_bytes = 0
+        else:
+            buffer.extend(frame)
+            silence_bytes = 0 if voiced else silence_bytes + len(frame)
+            if silence_bytes >= min_silence_seconds * bytes_per_second or len(buffer) >= max_segment_bytes:
+                segment = close_segment()
+                if segment:
+                    yield segment
+                buffer.clear()
+                segment_start = None
+                silence_bytes = 0
+        position += len(frame)
+
+    if segment_start is not None:
+        segment = close_segment()
+        if segment:
+            yield segment
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arquivos de backup do IAON (NDJSON comprimido, opcionalmente criptografado)
+
+Formato: um único fluxo gzip de linhas JSON, gravado em uma passada:
+    {"format": "iaon-backup", "version": 1, ...}      cabeçalho
+    {"table": "contacts", "row": {...}}                 uma linha por registro
+    {"footer": true, "counts": {...}, "records": N}    rodapé (arquivo completo)
+
+Um tar precisaria do tamanho de cada membro antes do conteúdo, o que obriga
+a gravar cada tabela em disco primeiro; o fluxo único mantém a memória e o
+disco constantes independentemente do volume do usuário.
+
+Com chave, o gzip é cifrado em fluxo com AES-256-GCM (pacote opcional
+`cryptography`): b'IAONENC1' + nonce (12 bytes) + texto cifrado + tag (16 bytes).
+
+A tag, o CRC do gzip e o rodapé só são conferidos no fim do fluxo, então uma
+restauração lê o arquivo inteiro uma vez (verify_archive) antes de gravar a
+primeira linha.
+"""
+
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import zlib
+from datetime import date, datetime, time
+
+FORMAT = 'iaon-backup'
+VERSION = 1
+MAGIC = b'IAONENC1'
+NONCE_SIZE = 12
+TAG_SIZE = 16
+READ_CHUNK = 1 << 16
+
+
+def load_key(value):
+    """Chave AES-256 a partir de base64 (32 bytes) ou None quando vazia"""
+    if not value:
+        return None
+    key = base64.b64decode(value)
+    if len(key) != 32:
+        raise ValueError('Chave de backup deve ter 32 bytes (base64)')
+    return key
+
+
+def _aes_gcm():
+    try:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    except ImportError as e:
+        raise RuntimeError('Backup criptografado requer o pacote cryptography (pip install cryptography)') from e
+    return Cipher, algorithms, modes
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError(f'Tipo não serializável no backup: {type(value).__name__}')
+
+
+class _CountingWriter(io.RawIOBase):
+    """Repassa bytes ao arquivo contando o tamanho e o SHA-256 do que foi gravado"""
+
+    def __init__(self, target):
+        self.target = target
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.target.write(data)
+        self.size += len(data)
+        self.sha256.update(data)
+        return len(data)
+
+
+class _EncryptingWriter(io.RawIOBase):
+    """AES-256-GCM em fluxo: cifra cada bloco recebido e grava a tag no fechamento"""
+
+    def __init__(self, target, key):
+        Cipher, algorithms, modes = _aes_gcm()
+        nonce = os.urandom(NONCE_SIZE)
+        self.target = target
+        self.encryptor = Cipher(algorithms.AES(key), modes.GCM(nonce)).encryptor()
+        target.write(MAGIC + nonce)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.target.write(self.encryptor.update(bytes(data)))
+        return len(data)
+
+    def finish(self):
+        self.target.write(self.encryptor.finalize() + self.encryptor.tag)
+
+
+class ArchiveWriter:
+    """Gravar um arquivo de backup registro a registro"""
+
+    def __init__(self, path, header, key=None, compresslevel=6):
+        self.path = path
+        self.key = key
+        self.counts = {}
+        self.raw_bytes = 0
+        self._file = open(path, 'wb')
+        self._output = _CountingWriter(self._file)
+        self._encrypting = _EncryptingWriter(self._output, key) if key else None
+        self._gzip = gzip.GzipFile(fileobj=self._encrypting or self._output, mode='wb', compresslevel=compresslevel)
+        self._line(dict(header, format=FORMAT, version=VERSION, encrypted=bool(key)))
+
+    def _line(self, payload):
+        data = json.dumps(payload, ensure_ascii=False, default=_json_default, separators=(',', ':')).encode('utf-8') + b'\n'
+        self._gzip.write(data)
+        self.raw_bytes += len(data)
+
+    def write(self, table, row):
+        self._line({'table': table, 'row': row})
+        self.counts[table] = self.counts.get(table, 0) + 1
+
+    def close(self):
+        """Gravar o rodapé e fechar; retorna tamanhos e checksum do arquivo final"""
+        self._line({'footer': True, 'counts': self.counts, 'records': sum(self.counts.values())})
+        self._gzip.close()
+        if self._encrypting:
+            self._encrypting.finish()
+        self._file.close()
+        return {
+            'records': sum(self.counts.values()),
+            'counts': dict(self.counts),
+            'raw_bytes': self.raw_bytes,
+            'file_bytes': self._output.size,
+            'sha256': self._output.sha256.hexdigest()
+        }
+
+    def abort(self):
+        """Descartar um arquivo incompleto"""
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.abort()
+
+
+class _DecryptingReader(io.RawIOBase):
+    """Leitura em fluxo de um arquivo AES-256-GCM (a tag é verificada no fim)"""
+
+    def __init__(self, source, key):
+        Cipher, algorithms, modes = _aes_gcm()
+        header = source.read(len(MAGIC) + NONCE_SIZE)
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError('Arquivo de backup não está criptografado com o formato do IAON')
+        self.source = source
+        self.remaining = os.fstat(source.fileno()).st_size - len(header) - TAG_SIZE
+        if self.remaining < 0:
+            raise ValueError('Arquivo de backup criptografado truncado')
+        self.decryptor = Cipher(algorithms.AES(key), modes.GCM(header[len(MAGIC):])).decryptor()
+        self._buffer = b''
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer and not self._done:
+            chunk = self.source.read(min(READ_CHUNK, self.remaining))
+            self.remaining -= len(chunk)
+            self._buffer = self.decryptor.update(chunk)
+            if self.remaining <= 0:
+                tag = self.source.read(TAG_SIZE)
+                try:
+                    self._buffer += self.decryptor.finalize_with_tag(tag)
+                except Exception as e:  # InvalidTag: arquivo adulterado ou truncado
+                    raise ValueError('Backup criptografado adulterado ou corrompido (tag inválida)') from e
+                self._done = True
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class ArchiveReader:
+    """Ler um arquivo de backup em fluxo: `header`, depois (tabela, linha) na iteração e `footer` no fim"""
+
+    def __init__(self, path, key=None):
+        self._file = open(path, 'rb')
+        try:
+            if self._file.read(len(MAGIC)) == MAGIC:
+                if key is None:
+                    raise ValueError('Backup criptografado: chave necessária')
+                self._file.seek(0)
+                raw = io.BufferedReader(_DecryptingReader(self._file, key), READ_CHUNK)
+            else:
+                self._file.seek(0)
+                raw = self._file
+            self._lines = gzip.GzipFile(fileobj=raw, mode='rb')
+            self.header = json.loads(self._lines.readline())
+        except Exception:
+            self._file.close()
+            raise
+        if self.header.get('format') != FORMAT:
+            self.close()
+            raise ValueError('Arquivo não é um backup do IAON')
+        if self.header.get('version', 0) > VERSION:
+            self.close()
+            raise ValueError(f"Versão de backup não suportada: {self.header.get('version')}")
+        self.footer = None
+
+    def __iter__(self):
+        for line in self._lines:
+            record = json.loads(line)
+            if record.get('footer'):
+                # Ler até o fim do fluxo confere o CRC do gzip e a tag AES-GCM
+                if self._lines.read():
+                    raise ValueError('Backup com dados depois do rodapé')
+                self.footer = record
+                return
+            yield record['table'], record['row']
+        raise ValueError('Backup incompleto (sem rodapé)')
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+def verify_archive(path, key=None):
+    """Ler o arquivo inteiro sem gravar nada (tag, CRC, rodapé e contagens); retorna o rodapé.
+
+    ValueError se o arquivo estiver truncado, corrompido ou adulterado.
+    """
+    counts = {}
+    with ArchiveReader(path, key=key) as archive:
+        try:
+            for table, _ in archive:
+                counts[table] = counts.get(table, 0) + 1
+        except (EOFError, OSError, zlib.error) as e:
+            raise ValueError(f'Backup truncado ou corrompido: {e}') from e
+        if archive.footer.get('counts') != counts:
+            raise ValueError('Backup inconsistente: contagens do rodapé não conferem com as linhas')
+        return archive.footer
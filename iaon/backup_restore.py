@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Restauração de arquivos de backup do IAON
+
+Lê um arquivo de backup_archive em fluxo e grava as linhas nas tabelas em
+lotes de tamanho fixo (executemany / INSERT de várias linhas), com memória
+constante independentemente do volume do usuário:
+- cada linha é validada e convertida pelos tipos das colunas; linhas
+  inválidas são rejeitadas e contadas sem interromper a restauração
+- os ids do arquivo não são reaproveitados: as linhas ganham ids novos e as
+  chaves estrangeiras para tabelas restauradas são traduzidas pelo mapa de ids
+  (o usuário dono passa a ser o usuário de destino)
+- cada tabela tem uma chave natural (ex.: user_id + phone_number nos
+  contatos); linhas que já existem são atualizadas em vez de duplicadas, então
+  restaurar o mesmo arquivo de novo não muda nada. Linhas repetidas no arquivo
+  casam uma a uma com as existentes (duas compras iguais continuam duas)
+
+As tabelas são gravadas na ordem do arquivo (pais antes dos filhos). Só as
+tabelas referenciadas por outras pedem os ids gerados (INSERT ... RETURNING);
+as demais vão em executemany puro.
+"""
+
+import base64
+from datetime import date, datetime, time
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, LargeBinary, String, Time, UniqueConstraint
+from sqlalchemy import and_, bindparam, func, insert, or_, select
+
+from db_upsert import upsert_statement
+
+MAX_ERRORS = 20  # Mensagens de rejeição guardadas no resultado
+
+
+class RestoreTable:
+    """Tabela do arquivo registrada para restauração"""
+
+    __slots__ = ('name', 'model', 'table', 'key', 'columns', 'plan')
+
+    def __init__(self, name, model, key, columns=None):
+        self.name = name
+        self.model = model
+        self.table = model.__table__
+        self.key = tuple(key)
+        # Colunas gravadas a partir do arquivo (as outras ficam com o padrão em linhas novas)
+        self.columns = [column for column in self.table.columns
+                        if not column.primary_key and (columns is None or column.name in columns)]
+        # Por coluna, calculado uma vez: (coluna, vem do arquivo?, conversor, tabelas referenciadas)
+        written = {column.name for column in self.columns}
+        self.plan = [
+            (column, column.name in written, _converter(column),
+             # user_id sem chave estrangeira (contadores) também é o dono da linha
+             [fk.column.table.name for fk in column.foreign_keys] or (['users'] if column.name == 'user_id' else []))
+            for column in self.table.columns if not column.primary_key
+        ]
+
+    def unique_key(self):
+        """A chave natural é garantida por um índice único? (permite ON CONFLICT)"""
+        key = set(self.key)
+        constraints = [index.columns for index in self.table.indexes if index.unique]
+        constraints += [constraint.columns for constraint in self.table.constraints
+                        if isinstance(constraint, UniqueConstraint)]
+        return any({column.name for column in columns} == key for columns in constraints)
+
+
+class BackupRestorer:
+    """Tabelas restauráveis e suas chaves naturais; `restore()` executa uma restauração"""
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.tables = {}
+
+    def table(self, name, model, key, columns=None):
+        """Registrar a tabela `name` do arquivo; `key` identifica a linha e `columns` limita o que é restaurado"""
+        self.tables[name] = RestoreTable(name, model, key, columns)
+
+    def restore(self, session, reader, user_id, on_batch=None):
+        """Gravar as linhas de `reader` (ArchiveReader) para `user_id`.
+
+        `on_batch(model, inserted_rows, stats)` é chamado na transação de cada
+        lote gravado (para somar agregados e registrar progresso).
+        """
+        return _RestoreRun(self, session, reader.header, user_id, on_batch).run(reader)
+
+
+def _integer(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+        raise ValueError(f'inteiro inválido: {value!r}')
+    return int(value)
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f'número inválido: {value!r}')
+    return float(value)
+
+
+def _boolean(value):
+    if not isinstance(value, (bool, int)) or value not in (0, 1):
+        raise ValueError(f'booleano inválido: {value!r}')
+    return bool(value)
+
+
+def _text(length):
+    def convert(value):
+        if not isinstance(value, str):
+            raise ValueError(f'texto inválido: {value!r}')
+        if length and len(value) > length:
+            raise ValueError(f'texto com mais de {length} caracteres')
+        return value
+    return convert
+
+
+def _converter(column):
+    """Conversor do valor do JSON para o tipo da coluna (ValueError/TypeError se inválido)"""
+    kind = column.type
+    if isinstance(kind, DateTime):
+        return datetime.fromisoformat
+    if isinstance(kind, Date):
+        return date.fromisoformat
+    if isinstance(kind, Time):
+        return time.fromisoformat
+    if isinstance(kind, Boolean):
+        return _boolean
+    if isinstance(kind, Integer):
+        return _integer
+    if isinstance(kind, Float):
+        return _number
+    if isinstance(kind, String):
+        return _text(kind.length)
+    if isinstance(kind, LargeBinary):
+        return base64.b64decode
+    return lambda value: value
+
+
+def _default(column):
+    default = column.default
+    if default is None:
+        return None
+    if default.is_scalar:
+        return default.arg
+    if default.is_callable:
+        return default.arg(None)
+    return None
+
+
+class _RestoreRun:
+    """Estado de uma restauração: mapas de ids, lote atual e contadores"""
+
+    def __init__(self, restorer, session, header, user_id, on_batch):
+        self.restorer = restorer
+        self.session = session
+        self.user_id = user_id
+        self.source_user_id = header.get('user_id')
+        self.on_batch = on_batch
+        self.specs = {spec.table.name: spec for spec in restorer.tables.values()}
+        self.referenced = {fk.column.table.name for spec in restorer.tables.values()
+                           for fk in spec.table.foreign_keys}
+        self.ids = {}  # tabela -> {id no arquivo: id restaurado}
+        self.stats = {'processed': 0, 'inserted': 0, 'updated': 0, 'rejected': 0, 'table': None,
+                      'tables': {}, 'errors': []}
+
+    # ---------- leitura ----------
+
+    def run(self, reader):
+        current, spec, batch = None, None, []
+        for name, row in reader:
+            self.stats['processed'] += 1
+            if name != current:
+                self._flush(spec, batch)
+                self._finish(spec)
+                current, spec, batch = name, self.restorer.tables.get(name), []
+                self._start(name, spec)
+            if spec is None:
+                self._reject(name, row, 'tabela desconhecida')
+                continue
+            item = self._convert(spec, row)
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.restorer.batch_size:
+                self._flush(spec, batch)
+                batch = []
+        self._flush(spec, batch)
+        self._finish(spec)
+        return self.stats
+
+    def _start(self, name, spec):
+        self.stats['table'] = name
+        self.stats['tables'].setdefault(name, {'inserted': 0, 'updated': 0, 'rejected': 0})
+        self.pending_parents = []  # Autorreferências resolvidas no fim da tabela
+        self.claimed = set()  # Linhas existentes já casadas com uma linha do arquivo
+        self.floor = 0
+        if spec is not None:
+            self.ids.setdefault(spec.table.name, {})
+            # Linhas gravadas por esta restauração têm id acima deste; não casam com as seguintes
+            self.floor = self.session.execute(select(func.max(spec.table.c.id))).scalar() or 0
+
+    def _reject(self, name, row, reason):
+        self.stats['rejected'] += 1
+        self.stats['tables'][name]['rejected'] += 1
+        if len(self.stats['errors']) < MAX_ERRORS:
+            row_id = row.get('id') if isinstance(row, dict) else None
+            self.stats['errors'].append(f'{name} (id {row_id}): {reason}')
+
+    def _convert(self, spec, row):
+        """(id no arquivo, valores para INSERT, colunas gravadas) ou None se a linha for rejeitada"""
+        if not isinstance(row, dict):
+            self._reject(spec.name, {}, 'linha não é um objeto')
+            return None
+        values = {}
+        parents = []
+        for column, written, convert, targets in spec.plan:
+            value = row.get(column.name) if written else None
+            if value is None:
+                value = _default(column)
+            else:
+                try:
+                    value = convert(value)
+                except (TypeError, ValueError) as e:
+                    self._reject(spec.name, row, f'{column.name}: {e}')
+                    return None
+            for target in targets:
+                if value is None:
+                    break
+                if target == 'users':
+                    # Dono da linha (ou referência a ele) passa a ser o usuário de destino
+                    value = self.user_id if value == self.source_user_id else None
+                elif target == spec.table.name and value not in self.ids[target]:
+                    parents.append((column.name, value))  # Pai da mesma tabela ainda não gravado
+                    value = None
+                elif target in self.specs:
+                    value = self.ids.get(target, {}).get(value)
+                else:
+                    value = None  # Tabela fora do backup: a referência não vale no destino
+            if value is None and not column.nullable:
+                self._reject(spec.name, row, f'{column.name} obrigatório ausente ou sem referência')
+                return None
+            values[column.name] = value
+        return row.get('id'), values, parents
+
+    # ---------- gravação ----------
+
+    def _existing(self, spec, keys):
+        """Linhas já gravadas com as chaves do lote: {chave: [ids em ordem]}"""
+        table = spec.table
+        conditions = [table.c.id <= self.floor]
+        for position, name in enumerate(spec.key[:2]):
+            values = {key[position] for key in keys}
+            condition = table.c[name].in_([value for value in values if value is not None])
+            conditions.append(or_(condition, table.c[name].is_(None)) if None in values else condition)
+        existing = {}
+        statement = select(table.c.id, *[table.c[name] for name in spec.key]).where(and_(*conditions))
+        for row_id, *key in self.session.execute(statement.order_by(table.c.id)):
+            if row_id not in self.claimed:
+                existing.setdefault(tuple(key), []).append(row_id)
+        return existing
+
+    def _flush(self, spec, batch):
+        if spec is None or not batch:
+            return
+        table = spec.table
+        ids = self.ids[table.name]
+        keys = [tuple(values[name] for name in spec.key) for _, values, _ in batch]
+        existing = self._existing(spec, keys)
+        updates, inserts = [], []
+        for (source_id, values, parents), key in zip(batch, keys):
+            matches = existing.get(key)
+            if matches:
+                row_id = matches.pop(0)
+                self.claimed.add(row_id)
+                ids[source_id] = row_id
+                updates.append(dict({f'v_{column.name}': values[column.name] for column in spec.columns}, v_id=row_id))
+                self.pending_parents.extend((row_id, name, parent) for name, parent in parents)
+            else:
+                inserts.append((source_id, values, parents))
+
+        if updates:
+            self.session.execute(
+                table.update().where(table.c.id == bindparam('v_id'))
+                .values({column.name: bindparam(f'v_{column.name}') for column in spec.columns}),
+                updates
+            )
+        if inserts:
+            rows = [values for _, values, _ in inserts]
+            if table.name in self.referenced:
+                # Ids novos na ordem do lote (lote único no PostgreSQL; linha a linha no SQLite)
+                result = self.session.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), rows)
+                for (source_id, _, parents), (row_id,) in zip(inserts, result):
+                    ids[source_id] = row_id
+                    self.pending_parents.extend((row_id, name, parent) for name, parent in parents)
+            else:
+                self.session.execute(self._insert_statement(spec), rows)
+
+        counts = self.stats['tables'][spec.name]
+        counts['inserted'] += len(inserts)
+        counts['updated'] += len(updates)
+        self.stats['inserted'] += len(inserts)
+        self.stats['updated'] += len(updates)
+        if self.on_batch:
+            self.on_batch(spec.model, [values for _, values, _ in inserts], self.stats)
+
+    def _insert_statement(self, spec):
+        """INSERT em lote; com índice único na chave natural vira upsert (ON CONFLICT)"""
+        statement = None
+        if spec.unique_key():
+            statement = upsert_statement(self.session, spec.table, spec.key,
+                                         replaced=[column.name for column in spec.columns if column.name not in spec.key])
+        return statement if statement is not None else insert(spec.table)
+
+    def _finish(self, spec):
+        """Ligar autorreferências (ex.: evento recorrente -> evento pai) depois da tabela inteira"""
+        if spec is None or not self.pending_parents:
+            return
+        ids = self.ids[spec.table.name]
+        updates = {}
+        for row_id, name, parent in self.pending_parents:
+            if parent in ids:
+                updates.setdefault(name, []).append({'v_id': row_id, 'v_parent': ids[parent]})
+        table = spec.table
+        for name, rows in updates.items():
+            self.session.execute(
+                table.update().where(table.c.id == bindparam('v_id')).values({name: bindparam('v_parent')}), rows)
+        self.pending_parents = []
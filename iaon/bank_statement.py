@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Leitura em fluxo de extratos bancários (OFX e CSV) do IAON
+
+Os extratos são lidos do stream em blocos (o corpo da requisição ou o arquivo
+enviado), decodificados de forma incremental e devolvidos linha a linha de
+extrato por geradores; nada além do bloco corrente fica em memória, então um
+ano de extrato custa o mesmo que um mês.
+
+Cada lançamento vira um dicionário com transaction_date, amount (com sinal:
+crédito positivo, débito negativo), description, reference_number e, no
+CSV, category quando o banco exporta a coluna. Lançamentos que não podem ser
+lidos são devolvidos como {'line': n, 'error': motivo} para o relatório da
+importação, sem interromper o resto do arquivo.
+
+- OFX 1.x (SGML, sem tags de fechamento nos campos) e 2.x (XML): blocos
+  <STMTTRN> com DTPOSTED, TRNAMT, NAME/MEMO e FITID
+- CSV: separador detectado (vírgula, ponto e vírgula ou tab), colunas
+  reconhecidas pelo cabeçalho em português ou inglês, valor em uma coluna
+  (com sinal ou com coluna de tipo C/D) ou em colunas de crédito e débito
+"""
+
+import codecs
+import csv
+import hashlib
+import re
+from datetime import datetime
+
+from text_search import fold_accents
+
+READ_SIZE = 64 * 1024  # Bytes lidos do stream por vez
+FORMATS = ('ofx', 'csv')
+
+_OFX_TOKEN = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+_DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%y', '%Y/%m/%d', '%d.%m.%Y')
+
+# Cabeçalhos do CSV (sem acentos, minúsculos) -> campo; o primeiro que casar vale
+CSV_COLUMNS = (
+    ('transaction_date', ('data', 'date', 'dt')),
+    ('credit', ('credito', 'entrada', 'credit')),
+    ('debit', ('debito', 'saida', 'debit')),
+    ('amount', ('valor', 'amount', 'quantia', 'montante')),
+    ('kind', ('tipo', 'type', 'natureza', 'd/c', 'c/d')),
+    ('category', ('categoria', 'category')),
+    ('reference_number', ('documento', 'referencia', 'fitid', 'id', 'numero', 'reference')),
+    ('description', ('descricao', 'historico', 'description', 'memo', 'lancamento', 'estabelecimento', 'detalhes')),
+)
+
+
+def detect_format(filename=None, head=b''):
+    """'ofx' ou 'csv' pela extensão do arquivo ou pelo começo do conteúdo"""
+    extension = (filename or '').rsplit('.', 1)[-1].lower() if filename and '.' in filename else ''
+    if extension in FORMATS:
+        return extension
+    start = head.lstrip()[:512].upper()
+    if start.startswith(b'OFXHEADER') or b'<OFX>' in start or start.startswith(b'<?XML') and b'OFX' in start:
+        return 'ofx'
+    return 'csv'
+
+
+def detect_encoding(head):
+    """Codificação pelo BOM ou cabeçalho OFX/XML; sem indicação, UTF-8 se o começo for válido, senão cp1252"""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    declared = re.search(rb'CHARSET:\s*(\d+)|encoding=["\']([A-Za-z0-9_-]+)', head[:1024])
+    if declared and declared.group(1):
+        return 'cp' + declared.group(1).decode('ascii')
+    if declared and declared.group(2):
+        try:
+            return codecs.lookup(declared.group(2).decode('ascii')).name
+        except LookupError:
+            pass
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        if e.start < len(head) - 3:  # Não é só um caractere cortado no fim do bloco
+            return 'cp1252'
+    return 'utf-8'
+
+
+def iter_text(stream, encoding=None, read_size=READ_SIZE, head=b''):
+    """Blocos de texto decodificados do stream (`head`: bytes já lidos para detectar formato)"""
+    first = head or stream.read(read_size)
+    decoder = codecs.getincrementaldecoder(encoding or detect_encoding(first))(errors='replace')
+    block = first
+    while block:
+        text = decoder.decode(block)
+        if text:
+            yield text
+        block = stream.read(read_size)
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_lines(chunks):
+    """Linhas (com o fim de linha) a partir de blocos de texto"""
+    pending = ''
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        yield from lines
+    if pending:
+        yield pending
+
+
+def parse_amount(text):
+    """Valor monetário em formato brasileiro ou internacional: '-1.234,56', '1,234.56', '(45,90)', 'R$ 10'"""
+    value = (text or '').strip().replace('R$', '').replace('\xa0', '').replace(' ', '')
+    negative = value.startswith('(') and value.endswith(')') or value.endswith('-')
+    value = value.strip('()').rstrip('-').rstrip('+')
+    if ',' in value and '.' in value:
+        decimal = ',' if value.rfind(',') > value.rfind('.') else '.'
+    elif ',' in value:
+        decimal = ',' if re.search(r',\d{1,2}$', value) else None
+    else:
+        decimal = '.' if value.count('.') == 1 else None
+    thousands = {',': '.', '.': ','}.get(decimal)
+    if thousands:
+        value = value.replace(thousands, '')
+    else:
+        value = value.replace(',', '').replace('.', '')
+    if decimal:
+        value = value.replace(decimal, '.')
+    amount = float(value)
+    return -abs(amount) if negative else amount
+
+
+def parse_date(text):
+    """Data de um extrato: ISO, dd/mm/aaaa e variações, ou AAAAMMDD[HHMMSS] do OFX"""
+    value = (text or '').strip()
+    digits = re.match(r'(\d{8})(\d{6})?', value)
+    if digits:
+        return datetime.strptime(digits.group(1) + (digits.group(2) or '120000'), '%Y%m%d%H%M%S')
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value.split(' ')[0], date_format).replace(hour=12)
+        except ValueError:
+            continue
+    raise ValueError(f'data inválida: {value!r}')
+
+
+def normalize_description(description):
+    """Descrição comparável: minúsculas, sem acentos e com espaços únicos"""
+    return ' '.join(fold_accents(description or '').split())
+
+
+def dedupe_key(account_id, when, amount, description):
+    """Hash de (conta, dia, valor com sinal, descrição normalizada) para achar lançamentos repetidos"""
+    raw = f'{account_id}|{when.date().isoformat()}|{round(amount, 2):.2f}|{normalize_description(description)}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def parse_ofx(chunks):
+    """Lançamentos <STMTTRN> de um OFX, a partir de blocos de texto"""
+    state = {'fields': None, 'number': 0}
+    pending = ''
+    for chunk in chunks:
+        pending += chunk
+        # O valor de um campo vai até o próximo '<': só os campos antes do último estão completos
+        cut = pending.rfind('<')
+        if cut > 0:
+            yield from _ofx_tokens(pending[:cut], state)
+            pending = pending[cut:]
+    yield from _ofx_tokens(pending, state)
+    if state['fields']:  # Arquivo terminou dentro de um lançamento
+        yield _ofx_row(state['fields'], state['number'] + 1)
+
+
+def _ofx_tokens(text, state):
+    for closing, tag, value in _OFX_TOKEN.findall(text):
+        tag = tag.upper()
+        if tag == 'STMTTRN':
+            if state['fields'] is not None:  # Fechamento (ou bloco anterior sem fechamento)
+                state['number'] += 1
+                yield _ofx_row(state['fields'], state['number'])
+            state['fields'] = None if closing else {}
+        elif state['fields'] is not None and not closing:
+            state['fields'][tag] = value.strip()
+
+
+def _ofx_row(fields, number):
+    try:
+        amount = parse_amount(fields['TRNAMT'])
+        if fields.get('TRNTYPE', '').upper() == 'DEBIT' and amount > 0:
+            amount = -amount  # Bancos que exportam o débito sem sinal
+        description = ' '.join(dict.fromkeys(part for part in (fields.get('NAME'), fields.get('MEMO')) if part))
+        return {
+            'line': number,
+            'transaction_date': parse_date(fields['DTPOSTED']),
+            'amount': amount,
+            'description': description[:300] or fields.get('TRNTYPE', 'Lançamento'),
+            'reference_number': fields.get('FITID') or fields.get('CHECKNUM') or None
+        }
+    except (KeyError, ValueError) as e:
+        return {'line': number, 'error': f'lançamento {number}: {e}'}
+
+
+def _csv_columns(header):
+    """Índice de cada campo reconhecido no cabeçalho"""
+    names = [normalize_description(name) for name in header]
+    columns = {}
+    for field, aliases in CSV_COLUMNS:
+        for index, name in enumerate(names):
+            if index in columns.values():
+                continue
+            if any(name == alias or name.startswith(alias + ' ') or name.endswith(' ' + alias) for alias in aliases):
+                columns[field] = index
+                break
+    return columns
+
+
+def parse_csv(chunks, delimiter=None):
+    """Lançamentos de um CSV com cabeçalho, a partir de blocos de texto"""
+    lines = iter_lines(chunks)
+    first = next(lines, '')
+    while first and not first.strip():
+        first = next(lines, '')
+    if not first:
+        return
+    if delimiter is None:
+        delimiter = max((';', ',', '\t'), key=first.count)
+    header = next(csv.reader([first], delimiter=delimiter))
+    columns = _csv_columns(header)
+    if 'transaction_date' not in columns or not ({'amount', 'credit', 'debit'} & columns.keys()):
+        yield {'line': 1, 'error': 'cabeçalho sem colunas de data e valor: ' + ', '.join(header)}
+        return
+    for number, values in enumerate(csv.reader(lines, delimiter=delimiter), start=2):
+        if not any(value.strip() for value in values):
+            continue
+        yield _csv_row(values, columns, number)
+
+
+def _csv_row(values, columns, number):
+    get = lambda field: values[columns[field]].strip() if field in columns and columns[field] < len(values) else ''
+    try:
+        if get('amount'):
+            amount = parse_amount(get('amount'))
+            kind = fold_accents(get('kind'))[:1]
+            if kind in ('d', 's') and amount > 0:  # Débito / saída com valor sem sinal
+                amount = -amount
+        else:
+            amount = (parse_amount(get('credit')) if get('credit') else 0.0) - \
+                (abs(parse_amount(get('debit'))) if get('debit') else 0.0)
+        return {
+            'line': number,
+            'transaction_date': parse_date(get('transaction_date')),
+            'amount': amount,
+            'description': get('description')[:300] or 'Lançamento importado',
+            'reference_number': get('reference_number') or None,
+            'category': get('category') or None
+        }
+    except ValueError as e:
+        return {'line': number, 'error': f'linha {number}: {e}'}
+
+
+def parse_statement(stream, statement_format=None, filename=None, encoding=None, delimiter=None):
+    """Lançamentos de um extrato OFX ou CSV lido em fluxo de `stream` (arquivo binário)"""
+    if encoding:
+        codecs.lookup(encoding)  # LookupError já aqui, não no meio da leitura
+    head = stream.read(READ_SIZE)
+    statement_format = statement_format or detect_format(filename, head)
+    if statement_format not in FORMATS:
+        raise ValueError(f'Formato "{statement_format}" não suportado')
+    chunks = iter_text(stream, encoding, head=head)
+    if statement_format == 'ofx':
+        return parse_ofx(chunks)
+    return parse_csv(chunks, delimiter)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos dashboards administrativos
+
+Grava N usuários (mais assinaturas, reuniões e sessões de coaching
+proporcionais) em um banco temporário, calcula os agregados uma vez pela
+reconciliação e mede:
+- /api/admin/dashboard e /api/admin/users/analytics lendo os agregados
+- as mesmas consultas que os dashboards faziam antes, sobre as tabelas inteiras
+- uma rodada completa de reconciliação
+
+Uso: python benchmark_admin_dashboard.py [usuários]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Banco temporário: o benchmark grava milhões de linhas
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='iaon-bench-'), 'bench.db')}")
+os.environ.setdefault('IAON_JOB_WORKERS', '0')
+os.environ.setdefault('IAON_NOTIFICATION_SCHEDULER', '0')
+
+from app import (app, db, Coach, CoachingSession, DiscountCoupon, MeetingSession, SubscriptionPlan, User,
+                 UserSubscription, reconcile_metric_rollups)
+
+BATCH = 50000
+
+
+def _insert(model, rows):
+    for start in range(0, len(rows), BATCH):
+        db.session.execute(model.__table__.insert(), rows[start:start + BATCH])
+
+
+def seed(size, seed=11):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    plan_ids = [plan.id for plan in SubscriptionPlan.query.all()]
+    coach_ids = [coach.id for coach in Coach.query.all()]
+
+    def moment(days):
+        return now - timedelta(seconds=rng.uniform(0, days * 86400))
+
+    _insert(User, [{'username': f'bench{n}', 'email': f'bench{n}@iaon.app', 'is_active': rng.random() > 0.05,
+                    'created_at': moment(730), 'last_activity': moment(60)} for n in range(size)])
+    _insert(UserSubscription, [{'user_id': rng.randint(1, size), 'plan_id': rng.choice(plan_ids),
+                                'status': rng.choice(['active', 'active', 'trial', 'cancelled', 'expired']),
+                                'billing_cycle': rng.choice(['monthly', 'yearly']),
+                                'next_billing_amount': rng.choice([29.9, 79.9, 149.9, 299.9]),
+                                'started_at': moment(730)} for _ in range(size // 4)])
+    _insert(MeetingSession, [{'user_id': rng.randint(1, size), 'title': 'Reunião', 'created_at': moment(365)}
+                             for _ in range(size // 2)])
+    _insert(CoachingSession, [{'user_id': rng.randint(1, size), 'coach_id': rng.choice(coach_ids),
+                               'created_at': moment(365)} for _ in range(size // 10)])
+    db.session.commit()
+
+
+def legacy_dashboard():
+    """Consultas que admin_dashboard() e user_analytics() faziam a cada carregamento"""
+    User.query.filter_by(is_active=True).count()
+    MeetingSession.query.count()
+    UserSubscription.query.filter_by(status='active').count()
+    db.session.query(db.func.sum(UserSubscription.next_billing_amount)).scalar()
+    db.session.query(SubscriptionPlan.display_name, db.func.count(UserSubscription.id))\
+        .join(UserSubscription).group_by(SubscriptionPlan.id).all()
+    db.session.query(DiscountCoupon.code).order_by(DiscountCoupon.current_uses.desc()).limit(5).all()
+    db.session.query(Coach.name, db.func.count(CoachingSession.id).label('sessions'))\
+        .join(CoachingSession).group_by(Coach.id).order_by(db.text('sessions DESC')).limit(5).all()
+    User.query.filter(User.created_at >= datetime.utcnow() - timedelta(days=30)).count()
+    UserSubscription.query.filter_by(status='cancelled').count()
+    User.query.filter(User.last_activity >= datetime.utcnow() - timedelta(days=7)).count()
+
+
+def _median_ms(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run_benchmark(size=1000000, repeat=20):
+    with app.app_context():
+        db.create_all()
+        seed(size)
+        start = time.perf_counter()
+        reconcile_metric_rollups()
+        reconcile_seconds = time.perf_counter() - start
+
+        client = app.test_client()
+
+        def rollup_dashboards():
+            client.get('/api/admin/dashboard')
+            client.get('/api/admin/users/analytics')
+
+        return {
+            'users': size,
+            'rollup_ms': _median_ms(rollup_dashboards, repeat),
+            'legacy_ms': _median_ms(legacy_dashboard, max(1, repeat // 10)),
+            'reconcile_seconds': reconcile_seconds
+        }
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print("⏱️ BENCHMARK - DASHBOARDS ADMINISTRATIVOS")
+    print("=" * 40)
+    result = run_benchmark(size)
+    print(f"{result['users']} usuários")
+    print(f"dashboards pelos agregados:     {result['rollup_ms']:.2f} ms (as duas rotas, mediana)")
+    print(f"consultas antigas nas tabelas:  {result['legacy_ms']:.1f} ms")
+    print(f"reconciliação completa:         {result['reconcile_seconds']:.1f} s")
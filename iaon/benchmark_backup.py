@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark do pipeline de backup e restauração
+
+Grava N conversas (mais eventos, transações e contatos proporcionais) de um
+usuário em um banco temporário e mede pela fila:
+- backup completo: tempo, registros por segundo, pico de memória Python
+  (tracemalloc, deve ficar constante com o volume), tamanho e compressão
+- restauração do arquivo para outro usuário (migração) e a reexecução
+  idempotente sobre os dados já restaurados
+
+Uso: python benchmark_backup.py [conversas]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Banco e diretório de backup temporários
+_bench_dir = tempfile.mkdtemp(prefix='iaon-bench-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_bench_dir, 'bench.db')}")
+os.environ.setdefault('IAON_BACKUP_DIR', os.path.join(_bench_dir, 'backups'))
+os.environ.setdefault('IAON_JOB_WORKERS', '0')
+os.environ.setdefault('IAON_NOTIFICATION_SCHEDULER', '0')
+
+from app import (app, db, job_queue, Contact, ConversationMemory, DataBackup, DataRestore, FinancialAccount,
+                 FinancialTransaction, SmartCalendar, User)
+
+BATCH = 50000
+USER_ID = 1
+TARGET_USER_ID = 2
+
+
+def _insert(model, rows):
+    for start in range(0, len(rows), BATCH):
+        db.session.execute(model.__table__.insert(), rows[start:start + BATCH])
+
+
+def seed(size, seed=17):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    def moment(days):
+        return now - timedelta(seconds=rng.uniform(0, days * 86400))
+
+    _insert(ConversationMemory, [{'user_id': USER_ID, 'session_id': f's{n // 20}',
+                                  'user_message': f'Mensagem {n} sobre a agenda da semana',
+                                  'ai_response': f'Resposta {n}: anotado, vou lembrar você amanhã.',
+                                  'created_at': moment(365)} for n in range(size)])
+    _insert(SmartCalendar, [{'user_id': USER_ID, 'title': f'Compromisso {n}', 'start_datetime': moment(365),
+                             'end_datetime': now, 'created_at': now, 'updated_at': now} for n in range(size // 5)])
+    db.session.add(User(id=TARGET_USER_ID, username='destino', email='destino@iaon.app'))
+    account = FinancialAccount(user_id=USER_ID, account_name='Conta', account_type='checking')
+    db.session.add(account)
+    db.session.flush()
+    _insert(FinancialTransaction, [{'user_id': USER_ID, 'account_id': account.id, 'transaction_type': 'expense',
+                                    'amount': round(rng.uniform(5, 500), 2), 'description': f'Compra {n}',
+                                    'transaction_date': moment(365), 'created_at': now, 'updated_at': now}
+                                   for n in range(size // 2)])
+    _insert(Contact, [{'user_id': USER_ID, 'name': f'Contato {n}', 'phone_number': f'1199{n:07d}',
+                       'created_at': now, 'updated_at': now} for n in range(size // 50)])
+    db.session.commit()
+
+
+def run_benchmark(size=100000):
+    with app.app_context():
+        db.create_all()
+        seed(size)
+        client = app.test_client()
+        backup_id = client.post(f'/api/backup/create/{USER_ID}', json={'backup_type': 'full'}).get_json()['backup_id']
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        job_queue.run_pending()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        db.session.expire_all()
+        backup = db.session.get(DataBackup, backup_id)
+
+        def restore():
+            response = client.post(f'/api/backup/{backup_id}/restore', json={'target_user_id': TARGET_USER_ID})
+            start = time.perf_counter()
+            job_queue.run_pending()
+            seconds = time.perf_counter() - start
+            db.session.expire_all()
+            return db.session.get(DataRestore, response.get_json()['restore_id']), seconds
+
+        restored, restore_seconds = restore()
+        rerun, rerun_seconds = restore()
+        return {
+            'restore_status': restored.status,
+            'restore_seconds': restore_seconds,
+            'restore_rows_per_second': restored.records_processed / restore_seconds,
+            'rerun_seconds': rerun_seconds,
+            'rerun_inserted': rerun.records_inserted,
+            'status': backup.status,
+            'records': backup.records_count,
+            'seconds': seconds,
+            'rows_per_second': backup.records_count / seconds,
+            'peak_mb': peak / (1024 * 1024),
+            'file_mb': backup.file_size_mb,
+            'compression_ratio': backup.compression_ratio
+        }
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print("⏱️ BENCHMARK - BACKUP EM FLUXO")
+    print("=" * 40)
+    result = run_benchmark(size)
+    print(f"backup {result['status']}: {result['records']} registros em {result['seconds']:.1f} s")
+    print(f"vazão:               {result['rows_per_second']:.0f} registros/s")
+    print(f"pico de memória:     {result['peak_mb']:.1f} MB (tracemalloc)")
+    print(f"arquivo:             {result['file_mb']:.2f} MB (compressão {result['compression_ratio']:.1f}x)")
+    print(f"restauração {result['restore_status']}: {result['restore_seconds']:.1f} s "
+          f"({result['restore_rows_per_second']:.0f} registros/s)")
+    print(f"reexecução:          {result['rerun_seconds']:.1f} s ({result['rerun_inserted']} linhas novas)")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark da análise emocional (léxico compilado + janela de humor por usuário)
+
+Compara, por mensagem, sobre um corpus sintético de 10 mil mensagens:
+- léxico: uma varredura `palavra in texto` por palavra de cada lista (antes)
+  contra uma passada do EMOTIONAL_LEXICON compilado (depois)
+- tendência: consulta ao banco dos últimos 7 dias + to_dict() + médias (antes)
+  contra a janela em memória do EmotionalStateCache (depois)
+
+Uso: python benchmark_emotional_analysis.py [mensagens]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Banco temporário: o benchmark grava histórico e não deve tocar em database/iaon.db
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='iaon-bench-'), 'bench.db')}")
+
+from app import app, db, EmotionalAnalysis, _emotional_keywords, emotional_state_cache, get_user_mood_window
+from emotional_samples import build_corpus, legacy_scan, compiled_scan, legacy_trend
+
+MOODS = ['very_positive', 'positive', 'neutral', 'depressed', 'anxious', 'critical']
+
+
+def legacy_history(user_id, days=7):
+    """get_user_recent_emotional_history antiga: uma consulta + to_dict() por mensagem"""
+    analyses = EmotionalAnalysis.query.filter_by(user_id=user_id)\
+        .filter(EmotionalAnalysis.created_at >= datetime.utcnow() - timedelta(days=days))\
+        .order_by(EmotionalAnalysis.created_at.desc()).limit(20).all()
+    return [analysis.to_dict() for analysis in analyses]
+
+
+def seed_history(user_ids, per_user=30, seed=5):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    for user_id in user_ids:
+        db.session.add_all([
+            EmotionalAnalysis(user_id=user_id, current_mood=rng.choice(MOODS),
+                              created_at=now - timedelta(hours=per_user - index))
+            for index in range(per_user)
+        ])
+    db.session.commit()
+
+
+def _per_message_us(function, corpus):
+    start = time.perf_counter()
+    for index, message in enumerate(corpus):
+        function(index, message)
+    return (time.perf_counter() - start) / len(corpus) * 1e6
+
+
+def run_benchmark(size=10000, users=50):
+    corpus = build_corpus(size)
+    user_ids = list(range(90000, 90000 + users))
+    with app.app_context():
+        db.create_all()
+        seed_history(user_ids)
+        emotional_state_cache.clear()
+        _emotional_keywords.cache_clear()
+
+        mismatches = sum(1 for message in corpus if legacy_scan(message) != compiled_scan(message))
+        mismatches += sum(1 for user_id in user_ids
+                          if legacy_trend(legacy_history(user_id)) != get_user_mood_window(user_id).trend())
+
+        results = [{
+            'path': 'léxico',
+            'before_us': _per_message_us(lambda index, message: legacy_scan(message), corpus),
+            'after_us': _per_message_us(lambda index, message: compiled_scan(message), corpus),
+        }, {
+            'path': 'tendência',
+            'before_us': _per_message_us(
+                lambda index, message: legacy_trend(legacy_history(user_ids[index % users])), corpus),
+            'after_us': _per_message_us(
+                lambda index, message: get_user_mood_window(user_ids[index % users]).trend(), corpus),
+        }]
+        results.append({
+            'path': 'total',
+            'before_us': sum(row['before_us'] for row in results),
+            'after_us': sum(row['after_us'] for row in results),
+        })
+        return results, mismatches
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print("⏱️ BENCHMARK - ANÁLISE EMOCIONAL")
+    print("=" * 40)
+    results, mismatches = run_benchmark(size)
+    print(f"{size} mensagens no corpus, {mismatches} divergências")
+    print(f"{'caminho':>10} | {'antes (µs)':>10} | {'depois (µs)':>11} | {'ganho':>6}")
+    for row in results:
+        print(f"{row['path']:>10} | {row['before_us']:>10.2f} | {row['after_us']:>11.2f} | "
+              f"{row['before_us'] / row['after_us']:>5.1f}x")
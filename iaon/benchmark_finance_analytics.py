@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos relatórios financeiros por somas mensais
+
+Grava N transações (por padrão 500 usuários com ~55 transações por mês em
+três anos) em um banco temporário e mede:
+- o recálculo completo com NumPy (recompute) contra o mesmo recálculo linha a
+  linha (um dicionário por transação, como metrics_rollup faz), e a
+  reconciliação que preenche a tabela de somas vazia
+- gastos por categoria e evolução de 12 meses lendo as somas, contra a soma
+  que o cliente fazia paginando as transações do usuário
+
+Uso: python benchmark_finance_analytics.py [transações] [usuários]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Banco temporário: o benchmark grava milhões de linhas
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='iaon-bench-'), 'bench.db')}")
+os.environ.setdefault('IAON_JOB_WORKERS', '0')
+os.environ.setdefault('IAON_NOTIFICATION_SCHEDULER', '0')
+
+from app import app, db, finance_totals, FinancialTransaction
+from finance_analytics import FIELDS, month_key
+
+BATCH = 50000
+CATEGORIES = ['alimentacao', 'transporte', 'saude', 'educacao', 'lazer', 'casa', 'roupas', 'outros']
+
+
+def seed(size, users, seed=23):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    for start in range(0, size, BATCH):
+        db.session.execute(FinancialTransaction.__table__.insert(), [
+            {'user_id': rng.randint(1, users), 'account_id': 1, 'description': 'Benchmark',
+             **({'transaction_type': 'income', 'category': 'salario'} if rng.random() < 0.05 else
+                {'transaction_type': 'expense', 'category': rng.choice(CATEGORIES)}),
+             'amount': round(rng.uniform(5, 800), 2),
+             'transaction_date': now - timedelta(seconds=rng.uniform(0, 3 * 365 * 86400)),
+             'status': 'cancelled' if rng.random() < 0.02 else 'confirmed'}
+            for _ in range(start, min(size, start + BATCH))
+        ])
+    db.session.commit()
+
+
+def row_by_row():
+    """Recálculo sem NumPy: contributions() para cada transação lida"""
+    expected = Counter()
+    columns = [getattr(FinancialTransaction, field) for field in FIELDS]
+    for row in db.session.query(*columns).execution_options(yield_per=BATCH):
+        finance_totals.contributions(dict(zip(FIELDS, row)), 1, expected)
+    return expected
+
+
+def client_side(user_id, month):
+    """O que o cliente fazia: paginar todas as transações do usuário e somar"""
+    spending, trend = Counter(), Counter()
+    for transaction in FinancialTransaction.query.filter_by(user_id=user_id).yield_per(200):
+        if transaction.status == 'cancelled':
+            continue
+        transaction_month = month_key(transaction.transaction_date)
+        if transaction.transaction_type == 'expense':
+            trend[transaction_month] -= transaction.amount
+            if transaction_month == month:
+                spending[transaction.category] += transaction.amount
+        elif transaction.transaction_type == 'income':
+            trend[transaction_month] += transaction.amount
+    return spending, trend
+
+
+def _median_ms(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run_benchmark(size=1000000, users=500, repeat=20):
+    with app.app_context():
+        db.create_all()
+        seed(size, users)
+
+        start = time.perf_counter()
+        finance_totals.reconcile(db.session)
+        db.session.commit()
+        reconcile_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        finance_totals.recompute(db.session)
+        numpy_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        row_by_row()
+        python_seconds = time.perf_counter() - start
+
+        client = app.test_client()
+        month = month_key(datetime.utcnow())
+
+        def reports():
+            client.get(f'/api/finance/analytics/1/categories?month={month}')
+            client.get('/api/finance/analytics/1/trend?months=12')
+
+        return {
+            'transactions': size,
+            'users': users,
+            'numpy_seconds': numpy_seconds,
+            'python_seconds': python_seconds,
+            'reconcile_seconds': reconcile_seconds,
+            'reports_ms': _median_ms(reports, repeat),
+            'client_ms': _median_ms(lambda: client_side(1, month), max(1, repeat // 4))
+        }
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    print("⏱️ BENCHMARK - RELATÓRIOS FINANCEIROS (SOMAS MENSAIS)")
+    print("=" * 40)
+    result = run_benchmark(size, users)
+    print(f"{result['transactions']} transações, {result['users']} usuários")
+    print(f"recálculo completo com NumPy:   {result['numpy_seconds']:.1f} s")
+    print(f"recálculo linha a linha:        {result['python_seconds']:.1f} s")
+    print(f"reconciliação (tabela vazia):   {result['reconcile_seconds']:.1f} s (recálculo + gravação das somas)")
+    print(f"relatórios pelas somas:         {result['reports_ms']:.2f} ms (categorias + 12 meses, mediana)")
+    print(f"soma no cliente (paginação):    {result['client_ms']:.1f} ms")
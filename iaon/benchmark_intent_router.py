@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark do roteador de intenções (intent_router)
+
+Compara, por mensagem, as cadeias antigas de `palavra in texto` com as tabelas
+compiladas em IntentClassifier, sobre um corpus de mensagens reais em português:
+- primeira intenção por prioridade (chat, comandos de voz, respostas, categorias)
+- todas as intenções pontuadas (tópicos + sentimento da memória conversacional)
+
+Uso: python benchmark_intent_router.py [repetições]
+"""
+
+import sys
+import time
+
+from app import (CHAT_INTENTS, AI_RESPONSE_INTENTS, VOICE_COMMAND_INTENTS, CONTEXT_KEYWORDS, CONTEXT_TOPICS,
+                 TRANSACTION_CATEGORIES)
+
+CORPUS = [
+    'oi, tudo bem? queria saber como está minha agenda de amanhã',
+    'preciso de ajuda com o relatório mensal de vendas da equipe',
+    'qual a previsão do tempo para o fim de semana em são paulo?',
+    'meu dinheiro está acabando, como posso economizar este mês?',
+    'quero falar com o coach empresarial sobre liderança',
+    'marcar consulta com o médico para a próxima terça às 14h',
+    'lembra de me avisar para tomar o remédio da pressão às 20h',
+    'abrir o whatsapp e mandar mensagem para a minha mãe',
+    'ligar para o joão do financeiro',
+    'gravar a reunião de planejamento do trimestre com a diretoria',
+    'quanto gastei com restaurante e padaria na última semana?',
+    'paguei a conta de internet e de água hoje cedo',
+    'estou me sentindo muito cansado e sem energia ultimamente',
+    'obrigado pela ajuda, até amanhã!',
+    'me mostra o histórico de chamadas de ontem',
+    'como está a bateria do celular?',
+    'quero revisar meus investimentos e o orçamento de casa',
+    'configurar minha biometria de voz novamente',
+    'preciso preparar a apresentação para o board de sexta-feira',
+    'uber para o aeroporto de guarulhos às 6 da manhã',
+    'compra no supermercado extra R$ 350,00 cartão de crédito',
+    'mensalidade da faculdade e livro de cálculo',
+    'ingresso de cinema e show no fim de semana com amigos',
+    'a reunião com o cliente foi ótima, fechamos o contrato',
+    'tive um problema com o pagamento do salário este mês',
+    'qual o objetivo da próxima sessão de desenvolvimento pessoal?',
+    'minha família vai viajar nas férias de julho',
+    'agendar compromisso com a dra. costa na clínica',
+    'socorro, preciso de ajuda urgente',
+    'qual é a minha meta de economia para este ano?',
+]
+
+# Os tópicos são detectados sobre mensagem + resposta da IA (analyze_conversation_context)
+AI_RESPONSE = (
+    'Entendi! Vou organizar isso para você. Posso ajudar com reuniões, agenda, '
+    'controle financeiro e acompanhamento médico. Já registrei as informações e '
+    'vou te lembrar no horário combinado. Se quiser, também posso gerar um '
+    'relatório com os próximos passos e enviar para os participantes.'
+)
+
+# Uma tabela por uso: (classificador, semântica)
+TABLES = (
+    ('chat', CHAT_INTENTS, 'first'),
+    ('respostas', AI_RESPONSE_INTENTS, 'first'),
+    ('comandos de voz', VOICE_COMMAND_INTENTS, 'first'),
+    ('categorias', TRANSACTION_CATEGORIES, 'first'),
+    ('contexto', CONTEXT_KEYWORDS, 'context'),
+)
+
+
+def legacy_table(classifier):
+    """Tabela original [(intenção, palavras)] reconstruída a partir do classificador"""
+    table = {intent: [] for intent in classifier.order}
+    for keyword, intents in classifier.intents_by_keyword.items():
+        for intent in intents:
+            table[intent].append(keyword)
+    return list(table.items())
+
+
+def legacy_first(table, text):
+    """Cadeia if/elif antiga: varre o texto uma vez por palavra até a primeira intenção"""
+    text = text.lower()
+    for intent, keywords in table:
+        if any(keyword in text for keyword in keywords):
+            return intent
+    return None
+
+
+def legacy_context(table, text):
+    """Contagem antiga: tópico com mais palavras e contagens de sentimento, uma varredura por palavra"""
+    text = text.lower()
+    best, max_matches, sentiment = None, 0, {}
+    for intent, keywords in table:
+        matches = sum(1 for keyword in keywords if keyword in text)
+        if intent not in CONTEXT_TOPICS:
+            sentiment[intent] = matches
+        elif matches > max_matches:
+            best, max_matches = intent, matches
+    return best, sentiment.get('positive', 0), sentiment.get('negative', 0)
+
+
+def compiled_context(text):
+    matches = CONTEXT_KEYWORDS.classify(text)
+    return matches.best(CONTEXT_TOPICS), matches.scores.get('positive', 0), matches.scores.get('negative', 0)
+
+
+def _per_message_us(function, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for message in CORPUS:
+            function(message)
+        best = min(best, time.perf_counter() - start)
+    return best / len(CORPUS) * 1e6
+
+
+def run_benchmark(repeats=200):
+    results = []
+    for name, classifier, mode in TABLES:
+        table = legacy_table(classifier)
+        if mode == 'first':
+            before = lambda message: legacy_first(table, message)
+            after = classifier.first
+        else:
+            before = lambda message: legacy_context(table, f'{message} {AI_RESPONSE}')
+            after = lambda message: compiled_context(f'{message} {AI_RESPONSE}')
+        mismatches = sum(1 for message in CORPUS if before(message) != after(message))
+        results.append({
+            'table': name,
+            'keywords': len(classifier.intents_by_keyword),
+            'before_us': _per_message_us(before, repeats),
+            'after_us': _per_message_us(after, repeats),
+            'mismatches': mismatches
+        })
+    return results
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print("⏱️ BENCHMARK - ROTEADOR DE INTENÇÕES")
+    print("=" * 40)
+    print(f"{len(CORPUS)} mensagens no corpus")
+    print(f"{'tabela':>16} | {'palavras':>8} | {'antes (µs)':>10} | {'depois (µs)':>11} | {'divergências':>12}")
+    for row in run_benchmark(repeats):
+        print(f"{row['table']:>16} | {row['keywords']:>8} | {row['before_us']:>10.2f} | "
+              f"{row['after_us']:>11.2f} | {row['mismatches']:>12}")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark do agendador de notificações
+
+Grava N lembretes pendentes espalhados por 30 dias (mais alguns já vencidos)
+em um banco temporário e mede:
+- partida: carga do heap pelo índice (status, scheduled_for)
+- rodada de manutenção (horizonte + atrasadas) com o heap já carregado
+- despacho em lotes dos lembretes vencidos
+- comparação: uma varredura de todas as pendentes, como faria um poller simples
+
+Uso: python benchmark_notification_scheduler.py [lembretes]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Banco temporário: o benchmark grava centenas de milhares de linhas
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='iaon-bench-'), 'bench.db')}")
+os.environ.setdefault('IAON_NOTIFICATION_SCHEDULER', '0')
+
+from app import app, db, NotificationSystem
+from notification_scheduler import NotificationScheduler
+
+DUE_NOW = 5000  # Lembretes vencidos nos últimos minutos
+
+
+def seed(size, now, seed=3):
+    rng = random.Random(seed)
+    rows = [{
+        'user_id': rng.randint(1, 5000),
+        'title': 'Lembrete',
+        'message': 'Você tem um evento agendado',
+        'notification_type': 'calendar',
+        'priority': 'medium',
+        'delivery_method': 'push',
+        'status': 'pending',
+        'scheduled_for': now + timedelta(seconds=rng.uniform(-300, 0) if index < DUE_NOW else rng.uniform(60, 30 * 86400)),
+        'created_at': now
+    } for index in range(size)]
+    for start in range(0, size, 20000):
+        db.session.execute(NotificationSystem.__table__.insert(), rows[start:start + 20000])
+    db.session.commit()
+
+
+def _timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(size=200000):
+    with app.app_context():
+        db.create_all()
+        now = datetime.utcnow()
+        seed(size, now)
+
+        scheduler = NotificationScheduler(app, db, NotificationSystem, enabled=False, batch_size=500)
+        scheduler.register_channel('push', lambda notifications: None)
+
+        loaded, hydrate_seconds = _timed(lambda: scheduler.hydrate(now))
+        dispatched, dispatch_seconds = _timed(lambda: scheduler.run_once(now))
+        _, refresh_seconds = _timed(lambda: scheduler.refresh(now + timedelta(seconds=5)))
+        pending, scan_seconds = _timed(
+            lambda: [row for row in db.session.query(NotificationSystem.id, NotificationSystem.scheduled_for)
+                     .filter(NotificationSystem.status == 'pending').all() if row.scheduled_for <= now])
+        db.session.commit()
+        return {
+            'pending': size,
+            'heap_size': loaded,
+            'hydrate_ms': hydrate_seconds * 1000,
+            'dispatched': dispatched,
+            'dispatch_per_second': dispatched / dispatch_seconds if dispatch_seconds else 0,
+            'refresh_ms': refresh_seconds * 1000,
+            'full_scan_ms': scan_seconds * 1000,
+            'metrics': scheduler.metrics()
+        }
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print("⏱️ BENCHMARK - AGENDADOR DE NOTIFICAÇÕES")
+    print("=" * 40)
+    result = run_benchmark(size)
+    print(f"{result['pending']} lembretes pendentes, {result['heap_size']} no heap após a partida")
+    print(f"partida (carga do heap):        {result['hydrate_ms']:.1f} ms")
+    print(f"despacho de {result['dispatched']} vencidos:      {result['dispatch_per_second']:.0f} notificações/s")
+    print(f"rodada de manutenção:           {result['refresh_ms']:.1f} ms")
+    print(f"varredura de todas as pendentes: {result['full_scan_ms']:.1f} ms (poller sem heap, por rodada)")
+    print(f"atraso p95: {result['metrics']['lag_seconds']['p95']} s")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark do motor de identificação de falantes (speaker_scoring)
+
+Mede, para reuniões com 5, 25 e 100 participantes:
+- montagem da matriz de perfis (JSON -> NumPy), feita uma vez por reunião
+- pontuação de um trecho contra todos os falantes
+- pontuação de um lote de trechos em uma única operação
+
+Uso: python benchmark_speaker_scoring.py [repetições]
+"""
+
+import json
+import random
+import sys
+import time
+
+from speaker_scoring import SpeakerScoringEngine
+
+PARTICIPANT_COUNTS = (5, 25, 100)
+BATCH_SIZE = 50
+
+
+def random_features(rng):
+    """Características no mesmo formato de extract_audio_features()/perfis salvos"""
+    return {
+        'fundamental_frequency': rng.uniform(90, 270),
+        'formants': {
+            'f1': rng.uniform(700, 1100),
+            'f2': rng.uniform(1100, 1700),
+            'f3': rng.uniform(2300, 3000),
+            'f4': rng.uniform(3100, 4000)
+        },
+        'speech_rate': rng.uniform(120, 210),
+        'spectral_features': {
+            'spectral_centroid': rng.uniform(1900, 3100),
+            'spectral_rolloff': rng.uniform(6800, 9300),
+            'zero_crossing_rate': rng.uniform(0.09, 0.34)
+        },
+        'prosodic_features': {
+            'intonation_pattern': rng.choice(['rising', 'falling', 'level']),
+            'rhythm_score': rng.uniform(0.5, 0.9)
+        }
+    }
+
+
+def _best_time(function, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark(repeats=20, seed=42):
+    rng = random.Random(seed)
+    results = []
+    for count in PARTICIPANT_COUNTS:
+        profiles = [
+            {'participant_id': i, 'name': f'Participante {i}',
+             'voice_profile': json.dumps(random_features(rng)), 'is_verified': i % 2 == 0}
+            for i in range(count)
+        ]
+        chunks = [random_features(rng) for _ in range(BATCH_SIZE)]
+        engine = SpeakerScoringEngine(profiles)
+
+        build = _best_time(lambda: SpeakerScoringEngine(profiles), repeats)
+        single = _best_time(lambda: engine.identify(chunks[0]), repeats)
+        batch = _best_time(lambda: engine.identify_batch(chunks), repeats)
+        results.append({
+            'participants': count,
+            'build_ms': build * 1000,
+            'chunk_ms': single * 1000,
+            'batch_ms_per_chunk': batch * 1000 / BATCH_SIZE
+        })
+    return results
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print("⏱️ BENCHMARK - IDENTIFICAÇÃO DE FALANTES")
+    print("=" * 40)
+    print(f"{'participantes':>13} | {'montagem (ms)':>13} | {'1 trecho (ms)':>13} | {f'lote {BATCH_SIZE} (ms/trecho)':>20}")
+    for row in run_benchmark(repeats):
+        print(f"{row['participants']:>13} | {row['build_ms']:>13.3f} | {row['chunk_ms']:>13.3f} | {row['batch_ms_per_chunk']:>20.4f}")
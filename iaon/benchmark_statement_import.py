@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark da importação de extratos bancários
+
+Gera um extrato CSV com N lançamentos (descrições de comerciantes que se
+repetem, como em um extrato real) e mede, em um banco temporário:
+- a categorização de todas as descrições: first() linha a linha contra
+  first_many() (descrições distintas em uma passada da regex)
+- a importação pelo endpoint em lotes, contra uma chamada de
+  /api/finance/transactions/create por lançamento (em uma amostra)
+- a reimportação do mesmo arquivo (tudo duplicado, nada gravado)
+
+Uso: python benchmark_statement_import.py [lançamentos]
+"""
+
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Banco temporário
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='iaon-bench-'), 'bench.db')}")
+os.environ.setdefault('IAON_JOB_WORKERS', '0')
+os.environ.setdefault('IAON_NOTIFICATION_SCHEDULER', '0')
+
+from app import app, db, FinancialAccount, TRANSACTION_CATEGORIES
+
+MERCHANTS = ['SUPERMERCADO {}', 'UBER *TRIP {}', 'FARMACIA POPULAR {}', 'PADARIA {}', 'POSTO COMBUSTIVEL {}',
+             'CINEMA SHOPPING {}', 'LOJA ROUPA {}', 'PIX ENVIADO {}', 'INTERNET FIBRA {}', 'CURSO ONLINE {}']
+SAMPLE = 500  # Lançamentos enviados um a um (a amostra é extrapolada)
+
+
+def statement(size, seed=5):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    names = [pattern.format(number) for pattern in MERCHANTS for number in range(30)]
+    lines = ['Data;Histórico;Valor']
+    for _ in range(size):
+        when = start + timedelta(days=rng.randrange(365))
+        amount = f'{rng.uniform(3, 900):.2f}'.replace('.', ',')
+        lines.append(f"{when:%d/%m/%Y};{rng.choice(names)};{'' if rng.random() < 0.05 else '-'}{amount}")
+    return ('\n'.join(lines) + '\n').encode('utf-8'), [line.split(';')[1] for line in lines[1:]]
+
+
+def _account(client, name):
+    response = client.post('/api/finance/accounts/create', json={'user_id': 1, 'account_name': name})
+    return response.get_json()['account_id']
+
+
+def run_benchmark(size=20000):
+    data, descriptions = statement(size)
+    start = time.perf_counter()
+    one_by_one = [TRANSACTION_CATEGORIES.first(description, default='outros') for description in descriptions]
+    first_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = TRANSACTION_CATEGORIES.first_many(descriptions, default='outros')
+    many_seconds = time.perf_counter() - start
+    assert batched == one_by_one
+
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        account_id = _account(client, 'Extrato')
+        url = f'/api/finance/transactions/import?user_id=1&account_id={account_id}&format=csv'
+        start = time.perf_counter()
+        imported = client.post(url, data=data).get_json()
+        import_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        again = client.post(url, data=data).get_json()
+        reimport_seconds = time.perf_counter() - start
+
+        single_account = _account(client, 'Uma a uma')
+        start = time.perf_counter()
+        for description in descriptions[:SAMPLE]:
+            client.post('/api/finance/transactions/create', json={
+                'user_id': 1, 'account_id': single_account, 'amount': 10.0, 'description': description,
+                'transaction_date': '2024-06-01T12:00:00'})
+        single_seconds = (time.perf_counter() - start) * size / SAMPLE
+        balance = db.session.get(FinancialAccount, account_id).current_balance
+
+    return {
+        'transactions': size,
+        'first_ms': first_seconds * 1000,
+        'first_many_ms': many_seconds * 1000,
+        'imported': imported['imported'],
+        'import_seconds': import_seconds,
+        'duplicates': again['duplicates'],
+        'reimport_seconds': reimport_seconds,
+        'single_seconds': single_seconds,
+        'balance': balance
+    }
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print("⏱️ BENCHMARK - IMPORTAÇÃO DE EXTRATOS")
+    print("=" * 40)
+    result = run_benchmark(size)
+    print(f"{result['transactions']} lançamentos")
+    print(f"categorização first() por linha:  {result['first_ms']:.1f} ms")
+    print(f"categorização first_many():       {result['first_many_ms']:.1f} ms")
+    print(f"importação em lotes:              {result['import_seconds']:.2f} s ({result['imported']} gravados)")
+    print(f"reimportação (só duplicatas):     {result['reimport_seconds']:.2f} s ({result['duplicates']} ignorados)")
+    print(f"uma chamada por lançamento:       {result['single_seconds']:.1f} s (estimado de {SAMPLE})")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark da escuta em segundo plano (wake_word): CPU por fluxo
+
+Para cada modo de energia, alimenta um WakeWordStream com um minuto de áudio
+(ruído de fundo com palavras faladas de vez em quando) em pedaços de
+buffer_size amostras, como o cliente envia, e mede o tempo de CPU
+(time.process_time). Mostra a fração de um núcleo que um fluxo ocupa,
+quantos fluxos simultâneos cabem em um núcleo e, para comparação, o custo de
+MFCC + DTW sobre todo o áudio em janelas de MAX_SEGMENT_SECONDS (o que
+aconteceria sem o VAD na frente).
+
+Uso: python benchmark_wake_word.py [porcentagem de fala] [segundos]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from wake_word import MAX_SEGMENT_SECONDS, POWER_PROFILES, WakeWordDetector, WakeWordStream, extract_template
+
+WORD = [(500, 1800), (300, 2300), (500, 900), (300, 1000)]
+OTHER = [(750, 1200), (700, 1300), (400, 2000), (650, 1100)]
+
+
+def synthetic_word(formants, sample_rate, f0=130, seed=0):
+    """Palavra sintética de 0.6 s: harmônicos de f0 moldados por formantes que variam no tempo"""
+    count = int(0.6 * sample_rate)
+    position = np.linspace(0, len(formants) - 1, count)
+    f1 = np.interp(position, np.arange(len(formants)), [f for f, _ in formants])
+    f2 = np.interp(position, np.arange(len(formants)), [f for _, f in formants])
+    pitch = f0 * (1 + 0.1 * np.sin(2 * np.pi * 1.5 * np.arange(count) / sample_rate))
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    signal = np.zeros(count)
+    for harmonic in range(1, int(4000 / f0)):
+        gain = np.exp(-((harmonic * pitch - f1) / 90) ** 2) + 0.6 * np.exp(-((harmonic * pitch - f2) / 120) ** 2) + 0.05
+        signal += gain * np.sin(harmonic * phase)
+    signal *= np.sin(np.pi * np.arange(count) / count) ** 0.5
+    return 0.3 * signal / np.abs(signal).max() + 0.002 * np.random.default_rng(seed).standard_normal(count)
+
+
+def background_audio(sample_rate, seconds, speech_fraction, seed=7):
+    """Ruído de fundo com palavras (metade a de ativação) ocupando ~speech_fraction do tempo"""
+    rng = np.random.default_rng(seed)
+    audio = 0.002 * rng.standard_normal(int(seconds * sample_rate))
+    word_samples = int(0.6 * sample_rate)
+    count = int(seconds * speech_fraction / 0.6)
+    slots = np.linspace(0, len(audio) - word_samples, count + 2)[1:-1].astype(int) if count else []
+    for index, start in enumerate(slots):
+        audio[start:start + word_samples] += synthetic_word(WORD if index % 2 else OTHER, sample_rate, 120 + index % 30, index)
+    return (np.clip(audio, -1, 1) * 32767).astype('<i2').tobytes()
+
+
+def run_benchmark(speech_fraction=0.1, seconds=60.0):
+    results = []
+    for mode, profile in POWER_PROFILES.items():
+        sample_rate = profile['sample_rate']
+        templates = [extract_template(synthetic_word(WORD, sample_rate, f0, seed), sample_rate, power_mode=mode)
+                     for seed, f0 in enumerate((115, 130, 145))]
+        audio = background_audio(sample_rate, seconds, speech_fraction)
+        chunk = profile['buffer_size'] * 2  # Bytes de um buffer do cliente
+
+        detector = WakeWordDetector(templates, sensitivity=0.7, power_mode=mode)
+        stream = WakeWordStream(detector)
+        start = time.process_time()
+        detections = []
+        for offset in range(0, len(audio), chunk):
+            detections += stream.feed(audio[offset:offset + chunk])
+        detections += stream.flush()
+        cpu = time.process_time() - start
+
+        samples = np.frombuffer(audio, dtype='<i2') / 32768.0
+        window = int(MAX_SEGMENT_SECONDS * sample_rate)
+        start = time.process_time()
+        for offset in range(0, len(samples), window):
+            detector.match(samples[offset:offset + window], sample_rate)
+        without_vad = time.process_time() - start
+
+        stats = stream.stats()
+        results.append({
+            'mode': mode,
+            'sample_rate': sample_rate,
+            'cpu_ms': cpu * 1000,
+            'core_fraction': cpu / stats['audio_seconds'],
+            'streams_per_core': stats['audio_seconds'] / cpu if cpu else float('inf'),
+            'speech_seconds': stats['speech_seconds'],
+            'segments': stats['segments_checked'],
+            'detections': sum(detection['valid'] for detection in detections),
+            'without_vad_ms': without_vad * 1000
+        })
+    return results
+
+
+if __name__ == '__main__':
+    speech_percent = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 60.0
+    print("⏱️ BENCHMARK - ESCUTA EM SEGUNDO PLANO (VAD + PALAVRA DE ATIVAÇÃO)")
+    print("=" * 40)
+    print(f"{seconds:.0f} s de áudio por fluxo, {speech_percent:.0f}% de fala")
+    print(f"{'modo':>11} | {'taxa (Hz)':>9} | {'CPU (ms)':>9} | {'% núcleo':>8} | {'fluxos/núcleo':>13} | "
+          f"{'fala (s)':>8} | {'trechos':>7} | {'ativações':>9} | {'sem VAD (ms)':>12}")
+    for row in run_benchmark(speech_percent / 100.0, seconds):
+        print(f"{row['mode']:>11} | {row['sample_rate']:>9} | {row['cpu_ms']:>9.1f} | {row['core_fraction'] * 100:>8.3f} | "
+              f"{row['streams_per_core']:>13.0f} | {row['speech_seconds']:>8.1f} | {row['segments']:>7} | "
+              f"{row['detections']:>9} | {row['without_vad_ms']:>12.1f}")
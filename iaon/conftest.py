@@ -0,0 +1,12 @@
+# Configuração do pytest: usar um banco SQLite temporário em vez de database/iaon.db
+import os
+import tempfile
+
+_test_db_dir = tempfile.mkdtemp(prefix='iaon-tests-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_test_db_dir, 'iaon_test.db')}")
+os.environ.setdefault('IAON_BACKUP_DIR', os.path.join(_test_db_dir, 'backups'))
+
+# Sem threads em segundo plano: os testes executam a fila (job_queue.run_pending())
+# e o agendador de notificações (notification_scheduler.run_once()) explicitamente
+os.environ.setdefault('IAON_JOB_WORKERS', '0')
+os.environ.setdefault('IAON_NOTIFICATION_SCHEDULER', '0')
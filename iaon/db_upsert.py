@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Peças comuns dos agregados mantidos a cada flush do IAON
+
+Os agregados (metrics_rollup, finance_analytics, ledger) seguem o mesmo
+padrão: no before_flush, cada linha nova soma a contribuição, cada excluída
+subtrai e cada alterada soma a nova e subtrai a antiga; os deltas são
+gravados como `coluna = coluna + delta` por upsert na mesma transação.
+
+- track_old_values: garante o valor antigo de um campo alterado sem ter
+  sido carregado (active_history), para poder subtraí-lo
+- flush_changes: percorre new/deleted/dirty da sessão devolvendo
+  (objeto, valores, sinal)
+- upsert_statement / upsert_add: INSERT ... ON CONFLICT DO UPDATE no
+  PostgreSQL e no SQLite; nos outros bancos, UPDATE e INSERT se nada mudou
+- consistent_read: leitura das tabelas de origem e dos agregados no mesmo
+  instante do banco, para a reconciliação
+"""
+
+from contextlib import contextmanager
+
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+
+def _keep_old_value(*args):
+    pass
+
+
+def track_old_values(model, fields):
+    """Carregar o valor antigo ao alterar um campo ainda não carregado (para subtraí-lo)"""
+    for field in fields:
+        event.listen(getattr(model, field), 'set', _keep_old_value, active_history=True)
+
+
+def _values(obj, fields):
+    return {field: getattr(obj, field) for field in fields}
+
+
+def flush_changes(session, fields_for, on_new=None):
+    """(objeto, valores, sinal) das linhas do flush: nova +1, excluída -1, alterada nova +1 e antiga -1
+
+    `fields_for(obj)` devolve os campos acompanhados do objeto (ou None para
+    ignorá-lo); `on_new(obj, campos)` roda antes de ler uma linha nova.
+    """
+    for obj in list(session.new):
+        fields = fields_for(obj)
+        if fields:
+            if on_new is not None:
+                on_new(obj, fields)
+            yield obj, _values(obj, fields), 1
+    for obj in list(session.deleted):
+        fields = fields_for(obj)
+        if fields:
+            yield obj, _values(obj, fields), -1
+    for obj in list(session.dirty):
+        fields = fields_for(obj)
+        if not fields:
+            continue
+        state = inspect(obj)
+        histories = {field: state.attrs[field].history for field in fields}
+        if not any(history.has_changes() for history in histories.values()):
+            continue
+        new = _values(obj, fields)
+        old = {field: (history.deleted[0] if history.deleted else None) if history.has_changes() else new[field]
+               for field, history in histories.items()}
+        yield obj, new, 1
+        yield obj, old, -1
+
+
+def upsert_statement(session, table, key_columns, added=(), replaced=()):
+    """INSERT que, em conflito na chave, soma `added` e sobrescreve `replaced`; None fora de PostgreSQL/SQLite"""
+    dialect = session.get_bind().dialect.name
+    if dialect not in ('postgresql', 'sqlite'):
+        return None
+    statement = (postgresql_insert if dialect == 'postgresql' else sqlite_insert)(table)
+    set_ = {name: table.c[name] + statement.excluded[name] for name in added}
+    set_.update({name: statement.excluded[name] for name in replaced})
+    return statement.on_conflict_do_update(index_elements=list(key_columns), set_=set_)
+
+
+def upsert_add(session, table, key_columns, rows, added=(), replaced=()):
+    """Gravar `rows` somando `added` às linhas existentes (`coluna = coluna + valor`) e sobrescrevendo `replaced`"""
+    if not rows:
+        return 0
+    statement = upsert_statement(session, table, key_columns, added, replaced)
+    if statement is not None:
+        session.execute(statement, rows)
+        return len(rows)
+    for row in rows:
+        key = None
+        for name in key_columns:
+            condition = table.c[name] == row[name]
+            key = condition if key is None else key & condition
+        values = {name: table.c[name] + row[name] for name in added}
+        values.update({name: row[name] for name in replaced})
+        if not session.execute(table.update().where(key).values(values)).rowcount:
+            session.execute(table.insert().values(**row))
+    return len(rows)
+
+
+@contextmanager
+def consistent_read(session):
+    """Sessão em que o recálculo e a leitura dos agregados veem o mesmo instante do banco.
+
+    No PostgreSQL é uma transação REPEATABLE READ separada, só de leitura: uma
+    escrita confirmada durante a reconciliação fica fora do recálculo e dos
+    agregados lidos (ou dentro dos dois), então não é desfeita como divergência.
+    Os deltas são aplicados depois na sessão original (`coluna = coluna + delta`),
+    por cima das escritas confirmadas no meio, sem conflito de serialização.
+    No SQLite (um escritor por vez, desenvolvimento) usa a própria sessão.
+    """
+    bind = session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        yield session
+        return
+    with Session(bind=bind) as reader:
+        reader.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+        try:
+            yield reader
+        finally:
+            reader.rollback()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Amostras da análise emocional usadas pelo teste e pelo benchmark
+
+Corpus sintético com termos do léxico e as varreduras antigas (palavra por
+palavra) que servem de referência para o EMOTIONAL_LEXICON compilado.
+"""
+
+import random
+
+from app import (DEPRESSION_KEYWORDS, ANXIETY_KEYWORDS, POSITIVE_KEYWORDS, CONCERNING_KEYWORDS,
+                 HELP_SEEKING_KEYWORDS, STRESS_INDICATORS, CRITICAL_RISK_PHRASES, HIGH_RISK_PHRASES,
+                 MEDIUM_RISK_PHRASES, BEHAVIORAL_INDICATORS, CONTEXTUAL_RISK_FACTORS, RISK_FACTOR_KEYWORDS,
+                 emotional_keywords, _present)
+
+FILLER = [
+    'hoje', 'eu', 'estou', 'me sentindo', 'no trabalho', 'com a família', 'de novo', 'desde ontem',
+    'não sei', 'talvez', 'muito', 'um pouco', 'a semana', 'foi', 'difícil', 'tranquila', 'mas', 'e',
+    'preciso', 'conversar', 'sobre', 'isso', 'amanhã', 'minha mãe', 'o chefe', 'a escola',
+]
+LEXICON = (DEPRESSION_KEYWORDS + ANXIETY_KEYWORDS + POSITIVE_KEYWORDS + CONCERNING_KEYWORDS
+           + HELP_SEEKING_KEYWORDS + STRESS_INDICATORS + MEDIUM_RISK_PHRASES
+           + [word for _, words in RISK_FACTOR_KEYWORDS for word in words])
+
+
+def build_corpus(size=10000, seed=11):
+    """Mensagens de 8 a 40 palavras com 0 a 3 termos do léxico misturados"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(8, 40))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randint(0, len(words)), rng.choice(LEXICON))
+        corpus.append(' '.join(words).capitalize() + '.')
+    return corpus
+
+
+def legacy_scan(message):
+    """Varreduras antigas de perform_advanced_emotional_analysis, assess_suicide_risk e identify_risk_factors"""
+    message_lower = message.lower()
+    return (
+        [word for word in DEPRESSION_KEYWORDS if word in message_lower],
+        [word for word in ANXIETY_KEYWORDS if word in message_lower],
+        [word for word in POSITIVE_KEYWORDS if word in message_lower],
+        [word for word in CONCERNING_KEYWORDS if word in message_lower],
+        sum(1 for word in HELP_SEEKING_KEYWORDS if word in message_lower),
+        sum(1 for indicator in STRESS_INDICATORS if indicator in message_lower),
+        any(phrase in message_lower for phrase in CRITICAL_RISK_PHRASES),
+        any(phrase in message_lower for phrase in HIGH_RISK_PHRASES),
+        any(phrase in message_lower for phrase in MEDIUM_RISK_PHRASES),
+        any(phrase in message_lower for phrase in BEHAVIORAL_INDICATORS),
+        [weight for words, weight in CONTEXTUAL_RISK_FACTORS if any(word in message_lower for word in words)],
+        [factor for factor, words in RISK_FACTOR_KEYWORDS if any(word in message_lower for word in words)],
+    )
+
+
+def compiled_scan(message):
+    found = emotional_keywords(message)
+    return (
+        _present(DEPRESSION_KEYWORDS, found),
+        _present(ANXIETY_KEYWORDS, found),
+        _present(POSITIVE_KEYWORDS, found),
+        _present(CONCERNING_KEYWORDS, found),
+        len(_present(HELP_SEEKING_KEYWORDS, found)),
+        len(_present(STRESS_INDICATORS, found)),
+        any(phrase in found for phrase in CRITICAL_RISK_PHRASES),
+        any(phrase in found for phrase in HIGH_RISK_PHRASES),
+        any(phrase in found for phrase in MEDIUM_RISK_PHRASES),
+        any(phrase in found for phrase in BEHAVIORAL_INDICATORS),
+        [weight for words, weight in CONTEXTUAL_RISK_FACTORS if any(word in found for word in words)],
+        [factor for factor, words in RISK_FACTOR_KEYWORDS if any(word in found for word in words)],
+    )
+
+
+def legacy_trend(history):
+    """analyze_emotional_trend antiga sobre to_dict() mais recente primeiro"""
+    if len(history) < 3:
+        return 'insufficient_data'
+    scores = {'very_positive': 5, 'positive': 4, 'neutral': 3, 'depressed': 2, 'anxious': 2}
+    mood_scores = [scores.get(entry.get('current_mood', 'neutral'), 1) for entry in history]
+    recent_avg = sum(mood_scores[:3]) / 3
+    older_avg = sum(mood_scores[3:6]) / min(3, len(mood_scores[3:6]))
+    if recent_avg > older_avg + 0.5:
+        return 'improving'
+    elif recent_avg < older_avg - 0.5:
+        return 'declining'
+    return 'stable'
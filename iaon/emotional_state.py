@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Janela de estado emocional recente por usuário do IAON
+
+MoodWindow é um buffer circular com os últimos humores analisados de um
+usuário (pontuação 1-5 + horário), de onde a tendência sai em O(1) olhando
+só as 6 entradas mais novas. EmotionalStateCache mantém essas janelas em
+memória: a janela é carregada do banco uma vez, recebe cada nova análise
+gravada e é recarregada depois de `reload_seconds`, o que cobre análises
+gravadas por outros workers.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+# Pontuação numérica dos humores (critical e desconhecidos valem 1)
+MOOD_SCORES = {
+    'very_positive': 5,
+    'positive': 4,
+    'neutral': 3,
+    'depressed': 2,
+    'anxious': 2,
+}
+WINDOW_SIZE = 20  # Análises mais recentes consideradas
+WINDOW_DAYS = 7
+TREND_SPAN = 3  # Média das 3 mais recentes contra as 3 anteriores
+TREND_MARGIN = 0.5
+
+
+def mood_score(mood):
+    return MOOD_SCORES.get(mood, 1)
+
+
+class MoodWindow:
+    """Últimas WINDOW_SIZE pontuações de humor de um usuário, em ordem cronológica"""
+
+    __slots__ = ('entries', 'max_age')
+
+    def __init__(self, size=WINDOW_SIZE, max_age=timedelta(days=WINDOW_DAYS)):
+        self.entries = deque(maxlen=size)  # (created_at, pontuação)
+        self.max_age = max_age
+
+    def __len__(self):
+        return len(self.entries)
+
+    def append(self, mood, created_at=None):
+        self.entries.append((created_at or datetime.utcnow(), mood_score(mood)))
+
+    def prune(self, now=None):
+        """Descartar entradas mais antigas que a janela de dias"""
+        limit = (now or datetime.utcnow()) - self.max_age
+        while self.entries and self.entries[0][0] < limit:
+            self.entries.popleft()
+
+    def scores(self):
+        return [score for _, score in self.entries]
+
+    def trend(self, now=None):
+        """improving / declining / stable, ou insufficient_data com menos de 3 análises"""
+        self.prune(now)
+        count = len(self.entries)
+        if count < TREND_SPAN:
+            return 'insufficient_data'
+        if count == TREND_SPAN:
+            return 'stable'  # Nada anterior para comparar
+        recent = [self.entries[-index][1] for index in range(1, TREND_SPAN + 1)]
+        older = [self.entries[-index][1] for index in range(TREND_SPAN + 1, min(count, 2 * TREND_SPAN) + 1)]
+        recent_avg = sum(recent) / len(recent)
+        older_avg = sum(older) / len(older)
+        if recent_avg > older_avg + TREND_MARGIN:
+            return 'improving'
+        if recent_avg < older_avg - TREND_MARGIN:
+            return 'declining'
+        return 'stable'
+
+
+class EmotionalStateCache:
+    """Janelas de humor por usuário, com limite LRU e recarga periódica do banco"""
+
+    def __init__(self, max_users=10000, reload_seconds=300, clock=time.monotonic):
+        self.max_users = max_users
+        self.reload_seconds = reload_seconds
+        self.clock = clock
+        self._entries = OrderedDict()  # user_id -> (carregada em, MoodWindow)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, user_id):
+        return user_id in self._entries
+
+    def get(self, user_id, loader):
+        """Janela do usuário; `loader(user_id)` devolve [(humor, created_at)] do mais antigo ao mais novo"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and self.clock() - entry[0] <= self.reload_seconds:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        window = MoodWindow()
+        for mood, created_at in loader(user_id):
+            window.append(mood, created_at)
+        with self._lock:
+            self._entries[user_id] = (self.clock(), window)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return window
+
+    def record(self, user_id, mood, created_at=None):
+        """Acrescentar uma análise recém-gravada à janela (se ela estiver em memória)"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return False
+            entry[1].append(mood, created_at)
+            return True
+
+    def evict(self, user_id):
+        with self._lock:
+            return self._entries.pop(user_id, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agregados mensais das finanças do IAON por categoria
+
+Uma linha por (usuário, mês, categoria, tipo) com a soma dos valores e a
+quantidade de transações. Como em metrics_rollup, o before_flush transforma
+cada transação nova, alterada ou excluída em deltas aplicados por upsert
+`total = total + delta` na mesma transação da escrita; transações canceladas
+não contam. Os relatórios (gastos por categoria, evolução mês a mês,
+progresso das metas) leem só essas linhas: dezenas por usuário e mês, em vez
+de todo o histórico.
+
+O recálculo completo (backfill, reconciliação noturna) é colunar: o banco só
+entrega (usuário, mês, categoria, tipo, valor) em lotes e o agrupamento é
+feito com NumPy (chaves codificadas em inteiros, ordenadas com np.lexsort e
+somadas com np.add.reduceat por lote e depois entre lotes), sem um objeto
+Python por transação. reconcile() corrige apenas as linhas que
+divergem, com o recálculo e a leitura das somas no mesmo instante do banco
+(consistent_read): uma transação confirmada durante a reconciliação não é
+desfeita, e as correções entram como deltas por cima dela.
+"""
+
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import Integer, cast, event, func, or_, select
+
+from db_upsert import consistent_read, flush_changes, track_old_values, upsert_add
+
+FIELDS = ('user_id', 'transaction_date', 'category', 'transaction_type', 'amount', 'status')
+KEY_COLUMNS = ('user_id', 'year_month', 'category', 'transaction_type')
+TOTAL, COUNT = 'total_amount', 'transaction_count'
+
+
+def month_key(when):
+    """Mês de um instante no formato 'AAAA-MM'"""
+    return when.strftime('%Y-%m') if when is not None else None
+
+
+def months_between(since, until):
+    """Quantidade de meses de `since` até `until` ('AAAA-MM')"""
+    return (int(until[:4]) - int(since[:4])) * 12 + int(until[5:7]) - int(since[5:7])
+
+
+def shift_month(year_month, months):
+    """Somar `months` (pode ser negativo) a um mês 'AAAA-MM'"""
+    year, month = (int(part) for part in year_month.split('-'))
+    index = year * 12 + month - 1 + months
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def _group_sum(keys, totals, counts):
+    """Agrupar linhas de chaves iguais (ordenação lexicográfica) somando totais e quantidades"""
+    order = np.lexsort(keys.T[::-1])
+    keys, totals, counts = keys[order], totals[order], counts[order]
+    starts = np.flatnonzero(np.concatenate(([True], np.any(keys[1:] != keys[:-1], axis=1))))
+    return keys[starts], np.add.reduceat(totals, starts), np.add.reduceat(counts, starts)
+
+
+class MonthlyCategoryTotals:
+    """Somas mensais por categoria mantidas a cada flush e recalculáveis em lote"""
+
+    def __init__(self, db, model, transaction_model, batch_size=100000):
+        self.db = db
+        self.model = model
+        self.transactions = transaction_model
+        self.batch_size = batch_size
+        self.reconciled_at = None
+        self.last_corrections = 0
+        track_old_values(transaction_model, FIELDS)
+        event.listen(db.session, 'before_flush', self._before_flush)
+
+    # ---------- escrita ----------
+
+    def contributions(self, values, sign=1, deltas=None):
+        """Somar em `deltas` o que uma transação conta: {(usuário, mês, categoria, tipo, coluna): valor}"""
+        deltas = Counter() if deltas is None else deltas
+        month = month_key(values.get('transaction_date'))
+        if values.get('status') == 'cancelled' or values.get('user_id') is None or month is None:
+            return deltas
+        key = (values['user_id'], month, values.get('category') or '', values.get('transaction_type') or '')
+        deltas[key + (TOTAL,)] += sign * float(values.get('amount') or 0.0)
+        deltas[key + (COUNT,)] += sign
+        return deltas
+
+    def _before_flush(self, session, flush_context, instances):
+        deltas = Counter()
+        fields_for = lambda obj: FIELDS if isinstance(obj, self.transactions) else None
+        for _, values, sign in flush_changes(session, fields_for):
+            self.contributions(values, sign, deltas)
+        self.apply(session, deltas)
+
+    def apply(self, session, deltas):
+        """Upsert por (usuário, mês, categoria, tipo): `total = total + delta`, `quantidade = quantidade + n`"""
+        rows = {}
+        for (*key, column), value in deltas.items():
+            if value:
+                row = rows.setdefault(tuple(key), dict(zip(KEY_COLUMNS, key), total_amount=0.0, transaction_count=0,
+                                                       updated_at=datetime.utcnow()))
+                row[column] += value
+        rows = [rows[key] for key in sorted(rows)]  # Ordem fixa: sem deadlock entre flushes simultâneos
+        return upsert_add(session, self.model.__table__, KEY_COLUMNS, rows,
+                          added=(TOTAL, COUNT), replaced=('updated_at',))
+
+    # ---------- recálculo em lote ----------
+
+    def recompute(self, session, user_ids=None):
+        """Agregados esperados, agrupados com NumPy a partir das colunas das transações"""
+        transactions = self.transactions.__table__
+        month = cast(func.extract('year', transactions.c.transaction_date) * 100 +
+                     func.extract('month', transactions.c.transaction_date), Integer)
+        statement = select(
+            transactions.c.user_id, month, func.coalesce(transactions.c.category, ''),
+            func.coalesce(transactions.c.transaction_type, ''), func.coalesce(transactions.c.amount, 0.0)
+        ).where(or_(transactions.c.status.is_(None), transactions.c.status != 'cancelled'),
+                transactions.c.transaction_date.isnot(None))
+        if user_ids is not None:
+            statement = statement.where(transactions.c.user_id.in_(user_ids))
+        # Categorias e tipos viram códigos inteiros (vocabulário comum a todos os lotes)
+        vocabularies = ({}, {})
+        partials = []
+        result = session.execute(statement.execution_options(yield_per=self.batch_size))
+        for chunk in result.partitions():
+            users, months, categories, types, amounts = zip(*chunk)
+            keys = np.empty((len(chunk), 4), dtype=np.int64)
+            keys[:, 0] = users
+            keys[:, 1] = months
+            for column, (values, vocabulary) in enumerate(zip((categories, types), vocabularies), start=2):
+                keys[:, column] = [vocabulary.setdefault(value, len(vocabulary)) for value in values]
+            partials.append(_group_sum(keys, np.asarray(amounts, dtype=np.float64), np.ones(len(chunk), dtype=np.int64)))
+        expected = Counter()
+        if not partials:
+            return expected
+        keys, totals, counts = _group_sum(*(np.concatenate(parts) for parts in zip(*partials)))
+        categories, types = ([name for name, _ in sorted(vocabulary.items(), key=lambda item: item[1])]
+                             for vocabulary in vocabularies)
+        month_labels = {yyyymm: f'{yyyymm // 100:04d}-{yyyymm % 100:02d}' for yyyymm in np.unique(keys[:, 1]).tolist()}
+        for (user_id, yyyymm, category, kind), total, count in zip(keys.tolist(), totals.tolist(), counts.tolist()):
+            key = (user_id, month_labels[yyyymm], categories[category], types[kind])
+            expected[key + (TOTAL,)] = total
+            expected[key + (COUNT,)] = count
+        return expected
+
+    def reconcile(self, session, user_ids=None):
+        """Corrigir as linhas que divergem do recálculo; retorna quantas mudaram"""
+        table = self.model.__table__
+        statement = table.select()
+        if user_ids is not None:
+            statement = statement.where(table.c.user_id.in_(user_ids))
+        corrections, changed = Counter(), set()
+        with consistent_read(session) as reader:
+            expected = self.recompute(reader, user_ids)
+            for row in reader.execute(statement):
+                key = tuple(getattr(row, column) for column in KEY_COLUMNS)
+                for column in (TOTAL, COUNT):
+                    corrections[key + (column,)] = expected.pop(key + (column,), 0) - (getattr(row, column) or 0)
+        corrections.update(expected)  # Linhas que ainda não existem
+        for (*key, column), delta in list(corrections.items()):
+            if abs(delta) > 1e-6:
+                changed.add(tuple(key))
+            else:
+                del corrections[tuple(key) + (column,)]
+        self.apply(session, corrections)
+        session.execute(table.delete().where(table.c[COUNT] == 0))
+        self.reconciled_at = datetime.utcnow()
+        self.last_corrections = len(changed)
+        return len(changed)
+
+    # ---------- leitura ----------
+
+    def _rows(self, session, user_id, since, until=None, transaction_type=None):
+        table = self.model.__table__
+        condition = (table.c.user_id == user_id) & (table.c.year_month >= since) & (table.c[COUNT] != 0)
+        if until is not None:
+            condition &= table.c.year_month <= until
+        if transaction_type is not None:
+            condition &= table.c.transaction_type == transaction_type
+        return session.execute(table.select().where(condition)).all()
+
+    def by_category(self, session, user_id, year_month, transaction_type='expense'):
+        """Total e quantidade por categoria em um mês, maiores primeiro"""
+        rows = self._rows(session, user_id, year_month, year_month, transaction_type)
+        return sorted(({'category': row.category, 'total': round(row.total_amount, 2), 'count': row.transaction_count}
+                       for row in rows), key=lambda item: (-item['total'], item['category']))
+
+    def monthly(self, session, user_id, since, until):
+        """Totais por mês e tipo entre dois meses 'AAAA-MM' (inclusive): {mês: {tipo: total}}"""
+        months = {}
+        for row in self._rows(session, user_id, since, until):
+            totals = months.setdefault(row.year_month, Counter())
+            totals[row.transaction_type] += row.total_amount
+        return months
+
+    def net(self, session, user_id, since, until):
+        """Receitas menos despesas entre dois meses (inclusive)"""
+        return sum(totals['income'] - totals['expense'] for totals in self.monthly(session, user_id, since, until).values())
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Configuração do gunicorn para produção (Railway/Render)
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Workers, threads e pool de conexões vêm de serving.serving_profile()
+(CPUs + variáveis de ambiente). O app é carregado uma vez no master
+(preload_app) e copiado para cada worker no fork; as conexões abertas no
+master durante a inicialização são descartadas antes do fork e cada worker
+descarta as herdadas (dispose) antes de abrir as suas.
+
+O esquema do banco é preparado no preload (schema_bootstrap), uma vez por
+deploy; se falhar, cada worker tenta de novo em segundo plano e /health
+responde 503 até ficar pronto.
+
+Recarga sem derrubar requisições:
+- kill -HUP <master>: relê esta configuração e troca os workers aos poucos
+  (cada um termina as requisições em andamento até graceful_timeout)
+- código novo com preload_app: kill -USR2 <master> sobe um master novo com o
+  código atualizado; depois kill -QUIT <master antigo>
+"""
+
+import os
+
+from serving import pool_environ, serving_profile
+
+profile = serving_profile()
+for _name, _value in pool_environ(profile).items():
+    os.environ.setdefault(_name, _value)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = profile['workers']
+worker_class = profile['worker_class']
+threads = profile['threads']
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))  # Chat com IA e transcrição podem demorar
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+# Reciclar workers de tempos em tempos (com variação para não reiniciarem juntos)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    server.log.info(
+        "IAON: %s workers %s x %s threads, pool %s + %s por processo (%s de %s conexões)",
+        profile['workers'], profile['worker_class'], profile['threads'], profile['pool_size'],
+        profile['max_overflow'], profile['connections'], profile['connection_budget']
+    )
+    for warning in profile['warnings']:
+        server.log.warning("IAON: %s", warning)
+
+
+def when_ready(server):
+    """Depois do preload e antes do primeiro fork: o master não fica com threads nem conexões"""
+    from app import app, db, job_queue, notification_scheduler
+    job_queue.stop()  # A inicialização pode ter enfileirado tarefas (e iniciado o pool) no master
+    notification_scheduler.stop()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def post_fork(server, worker):
+    """Conexões herdadas do master pertencem a ele: descartar sem fechá-las"""
+    from app import app, db, job_queue, notification_scheduler, schema_bootstrap
+    with app.app_context():
+        db.engine.dispose(close=False)
+    schema_bootstrap.start_retry()  # Threads não sobrevivem ao fork: sem efeito se o esquema estiver pronto
+    # Tarefas pendentes e adiadas (reconciliação, checkpoint, novas tentativas) não esperam uma requisição
+    job_queue.start()
+    notification_scheduler.start()
+
+
+def worker_exit(server, worker):
+    """Saída graciosa: terminar a tarefa em andamento e parar o agendador"""
+    from app import job_queue, notification_scheduler
+    job_queue.stop(timeout=graceful_timeout / 2)
+    notification_scheduler.stop()
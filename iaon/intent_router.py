@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Classificação de intenções por palavras-chave do IAON
+
+Cada tabela de palavras-chave (intenção -> palavras, em ordem de prioridade)
+é compilada uma única vez, na importação, em uma regex de alternância com
+formato de trie (prefixos comuns compartilhados). Uma só passada pelo texto
+encontra todas as palavras presentes, inclusive sobrepostas, com a mesma
+semântica de `palavra in texto` das cadeias de if/elif que ela substitui.
+"""
+
+import re
+from bisect import bisect_right
+
+
+def _trie_pattern(keywords):
+    """Alternância em forma de trie; no mesmo ponto do texto a palavra mais longa vence"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class IntentMatches:
+    """Resultado de uma classificação: palavras encontradas e intenções correspondentes"""
+
+    __slots__ = ('keywords', 'scores', '_order')
+
+    def __init__(self, keywords, scores, order):
+        self.keywords = keywords
+        self.scores = scores  # intenção -> quantidade de palavras distintas encontradas
+        self._order = order
+
+    def __contains__(self, intent):
+        return intent in self.scores
+
+    def __bool__(self):
+        return bool(self.scores)
+
+    @property
+    def intents(self):
+        """Intenções encontradas na ordem de prioridade da tabela"""
+        return sorted(self.scores, key=self._order.__getitem__)
+
+    def first(self, candidates=None):
+        """Primeira intenção encontrada pela prioridade da tabela (semântica do if/elif)"""
+        best = None
+        for intent in self.scores:
+            if candidates is not None and intent not in candidates:
+                continue
+            if best is None or self._order[intent] < self._order[best]:
+                best = intent
+        return best
+
+    def ranked(self, candidates=None):
+        """[(intenção, pontos)] por mais palavras encontradas; empate pela prioridade da tabela"""
+        items = [item for item in self.scores.items() if candidates is None or item[0] in candidates]
+        return sorted(items, key=lambda item: (-item[1], self._order[item[0]]))
+
+    def best(self, candidates=None):
+        """Intenção com mais palavras encontradas (None se nenhuma)"""
+        best = None
+        for intent, score in self.scores.items():
+            if candidates is not None and intent not in candidates:
+                continue
+            if best is None or (-score, self._order[intent]) < (-self.scores[best], self._order[best]):
+                best = intent
+        return best
+
+
+class IntentClassifier:
+    """Tabela de intenções compilada: [(intenção, [palavras-chave]), ...] em ordem de prioridade"""
+
+    def __init__(self, table):
+        table = list(table.items()) if isinstance(table, dict) else list(table)
+        self.order = {intent: position for position, (intent, _) in enumerate(table)}
+        self.intents_by_keyword = {}
+        for intent, keywords in table:
+            for keyword in keywords:
+                self.intents_by_keyword.setdefault(keyword.lower(), []).append(intent)
+
+        keywords = list(self.intents_by_keyword)
+        # Palavras contidas em outra: quando a mais longa casa, a menor também está no texto
+        self.implied = {}
+        for keyword in keywords:
+            contained = [other for other in keywords if other != keyword and other in keyword]
+            if contained:
+                self.implied[keyword] = contained
+        # Prioridade da melhor intenção de cada palavra (atalho de first())
+        self.keyword_priority = {
+            keyword: min(self.order[intent] for intent in intents)
+            for keyword, intents in self.intents_by_keyword.items()
+        }
+        self.intent_at = [intent for intent, _ in table]
+        # Prioridade de uma palavra contando as contidas nela (que first() também veria)
+        self.match_priority = {
+            keyword: min([priority] + [self.keyword_priority[other] for other in self.implied.get(keyword, ())])
+            for keyword, priority in self.keyword_priority.items()
+        }
+        self.pattern = re.compile(_trie_pattern(keywords)) if keywords else None
+
+    def find_keywords(self, text):
+        """Conjunto de palavras-chave presentes no texto (uma passada)"""
+        if not text or self.pattern is None:
+            return set()
+        text = text.lower()
+        search = self.pattern.search
+        found = set()
+        match = search(text)
+        while match:
+            found.add(match.group())
+            # Recomeçar logo após o início do trecho encontrado: palavras sobrepostas
+            # (que começam dentro dele e terminam depois) também são vistas
+            match = search(text, match.start() + 1)
+        if self.implied:
+            for keyword in [keyword for keyword in found if keyword in self.implied]:
+                found.update(self.implied[keyword])
+        return found
+
+    def classify(self, text):
+        keywords = self.find_keywords(text)
+        scores = {}
+        for keyword in keywords:
+            for intent in self.intents_by_keyword[keyword]:
+                scores[intent] = scores.get(intent, 0) + 1
+        return IntentMatches(keywords, scores, self.order)
+
+    def first(self, text, default=None, candidates=None):
+        """Primeira intenção encontrada pela prioridade da tabela"""
+        if candidates is not None:
+            intent = self.classify(text).first(candidates)
+            return default if intent is None else intent
+        keywords = self.find_keywords(text)
+        if not keywords:
+            return default
+        return self.intent_at[min(self.keyword_priority[keyword] for keyword in keywords)]
+
+    def first_many(self, texts, default=None):
+        """first() para uma lista de textos: textos repetidos são classificados uma vez e os
+        distintos, unidos por quebras de linha, em uma única passada da regex"""
+        unique = {}
+        for text in texts:
+            unique.setdefault((text or '').lower(), default)
+        if self.pattern is not None and unique:
+            keys = list(unique)
+            joined = '\n'.join(keys)  # Nenhuma palavra-chave tem quebra de linha: não há casamento entre textos
+            starts = [0]
+            for key in keys[:-1]:
+                starts.append(starts[-1] + len(key) + 1)
+            best = [None] * len(keys)
+            search = self.pattern.search
+            match = search(joined)
+            while match:
+                index = bisect_right(starts, match.start()) - 1
+                priority = self.match_priority[match.group()]
+                if best[index] is None or priority < best[index]:
+                    best[index] = priority
+                match = search(joined, match.start() + 1)
+            for key, priority in zip(keys, best):
+                if priority is not None:
+                    unique[key] = self.intent_at[priority]
+        return [unique[(text or '').lower()] for text in texts]
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fila de tarefas em segundo plano do IAON
+
+O trabalho que o usuário não precisa esperar (memória conversacional,
+lembretes de eventos, protocolo de emergência) é gravado como uma linha na
+tabela de tarefas, na mesma transação da requisição: se a requisição faz
+rollback a tarefa some junto, e tarefas gravadas sobrevivem a reinícios.
+
+Cada processo mantém um pool de threads que reivindica tarefas com um UPDATE
+condicional (status pending -> running), então vários workers do gunicorn
+podem consumir a mesma fila. Cada tipo de tarefa tem limite de execuções
+simultâneas, número máximo de tentativas e espera exponencial entre elas. O
+limite vale para todos os processos: o UPDATE que reivindica a tarefa só
+passa se o tipo tiver menos tarefas em running do que o limite (no
+PostgreSQL, duas reivindicações no mesmo instante ainda podem passar juntas;
+tarefas de um worker morto ocupam a vaga até recover_stale devolvê-las). A
+entrega é "pelo menos uma vez": os handlers devem tolerar ser executados de
+novo.
+
+Tarefas concluídas são apagadas depois de `retention_seconds` e as que
+falharam depois de `failed_retention_seconds` (ficam mais tempo para
+diagnóstico), na mesma rotina que recupera tarefas presas.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import aliased
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+STATUSES = (PENDING, RUNNING, DONE, FAILED)
+
+# Marca na sessão (por instância): tarefas adicionadas nesta transação (acordar os workers no commit)
+_SESSION_FLAG = 'job_queue_enqueued'
+PURGE_BATCH = 1000  # Linhas apagadas por DELETE na limpeza de tarefas antigas
+
+
+class JobType:
+    """Handler registrado para um tipo de tarefa e seus limites"""
+
+    __slots__ = ('name', 'handler', 'concurrency', 'max_attempts', 'backoff_seconds', 'max_backoff_seconds',
+                 'priority')
+
+    def __init__(self, name, handler, concurrency=1, max_attempts=3, backoff_seconds=5.0,
+                 max_backoff_seconds=600.0, priority=0):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.priority = priority
+
+    def retry_delay(self, attempts):
+        """Espera antes da próxima tentativa: backoff, 2x backoff, 4x backoff... até o máximo"""
+        return min(self.max_backoff_seconds, self.backoff_seconds * 2 ** max(0, attempts - 1))
+
+
+class JobMetrics:
+    """Contadores de um tipo de tarefa neste processo"""
+
+    __slots__ = ('enqueued', 'started', 'succeeded', 'retried', 'failed', 'running',
+                 'run_seconds', 'max_run_seconds', 'wait_seconds')
+
+    def __init__(self):
+        self.enqueued = self.started = self.succeeded = self.retried = self.failed = self.running = 0
+        self.run_seconds = self.max_run_seconds = self.wait_seconds = 0.0
+
+    def to_dict(self):
+        finished = self.succeeded + self.retried + self.failed
+        return {
+            'enqueued': self.enqueued,
+            'started': self.started,
+            'succeeded': self.succeeded,
+            'retried': self.retried,
+            'failed': self.failed,
+            'running': self.running,
+            'avg_run_ms': round(self.run_seconds / finished * 1000, 2) if finished else None,
+            'max_run_ms': round(self.max_run_seconds * 1000, 2),
+            'avg_wait_ms': round(self.wait_seconds / self.started * 1000, 2) if self.started else None
+        }
+
+
+class JobQueue:
+    """Fila persistente (tabela `model`) com pool de threads por processo"""
+
+    def __init__(self, app, db, model, workers=4, poll_interval=1.0, stale_seconds=600,
+                 retention_seconds=7 * 86400, failed_retention_seconds=30 * 86400):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_seconds = stale_seconds
+        self.retention_seconds = retention_seconds
+        self.failed_retention_seconds = failed_retention_seconds
+        self.types = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._last_recovery = 0.0
+        self._session_flag = f'{_SESSION_FLAG}:{id(self)}'
+
+        event.listen(db.session, 'after_commit', self._after_commit)
+        event.listen(db.session, 'after_rollback', self._after_rollback)
+
+    # ---------- registro e enfileiramento ----------
+
+    def handler(self, name, **options):
+        """Decorador: registra `function(payload)` como handler do tipo `name`"""
+        def register(function):
+            self.types[name] = JobType(name, function, **options)
+            self.stats.setdefault(name, JobMetrics())
+            return function
+        return register
+
+    def enqueue(self, name, payload=None, delay=0, priority=None):
+        """Adicionar uma tarefa à sessão atual; ela é gravada (e executada) com o commit da requisição"""
+        job_type = self.types[name]
+        job = self.model(
+            job_type=name,
+            payload=json.dumps(payload or {}),
+            status=PENDING,
+            priority=job_type.priority if priority is None else priority,
+            max_attempts=job_type.max_attempts,
+            run_after=datetime.utcnow() + timedelta(seconds=delay)
+        )
+        self.db.session.add(job)
+        self.db.session.info[self._session_flag] = True
+        with self._lock:
+            self.stats[name].enqueued += 1
+        self.start()
+        return job
+
+    def _after_commit(self, session):
+        if session.info.pop(self._session_flag, False):
+            self._wakeup.set()
+
+    def _after_rollback(self, session):
+        session.info.pop(self._session_flag, None)
+
+    # ---------- workers ----------
+
+    def start(self):
+        """Iniciar o pool deste processo (no fork do worker, na primeira requisição ou na primeira tarefa)"""
+        if self.workers <= 0:
+            return False
+        pid = os.getpid()
+        if self._pid == pid and all(thread.is_alive() for thread in self._threads):
+            return False
+        with self._lock:
+            if self._pid == pid and all(thread.is_alive() for thread in self._threads):
+                return False
+            # Depois de um fork as threads do processo pai não existem aqui
+            self._pid = pid
+            self._stopping.clear()
+            self._threads = [
+                threading.Thread(target=self._worker, name=f'iaon-jobs-{index}', daemon=True)
+                for index in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+        return True
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._pid = None
+
+    def _worker(self):
+        worker_id = f'{os.getpid()}:{threading.current_thread().name}'
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    ran = self.run_next(worker_id)
+                    if not ran:
+                        self._recover_if_due()
+            except Exception as e:
+                print(f"⚠️ Erro no worker de tarefas: {e}")
+                ran = False
+            if not ran:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    # ---------- execução ----------
+
+    def _free_types(self):
+        """Tipos com vaga neste processo e no total de tarefas em running (todos os processos)"""
+        model = self.model
+        running = dict(self.db.session.query(model.job_type, func.count(model.id))
+                       .filter(model.status == RUNNING).group_by(model.job_type).all())
+        with self._lock:
+            return [name for name, job_type in self.types.items()
+                    if self.stats[name].running < job_type.concurrency
+                    and running.get(name, 0) < job_type.concurrency]
+
+    def _reserve(self, name):
+        with self._lock:
+            if self.stats[name].running >= self.types[name].concurrency:
+                return False
+            self.stats[name].running += 1
+            return True
+
+    def _release(self, name):
+        with self._lock:
+            self.stats[name].running -= 1
+
+    def _claim(self, worker_id):
+        """Reivindicar a próxima tarefa pronta de um tipo com vaga; None se não houver"""
+        model = self.model
+        session = self.db.session
+        for _ in range(5):  # Outro worker pode levar a tarefa entre o SELECT e o UPDATE
+            free_types = self._free_types()
+            if not free_types:
+                return None
+            now = datetime.utcnow()
+            candidate = session.query(model.id, model.job_type)\
+                .filter(model.status == PENDING, model.run_after <= now, model.job_type.in_(free_types))\
+                .order_by(model.priority.desc(), model.run_after, model.id).first()
+            session.commit()
+            if candidate is None:
+                return None
+            if not self._reserve(candidate.job_type):
+                continue
+            try:
+                other = aliased(model)
+                running = select(func.count(other.id))\
+                    .where(other.job_type == candidate.job_type, other.status == RUNNING).scalar_subquery()
+                claimed = session.query(model).filter(
+                    model.id == candidate.id, model.status == PENDING,
+                    running < self.types[candidate.job_type].concurrency  # Limite entre processos
+                ).update({
+                    model.status: RUNNING,
+                    model.attempts: model.attempts + 1,
+                    model.locked_by: worker_id,
+                    model.started_at: now
+                }, synchronize_session=False)
+                session.commit()
+                if claimed:
+                    return session.get(model, candidate.id)
+            except Exception:
+                session.rollback()
+                self._release(candidate.job_type)  # Vaga do processo volta mesmo se o commit falhar
+                raise
+            self._release(candidate.job_type)
+        return None
+
+    def run_next(self, worker_id='inline'):
+        """Executar uma tarefa pronta (dentro de um app context); False se não havia nenhuma"""
+        job = self._claim(worker_id)
+        if job is None:
+            return False
+        name = job.job_type
+        job_type = self.types[name]
+        metrics = self.stats[name]
+        with self._lock:
+            metrics.started += 1
+            metrics.wait_seconds += max(0.0, (job.started_at - job.run_after).total_seconds())
+
+        session = self.db.session
+        try:
+            started = time.monotonic()
+            try:
+                job_type.handler(json.loads(job.payload or '{}'))
+                session.commit()
+                error = None
+            except Exception as e:
+                session.rollback()
+                error = f'{type(e).__name__}: {e}'
+            elapsed = time.monotonic() - started
+            outcome = self._finish(session.get(self.model, job.id), job_type, error)
+        finally:
+            self._release(name)
+
+        with self._lock:
+            setattr(metrics, outcome, getattr(metrics, outcome) + 1)
+            metrics.run_seconds += elapsed
+            metrics.max_run_seconds = max(metrics.max_run_seconds, elapsed)
+        return True
+
+    def _finish(self, job, job_type, error):
+        """Gravar o resultado da tentativa: done, nova tentativa com espera, ou failed"""
+        job.locked_by = None
+        if error is None:
+            job.status = DONE
+            job.finished_at = datetime.utcnow()
+            job.last_error = None
+            outcome = 'succeeded'
+        elif job.attempts < job.max_attempts:
+            job.status = PENDING
+            job.run_after = datetime.utcnow() + timedelta(seconds=job_type.retry_delay(job.attempts))
+            job.last_error = error
+            outcome = 'retried'
+        else:
+            job.status = FAILED
+            job.finished_at = datetime.utcnow()
+            job.last_error = error
+            outcome = 'failed'
+            print(f"❌ Tarefa {job.job_type} #{job.id} falhou após {job.attempts} tentativas: {error}")
+        self.db.session.commit()
+        return outcome
+
+    def run_pending(self, limit=None):
+        """Executar no thread atual todas as tarefas prontas (testes e processos sem workers)"""
+        ran = 0
+        while (limit is None or ran < limit) and self.run_next():
+            ran += 1
+        return ran
+
+    def recover_stale(self):
+        """Devolver à fila tarefas presas em running (worker morto ou reiniciado)"""
+        model = self.model
+        limit = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        recovered = self.db.session.query(model).filter(model.status == RUNNING, model.started_at < limit).update({
+            model.status: PENDING,
+            model.locked_by: None,
+            model.run_after: datetime.utcnow()
+        }, synchronize_session=False)
+        self.db.session.commit()
+        return recovered
+
+    def purge_finished(self):
+        """Apagar tarefas concluídas e falhas mais antigas que a retenção; retorna quantas"""
+        model = self.model
+        session = self.db.session
+        now = datetime.utcnow()
+        purged = 0
+        for status, seconds in ((DONE, self.retention_seconds), (FAILED, self.failed_retention_seconds)):
+            limit = now - timedelta(seconds=seconds)
+            while True:
+                ids = [row.id for row in session.query(model.id).filter(
+                    model.status == status, model.finished_at < limit).limit(PURGE_BATCH)]
+                if ids:
+                    session.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+                session.commit()
+                purged += len(ids)
+                if len(ids) < PURGE_BATCH:
+                    break
+        return purged
+
+    def _recover_if_due(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._last_recovery and now - self._last_recovery < self.stale_seconds / 2:
+                return
+            self._last_recovery = now
+        self.recover_stale()
+        self.purge_finished()
+
+    # ---------- métricas ----------
+
+    def metrics(self):
+        """Contadores deste processo + tamanho da fila por tipo e status (todas as instâncias)"""
+        model = self.model
+        rows = self.db.session.query(model.job_type, model.status, self.db.func.count(model.id))\
+            .group_by(model.job_type, model.status).all()
+        queue = {}
+        for name, status, count in rows:
+            queue.setdefault(name, {status_name: 0 for status_name in STATUSES})[status] = count
+        oldest = self.db.session.query(self.db.func.min(model.run_after))\
+            .filter(model.status == PENDING, model.run_after <= datetime.utcnow()).scalar()
+
+        with self._lock:
+            types = {
+                name: dict(self.stats[name].to_dict(), concurrency=job_type.concurrency,
+                           max_attempts=job_type.max_attempts)
+                for name, job_type in self.types.items()
+            }
+        return {
+            'workers': self.workers,
+            'workers_alive': sum(1 for thread in self._threads if thread.is_alive()),
+            'types': types,
+            'queue': queue,
+            'oldest_ready_seconds': round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else 0
+        }
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Saldos das contas financeiras do IAON como razão (ledger)
+
+As transações são a fonte da verdade e só são acrescentadas; o saldo da
+conta é uma soma mantida junto delas:
+- no before_flush, cada transação nova (ou alterada/excluída) vira um delta
+  por conta, aplicado como `saldo = saldo + delta` em um UPDATE atômico na
+  mesma transação do INSERT. Não há leitura do saldo antes da escrita, então
+  escritores simultâneos na mesma conta não perdem atualizações, e o
+  bloqueio de linha dura só do UPDATE ao commit (contas em ordem de id, sem
+  deadlock entre flushes que tocam várias contas)
+- checkpoints periódicos gravam (saldo, última transação) por conta. O
+  saldo guardado é conferido contra o último checkpoint mais as transações
+  posteriores, divergências (escritas em lote fora da sessão, edição manual)
+  são corrigidas com um delta e um novo checkpoint é acrescentado; o custo é
+  proporcional às transações desde o último, não ao histórico inteiro
+
+A leitura do saldo (lista de contas) é a coluna da própria conta, O(1).
+
+Transações mais novas que settle_seconds ficam fora do checkpoint (um commit
+atrasado com id menor não escapa da soma); entram no seguinte.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, bindparam, case, event, func, inspect, select
+
+from db_upsert import flush_changes, track_old_values
+
+SIGNED_FIELDS = ('account_id', 'transaction_type', 'amount', 'status')
+TOLERANCE = 0.005  # Meio centavo: diferenças menores são arredondamento de float
+
+
+def signed_amount(values):
+    """Efeito de uma transação no saldo: receita soma, despesa subtrai; transferência e cancelada não mudam"""
+    if values.get('status') == 'cancelled' or not values.get('amount'):
+        return 0.0
+    if values.get('transaction_type') == 'income':
+        return float(values['amount'])
+    if values.get('transaction_type') == 'expense':
+        return -float(values['amount'])
+    return 0.0
+
+
+class BalanceLedger:
+    """Saldos mantidos por deltas atômicos e conferidos por checkpoints"""
+
+    def __init__(self, db, account_model, transaction_model, checkpoint_model, batch_size=500, settle_seconds=60):
+        self.db = db
+        self.accounts = account_model
+        self.transactions = transaction_model
+        self.checkpoints = checkpoint_model
+        self.batch_size = batch_size
+        self.settle_seconds = settle_seconds
+        self.checkpointed_at = None
+        self.last_corrections = 0
+        track_old_values(transaction_model, SIGNED_FIELDS)
+        event.listen(db.session, 'before_flush', self._before_flush)
+        event.listen(db.session, 'after_flush', self._after_flush)
+
+    # ---------- escrita ----------
+
+    def _before_flush(self, session, flush_context, instances):
+        deltas = Counter()
+        fields_for = lambda obj: SIGNED_FIELDS if isinstance(obj, self.transactions) else None
+        for _, values, sign in flush_changes(session, fields_for):
+            deltas[values['account_id']] += sign * signed_amount(values)
+        self.apply(session, deltas)
+
+    def _after_flush(self, session, flush_context):
+        # Conta nova: checkpoint de abertura com o saldo inicial (transações começam do zero)
+        rows = [{'account_id': obj.id, 'current_balance': obj.current_balance or 0.0,
+                 'available_balance': obj.available_balance or 0.0, 'last_transaction_id': 0,
+                 'transaction_count': 0, 'created_at': datetime.utcnow()}
+                for obj in session.new if isinstance(obj, self.accounts) and obj.id is not None]
+        if rows:
+            session.execute(self.checkpoints.__table__.insert(), rows)
+
+    def apply(self, session, deltas):
+        """Somar deltas aos saldos: UPDATE conta SET saldo = saldo + :delta (em ordem de id)"""
+        rows = [{'b_id': account_id, 'b_delta': delta}
+                for account_id, delta in sorted(deltas.items(), key=lambda item: item[0]) if account_id and delta]
+        if not rows:
+            return 0
+        table = self.accounts.__table__
+        session.execute(
+            table.update().where(table.c.id == bindparam('b_id')).values(
+                current_balance=func.coalesce(table.c.current_balance, 0.0) + bindparam('b_delta'),
+                available_balance=func.coalesce(table.c.available_balance, 0.0) + bindparam('b_delta'),
+                updated_at=datetime.utcnow()
+            ),
+            rows
+        )
+        # Contas carregadas nesta sessão: o saldo em memória ficou velho (e não pode sobrescrever o delta)
+        for account_id in deltas:
+            account = session.identity_map.get(inspect(self.accounts).identity_key_from_primary_key((account_id,)))
+            if account is not None:
+                session.expire(account, ['current_balance', 'available_balance'])
+        return len(rows)
+
+    # ---------- checkpoints ----------
+
+    def _pending(self, session, account_ids, settled_before):
+        """Por conta: saldo guardado, último checkpoint e somas das transações posteriores (uma consulta)"""
+        accounts = self.accounts.__table__
+        checkpoints = self.checkpoints.__table__
+        transactions = self.transactions.__table__
+        latest = select(checkpoints.c.account_id, func.max(checkpoints.c.id).label('checkpoint_id')) \
+            .where(checkpoints.c.account_id.in_(account_ids)).group_by(checkpoints.c.account_id).subquery()
+        checkpoint = checkpoints.alias('checkpoint')
+        signed = case(
+            (transactions.c.status == 'cancelled', 0.0),
+            (transactions.c.transaction_type == 'income', transactions.c.amount),
+            (transactions.c.transaction_type == 'expense', -transactions.c.amount),
+            else_=0.0
+        )
+        after = and_(transactions.c.account_id == accounts.c.id,
+                     transactions.c.id > func.coalesce(checkpoint.c.last_transaction_id, 0))
+        settled = and_(after, transactions.c.created_at < settled_before)
+        statement = select(
+            accounts.c.id,
+            accounts.c.current_balance,
+            accounts.c.available_balance,
+            checkpoint.c.current_balance.label('checkpoint_balance'),
+            checkpoint.c.available_balance.label('checkpoint_available'),
+            checkpoint.c.last_transaction_id,
+            checkpoint.c.transaction_count,
+            select(func.coalesce(func.sum(signed), 0.0)).where(after).scalar_subquery().label('pending'),
+            select(func.coalesce(func.sum(signed), 0.0)).where(settled).scalar_subquery().label('settled'),
+            select(func.max(transactions.c.id)).where(settled).scalar_subquery().label('settled_last_id'),
+            select(func.count()).where(settled).scalar_subquery().label('settled_count')
+        ).select_from(
+            accounts.outerjoin(latest, latest.c.account_id == accounts.c.id)
+            .outerjoin(checkpoint, checkpoint.c.id == latest.c.checkpoint_id)
+        ).where(accounts.c.id.in_(account_ids))
+        return session.execute(statement).all()
+
+    def checkpoint(self, session, account_ids=None, now=None):
+        """Conferir e corrigir saldos e acrescentar checkpoints; retorna contagens"""
+        now = now or datetime.utcnow()
+        settled_before = now - timedelta(seconds=self.settle_seconds)
+        accounts = self.accounts.__table__
+        if account_ids is None:
+            account_ids = [row[0] for row in session.execute(select(accounts.c.id).order_by(accounts.c.id))]
+        result = {'accounts': 0, 'checkpoints': 0, 'corrections': 0, 'opened': 0}
+        for start in range(0, len(account_ids), self.batch_size):
+            batch = account_ids[start:start + self.batch_size]
+            corrections, rows = Counter(), []
+            for row in self._pending(session, batch, settled_before):
+                result['accounts'] += 1
+                current = row.current_balance or 0.0
+                if row.checkpoint_balance is None:
+                    # Conta sem checkpoint (criada antes do razão ou fora da sessão): confia no saldo guardado
+                    unsettled = row.pending - row.settled
+                    rows.append(self._opening(row.id, current - unsettled, (row.available_balance or 0.0) - unsettled,
+                                              row.settled_last_id, row.settled_count, now))
+                    result['opened'] += 1
+                    continue
+                drift = row.checkpoint_balance + row.pending - current
+                if abs(drift) > TOLERANCE:
+                    corrections[row.id] += drift
+                if row.settled_last_id is not None:
+                    rows.append({
+                        'account_id': row.id,
+                        'current_balance': row.checkpoint_balance + row.settled,
+                        'available_balance': (row.checkpoint_available or 0.0) + row.settled,
+                        'last_transaction_id': row.settled_last_id,
+                        'transaction_count': (row.transaction_count or 0) + row.settled_count,
+                        'created_at': now
+                    })
+            self.apply(session, corrections)
+            if rows:
+                session.execute(self.checkpoints.__table__.insert(), rows)
+            result['checkpoints'] += len(rows)
+            result['corrections'] += len(corrections)
+            session.commit()
+        self.checkpointed_at = now
+        self.last_corrections = result['corrections']
+        return result
+
+    def _opening(self, account_id, balance, available, last_transaction_id, count, now):
+        return {'account_id': account_id, 'current_balance': balance, 'available_balance': available,
+                'last_transaction_id': last_transaction_id or 0, 'transaction_count': count or 0, 'created_at': now}
+
+    def rebase(self, session, account_ids):
+        """Aceitar os saldos guardados como corretos (ex.: contas restauradas de um backup)"""
+        transactions = self.transactions.__table__
+        last = dict(session.execute(
+            select(transactions.c.account_id, func.max(transactions.c.id))
+            .where(transactions.c.account_id.in_(account_ids)).group_by(transactions.c.account_id)
+        ).all()) if account_ids else {}
+        accounts = self.accounts.__table__
+        rows = [self._opening(row.id, row.current_balance or 0.0, row.available_balance or 0.0, last.get(row.id), 0,
+                              datetime.utcnow())
+                for row in session.execute(select(accounts.c.id, accounts.c.current_balance, accounts.c.available_balance)
+                                           .where(accounts.c.id.in_(account_ids)))] if account_ids else []
+        if rows:
+            session.execute(self.checkpoints.__table__.insert(), rows)
+        return len(rows)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agregados pré-calculados das métricas administrativas do IAON
+
+Cada modelo de origem (usuários, assinaturas, reuniões, sessões de coaching)
+registra uma função que diz com o que uma linha contribui: tuplas
+(métrica, período, instante, dimensão, valor). Período 'total' é um contador
+geral; 'day' e 'hour' somam no balde do instante (UTC).
+
+No before_flush, inserções somam a contribuição, exclusões subtraem e
+alterações somam a nova e subtraem a antiga, tudo aplicado como
+`valor = valor + delta` (upsert) na mesma transação da escrita. Os dashboards
+leem só as linhas agregadas.
+
+Escritas que não passam pela sessão (UPDATE/INSERT em massa, outro sistema
+gravando no banco) não são vistas: reconcile() recalcula tudo a partir das
+tabelas de origem e corrige só as linhas divergentes. O recálculo e a leitura
+dos agregados usam o mesmo instante do banco (consistent_read), então uma
+escrita confirmada durante a reconciliação não é tomada por divergência.
+
+DailyCounters segue a mesma ideia para contadores por usuário: uma linha por
+(usuário, dia) com uma coluna por contador, lida como soma de uma janela de
+dias pelo índice (user_id, day).
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from db_upsert import consistent_read, flush_changes, track_old_values, upsert_add
+
+TOTAL, DAY, HOUR = 'total', 'day', 'hour'
+PERIODS = (TOTAL, DAY, HOUR)
+
+_BUCKET_FORMATS = {DAY: '%Y-%m-%d', HOUR: '%Y-%m-%dT%H'}
+
+
+def bucket_for(period, when):
+    """Balde de um instante: '' (total), 'AAAA-MM-DD' (dia) ou 'AAAA-MM-DDTHH' (hora)"""
+    if period == TOTAL:
+        return ''
+    if when is None:
+        return None
+    return when.strftime(_BUCKET_FORMATS[period])
+
+
+def timeline(metric, when, dimension='', value=1):
+    """Contribuição para os baldes de dia e de hora de um instante"""
+    return [(metric, DAY, when, dimension, value), (metric, HOUR, when, dimension, value)]
+
+
+class MetricRollups:
+    """Contadores agregados mantidos a cada flush e reconciliados periodicamente"""
+
+    def __init__(self, db, model, batch_size=5000):
+        self.db = db
+        self.model = model
+        self.batch_size = batch_size
+        self.sources = {}  # modelo -> (campos, função de contribuição)
+        self.reconciled_at = None
+        self.last_corrections = 0
+        event.listen(db.session, 'before_flush', self._before_flush)
+
+    # ---------- origens ----------
+
+    def source(self, model, fields):
+        """Registrar `função(valores) -> [(métrica, período, instante, dimensão, valor)]` para um modelo"""
+        def decorator(function):
+            self.sources[model] = (tuple(fields), function)
+            track_old_values(model, fields)
+            return function
+        return decorator
+
+    def contributions(self, model, values, sign=1, deltas=None):
+        """Somar em `deltas` o que uma linha contribui: {(métrica, período, balde, dimensão): valor}"""
+        deltas = Counter() if deltas is None else deltas
+        for metric, period, when, dimension, value in self.sources[model][1](values):
+            bucket = bucket_for(period, when)
+            if bucket is not None and value:
+                deltas[(metric, period, bucket, str(dimension or ''))] += sign * value
+        return deltas
+
+    @staticmethod
+    def _apply_defaults(obj, fields):
+        # Padrões da coluna (created_at, status...) só entrariam no INSERT; aplicá-los já
+        table = type(obj).__table__
+        for field in fields:
+            column = table.c.get(field)
+            if getattr(obj, field) is not None or column is None or column.default is None:
+                continue
+            default = column.default
+            if default.is_scalar:
+                setattr(obj, field, default.arg)
+            elif default.is_callable:
+                setattr(obj, field, default.arg(None))
+
+    def _fields(self, obj):
+        entry = self.sources.get(type(obj))
+        return entry[0] if entry else None
+
+    def _before_flush(self, session, flush_context, instances):
+        deltas = Counter()
+        for obj, values, sign in flush_changes(session, self._fields, on_new=self._apply_defaults):
+            self.contributions(type(obj), values, sign, deltas)
+        self.apply(session, deltas)
+
+    # ---------- escrita ----------
+
+    def apply(self, session, deltas):
+        """Somar deltas às linhas agregadas (upsert `valor = valor + delta`)"""
+        rows = [{'metric': metric, 'period': period, 'bucket': bucket, 'dimension': dimension,
+                 'value': value, 'updated_at': datetime.utcnow()}
+                for (metric, period, bucket, dimension), value in deltas.items() if value]
+        return upsert_add(session, self.model.__table__, ('metric', 'period', 'bucket', 'dimension'), rows,
+                          added=('value',), replaced=('updated_at',))
+
+    def recompute(self, session):
+        """Agregados esperados, recalculados das tabelas de origem (só os campos registrados)"""
+        expected = Counter()
+        for model, (fields, _) in self.sources.items():
+            columns = [getattr(model, field) for field in fields]
+            for row in session.query(*columns).execution_options(yield_per=self.batch_size):
+                self.contributions(model, dict(zip(fields, row)), 1, expected)
+        return +expected  # Sem zeros
+
+    def reconcile(self, session):
+        """Corrigir as linhas que divergem do recálculo; retorna quantas mudaram"""
+        table = self.model.__table__
+        with consistent_read(session) as reader:
+            expected = self.recompute(reader)
+            current = {(row.metric, row.period, row.bucket, row.dimension): row.value
+                       for row in reader.execute(table.select())}
+        corrections = Counter({key: expected.get(key, 0) - value for key, value in current.items()})
+        corrections.update({key: value for key, value in expected.items() if key not in current})
+        corrections = Counter({key: delta for key, delta in corrections.items() if abs(delta) > 1e-6})
+        self.apply(session, corrections)
+        session.execute(table.delete().where(table.c.value == 0))
+        self.reconciled_at = datetime.utcnow()
+        self.last_corrections = len(corrections)
+        return len(corrections)
+
+    # ---------- leitura ----------
+
+    def totals(self, session, metric):
+        """Contador geral por dimensão: {dimensão: valor}"""
+        table = self.model.__table__
+        rows = session.execute(table.select().with_only_columns(table.c.dimension, table.c.value).where(
+            (table.c.metric == metric) & (table.c.period == TOTAL) & (table.c.bucket == '')))
+        return {row.dimension: row.value for row in rows}
+
+    def total(self, session, metric, dimension=None):
+        values = self.totals(session, metric)
+        return values.get(dimension, 0) if dimension is not None else sum(values.values())
+
+    def series(self, session, metric, period, since, until=None):
+        """Valores por balde (todas as dimensões somadas) a partir de `since`"""
+        table = self.model.__table__
+        condition = (table.c.metric == metric) & (table.c.period == period) & \
+                    (table.c.bucket >= bucket_for(period, since))
+        if until is not None:
+            condition &= table.c.bucket < bucket_for(period, until)
+        rows = session.execute(table.select().with_only_columns(table.c.bucket, table.c.value).where(condition))
+        series = Counter()
+        for row in rows:
+            series[row.bucket] += row.value
+        return dict(sorted(series.items()))
+
+    def window(self, session, metric, period, since):
+        """Soma dos baldes desde `since` (janela móvel com a precisão do período)"""
+        return sum(self.series(session, metric, period, since).values())
+
+
+class DailyCounters:
+    """Contadores diários por usuário: uma linha por (usuário, dia), uma coluna por contador"""
+
+    def __init__(self, db, model, counters):
+        self.db = db
+        self.model = model
+        self.counters = tuple(counters)
+        self.sources = {}  # modelo -> (contador, campo do usuário, campo do instante)
+        event.listen(db.session, 'before_flush', self._before_flush)
+
+    def source(self, model, counter, user_field='user_id', time_field='created_at'):
+        """Cada linha inserida de `model` soma 1 em `counter` no dia de `time_field` (exclusões subtraem)"""
+        self.sources[model] = (counter, user_field, time_field)
+
+    def contributions(self, model, values, sign=1, deltas=None):
+        """Somar em `deltas` o que uma linha de `model` conta: {(usuário, dia, contador): valor}"""
+        deltas = Counter() if deltas is None else deltas
+        counter, user_field, time_field = self.sources[model]
+        user_id, when = values.get(user_field), values.get(time_field)
+        if user_id is not None and when is not None:
+            deltas[(user_id, when.date(), counter)] += sign
+        return deltas
+
+    def _before_flush(self, session, flush_context, instances):
+        deltas = Counter()
+        for objects, sign in ((session.new, 1), (session.deleted, -1)):
+            for obj in objects:
+                entry = self.sources.get(type(obj))
+                if not entry:
+                    continue
+                _, user_field, time_field = entry
+                if sign > 0:
+                    MetricRollups._apply_defaults(obj, (time_field,))
+                values = {user_field: getattr(obj, user_field), time_field: getattr(obj, time_field)}
+                self.contributions(type(obj), values, sign, deltas)
+        self.apply(session, deltas)
+
+    def record(self, session, user_id, counter, amount=1, when=None):
+        """Contar uma atividade sem linha de origem (ex.: comando de voz) na transação atual"""
+        self.apply(session, Counter({(user_id, (when or datetime.utcnow()).date(), counter): amount}))
+
+    def apply(self, session, deltas, replace=False):
+        """Upsert por (usuário, dia): `coluna = coluna + delta` (ou `= valor` com replace)"""
+        rows = {}
+        for (user_id, day, counter), value in deltas.items():
+            if value or replace:
+                row = rows.setdefault((user_id, day), dict({name: 0 for name in self.counters},
+                                                           user_id=user_id, day=day))
+                row[counter] += value
+        touched = sorted({counter for (_, _, counter) in deltas})
+        return upsert_add(session, self.model.__table__, ('user_id', 'day'), list(rows.values()),
+                          added=() if replace else touched, replaced=touched if replace else ())
+
+    def window(self, session, user_id, days, today=None):
+        """Soma dos últimos `days` dias (incluindo hoje) com uma leitura pelo índice (user_id, day)"""
+        table = self.model.__table__
+        today = today or datetime.utcnow().date()
+        row = session.execute(
+            table.select().with_only_columns(*[self.db.func.coalesce(self.db.func.sum(table.c[name]), 0)
+                                               for name in self.counters])
+            .where((table.c.user_id == user_id) & (table.c.day > today - timedelta(days=days)))
+        ).one()
+        return {name: int(value) for name, value in zip(self.counters, row)}
+
+    def rebuild(self, session):
+        """Recalcular das tabelas de origem os contadores que têm origem (os outros são mantidos)"""
+        table = self.model.__table__
+        counters = sorted({entry[0] for entry in self.sources.values()})
+        session.execute(table.update().values({name: 0 for name in counters}))
+        expected = Counter()
+        for model, (counter, user_field, time_field) in self.sources.items():
+            day = self.db.func.date(getattr(model, time_field))
+            rows = session.query(getattr(model, user_field), day, self.db.func.count()) \
+                .filter(getattr(model, time_field).isnot(None)).group_by(getattr(model, user_field), day)
+            for user_id, bucket, count in rows:
+                if isinstance(bucket, str):
+                    bucket = datetime.strptime(bucket, '%Y-%m-%d').date()
+                expected[(user_id, bucket, counter)] += count
+        self.apply(session, expected, replace=True)
+        return len(expected)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Migração de índices do IAON
+
+Cria as tabelas que faltarem e aplica, em um banco já existente (SQLite local
+ou PostgreSQL no Railway), os índices compostos declarados nos modelos e o
+índice de busca textual da memória conversacional (FTS5 / GIN) e as
+colunas de agregados das reuniões, além de preencher os agregados do
+dashboard administrativo.
+Pode ser executado várias vezes: índices existentes são ignorados.
+
+Uso:
+    DATABASE_URL=postgresql://... python migrate_indexes.py
+"""
+
+from app import (app, db, apply_index_migrations, ensure_memory_search_index, ensure_meeting_statistics,
+                 ensure_metric_rollups, ensure_user_activity_counters, schedule_metrics_reconciliation,
+                 merge_duplicate_contacts)
+
+def migrate():
+    print("🏗️ Aplicando migração de índices...")
+    
+    with app.app_context():
+        db.create_all()
+        merge_duplicate_contacts()  # Necessário para o índice único (user_id, phone_number)
+        created = apply_index_migrations()
+        ensure_memory_search_index()
+        ensure_meeting_statistics()  # Colunas de agregados das reuniões
+        ensure_metric_rollups()  # Agregados do dashboard administrativo
+        ensure_user_activity_counters()  # Atividade diária por usuário
+        schedule_metrics_reconciliation()
+    
+    if created:
+        print(f"\n🎉 {len(created)} índice(s) criado(s)")
+    else:
+        print("\n✅ Banco já possui todos os índices")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agendador de notificações do IAON
+
+Mantém em um heap ordenado por horário (scheduled_for, id) só as notificações
+pendentes que vencem dentro do horizonte (15 minutos por padrão). O heap é
+carregado por faixas do índice (status, scheduled_for): na partida tudo o que
+vence até o horizonte (inclusive atrasadas) e depois só a faixa seguinte,
+conforme o horizonte avança. Notificações gravadas por este processo entram
+no heap no commit; as gravadas por outros processos dentro de uma faixa já
+carregada são pegas pela varredura de atrasadas, que também só lê uma faixa
+do índice. Nenhuma etapa percorre a tabela inteira.
+
+Notificações vencidas são reivindicadas em lote com um UPDATE condicional
+(pending -> sending) e entregues pelo canal do seu delivery_method. Vários
+processos podem rodar o agendador sem entregar a mesma notificação duas vezes.
+Lembretes vencidos há mais de `max_delay_seconds` (1 dia) viram expired em vez
+de serem entregues fora de hora.
+"""
+
+import heapq
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event, update
+
+PENDING, SENDING, SENT, FAILED, EXPIRED = 'pending', 'sending', 'sent', 'failed', 'expired'
+
+# Chave na sessão (por instância): notificações agendadas gravadas nesta transação
+_SESSION_KEY = 'notification_scheduler_pending'
+
+
+def naive_utc(value):
+    """Horário com fuso (ex.: '...Z' do toISOString) convertido para UTC sem fuso, como o resto do banco"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class LogChannel:
+    """Canal padrão: registra o envio no log (integração real de push/email/SMS entra aqui)"""
+
+    def __call__(self, notifications):
+        for notification in notifications:
+            print(f"📱 Notificação enviada: {notification.title}")
+
+
+class MemoryChannel:
+    """Canal local que guarda as notificações entregues (testes e desenvolvimento)"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+
+    def __call__(self, notifications):
+        if self.fail:
+            raise RuntimeError('canal indisponível')
+        self.sent.extend(notifications)
+
+
+class NotificationScheduler:
+    """Heap de notificações pendentes + thread de despacho por processo"""
+
+    def __init__(self, app, db, model, horizon_seconds=900, sweep_seconds=5.0, batch_size=200,
+                 stale_seconds=600, max_delay_seconds=86400, enabled=True):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.horizon = timedelta(seconds=horizon_seconds)
+        self.sweep_seconds = sweep_seconds
+        self.batch_size = batch_size
+        self.stale = timedelta(seconds=stale_seconds)
+        self.max_delay = timedelta(seconds=max_delay_seconds)
+        self.enabled = enabled
+        self.channels = {}
+        self.default_channel = LogChannel()
+
+        self._heap = []  # (scheduled_for, id)
+        self._loaded_until = None  # Faixa do índice já carregada no heap
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._session_key = f'{_SESSION_KEY}:{id(self)}'
+
+        # Métricas
+        self.dispatched = 0
+        self.failed = 0
+        self.expired = 0
+        self.batches = 0
+        self.by_channel = {}
+        self._lags = deque(maxlen=1000)  # Atraso (s) das últimas entregas
+        self._recent = deque()  # (instante, quantidade) do último minuto
+        self._max_lag = 0.0
+
+        event.listen(db.session, 'after_flush', self._after_flush)
+        event.listen(db.session, 'after_commit', self._after_commit)
+        event.listen(db.session, 'after_rollback', self._after_rollback)
+
+    # ---------- canais ----------
+
+    def register_channel(self, delivery_method, channel):
+        """Canal `channel(notificações)` para um delivery_method (push, email, sms, voice)"""
+        self.channels[delivery_method] = channel
+
+    def channel_for(self, delivery_method):
+        return self.channels.get(delivery_method, self.default_channel)
+
+    # ---------- heap ----------
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _push_many(self, entries):
+        with self._lock:
+            limit = self._loaded_until
+            earliest = self._heap[0][0] if self._heap else None
+            for scheduled_for, notification_id in entries:
+                # Além do horizonte a notificação entra quando a faixa dela for carregada
+                if limit is None or scheduled_for < limit:
+                    heapq.heappush(self._heap, (scheduled_for, notification_id))
+            woke = self._heap and (earliest is None or self._heap[0][0] < earliest)
+        if woke:
+            self._wakeup.set()
+
+    def _pop_due(self, now):
+        with self._lock:
+            due = []
+            while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                due.append(heapq.heappop(self._heap)[1])
+            return due
+
+    def _next_due(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def _after_flush(self, session, flush_context):
+        model = self.model
+        entries = [
+            (naive_utc(obj.scheduled_for), obj.id)  # O heap e _loaded_until são UTC sem fuso
+            for obj in list(session.new) + list(session.dirty)
+            if isinstance(obj, model) and obj.scheduled_for is not None and obj.status in (None, PENDING)
+        ]
+        if entries:
+            session.info.setdefault(self._session_key, []).extend(entries)
+
+    def _after_commit(self, session):
+        entries = session.info.pop(self._session_key, None)
+        if entries and self._loaded_until is not None:
+            self._push_many(entries)
+
+    def _after_rollback(self, session):
+        session.info.pop(self._session_key, None)
+
+    # ---------- carga pelo índice (status, scheduled_for) ----------
+
+    def _load_range(self, start, end, limit=None):
+        model = self.model
+        query = self.db.session.query(model.scheduled_for, model.id)\
+            .filter(model.status == PENDING, model.scheduled_for < end)
+        if start is not None:
+            query = query.filter(model.scheduled_for >= start)
+        rows = query.order_by(model.scheduled_for).limit(limit).all() if limit else query.all()
+        self.db.session.commit()
+        return [(row.scheduled_for, row.id) for row in rows]
+
+    def expire_overdue(self, now=None):
+        """Marcar como expired as pendentes vencidas há mais de max_delay"""
+        now = now or datetime.utcnow()
+        model = self.model
+        expired = self.db.session.query(model)\
+            .filter(model.status == PENDING, model.scheduled_for < now - self.max_delay)\
+            .update({model.status: EXPIRED}, synchronize_session=False)
+        self.db.session.commit()
+        if expired:
+            with self._lock:
+                self.expired += expired
+        return expired
+
+    def hydrate(self, now=None):
+        """Carregar tudo o que vence até o horizonte (inclusive atrasadas recentes)"""
+        now = now or datetime.utcnow()
+        self.expire_overdue(now)
+        until = now + self.horizon
+        entries = self._load_range(None, until)
+        with self._lock:
+            self._heap = entries
+            heapq.heapify(self._heap)
+            self._loaded_until = until
+        return len(entries)
+
+    def refresh(self, now=None):
+        """Avançar o horizonte e recolher atrasadas que não estão no heap"""
+        now = now or datetime.utcnow()
+        if self._loaded_until is None:
+            return self.hydrate(now)
+
+        model = self.model
+        # Entregas interrompidas (processo morto no meio do envio) voltam para a fila
+        self.db.session.query(model).filter(model.status == SENDING, model.sent_at < now - self.stale)\
+            .update({model.status: PENDING}, synchronize_session=False)
+        self.db.session.commit()
+        self.expire_overdue(now)
+
+        loaded = 0
+        until = now + self.horizon
+        if until > self._loaded_until:
+            entries = self._load_range(self._loaded_until, until)
+            with self._lock:
+                for entry in entries:
+                    heapq.heappush(self._heap, entry)
+                self._loaded_until = until
+            loaded += len(entries)
+        # Atrasadas fora do heap (gravadas por outro processo dentro da faixa já carregada)
+        if self._next_due() is None or self._next_due() > now:
+            overdue = self._load_range(None, now, limit=self.batch_size * 10)
+            self._push_many(overdue)
+            loaded += len(overdue)
+        return loaded
+
+    # ---------- despacho ----------
+
+    def _claim(self, ids, now):
+        """Marcar como sending as notificações ainda pendentes e vencidas; ids reivindicados"""
+        model = self.model
+        session = self.db.session
+        condition = (model.id.in_(ids), model.status == PENDING, model.scheduled_for <= now)
+        if self.db.engine.dialect.update_returning:
+            result = session.execute(
+                update(model).where(*condition).values(status=SENDING, sent_at=now).returning(model.id)
+            )
+            claimed = [row[0] for row in result]
+        else:
+            claimed = [
+                notification_id for notification_id in ids
+                if session.query(model).filter(model.id == notification_id, *condition[1:])
+                .update({model.status: SENDING, model.sent_at: now}, synchronize_session=False)
+            ]
+        session.commit()
+        return claimed
+
+    def dispatch_due(self, now=None):
+        """Entregar um lote de notificações vencidas; quantidade reivindicada"""
+        now = now or datetime.utcnow()
+        due = self._pop_due(now)
+        if not due:
+            return 0
+        model = self.model
+        session = self.db.session
+        claimed = self._claim(list(dict.fromkeys(due)), now)
+
+        # Reagendadas para mais tarde continuam pendentes: voltam para o heap
+        if len(claimed) < len(set(due)):
+            remaining = set(due) - set(claimed)
+            rows = session.query(model.scheduled_for, model.id)\
+                .filter(model.id.in_(remaining), model.status == PENDING, model.scheduled_for > now).all()
+            session.commit()
+            self._push_many([(row.scheduled_for, row.id) for row in rows])
+        if not claimed:
+            return 0
+
+        notifications = model.query.filter(model.id.in_(claimed)).all()
+        by_method = {}
+        for notification in notifications:
+            by_method.setdefault(notification.delivery_method or 'push', []).append(notification)
+        self.deliver(by_method, now)
+        return len(claimed)
+
+    def deliver(self, by_method, now=None):
+        """Entregar {delivery_method: [notificações]} pelos canais e gravar o resultado"""
+        now = now or datetime.utcnow()
+        model = self.model
+        session = self.db.session
+        outcomes = {SENT: [], FAILED: []}
+        lags = []
+        for method, notifications in by_method.items():
+            try:
+                self.channel_for(method)(notifications)
+                outcome = SENT
+            except Exception as e:
+                print(f"❌ Erro ao enviar {len(notifications)} notificação(ões) por {method}: {e}")
+                outcome = FAILED
+            outcomes[outcome].extend(notification.id for notification in notifications)
+            with self._lock:
+                counts = self.by_channel.setdefault(method, {SENT: 0, FAILED: 0})
+                counts[outcome] += len(notifications)
+            if outcome == SENT:
+                lags.extend(max(0.0, (now - (n.scheduled_for or now)).total_seconds()) for n in notifications)
+
+        for status, ids in outcomes.items():
+            if ids:
+                session.query(model).filter(model.id.in_(ids))\
+                    .update({model.status: status, model.sent_at: now}, synchronize_session=False)
+        session.commit()
+
+        with self._lock:
+            self.batches += 1
+            self.dispatched += len(outcomes[SENT])
+            self.failed += len(outcomes[FAILED])
+            self._lags.extend(lags)
+            if lags:
+                self._max_lag = max(self._max_lag, max(lags))
+            self._recent.append((time.monotonic(), len(outcomes[SENT])))
+        return outcomes
+
+    def send_now(self, notification):
+        """Entregar agora uma notificação sem horário (o commit fica com quem chamou)"""
+        now = datetime.utcnow()
+        channel = self.channel_for(notification.delivery_method or 'push')
+        try:
+            channel([notification])
+            notification.status = SENT
+        except Exception as e:
+            notification.status = FAILED
+            print(f"Erro ao enviar notificação: {e}")
+        notification.sent_at = now
+        with self._lock:
+            if notification.status == SENT:
+                self.dispatched += 1
+            else:
+                self.failed += 1
+            counts = self.by_channel.setdefault(notification.delivery_method or 'push', {SENT: 0, FAILED: 0})
+            counts[notification.status] += 1
+            self._recent.append((time.monotonic(), 1 if notification.status == SENT else 0))
+        return notification.status == SENT
+
+    def run_once(self, now=None):
+        """Uma rodada completa: carregar, despachar até esvaziar os vencidos e varrer atrasadas"""
+        now = now or datetime.utcnow()
+        total = 0
+        for _ in range(2):  # A varredura de atrasadas só roda com o heap sem vencidos
+            self.refresh(now)
+            while True:
+                sent = self.dispatch_due(now)
+                if not sent and (self._next_due() is None or self._next_due() > now):
+                    break
+                total += sent
+        return total
+
+    # ---------- thread ----------
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return False
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='iaon-notifications', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        next_sweep = 0.0
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    if time.monotonic() >= next_sweep:
+                        self.refresh()
+                        next_sweep = time.monotonic() + self.sweep_seconds
+                    while self.dispatch_due():
+                        pass
+            except Exception as e:
+                print(f"⚠️ Erro no agendador de notificações: {e}")
+            next_due = self._next_due()
+            timeout = max(0.0, next_sweep - time.monotonic())
+            if next_due is not None:
+                timeout = min(timeout, max(0.0, (next_due - datetime.utcnow()).total_seconds()))
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    # ---------- métricas ----------
+
+    def metrics(self):
+        """Vazão, atraso das entregas e tamanho do heap deste processo"""
+        with self._lock:
+            cutoff = time.monotonic() - 60
+            while self._recent and self._recent[0][0] < cutoff:
+                self._recent.popleft()
+            lags = sorted(self._lags)
+            next_due = self._heap[0][0] if self._heap else None
+            return {
+                'running': bool(self._thread and self._thread.is_alive()),
+                'heap_size': len(self._heap),
+                'loaded_until': self._loaded_until.isoformat() if self._loaded_until else None,
+                'next_due': next_due.isoformat() if next_due else None,
+                'dispatched': self.dispatched,
+                'failed': self.failed,
+                'expired': self.expired,
+                'batches': self.batches,
+                'sent_last_minute': sum(count for _, count in self._recent),
+                'channels': {method: dict(counts) for method, counts in self.by_channel.items()},
+                'lag_seconds': {
+                    'avg': round(sum(lags) / len(lags), 3) if lags else None,
+                    'p95': round(lags[int(len(lags) * 0.95) - 1 if len(lags) > 1 else 0], 3) if lags else None,
+                    'max': round(self._max_lag, 3)
+                }
+            }
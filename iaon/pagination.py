@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Paginação por cursor (keyset) e respostas em fluxo das listagens do IAON
+
+Cada listagem declara um Keyset: as colunas da ordenação (com o sentido) e o
+id como desempate, de modo que a ordem é total e estável. Uma página é
+`WHERE (chave) vem depois do cursor ORDER BY chave LIMIT n + 1`: o banco
+continua pelo índice (user_id, coluna) a partir do ponto certo, então a
+página 1000 custa o mesmo que a primeira (OFFSET leria e descartaria as
+anteriores) e inserções entre uma página e outra não repetem nem pulam
+linhas.
+
+O cursor é opaco para o cliente: base64 de [nome do keyset, valores da
+última linha, id]. Colunas que aceitam NULL entram na comparação por
+coalesce com um valor de substituição.
+
+Para exportações, `stream_rows` percorre todas as páginas e devolve o
+resultado em fluxo (NDJSON, um objeto por linha, ou um documento JSON
+escrito aos poucos): a memória fica limitada a uma página e cada página é
+uma consulta curta, sem cursor aberto no banco durante o envio.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+
+from flask import Response, stream_with_context
+from sqlalchemy import and_, func, or_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+STREAM_PAGE_SIZE = 500  # Linhas por consulta ao exportar em fluxo
+STREAM_FORMATS = ('ndjson', 'json-stream')
+
+
+class InvalidCursor(ValueError):
+    """Cursor malformado ou de outra listagem"""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        raise InvalidCursor('valor desconhecido no cursor')
+    return value
+
+
+class Keyset:
+    """Ordenação estável de uma listagem: [(coluna, descendente, substituto de NULL)] + id"""
+
+    def __init__(self, name, columns, id_column):
+        self.name = name
+        self.columns = [column if isinstance(column, tuple) else (column, False) for column in columns]
+        self.columns = [(column[0], column[1], column[2] if len(column) > 2 else None) for column in self.columns]
+        self.id_column = id_column
+
+    def _expressions(self):
+        expressions = [(func.coalesce(column, null) if null is not None else column, descending)
+                       for column, descending, null in self.columns]
+        descending = self.columns[0][1] if self.columns else False
+        return expressions + [(self.id_column, descending)]
+
+    def order_by(self):
+        return [expression.desc() if descending else expression.asc() for expression, descending in self._expressions()]
+
+    def after(self, values):
+        """Condição das linhas que vêm depois de `values` na ordem: (a > x) OR (a = x AND b > y) ..."""
+        expressions = self._expressions()
+        if len(values) != len(expressions):
+            raise InvalidCursor('cursor de outra ordenação')
+        branches = []
+        for position, ((expression, descending), value) in enumerate(zip(expressions, values)):
+            equal = [previous == previous_value
+                     for (previous, _), previous_value in zip(expressions[:position], values[:position])]
+            branches.append(and_(*equal, expression < value if descending else expression > value))
+        return or_(*branches)
+
+    def values(self, row):
+        """Valores da chave de uma linha (objeto do modelo)"""
+        values = []
+        for column, _, null in self.columns:
+            value = getattr(row, column.key)
+            values.append(null if value is None else value)
+        return values + [getattr(row, self.id_column.key)]
+
+    def encode(self, row):
+        payload = [self.name] + [_encode_value(value) for value in self.values(row)]
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (ValueError, TypeError) as e:
+            raise InvalidCursor('cursor inválido') from e
+        if not isinstance(payload, list) or not payload or payload[0] != self.name:
+            raise InvalidCursor('cursor de outra listagem')
+        return [_decode_value(value) for value in payload[1:]]
+
+
+def page_limit(args, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    """Tamanho de página pedido em `limit`, entre 1 e `maximum`"""
+    try:
+        limit = int(args.get('limit', default))
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def paginate(query, keyset, cursor=None, limit=DEFAULT_LIMIT):
+    """Uma página da consulta: (linhas, cursor da próxima página ou None)"""
+    if cursor:
+        query = query.filter(keyset.after(keyset.decode(cursor)))
+    rows = query.order_by(*keyset.order_by()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], keyset.encode(rows[limit - 1])
+
+
+def iterate(query, keyset, cursor=None, page_size=STREAM_PAGE_SIZE):
+    """Todas as linhas a partir do cursor, uma página por consulta"""
+    while True:
+        rows, cursor = paginate(query, keyset, cursor, page_size)
+        yield from rows
+        if cursor is None:
+            return
+
+
+def page_info(next_cursor):
+    """Campos de continuação incluídos em toda listagem paginada"""
+    return {'next_cursor': next_cursor, 'has_more': next_cursor is not None}
+
+
+def stream_rows(query, keyset, serialize, key, cursor=None, mode='ndjson', page_size=STREAM_PAGE_SIZE):
+    """Resposta em fluxo com todas as linhas: NDJSON ou documento JSON {key: [...], "count": n}"""
+    if cursor:
+        keyset.decode(cursor)  # Cursor inválido vira erro 400 antes de a resposta começar
+
+    def ndjson():
+        for row in iterate(query, keyset, cursor, page_size):
+            yield json.dumps(serialize(row), ensure_ascii=False, default=str) + '\n'
+
+    def document():
+        yield '{' + json.dumps(key) + ':['
+        count = 0
+        for row in iterate(query, keyset, cursor, page_size):
+            yield (',' if count else '') + json.dumps(serialize(row), ensure_ascii=False, default=str)
+            count += 1
+        yield '],"count":' + str(count) + '}'
+
+    if mode == 'ndjson':
+        return Response(stream_with_context(ndjson()), mimetype='application/x-ndjson')
+    return Response(stream_with_context(document()), mimetype='application/json')
+
+
+def stream_response(args, query, keyset, serialize, key):
+    """Resposta em fluxo se a listagem pediu `format=ndjson` ou `format=json-stream`; senão None"""
+    mode = args.get('format')
+    if mode not in STREAM_FORMATS:
+        return None
+    return stream_rows(query, keyset, serialize, key, args.get('cursor'), mode)
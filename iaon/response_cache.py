@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache de respostas do IAON para endpoints de catálogo (leitura quase sempre)
+
+Guarda o corpo JSON já serializado de respostas GET 200 junto com um ETag
+(hash do corpo). Cada entrada depende de "tags" (plans, coaches, coach:3...)
+e a chave inclui a versão atual de cada tag: invalidar é só incrementar a
+versão, e as entradas antigas deixam de ser encontradas e expiram pelo TTL/LRU.
+Requisições com If-None-Match igual ao ETag recebem 304 sem corpo.
+
+O backend é plugável: LocalCacheBackend (LRU em memória, por processo) é o
+padrão; RedisCacheBackend compartilha entradas e versões entre os workers do
+gunicorn (requer o pacote `redis`). Com o backend local cada worker só vê as
+próprias invalidações, então o TTL limita por quanto tempo outro worker pode
+servir uma versão antiga.
+"""
+
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, request
+
+
+class LocalCacheBackend:
+    """LRU em memória com TTL por entrada; contadores (versões das tags) fora do LRU"""
+
+    def __init__(self, max_entries=1024, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()  # chave -> (expira em, valor)
+        self._counters = {}  # Nunca descartados: perder uma versão reviveria entradas antigas
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counters(self, keys):
+        with self._lock:
+            return [self._counters.get(key, 0) for key in keys]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCacheBackend:
+    """Backend compartilhado entre processos (Redis); valores guardados como JSON"""
+
+    def __init__(self, url, prefix='iaon:cache:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError('Backend de cache Redis requer o pacote redis (pip install redis)') from e
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def counters(self, keys):
+        if not keys:
+            return []
+        return [int(value or 0) for value in self.client.mget([self.prefix + key for key in keys])]
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl) if ttl else None)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+def backend_from_url(url=None, max_entries=1024):
+    """Backend pelo endereço configurado: redis://... ou vazio/local para o LRU em memória"""
+    if url and url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCacheBackend(url)
+    return LocalCacheBackend(max_entries=max_entries)
+
+
+class ResponseCache:
+    """Decorador de views GET com ETag, Cache-Control e invalidação por tags"""
+
+    def __init__(self, backend=None, ttl=300, max_age=60):
+        self.backend = backend or LocalCacheBackend()
+        self.ttl = ttl
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self, *tags):
+        """Nova versão das tags: respostas que dependem delas deixam de ser servidas"""
+        for tag in set(tags):
+            self.backend.incr(f'version:{tag}')
+        with self._lock:
+            self.invalidations += len(set(tags))
+
+    def _key(self, tags, vary_query):
+        versions = self.backend.counters([f'version:{tag}' for tag in tags])
+        stamp = ','.join(f'{tag}={version}' for tag, version in zip(tags, versions))
+        query = '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True))) if vary_query else ''
+        return f'response:{request.path}?{query}#{stamp}'
+
+    def _respond(self, entry, max_age):
+        response = Response(entry['body'], status=200, mimetype=entry['mimetype'])
+        response.set_etag(entry['etag'])
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        conditional = response.make_conditional(request)
+        if conditional.status_code == 304:
+            with self._lock:
+                self.not_modified += 1
+        return conditional
+
+    def cached(self, *tags, ttl=None, max_age=None, vary_query=True):
+        """Cachear a resposta da view; tags podem usar os argumentos da rota ('coach:{coach_id}')"""
+        ttl = self.ttl if ttl is None else ttl
+        max_age = self.max_age if max_age is None else max_age
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != 'GET':
+                    return view(*args, **kwargs)
+                key = self._key([tag.format(**kwargs) for tag in tags], vary_query)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    with self._lock:
+                        self.hits += 1
+                    return self._respond(entry, max_age)
+
+                with self._lock:
+                    self.misses += 1
+                result = view(*args, **kwargs)
+                response = result if isinstance(result, Response) else None
+                if response is None or response.status_code != 200 or response.direct_passthrough:
+                    return result  # Erros e respostas não JSON não são guardados
+                body = response.get_data()
+                entry = {
+                    'body': body.decode('utf-8'),
+                    'etag': hashlib.sha1(body).hexdigest()[:20],
+                    'mimetype': response.mimetype
+                }
+                self.backend.set(key, entry, ttl)
+                return self._respond(entry, max_age)
+            return wrapper
+        return decorator
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': type(self.backend).__name__,
+                'entries': len(self.backend) if hasattr(self.backend, '__len__') else None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'not_modified': self.not_modified,
+                'invalidations': self.invalidations
+            }
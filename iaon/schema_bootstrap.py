@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Inicialização do esquema do IAON na partida do processo
+
+O esquema (create_all, colunas e índices extras, agregados) é preparado uma
+vez, antes de o processo atender requisições, e nunca no caminho da
+requisição:
+- uma impressão digital do esquema declarado nos modelos (tabelas, colunas,
+  índices e a versão dos passos) fica gravada na tabela schema_state; se a do
+  banco for igual, a partida custa uma consulta
+- senão os passos rodam sob uma trava entre processos (advisory lock no
+  PostgreSQL, trava de arquivo no SQLite), então só um worker/réplica aplica
+  e os outros esperam e encontram a impressão digital já gravada
+- a espera pela trava tem limite; se expirar ou um passo falhar, o processo
+  fica "não pronto" (/health responde 503) e tenta de novo em segundo plano
+"""
+
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import text
+
+LOCK_KEY = 0x1A0E5C4E  # Chave do advisory lock do PostgreSQL (fixa para todas as réplicas)
+RETRY_MAX_SECONDS = 60.0
+
+
+def schema_fingerprint(metadata, version):
+    """SHA-256 do esquema declarado: tabelas, colunas, índices e a versão dos passos"""
+    digest = hashlib.sha256(str(version).encode('utf-8'))
+    for table in metadata.sorted_tables:
+        digest.update(f'T {table.name}'.encode('utf-8'))
+        for column in table.columns:
+            digest.update(f'C {column.name} {column.type!r} {column.nullable}'.encode('utf-8'))
+        for index in sorted(table.indexes, key=lambda index: index.name or ''):
+            digest.update(f"I {index.name} {[c.name for c in index.columns]} {index.unique}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+@contextmanager
+def bootstrap_lock(engine, timeout):
+    """Trava exclusiva entre processos durante os passos; TimeoutError se não vier em `timeout` segundos"""
+    deadline = time.monotonic() + timeout
+    if engine.dialect.name == 'postgresql':
+        with engine.connect() as connection:
+            # Trava de sessão: vale enquanto esta conexão estiver aberta, os passos usam outras
+            while not connection.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': LOCK_KEY}).scalar():
+                if time.monotonic() > deadline:
+                    raise TimeoutError('Outro processo está inicializando o esquema')
+                time.sleep(0.2)
+            try:
+                yield
+            finally:
+                connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': LOCK_KEY})
+        return
+
+    database = engine.url.database if engine.dialect.name == 'sqlite' else None
+    try:
+        import fcntl
+    except ImportError:  # Windows: desenvolvimento com um processo só
+        fcntl = None
+    if not database or database == ':memory:' or fcntl is None:
+        yield
+        return
+    with open(f'{database}.bootstrap.lock', 'a') as handle:
+        while True:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError('Outro processo está inicializando o esquema')
+                time.sleep(0.2)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class SchemaBootstrap:
+    """Estado de inicialização deste processo; `run()` aplica os passos se o esquema mudou"""
+
+    def __init__(self, app, db, model, steps, version, name='iaon', timeout=60.0):
+        self.app = app
+        self.db = db
+        self.model = model  # Tabela schema_state (name, fingerprint, applied_at, duration_ms)
+        self.steps = steps
+        self.version = version
+        self.name = name
+        self.timeout = timeout
+        self.status = 'pending'  # pending, running, ready, failed, disabled
+        self.error = None
+        self.applied = False  # Os passos rodaram neste processo (False: esquema já estava em dia)
+        self.duration_ms = None
+        self.finished_at = None
+        self._retry_lock = threading.Lock()
+        self._retry_thread = None
+
+    @property
+    def ready(self):
+        return self.status in ('ready', 'disabled')
+
+    def disable(self):
+        """Processo sem inicialização automática (o esquema é responsabilidade da migração)"""
+        self.status = 'disabled'
+
+    def _stored_fingerprint(self):
+        session = self.db.session
+        try:
+            row = session.query(self.model.fingerprint).filter(self.model.name == self.name).first()
+            return row[0] if row else None
+        except Exception:
+            session.rollback()  # Tabela ainda não existe
+            return None
+
+    def _store(self, fingerprint, duration_ms):
+        state = self.model.query.filter_by(name=self.name).first() or self.model(name=self.name)
+        state.fingerprint = fingerprint
+        state.applied_at = datetime.utcnow()
+        state.duration_ms = duration_ms
+        self.db.session.add(state)
+        self.db.session.commit()
+
+    def run(self):
+        """Inicializar (uma consulta se o esquema já estiver em dia); True quando pronto"""
+        self.status, self.error = 'running', None
+        start = time.monotonic()
+        try:
+            with self.app.app_context():
+                fingerprint = schema_fingerprint(self.db.metadata, self.version)
+                self.applied = False
+                if self._stored_fingerprint() != fingerprint:
+                    with bootstrap_lock(self.db.engine, self.timeout):
+                        # Quem esperou a trava encontra o trabalho feito por outro processo
+                        if self._stored_fingerprint() != fingerprint:
+                            self.steps()
+                            self._store(fingerprint, round((time.monotonic() - start) * 1000))
+                            self.applied = True
+        except Exception as e:
+            self.status, self.error = 'failed', str(e)
+            print(f"❌ Erro na inicialização do banco: {e}")
+            self.start_retry()
+            return False
+        finally:
+            self.duration_ms = round((time.monotonic() - start) * 1000)
+            self.finished_at = datetime.utcnow()
+        self.status = 'ready'
+        return True
+
+    def start_retry(self):
+        """Tentar de novo em segundo plano com espera crescente (uma thread por processo)"""
+        if self.ready:
+            return False
+        with self._retry_lock:
+            if self._retry_thread is not None and self._retry_thread.is_alive():
+                return False
+            self._retry_thread = threading.Thread(target=self._retry, name='iaon-schema-bootstrap', daemon=True)
+            self._retry_thread.start()
+        return True
+
+    def _retry(self):
+        delay = 1.0
+        while not self.ready:  # run() com falha chama start_retry(), que vê esta thread viva
+            time.sleep(delay)
+            delay = min(RETRY_MAX_SECONDS, delay * 2)
+            self.run()
+
+    def to_dict(self):
+        return {
+            'status': self.status,
+            'ready': self.ready,
+            'applied': self.applied,
+            'duration_ms': self.duration_ms,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'error': self.error,
+            'pid': os.getpid()
+        }
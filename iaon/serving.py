@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfil de produção do IAON (gunicorn)
+
+Deriva do número de CPUs e do ambiente:
+- workers (processos): 2 x CPUs + 1, limitado por MAX_WORKERS e pelo
+  orçamento de conexões; WEB_CONCURRENCY fixa o número
+- classe do worker: gthread com GUNICORN_THREADS threads por processo (as
+  rotas esperam banco e IA, não CPU); GUNICORN_THREADS=1 usa sync
+- pool de conexões de cada processo alinhado com o que o processo usa ao
+  mesmo tempo: threads de requisição + threads da fila de tarefas
+  (IAON_JOB_WORKERS) + agendador de notificações, com folga (overflow) para
+  picos, desde que workers x (pool + overflow) caiba em
+  IAON_DB_MAX_CONNECTIONS menos as conexões reservadas (release, psql, admin)
+
+O gunicorn.conf.py exporta o pool em IAON_DB_POOL_SIZE / IAON_DB_MAX_OVERFLOW /
+IAON_DB_POOL_TIMEOUT antes de carregar o app; engine_options() os aplica.
+"""
+
+import os
+
+MAX_WORKERS = 12
+DEFAULT_THREADS = 4
+DEFAULT_MAX_CONNECTIONS = 100  # max_connections padrão do PostgreSQL
+DEFAULT_RESERVED_CONNECTIONS = 10
+DEFAULT_POOL_TIMEOUT = 10  # Segundos esperando conexão livre antes de falhar a requisição
+
+
+def _int(environ, name, default):
+    value = environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def serving_profile(cpu_count=None, environ=None):
+    """Workers, threads e pool de conexões para esta máquina"""
+    environ = os.environ if environ is None else environ
+    cpus = cpu_count or os.cpu_count() or 1
+    threads = max(1, _int(environ, 'GUNICORN_THREADS', DEFAULT_THREADS))
+    job_workers = max(0, _int(environ, 'IAON_JOB_WORKERS', 4))
+    scheduler = 0 if environ.get('IAON_NOTIFICATION_SCHEDULER') == '0' else 1
+    budget = _int(environ, 'IAON_DB_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS) - \
+        _int(environ, 'IAON_DB_RESERVED_CONNECTIONS', DEFAULT_RESERVED_CONNECTIONS)
+    warnings = []
+
+    workers = max(1, _int(environ, 'WEB_CONCURRENCY', min(2 * cpus + 1, MAX_WORKERS)))  # 0 ou negativo: 1 worker
+    if budget // workers < 2:
+        # Menos de 2 conexões por processo travaria a fila atrás das requisições
+        workers = max(1, budget // 2)
+        warnings.append(f'workers reduzidos para {workers}: orçamento de {budget} conexões')
+
+    concurrency = threads + job_workers + scheduler  # Conexões que o processo pode usar ao mesmo tempo
+    per_worker = max(1, budget // workers)
+    pool_size = min(concurrency, per_worker)
+    max_overflow = max(0, min(threads, per_worker - pool_size))
+    if pool_size < concurrency:
+        warnings.append(f'pool de {pool_size} conexões para {concurrency} threads por processo: '
+                        'aumente IAON_DB_MAX_CONNECTIONS ou reduza WEB_CONCURRENCY/GUNICORN_THREADS')
+
+    return {
+        'cpus': cpus,
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': _int(environ, 'IAON_DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+        'connections': workers * (pool_size + max_overflow),
+        'connection_budget': budget,
+        'warnings': warnings
+    }
+
+
+def pool_environ(profile):
+    """Variáveis que o app lê em engine_options() (definidas antes do preload)"""
+    return {
+        'IAON_DB_POOL_SIZE': str(profile['pool_size']),
+        'IAON_DB_MAX_OVERFLOW': str(profile['max_overflow']),
+        'IAON_DB_POOL_TIMEOUT': str(profile['pool_timeout'])
+    }
+
+
+def engine_options(database_uri, environ=None):
+    """SQLALCHEMY_ENGINE_OPTIONS: pre_ping/recycle sempre; pool dimensionado fora do SQLite"""
+    environ = os.environ if environ is None else environ
+    options = {
+        'pool_pre_ping': True,
+        'pool_recycle': 300,
+    }
+    if not database_uri.startswith('sqlite') and environ.get('IAON_DB_POOL_SIZE'):
+        options['pool_size'] = _int(environ, 'IAON_DB_POOL_SIZE', 5)
+        options['max_overflow'] = _int(environ, 'IAON_DB_MAX_OVERFLOW', 10)
+        options['pool_timeout'] = _int(environ, 'IAON_DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT)
+    return options
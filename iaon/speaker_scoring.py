@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de identificação de falantes do IAON
+
+Empacota os perfis de voz de todos os participantes de uma reunião em uma
+matriz NumPy (participantes x características) uma única vez. Cada trecho de
+áudio é então comparado com todos os falantes em uma só operação vetorizada,
+e vários trechos podem ser pontuados juntos (trechos x participantes).
+MeetingProfileCache mantém esses motores vivos enquanto a reunião acontece.
+
+Pesos e normalizações são os mesmos usados até aqui na comparação escalar:
+frequência fundamental 25% (escala 100 Hz), formantes 30% (500 Hz cada),
+taxa de fala 15% (60 ppm), espectrais 20% (centroide 2000, rolloff 3000) e
+prosódicas 10% (entonação igual 1.0 / diferente 0.3, ritmo 0.5).
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+UNKNOWN_SPEAKER = "Participante Desconhecido"
+
+# (grupo, chave dentro do grupo ou None para valor escalar, escala da diferença)
+NUMERIC_FEATURES = (
+    ('fundamental_frequency', None, 100.0),
+    ('formants', 'f1', 500.0),
+    ('formants', 'f2', 500.0),
+    ('formants', 'f3', 500.0),
+    ('formants', 'f4', 500.0),
+    ('speech_rate', None, 60.0),
+    ('spectral_features', 'spectral_centroid', 2000.0),
+    ('spectral_features', 'spectral_rolloff', 3000.0),
+    ('prosodic_features', 'rhythm_score', 0.5),
+)
+CATEGORICAL_FEATURE = ('prosodic_features', 'intonation_pattern')
+CATEGORICAL_MATCH, CATEGORICAL_MISMATCH = 1.0, 0.3
+
+GROUP_WEIGHTS = (
+    ('fundamental_frequency', 0.25),
+    ('formants', 0.30),
+    ('speech_rate', 0.15),
+    ('spectral_features', 0.20),
+    ('prosodic_features', 0.10),
+)
+GROUPS = tuple(group for group, _ in GROUP_WEIGHTS)
+WEIGHTS = np.array([weight for _, weight in GROUP_WEIGHTS])
+SCALES = np.array([scale for _, _, scale in NUMERIC_FEATURES])
+
+# Colunas (numéricas + categórica) -> grupo, para somar por grupo com um produto de matrizes
+_COLUMN_GROUPS = [group for group, _, _ in NUMERIC_FEATURES] + [CATEGORICAL_FEATURE[0]]
+MEMBERSHIP = np.array([[1.0 if column_group == group else 0.0 for group in GROUPS] for column_group in _COLUMN_GROUPS])
+SCALAR_GROUPS = frozenset(group for group, key, _ in NUMERIC_FEATURES if key is None)
+
+# Score de quem não tem perfil (ou tem perfil inválido) e bônus de verificação
+NO_PROFILE_SCORE = 0.1
+VERIFIED_BONUS = 1.1
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_voice_profile(voice_profile):
+    """Perfil de voz como dict (aceita JSON do banco); None se ausente/inválido"""
+    if isinstance(voice_profile, dict):
+        return voice_profile or None
+    if not voice_profile or voice_profile == '{}':
+        return None
+    try:
+        profile = json.loads(voice_profile)
+    except (TypeError, ValueError):
+        return None
+    return profile if isinstance(profile, dict) else None
+
+
+def vectorize_features(features, vocabulary, grow=True):
+    """Converter um dict de características em listas simples: (valores com None
+    onde falta, código categórico, grupos presentes, grupos com formato válido).
+
+    Com grow=False (trechos pontuados) o vocabulário não muda: categoria que nenhum
+    perfil tem recebe len(vocabulary), que não coincide com o código de nenhum perfil."""
+    values = []
+    for group, key, _ in NUMERIC_FEATURES:
+        container = features.get(group)
+        value = container if key is None else (container.get(key) if isinstance(container, dict) else None)
+        values.append(value if _is_number(value) else None)
+
+    present = []
+    well_formed = []
+    for group in GROUPS:
+        if group in SCALAR_GROUPS:
+            present.append(_is_number(features.get(group)))
+            well_formed.append(True)
+        else:
+            present.append(group in features)
+            well_formed.append(group not in features or isinstance(features[group], dict))
+
+    group, key = CATEGORICAL_FEATURE
+    container = features.get(group)
+    category = container.get(key) if isinstance(container, dict) else None
+    if category is None:
+        code = -1
+    elif grow:
+        code = vocabulary.setdefault(category, len(vocabulary))
+    else:
+        code = vocabulary.get(category, len(vocabulary))
+    return values, code, present, well_formed
+
+
+def _pack(rows):
+    """Empilhar saídas de vectorize_features em matrizes NumPy"""
+    count = len(rows)
+    values = np.array([row[0] for row in rows], dtype=float).reshape(count, len(NUMERIC_FEATURES))
+    codes = np.array([row[1] for row in rows], dtype=int).reshape(count)
+    present = np.array([row[2] for row in rows], dtype=bool).reshape(count, len(GROUPS))
+    well_formed = np.array([row[3] for row in rows], dtype=bool).reshape(count, len(GROUPS))
+    return values, codes, present, well_formed
+
+
+def decide_speaker(names, confidences):
+    """Regra de decisão: nome certo, '(provável)' ou desconhecido"""
+    if len(names) == 0:
+        return UNKNOWN_SPEAKER
+    order = np.argsort(-confidences, kind='stable')
+    best = confidences[order[0]]
+    second = confidences[order[1]] if len(order) > 1 else 0.0
+    if best > 0.75 and (best - second) > 0.2:
+        return names[order[0]]
+    if best > 0.6:
+        return f"{names[order[0]]} (provável)"
+    return UNKNOWN_SPEAKER
+
+
+def participant_profile(participant):
+    """Dados de um MeetingParticipant usados pelo motor"""
+    return {
+        'participant_id': participant.id,
+        'name': participant.participant_name,
+        'voice_profile': participant.voice_profile,
+        'is_verified': participant.is_verified,
+    }
+
+
+class SpeakerScoringEngine:
+    """Perfis de voz dos participantes de uma reunião empacotados em matrizes"""
+
+    def __init__(self, profiles=()):
+        """`profiles`: iterável de dicts com 'name', 'voice_profile' (dict ou JSON)
+        e opcionalmente 'participant_id' e 'is_verified'"""
+        self.vocabulary = {}
+        self.participant_ids = []
+        self.names = []
+        self.parsed_profiles = []
+        self._verified = []
+        self._rows = []
+        for profile in profiles:
+            self._append(profile)
+        self._pack_rows()
+
+    def _vectorize_profile(self, profile):
+        parsed = parse_voice_profile(profile.get('voice_profile'))
+        if parsed is None:
+            row = ([None] * len(NUMERIC_FEATURES), -1, [False] * len(GROUPS), [True] * len(GROUPS))
+        else:
+            row = vectorize_features(parsed, self.vocabulary)
+        return parsed, row
+
+    def _append(self, profile):
+        parsed, row = self._vectorize_profile(profile)
+        self.participant_ids.append(profile.get('participant_id'))
+        self.names.append(profile['name'])
+        self.parsed_profiles.append(parsed)
+        self._verified.append(bool(profile.get('is_verified')))
+        self._rows.append(row)
+
+    def _pack_rows(self):
+        self.values, self.codes, self.present, self.well_formed = _pack(self._rows)
+        self.verified = np.array(self._verified, dtype=bool).reshape(len(self._rows))
+        self.has_profile = np.array([parsed is not None for parsed in self.parsed_profiles], dtype=bool).reshape(len(self._rows))
+
+    def with_profile(self, profile):
+        """Nova instância com o perfil incluído ou substituído (pelo participant_id).
+        Só o perfil informado é analisado; as demais linhas são reaproveitadas e a
+        instância atual continua válida para quem já a está usando."""
+        engine = SpeakerScoringEngine()
+        engine.vocabulary = dict(self.vocabulary)
+        engine.participant_ids = list(self.participant_ids)
+        engine.names = list(self.names)
+        engine.parsed_profiles = list(self.parsed_profiles)
+        engine._verified = list(self._verified)
+        engine._rows = list(self._rows)
+
+        participant_id = profile.get('participant_id')
+        if participant_id is not None and participant_id in engine.participant_ids:
+            position = engine.participant_ids.index(participant_id)
+            parsed, row = engine._vectorize_profile(profile)
+            engine.names[position] = profile['name']
+            engine.parsed_profiles[position] = parsed
+            engine._verified[position] = bool(profile.get('is_verified'))
+            engine._rows[position] = row
+        else:
+            engine._append(profile)
+        engine._pack_rows()
+        return engine
+
+    @classmethod
+    def from_participants(cls, participants):
+        """Montar a partir de objetos MeetingParticipant"""
+        return cls(participant_profile(participant) for participant in participants)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _vectorize_batch(self, feature_batch):
+        return _pack([vectorize_features(features, self.vocabulary, grow=False) for features in feature_batch])
+
+    def _score_batch(self, feature_batch):
+        """Scores ponderados (trechos x participantes) e máscara de grupos comparados"""
+        values, codes, present, well_formed = self._vectorize_batch(feature_batch)
+
+        # Similaridade por coluna: max(0, 1 - |diferença| / escala), NaN onde falta valor
+        numeric = np.clip(1.0 - np.abs(self.values[None, :, :] - values[:, None, :]) / SCALES, 0.0, None)
+        categorical_mask = (self.codes[None, :] >= 0) & (codes[:, None] >= 0)
+        categorical = np.where(self.codes[None, :] == codes[:, None], CATEGORICAL_MATCH, CATEGORICAL_MISMATCH)
+
+        mask = np.concatenate([~np.isnan(numeric), categorical_mask[:, :, None]], axis=2)
+        similarity = np.concatenate([np.nan_to_num(numeric), categorical[:, :, None]], axis=2) * mask
+
+        # Média por grupo (0.5 quando o grupo não tem coluna comparável ou não é um dict)
+        totals = similarity @ MEMBERSHIP
+        counts = mask @ MEMBERSHIP
+        group_similarity = np.where(counts > 0, totals / np.maximum(counts, 1), 0.5)
+        group_similarity = np.where(self.well_formed[None] & well_formed[:, None], group_similarity, 0.5)
+
+        active = self.present[None] & present[:, None]
+        scores = (group_similarity * active) @ WEIGHTS
+        return scores, active.any(axis=2)
+
+    def similarity_batch(self, feature_batch):
+        """Similaridade bruta (0-1) de cada trecho com cada participante"""
+        scores, compared = self._score_batch(feature_batch)
+        return np.where(compared & self.has_profile[None], scores, 0.0)
+
+    def similarities(self, features):
+        return self.similarity_batch([features])[0]
+
+    def confidence_batch(self, feature_batch):
+        """Confiança de identificação: bônus para verificados, teto 1.0 e 0.1 sem perfil"""
+        scores, compared = self._score_batch(feature_batch)
+        confidences = np.where(compared, scores, NO_PROFILE_SCORE)
+        confidences = np.minimum(np.where(self.verified[None], confidences * VERIFIED_BONUS, confidences), 1.0)
+        return np.where(self.has_profile[None], confidences, NO_PROFILE_SCORE)
+
+    def identify_batch(self, feature_batch):
+        """Nome identificado para cada trecho"""
+        if not self.names:
+            return [UNKNOWN_SPEAKER for _ in feature_batch]
+        return [decide_speaker(self.names, row) for row in self.confidence_batch(feature_batch)]
+
+    def identify(self, features):
+        return self.identify_batch([features])[0]
+
+
+class MeetingProfileCache:
+    """Motores de pontuação por reunião, com limite LRU e expiração por inatividade.
+
+    Cada entrada guarda a versão dos perfis da reunião (profiles_version) com
+    que foi montada; uma versão diferente (participante alterado em outro
+    worker) descarta a entrada e ela é remontada na próxima consulta.
+    """
+
+    def __init__(self, max_meetings=256, ttl_seconds=3600, clock=time.monotonic):
+        self.max_meetings = max_meetings
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()  # meeting_id -> (último acesso, versão, motor)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, meeting_id):
+        return meeting_id in self._entries
+
+    def get(self, meeting_id, version=None):
+        """Motor da reunião ou None (ausente, expirado ou de outra versão)"""
+        with self._lock:
+            entry = self._entries.get(meeting_id)
+            now = self.clock()
+            if entry is None or now - entry[0] > self.ttl_seconds or (version is not None and entry[1] != version):
+                self._entries.pop(meeting_id, None)
+                self.misses += 1
+                return None
+            self._entries[meeting_id] = (now, entry[1], entry[2])
+            self._entries.move_to_end(meeting_id)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, meeting_id, engine, version=None):
+        with self._lock:
+            self._entries[meeting_id] = (self.clock(), version, engine)
+            self._entries.move_to_end(meeting_id)
+            while len(self._entries) > self.max_meetings:
+                self._entries.popitem(last=False)
+
+    def upsert_participant(self, meeting_id, profile, expected_version=None, version=None):
+        """Incluir/atualizar um participante de uma reunião já em cache.
+        
+        Só altera a entrada montada em `expected_version` (a versão anterior à
+        mudança); em outra versão falta alguma mudança feita por outro worker,
+        então a entrada é descartada em vez de ser marcada como atual.
+        """
+        with self._lock:
+            entry = self._entries.get(meeting_id)
+            if entry is None:
+                return False
+            if entry[1] != expected_version:
+                del self._entries[meeting_id]
+                return False
+            self._entries[meeting_id] = (self.clock(), version, entry[2].with_profile(profile))
+            self._entries.move_to_end(meeting_id)
+            return True
+
+    def evict(self, meeting_id):
+        with self._lock:
+            return self._entries.pop(meeting_id, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -1,3 +1,3 @@
 #!/bin/bash
 # Start script for Render
-python run.py
+gunicorn -c gunicorn.conf.py main:app
@@ -370,7 +370,7 @@ class IAON {
             const response = await this.callAPI(`/api/apps/list/${this.userId}?limit=20&sort_by=usage_count`);
 
             if (response.success) {
-                this.displayAppsData(response.apps, response.total_apps, response.enabled_apps);
+                this.displayAppsData(response.apps, response.total_apps, response.favorite_apps);
             } else {
                 console.error('Error loading apps:', response.error);
             }
@@ -418,7 +418,7 @@ class IAON {
 
     async loadMeetingsData() {
         try {
-            const response = await this.callAPI(`/api/meetings/user/${this.userId}`);
+            const response = await this.callAPIAllPages(`/api/meetings/user/${this.userId}`, 'meetings');
 
             if (response.success) {
                 this.displayMeetingsData(response.meetings);
@@ -442,7 +442,7 @@ class IAON {
         }
     }
 
-    displayAppsData(apps, totalApps, enabledApps) {
+    displayAppsData(apps, totalApps, favoriteApps) {
         const container = document.getElementById('apps-list') || this.createAppsContainer();
 
         if (!apps || apps.length === 0) {
@@ -509,8 +509,8 @@ class IAON {
                         <div class="text-sm text-gray-600">Total de Apps</div>
                     </div>
                     <div class="bg-green-50 rounded-lg p-3">
-                        <div class="text-2xl font-bold text-green-600">${enabledApps}</div>
-                        <div class="text-sm text-gray-600">Apps Habilitados</div>
+                        <div class="text-2xl font-bold text-green-600">${favoriteApps}</div>
+                        <div class="text-sm text-gray-600">Apps Favoritos</div>
                     </div>
                     <div class="bg-purple-50 rounded-lg p-3">
                         <div class="text-2xl font-bold text-purple-600">${apps.filter(app => app.voice_aliases && app.voice_aliases.length > 0).length}</div>
@@ -1664,6 +1664,20 @@ Acesse as configurações para personalizar sua palavra de ativação ("${trigge
         }
     }
 
+    async callAPIAllPages(endpoint, key) {
+        // Segue next_cursor até a última página e junta os itens em response[key]
+        const separator = endpoint.includes('?') ? '&' : '?';
+        let response = await this.callAPI(endpoint);
+        const items = [...(response[key] || [])];
+
+        while (response.success !== false && response.has_more && response.next_cursor) {
+            response = await this.callAPI(`${endpoint}${separator}cursor=${encodeURIComponent(response.next_cursor)}`);
+            items.push(...(response[key] || []));
+        }
+
+        return { ...response, [key]: items };
+    }
+
     escapeHtml(text) {
         const div = document.createElement('div');
         div.textContent = text;
@@ -2170,7 +2184,7 @@ Acesse as configurações para personalizar sua palavra de ativação ("${trigge
 
     async loadUserMeetings() {
         try {
-            const response = await this.callAPI(`/api/meetings/user/${this.userId}`);
+            const response = await this.callAPIAllPages(`/api/meetings/user/${this.userId}`, 'meetings');
             this.displayMeetingsList(response.meetings);
         } catch (error) {
             console.error('Error loading meetings:', error);
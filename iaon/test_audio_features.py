@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Teste da extração de características de áudio (NumPy)
+"""
+
+import base64
+import io
+import json
+import wave
+
+import numpy as np
+import pytest
+
+from app import create_voice_profile, create_enhanced_voice_profile, extract_audio_features
+from audio_features import decode_audio, analyze_audio, extract_features, N_MFCC
+
+SAMPLE_RATE = 16000
+FORMANTS = (700, 1220, 2600, 3500)
+
+
+def _vowel(f0=120, seconds=2.0, formants=FORMANTS):
+    """Vogal sintética: harmônicos de f0 moldados por ressonâncias nas formantes"""
+    times = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    signal = np.zeros_like(times)
+    for harmonic in np.arange(f0, SAMPLE_RATE / 2, f0):
+        gain = sum(1.0 / (1.0 + ((harmonic - formant) / 60.0) ** 2) for formant in formants)
+        signal += gain * np.sin(2 * np.pi * harmonic * times)
+    return (0.5 * signal / np.abs(signal).max() * 32767).astype('<i2').tobytes()
+
+
+def test_pitch_formantes_e_mfcc():
+    features = extract_features(_vowel(f0=120))
+    assert abs(features['fundamental_frequency'] - 120) < 3
+    for index, expected in enumerate(FORMANTS):
+        assert abs(features['formants'][f'f{index + 1}'] - expected) / expected < 0.08
+    assert len(features['spectral_features']['mfcc_coefficients']) == N_MFCC
+    assert features['audio_quality'] != 'poor'
+
+    assert abs(extract_features(_vowel(f0=210))['fundamental_frequency'] - 210) < 5
+    analysis = analyze_audio(_vowel(seconds=1.0))
+    assert analysis['mfcc'].shape == (analysis['frame_count'], N_MFCC)
+
+
+def test_decodificacao_wav_base64_e_entradas_curtas():
+    pcm = _vowel(seconds=0.5)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(pcm)
+    samples, sample_rate = decode_audio('data:audio/wav;base64,' + base64.b64encode(buffer.getvalue()).decode())
+    assert sample_rate == 8000 and len(samples) == len(pcm) // 2
+    for broken in (buffer.getvalue()[:30], b'RIFF\x00\x00\x00\x00WAVEjunk'):
+        with pytest.raises(ValueError):
+            decode_audio(broken)
+    assert np.allclose(decode_audio(base64.b64encode(pcm).decode())[0], decode_audio(pcm)[0])
+
+    noise = (np.random.default_rng(1).standard_normal(SAMPLE_RATE) * 3000).astype('<i2').tobytes()
+    assert 'fundamental_frequency' not in extract_features(noise)  # Ruído não é vozeado
+    assert extract_features(noise)['audio_quality'] == 'poor'
+
+    for audio in ('', 'a' * 400, 'z' * 97, b'\x00' * 10):
+        features = extract_audio_features(audio)
+        assert features['audio_quality'] == 'poor' or 'spectral_features' in features
+        json.dumps(features)
+
+
+def test_perfis_no_esquema_existente():
+    audio = _vowel(seconds=3.0)
+    enhanced = json.loads(create_enhanced_voice_profile(audio, 'Olá, eu sou a Ana e trabalho no financeiro'))
+    assert set(enhanced) == {'profile_id', 'created_at', 'audio_quality', 'fundamental_frequency', 'pitch_variance',
+                             'formants', 'speech_rate', 'pause_patterns', 'spectral_features', 'prosodic_features',
+                             'analysis_metadata', 'voice_signature'}
+    assert abs(enhanced['fundamental_frequency'] - 120) < 3
+    assert abs(enhanced['speech_rate'] - 9 / 3.0 * 60) < 1  # Palavras do texto na duração do áudio
+    assert 14 < enhanced['voice_signature']['vocal_tract_length'] < 20
+    assert enhanced['analysis_metadata']['audio_duration_estimate'] == 3.0
+
+    simple = json.loads(create_voice_profile(audio))
+    assert len(simple['formants']) == 4 and simple['pitch_range']['min'] <= simple['pitch_range']['max']
+
+    empty = json.loads(create_enhanced_voice_profile('', ''))
+    assert empty['fundamental_frequency'] is None and empty['audio_quality'] == 'poor'
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Teste da ingestão de áudio em fluxo das reuniões
+"""
+
+import io
+import os
+import tracemalloc
+
+import numpy as np
+
+from app import app, MeetingSession, MeetingTranscript
+from audio_stream import frame_size_bytes, iter_frames, segment_speech
+
+SAMPLE_RATE = 16000
+
+
+def _tone(seconds, amplitude=3000):
+    samples = np.arange(int(seconds * SAMPLE_RATE))
+    return (amplitude * np.sin(2 * np.pi * 220 * samples / SAMPLE_RATE)).astype('<i2').tobytes()
+
+
+def _silence(seconds):
+    return bytes(int(seconds * SAMPLE_RATE) * 2)
+
+
+class GeneratedStream:
+    """Stream que gera áudio sob demanda (fala/pausa alternadas), sem materializar tudo"""
+
+    def __init__(self, total_seconds):
+        self.cycle = _tone(2.0) + _silence(1.0)
+        self.remaining = int(total_seconds * SAMPLE_RATE) * 2
+        self.position = 0
+
+    def read(self, size):
+        size = min(size, self.remaining)
+        chunk = bytearray()
+        while len(chunk) < size:
+            start = self.position % len(self.cycle)
+            piece = self.cycle[start:start + size - len(chunk)]
+            chunk.extend(piece)
+            self.position += len(piece)
+        self.remaining -= size
+        return bytes(chunk)
+
+
+def test_quadros_fixos_e_segmentos():
+    audio = _silence(0.5) + _tone(1.0) + _silence(1.0) + _tone(0.8) + _silence(0.1) + _tone(0.1)
+    frames = list(iter_frames(io.BytesIO(audio), frame_size_bytes(SAMPLE_RATE), read_size=1000))
+    assert all(len(frame) == 640 for frame in frames[:-1])
+    assert sum(len(frame) for frame in frames) == len(audio)
+
+    segments = list(segment_speech(iter(frames), SAMPLE_RATE, offset_seconds=10.0))
+    assert len(segments) == 2
+    assert abs(segments[0].start_seconds - 10.5) < 0.03 and abs(segments[0].end_seconds - 11.5) < 0.03
+    assert abs(segments[1].start_seconds - 12.5) < 0.03
+
+
+def test_memoria_constante_em_reuniao_longa():
+    tracemalloc.start()
+    try:
+        count = 0
+        for _ in segment_speech(iter_frames(GeneratedStream(600), frame_size_bytes(SAMPLE_RATE)), SAMPLE_RATE):
+            count += 1
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert count == 200  # 10 minutos, um segmento de fala a cada 3 s
+    assert peak < 2 * 1024 * 1024  # Bem abaixo dos ~19 MB de áudio recebidos
+
+
+def test_endpoint_de_fluxo(tmp_path):
+    app.config['MEETING_RECORDINGS_DIR'] = str(tmp_path)
+    with app.app_context():
+        client = app.test_client()
+        meeting_id = client.post('/api/meetings/start', json={'user_id': 955, 'title': 'Fluxo'}).get_json()['meeting']['id']
+
+        audio = _tone(1.0) + _silence(1.0) + _tone(1.0) + _silence(1.0)
+        data = client.post(f'/api/meetings/{meeting_id}/audio-stream?sample_rate={SAMPLE_RATE}',
+                           input_stream=io.BytesIO(audio),
+                           headers={'Content-Type': 'application/octet-stream', 'Transfer-Encoding': 'chunked'},
+                           environ_overrides={'wsgi.input_terminated': True}).get_json()  # Como no gunicorn
+        assert data['segments_transcribed'] == 2
+        assert data['bytes_received'] == len(audio)
+
+        # Segundo envio continua a linha do tempo a partir da gravação existente
+        data = client.post(f'/api/meetings/{meeting_id}/audio-stream?sample_rate={SAMPLE_RATE}',
+                           data=_tone(1.0), content_type='application/octet-stream').get_json()
+        assert data['segments_transcribed'] == 1
+        assert abs(data['last_transcript']['start_time_seconds'] - 4.0) < 0.03
+
+        transcripts = MeetingTranscript.query.filter_by(meeting_id=meeting_id).all()
+        assert len(transcripts) == 3
+        meeting = MeetingSession.query.get(meeting_id)
+        assert os.path.getsize(meeting.recording_path) == len(audio) + len(_tone(1.0))
+
+        response = client.post(f'/api/meetings/{meeting_id}/audio-stream?encoding=opus', data=b'x')
+        assert response.status_code == 415
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Teste do pipeline de backup (arquivo em fluxo, incremental e registro em DataBackup)
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import (app, db, job_queue, Contact, ConversationMemory, DataBackup, MeetingSession, MeetingTranscript,
+                 SmartCalendar)
+from backup_archive import ArchiveReader, ArchiveWriter, load_key
+
+
+def _backup(client, user_id, **options):
+    response = client.post(f'/api/backup/create/{user_id}', json=options)
+    assert response.status_code == 200, response.get_json()
+    job_queue.run_pending()
+    db.session.expire_all()
+    return db.session.get(DataBackup, response.get_json()['backup_id'])
+
+
+def _contents(backup):
+    with ArchiveReader(backup.storage_path) as archive:
+        rows = list(archive)
+        return archive.header, rows, archive.footer
+
+
+def test_backup_completo_e_incremental():
+    with app.app_context():
+        client = app.test_client()
+        now = datetime.utcnow()
+        meeting = MeetingSession(user_id=880, title='Planejamento')
+        db.session.add_all([
+            ConversationMemory(user_id=880, session_id='b', user_message='oi', ai_response='olá'),
+            SmartCalendar(user_id=880, title='Dentista', start_datetime=now, end_datetime=now),
+            Contact(user_id=880, name='Ana', phone_number='11999990000'),
+            Contact(user_id=881, name='Outro usuário', phone_number='11999990001'),
+            meeting
+        ])
+        db.session.flush()
+        db.session.add(MeetingTranscript(meeting_id=meeting.id, content='Bom dia a todos', timestamp=now))
+        db.session.commit()
+
+        full = _backup(client, 880)
+        assert full.status == 'completed' and full.progress_percentage == 100.0
+        header, rows, footer = _contents(full)
+        tables = [table for table, _ in rows]
+        assert header['backup_type'] == 'full' and header['encrypted'] is False
+        assert tables.count('contacts') == 1 and 'meeting_transcripts' in tables
+        assert all(row['user_id'] == 880 for table, row in rows if 'user_id' in row)
+        assert footer['records'] == full.records_count == len(rows)
+        assert full.checksum and len(full.checksum) == 64 and full.expires_at
+
+        # Só o que mudou depois do backup completo (inclusive linhas antigas alteradas)
+        db.session.add(Contact(user_id=880, name='Bruno', phone_number='11999990002', updated_at=now + timedelta(seconds=5)))
+        memory = ConversationMemory.query.filter_by(user_id=880).one()
+        memory.accessed_count, memory.updated_at = 1, now + timedelta(seconds=5)
+        db.session.commit()
+        incremental = _backup(client, 880, backup_type='incremental')
+        header, rows, footer = _contents(incremental)
+        assert header['base_backup_id'] == full.id
+        # Contadores diários entram pelo dia (o de hoje pode ter mudado)
+        changed = [(table, row.get('name') or row.get('accessed_count')) for table, row in rows if table != 'user_activity_daily']
+        assert changed == [('conversation_memory', 1), ('contacts', 'Bruno')]
+
+        download = client.get(f'/api/backup/{incremental.id}/download')
+        assert download.status_code == 200 and len(download.data) == os.path.getsize(incremental.storage_path)
+        download.close()
+
+
+def test_criptografia_exige_chave(tmp_path):
+    with app.app_context():
+        response = app.test_client().post('/api/backup/create/880', json={'encryption_enabled': True})
+        assert response.status_code == 400
+
+    with pytest.raises(ValueError):
+        load_key('Y3VydGE=')  # 5 bytes
+
+    path = str(tmp_path / 'incompleto.ndjson.gz')
+    with pytest.raises(RuntimeError):
+        with ArchiveWriter(path, {}) as archive:
+            archive.write('contacts', {'id': 1})
+            raise RuntimeError('falha no meio da exportação')
+    assert not os.path.exists(path)  # Arquivo parcial descartado
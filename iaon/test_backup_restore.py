@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Teste da restauração/importação de arquivos de backup
+"""
+
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import (app, db, job_queue, metric_rollups, user_activity, Contact, ConversationMemory, DataRestore,
+                 FinancialAccount, FinancialBalanceCheckpoint, FinancialTransaction, MeetingParticipant,
+                 MeetingSession, MeetingTranscript, MetricRollup, SmartCalendar, User)
+from backup_archive import ArchiveWriter, verify_archive
+
+
+def _seed(user_id):
+    now = datetime.utcnow()
+    account = FinancialAccount(user_id=user_id, account_name='Conta corrente', account_type='checking')
+    meeting = MeetingSession(user_id=user_id, title='Retrospectiva', created_at=now)
+    parent = SmartCalendar(user_id=user_id, title='Academia', start_datetime=now, end_datetime=now, is_recurring=True)
+    db.session.add_all([account, meeting, parent,
+                        ConversationMemory(user_id=user_id, session_id='r', user_message='oi', ai_response='olá'),
+                        Contact(user_id=user_id, name='Carla', phone_number='11988887777')])
+    db.session.flush()
+    participant = MeetingParticipant(meeting_id=meeting.id, participant_name='Carla')
+    db.session.add_all([participant,
+                        SmartCalendar(user_id=user_id, title='Academia', start_datetime=now + timedelta(days=7),
+                                      end_datetime=now + timedelta(days=7), parent_event_id=parent.id)])
+    # Duas compras iguais continuam duas depois da restauração
+    for _ in range(2):
+        db.session.add(FinancialTransaction(user_id=user_id, account_id=account.id, transaction_type='expense',
+                                            amount=7.5, description='café', transaction_date=now))
+    db.session.flush()
+    db.session.add(MeetingTranscript(meeting_id=meeting.id, participant_id=participant.id, content='Vamos começar'))
+    user_activity.record(db.session, user_id, 'voice_commands', 4)
+    db.session.commit()
+
+
+def _run(client, url, **kwargs):
+    response = client.post(url, **kwargs)
+    assert response.status_code == 200, response.get_json()
+    job_queue.run_pending()
+    db.session.expire_all()
+    return db.session.get(DataRestore, response.get_json()['restore_id'])
+
+
+def _snapshot(user_id):
+    meeting = MeetingSession.query.filter_by(user_id=user_id).one()
+    transcript = MeetingTranscript.query.filter_by(meeting_id=meeting.id).one()
+    speaker = db.session.get(MeetingParticipant, transcript.participant_id)
+    child = SmartCalendar.query.filter(SmartCalendar.user_id == user_id,
+                                       SmartCalendar.parent_event_id.isnot(None)).one()
+    return {
+        'conversations': ConversationMemory.query.filter_by(user_id=user_id).count(),
+        'contacts': Contact.query.filter_by(user_id=user_id).count(),
+        'transactions': [(t.amount, db.session.get(FinancialAccount, t.account_id).user_id == user_id)
+                         for t in FinancialTransaction.query.filter_by(user_id=user_id)],
+        'speaker': (speaker.meeting_id == meeting.id, speaker.participant_name),
+        'parent': (db.session.get(SmartCalendar, child.parent_event_id).user_id == user_id, child.title),
+        'activity': user_activity.window(db.session, user_id, 7)
+    }
+
+
+def test_restauracao_para_outro_usuario_e_idempotente():
+    with app.app_context():
+        client = app.test_client()
+        db.session.add(User(id=871, username='restaurado', email='restaurado@iaon.app'))
+        db.session.commit()
+        _seed(870)
+        backup_id = client.post('/api/backup/create/870', json={}).get_json()['backup_id']
+        job_queue.run_pending()
+        meetings_before = metric_rollups.total(db.session, 'meetings')
+
+        restore = _run(client, f'/api/backup/{backup_id}/restore', json={'target_user_id': 871})
+        assert restore.status == 'completed' and restore.progress_percentage == 100.0
+        # A linha de atividade do dia já nasce dos contadores somados pelas tabelas anteriores
+        assert restore.records_rejected == 0 and restore.records_updated == 1
+        assert restore.source_user_id == 870
+        assert _snapshot(871) == _snapshot(870)
+        assert _snapshot(871)['transactions'] == [(7.5, True), (7.5, True)]
+
+        # Os agregados contam as linhas gravadas em lote
+        assert metric_rollups.total(db.session, 'meetings') == meetings_before + 1
+        expected = metric_rollups.recompute(db.session)
+        stored = {(r.metric, r.period, r.bucket, r.dimension): r.value for r in MetricRollup.query.all()}
+        assert all(abs(stored.get(key, 0) - value) < 1e-6 for key, value in expected.items())
+
+        again = _run(client, f'/api/backup/{backup_id}/restore', json={'target_user_id': 871})
+        assert again.status == 'completed' and again.records_inserted == 0
+        assert again.records_updated == restore.records_processed
+        assert _snapshot(871) == _snapshot(870)
+
+        status = client.get(f'/api/backup/restore/{again.id}').get_json()['restore']
+        assert status['records_updated'] == again.records_updated
+
+
+def test_importacao_rejeita_linhas_invalidas(tmp_path):
+    path = str(tmp_path / 'outra-instancia.ndjson.gz')
+    with ArchiveWriter(path, {'user_id': 5, 'tables': ['contacts', 'smart_calendar', 'tabela_nova']}) as archive:
+        archive.write('contacts', {'id': 1, 'user_id': 5, 'name': 'Davi', 'phone_number': '11977776666'})
+        archive.write('contacts', {'id': 2, 'user_id': 5, 'name': 'Sem telefone'})
+        archive.write('smart_calendar', {'id': 3, 'user_id': 5, 'title': 'Data ruim', 'start_datetime': 'ontem',
+                                         'end_datetime': '2026-01-01T10:00:00'})
+        archive.write('tabela_nova', {'id': 4})
+        archive.close()
+
+    with app.app_context():
+        client = app.test_client()
+        with open(path, 'rb') as source:
+            restore = _run(client, '/api/backup/import/872',
+                           data={'archive': (io.BytesIO(source.read()), 'backup.ndjson.gz')})
+        assert restore.status == 'completed'
+        assert (restore.records_processed, restore.records_inserted, restore.records_rejected) == (4, 1, 3)
+        assert Contact.query.filter_by(user_id=872).one().name == 'Davi'
+        assert any('start_datetime' in detail for detail in restore.to_dict()['rejection_details'])
+
+        invalid = client.post('/api/backup/import/872', data={'archive': (io.BytesIO(b'nada'), 'x.gz')})
+        assert invalid.status_code == 400
+
+
+def test_arquivo_truncado_nao_grava_nenhuma_linha(tmp_path):
+    path = str(tmp_path / 'truncado.ndjson.gz')
+    with ArchiveWriter(path, {'user_id': 6, 'tables': ['contacts']}) as archive:
+        for number in range(2000):
+            archive.write('contacts', {'id': number + 1, 'user_id': 6, 'name': f'Contato {number}',
+                                       'phone_number': f'119{number:08d}', 'notes': f'{number ** 3:x}' * 20})
+        archive.close()
+    with open(path, 'rb') as source:
+        data = source.read()
+    data = data[:len(data) // 2]  # Upload interrompido: cabeçalho e as primeiras linhas legíveis
+
+    with pytest.raises(ValueError):
+        with open(path, 'wb') as target:
+            target.write(data)
+        verify_archive(path)
+
+    with app.app_context():
+        client = app.test_client()
+        response = client.post('/api/backup/import/873', data={'archive': (io.BytesIO(data), 'backup.ndjson.gz')})
+        assert response.status_code == 200
+        job_queue.run_pending()  # A tarefa falha antes de gravar
+        db.session.expire_all()
+        restore = db.session.get(DataRestore, response.get_json()['restore_id'])
+        assert restore.status == 'failed' and 'truncado' in restore.error_message
+        assert Contact.query.filter_by(user_id=873).count() == 0
+
+
+def test_restauracao_sobre_conta_existente_mantem_o_saldo_do_razao():
+    with app.app_context():
+        client = app.test_client()
+        account = FinancialAccount(user_id=874, account_name='Conta corrente', account_type='checking',
+                                   current_balance=100.0, available_balance=100.0)
+        db.session.add(account)
+        db.session.flush()
+        db.session.add(FinancialTransaction(user_id=874, account_id=account.id, transaction_type='expense',
+                                            amount=30.0, description='mercado', transaction_date=datetime.utcnow()))
+        db.session.commit()
+        account_id = account.id
+        backup_id = client.post('/api/backup/create/874', json={}).get_json()['backup_id']
+        job_queue.run_pending()
+
+        # Depois do backup a conta continua recebendo transações
+        db.session.add(FinancialTransaction(user_id=874, account_id=account_id, transaction_type='income',
+                                            amount=50.0, description='reembolso', transaction_date=datetime.utcnow()))
+        db.session.commit()
+
+        restore = _run(client, f'/api/backup/{backup_id}/restore', json={'target_user_id': 874})
+        assert restore.status == 'completed'
+        assert db.session.get(FinancialAccount, account_id).current_balance == 120.0
+        # Nenhum checkpoint aceita o saldo antigo do backup como ponto de partida
+        assert not FinancialBalanceCheckpoint.query.filter_by(account_id=account_id, current_balance=70.0).count()
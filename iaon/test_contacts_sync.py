@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Teste da sincronização de contatos em lote (/api/contacts/sync)
+"""
+
+from sqlalchemy import event
+
+from app import app, db, Contact
+
+USER_ID = 951
+
+
+def _sync(client, contacts, **extra):
+    payload = {'user_id': USER_ID, 'contacts': contacts}
+    payload.update(extra)
+    return client.post('/api/contacts/sync', json=payload)
+
+
+def test_sincronizacao_completa_e_delta():
+    with app.app_context():
+        client = app.test_client()
+        contacts = [
+            {'name': f'Contato {i}', 'phone_number': f'+55 11 9{i:04d}-{i:04d}'}
+            for i in range(300)
+        ]
+
+        statements = []
+
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', _capture)
+        try:
+            response = _sync(client, contacts)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', _capture)
+
+        data = response.get_json()
+        assert response.status_code == 200
+        assert data['synced_count'] == 300 and data['updated_count'] == 0
+        assert data['total_contacts'] == 300
+        # Uma leitura dos contatos existentes e um único INSERT em lote (sem N+1)
+        assert len([s for s in statements if 'FROM contacts' in s]) == 1
+        assert len([s for s in statements if s.startswith('INSERT INTO contacts')]) == 1
+
+        # Reenviar tudo sem mudanças não regrava nada
+        data = _sync(client, contacts).get_json()
+        assert data['unchanged_count'] == 300 and data['updated_count'] == 0
+
+        # Delta: só o contato alterado e o removido
+        token = data['sync_token']
+        data = _sync(client, [{'name': 'Contato Renomeado', 'phone_number': contacts[0]['phone_number']}],
+                     sync_token=token, deleted_phone_numbers=[contacts[1]['phone_number']]).get_json()
+        assert data['delta'] is True
+        assert data['updated_count'] == 1 and data['deleted_count'] == 1
+        assert data['total_contacts'] == 299
+
+        renamed = Contact.query.filter_by(user_id=USER_ID, phone_number=contacts[0]['phone_number']).first()
+        assert renamed.name == 'Contato Renomeado'
+        assert renamed.formatted_phone.startswith('+55')
+
+        # Token antigo exige sincronização completa
+        response = _sync(client, [], sync_token=token)
+        assert response.status_code == 409
+        assert response.get_json()['full_sync_required'] is True
+
+
+def test_numero_repetido_no_mesmo_envio():
+    with app.app_context():
+        client = app.test_client()
+        data = _sync(client, [
+            {'name': 'Primeiro', 'phone_number': '11 3333-4444'},
+            {'name': 'Segundo', 'phone_number': '11 3333-4444'},
+        ]).get_json()
+        assert data['synced_count'] == 1
+        assert Contact.query.filter_by(user_id=USER_ID, phone_number='11 3333-4444').one().name == 'Segundo'
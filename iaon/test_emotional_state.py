@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Teste do léxico emocional compilado e da janela de humor por usuário
+"""
+
+from datetime import datetime, timedelta
+
+from app import app, analyze_emotional_trend, emotional_state_cache
+from emotional_samples import build_corpus, legacy_scan, compiled_scan, legacy_trend
+from emotional_state import EmotionalStateCache, MoodWindow
+
+
+def test_lexico_igual_as_varreduras_antigas():
+    corpus = build_corpus(2000, seed=3) + [
+        'Estou triste, perdido e sozinho no mundo; não aguento mais viver',
+        'Vou me matar, acabar com tudo agora. Tchau mundo',
+        'Feliz e grato, mas com muito trabalho e dívida no banco',
+        '',
+    ]
+    for message in corpus:
+        assert compiled_scan(message) == legacy_scan(message), message
+
+
+def test_tendencia_da_janela():
+    now = datetime.utcnow()
+    window = MoodWindow(size=20)
+    for mood in ['positive', 'very_positive', 'positive']:
+        window.append(mood, now)
+    assert window.trend(now) == 'stable'  # O cálculo antigo dividia por zero aqui
+    for mood in ['depressed', 'critical', 'anxious']:
+        window.append(mood, now)
+    assert window.trend(now) == 'declining'
+
+    history = [{'current_mood': mood} for mood in ['very_positive', 'positive', 'very_positive', 'neutral', 'anxious']]
+    assert analyze_emotional_trend(history) == legacy_trend(history) == 'improving'
+
+    window.entries.appendleft((now - timedelta(days=30), 5))  # Fora dos 7 dias
+    window.trend(now)
+    assert len(window) == 6
+
+
+def test_cache_recarrega_e_registra():
+    clock = [0.0]
+    loads = []
+
+    def loader(user_id):
+        loads.append(user_id)
+        return [('neutral', datetime.utcnow())] * 3
+
+    cache = EmotionalStateCache(max_users=2, reload_seconds=60, clock=lambda: clock[0])
+    window = cache.get(1, loader)
+    assert cache.get(1, loader) is window and loads == [1]
+    assert cache.record(1, 'critical') and len(window) == 4
+    assert not cache.record(2, 'critical')  # Não carregada: nada a atualizar
+    cache.get(2, loader)
+    cache.get(3, loader)
+    assert 1 not in cache and len(cache) == 2
+    clock[0] = 61
+    cache.get(3, loader)
+    assert loads == [1, 2, 3, 3]
+
+
+def test_rota_atualiza_a_janela():
+    with app.app_context():
+        client = app.test_client()
+        emotional_state_cache.evict(958)
+        for message in ['Estou feliz e grato', 'Dia alegre e tranquilo', 'Me sinto bem e animado']:
+            data = client.post('/api/emotional/analyze', json={'user_id': 958, 'message': message}).get_json()
+        assert data['emotional_analysis']['mood'] == 'positive'
+        assert len(emotional_state_cache.get(958, lambda user_id: []).entries) == 3
+
+        for message in ['Estou triste e sem energia', 'Muito ansioso e com medo', 'Deprimido e vazio']:
+            data = client.post('/api/emotional/analyze', json={'user_id': 958, 'message': message}).get_json()
+        assert data['emotional_analysis']['context']['recent_trend'] == 'declining'
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Teste das somas mensais das finanças por categoria (incrementais + recálculo com NumPy)
+"""
+
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+from app import app, db, finance_totals, FinancialAccount, FinancialGoal, FinancialMonthlyTotal, FinancialTransaction
+from finance_analytics import month_key, shift_month
+
+USER_ID = 2301
+
+
+def _account(user_id):
+    with app.app_context():
+        account = FinancialAccount(user_id=user_id, account_name='Conta Analítica', account_type='checking',
+                                   current_balance=0.0, available_balance=0.0)
+        db.session.add(account)
+        db.session.commit()
+        return account.id
+
+
+def _create(client, user_id, account_id, amount, transaction_type, category, when):
+    response = client.post('/api/finance/transactions/create', json={
+        'user_id': user_id, 'account_id': account_id, 'amount': amount, 'description': 'Teste',
+        'transaction_type': transaction_type, 'category': category, 'transaction_date': when.isoformat()
+    })
+    assert response.status_code == 200
+    return response.get_json()['transaction_id']
+
+
+def _table(user_id):
+    return {(row.year_month, row.category, row.transaction_type): (round(row.total_amount, 6), row.transaction_count)
+            for row in FinancialMonthlyTotal.query.filter_by(user_id=user_id).all() if row.transaction_count}
+
+
+def test_somas_incrementais_e_relatorios():
+    account_id = _account(USER_ID)
+    client = app.test_client()
+    this_month = datetime.utcnow().replace(day=1, hour=12, minute=0, second=0, microsecond=0)
+    last_month = (this_month - timedelta(days=1)).replace(day=1)
+
+    _create(client, USER_ID, account_id, 3000.0, 'income', 'salario', last_month)
+    _create(client, USER_ID, account_id, 400.0, 'expense', 'alimentacao', last_month)
+    _create(client, USER_ID, account_id, 3000.0, 'income', 'salario', this_month)
+    _create(client, USER_ID, account_id, 300.0, 'expense', 'alimentacao', this_month)
+    _create(client, USER_ID, account_id, 200.0, 'expense', 'transporte', this_month)
+    moved = _create(client, USER_ID, account_id, 100.0, 'expense', 'lazer', this_month)
+    cancelled = _create(client, USER_ID, account_id, 999.0, 'expense', 'lazer', this_month)
+
+    with app.app_context():
+        # Alteração de categoria e de mês, e cancelamento, ajustam as somas no flush
+        transaction = db.session.get(FinancialTransaction, moved)
+        transaction.category, transaction.transaction_date = 'transporte', last_month
+        db.session.get(FinancialTransaction, cancelled).status = 'cancelled'
+        db.session.commit()
+
+    month = month_key(this_month)
+    categories = client.get(f'/api/finance/analytics/{USER_ID}/categories?month={month}').get_json()
+    assert categories['total'] == 500.0
+    assert [(item['category'], item['total'], item['count']) for item in categories['categories']] == \
+        [('alimentacao', 300.0, 1), ('transporte', 200.0, 1)]
+    assert categories['categories'][0]['percentage'] == 60.0
+    assert client.get(f'/api/finance/analytics/{USER_ID}/categories?month=13-2024').status_code == 400
+
+    trend = client.get(f'/api/finance/analytics/{USER_ID}/trend?months=3&until={month}').get_json()['months']
+    assert [entry['month'] for entry in trend] == [shift_month(month, -2), shift_month(month, -1), month]
+    assert (trend[1]['income'], trend[1]['expense'], trend[1]['net']) == (3000.0, 500.0, 2500.0)
+    assert trend[1]['expense_change_percentage'] is None and trend[2]['expense_change_percentage'] == 0.0
+    fallback = client.get(f'/api/finance/analytics/{USER_ID}/trend?months=abc&until={month}')
+    assert fallback.status_code == 200 and len(fallback.get_json()['months']) == 6
+
+    # Escrita em lote (fora da sessão) não é vista; a reconciliação corrige só a linha afetada
+    with app.app_context():
+        before = _table(USER_ID)
+        assert finance_totals.reconcile(db.session, [USER_ID]) == 0
+        db.session.execute(FinancialTransaction.__table__.insert(), [
+            {'user_id': USER_ID, 'account_id': account_id, 'transaction_type': 'expense', 'amount': 50.0,
+             'description': 'Importado', 'category': 'saude', 'transaction_date': this_month, 'status': 'confirmed'}
+        ])
+        assert finance_totals.reconcile(db.session, [USER_ID]) == 1
+        db.session.commit()
+        assert _table(USER_ID) == {**before, (month, 'saude', 'expense'): (50.0, 1)}
+
+
+def test_progresso_das_metas():
+    user_id = USER_ID + 1
+    account_id = _account(user_id)
+    client = app.test_client()
+    now = datetime.utcnow()
+    with app.app_context():
+        budget = FinancialGoal(user_id=user_id, goal_name='Mercado', goal_type='budget', target_amount=1000.0,
+                               monthly_target=800.0)
+        savings = FinancialGoal(user_id=user_id, goal_name='Reserva', goal_type='savings', target_amount=5000.0,
+                                monthly_target=1000.0, created_date=now - timedelta(days=40))
+        db.session.add_all([budget, savings])
+        db.session.commit()
+        budget_id, savings_id = budget.id, savings.id
+
+    previous = (now.replace(day=1) - timedelta(days=1)).replace(day=15)
+    _create(client, user_id, account_id, 2000.0, 'income', 'salario', previous)
+    _create(client, user_id, account_id, 900.0, 'expense', 'alimentacao', previous)
+    _create(client, user_id, account_id, 2000.0, 'income', 'salario', now)
+    _create(client, user_id, account_id, 600.0, 'expense', 'alimentacao', now)
+
+    progress = client.get(f'/api/finance/goals/{budget_id}/progress').get_json()['progress']
+    assert (progress['spent'], progress['remaining'], progress['progress_percentage']) == (600.0, 200.0, 75.0)
+    assert not progress['over_budget']
+
+    progress = client.get(f'/api/finance/goals/{savings_id}/progress').get_json()['progress']
+    assert progress['tracked_amount'] == 2500.0 and progress['progress_percentage'] == 50.0
+    assert progress['month_saved'] == 1400.0 and progress['on_track']
+    assert progress['months_to_target'] >= 1
+    assert client.get('/api/finance/goals/999999/progress').status_code == 404
+
+
+def test_recalculo_com_numpy_confere_com_a_soma_linha_a_linha():
+    rng = random.Random(23)
+    user_ids = [USER_ID + 10 + index for index in range(3)]
+    start = datetime(2023, 1, 1)
+    with app.app_context():
+        rows = [{'user_id': rng.choice(user_ids), 'account_id': 1, 'description': 'Lote',
+                 'transaction_type': rng.choice(['income', 'expense', 'expense', 'transfer']),
+                 'amount': round(rng.uniform(1, 500), 2), 'category': rng.choice(['casa', 'lazer', 'saude', None]),
+                 'transaction_date': start + timedelta(hours=rng.randrange(24 * 700)),
+                 'status': rng.choice(['confirmed', 'confirmed', 'pending', 'cancelled'])}
+                for _ in range(3000)]
+        db.session.execute(FinancialTransaction.__table__.insert(), rows)
+
+        expected = Counter()
+        for row in rows:
+            finance_totals.contributions(row, 1, expected)
+        original_batch = finance_totals.batch_size
+        finance_totals.batch_size = 700  # Vários lotes do cursor
+        try:
+            recomputed = finance_totals.recompute(db.session, user_ids)
+            assert finance_totals.reconcile(db.session, user_ids) == len({key[:4] for key in +expected})
+        finally:
+            finance_totals.batch_size = original_batch
+        db.session.commit()
+
+        assert recomputed.keys() == expected.keys()
+        assert all(abs(recomputed[key] - expected[key]) < 1e-6 for key in expected)
+        stored = {}
+        for user_id in user_ids:
+            stored.update({(user_id,) + key: value for key, value in _table(user_id).items()})
+        assert stored == {key[:4]: (round(expected[key[:4] + ('total_amount',)], 6),
+                                    expected[key[:4] + ('transaction_count',)])
+                          for key in expected if expected[key[:4] + ('transaction_count',)]}
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Verificação de índices do IAON
+
+Percorre o app.py procurando consultas por usuário/reunião/conta
+(filter_by com chave estrangeira + filter/order_by) e falha se alguma
+delas não tiver um índice composto que a sustente. Também garante que a
+migração de índices recria índices ausentes em um banco já existente.
+"""
+
+import ast
+import os
+
+from sqlalchemy import create_engine, inspect, text
+
+from app import app, db, apply_index_migrations
+
+APP_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+
+def _model_tables():
+    """Mapear nome da classe do modelo -> tabela SQLAlchemy"""
+    models = {}
+    for mapper in db.Model.registry.mappers:
+        models[mapper.class_.__name__] = mapper.local_table
+    return models
+
+
+def _column_name(node, model_name):
+    """Extrair o nome da coluna de expressões como Model.col, Model.col.desc()"""
+    while isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        if node.func.attr in ('desc', 'asc', 'nullslast', 'nullsfirst', 'isnot', 'is_', 'contains', 'ilike', 'like', 'in_'):
+            node = node.func.value
+        else:
+            break
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == model_name:
+        return node.attr
+    return None
+
+
+TERMINAL_METHODS = ('all', 'first', 'count', 'limit', 'paginate', 'update')
+
+
+def _new_shape(model_name):
+    return {'model': model_name, 'equality': [], 'range': [], 'order': []}
+
+
+def _walk_chain(node, shapes_by_var):
+    """Desmontar uma cadeia Model.query.filter_by(...).filter(...).order_by(...)"""
+    calls = []
+    current = node
+    while True:
+        if isinstance(current, ast.Call) and isinstance(current.func, ast.Attribute):
+            calls.append(current)
+            current = current.func.value
+        elif isinstance(current, ast.Attribute):
+            current = current.value
+        else:
+            break
+
+    shape = None
+    if isinstance(current, ast.Name) and current.id in shapes_by_var:
+        base = shapes_by_var[current.id]
+        shape = {key: list(value) if isinstance(value, list) else value for key, value in base.items()}
+        shape['order'] = []  # Ramos if/elif reatribuem a ordenação
+    elif isinstance(current, ast.Name):
+        # Model.query.<...>
+        root = node
+        while isinstance(root, (ast.Call, ast.Attribute)):
+            if isinstance(root, ast.Attribute) and root.attr == 'query' and isinstance(root.value, ast.Name):
+                shape = _new_shape(root.value.id)
+                break
+            root = root.func if isinstance(root, ast.Call) else root.value
+    if shape is None:
+        return None
+
+    model_name = shape['model']
+    for call in reversed(calls):
+        method = call.func.attr
+        if method == 'filter_by':
+            for keyword in call.keywords:
+                if keyword.arg:
+                    shape['equality'].append(keyword.arg)
+        elif method == 'filter':
+            for arg in call.args:
+                if isinstance(arg, ast.Compare) and len(arg.ops) == 1:
+                    column = _column_name(arg.left, model_name)
+                    if column is None:
+                        continue
+                    if isinstance(arg.ops[0], ast.Eq):
+                        shape['equality'].append(column)
+                    elif isinstance(arg.ops[0], (ast.Gt, ast.GtE, ast.Lt, ast.LtE)):
+                        shape['range'].append(column)
+        elif method == 'order_by':
+            for arg in call.args:
+                column = _column_name(arg, model_name)
+                if column:
+                    shape['order'].append(column)
+    return shape
+
+
+def collect_query_shapes(source_path=APP_SOURCE):
+    """Coletar formatos de consulta (igualdade, faixa, ordenação) por função"""
+    with open(source_path, encoding='utf-8') as source_file:
+        tree = ast.parse(source_file.read())
+
+    shapes = {}
+    for function in ast.walk(tree):
+        if not isinstance(function, ast.FunctionDef):
+            continue
+        shapes_by_var = {}
+        assignments = sorted(
+            (node for node in ast.walk(function)
+             if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)),
+            key=lambda node: node.lineno
+        )
+        for node in assignments:
+            shape = _walk_chain(node.value, shapes_by_var)
+            if shape:
+                shapes_by_var[node.targets[0].id] = shape
+        for node in ast.walk(function):
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in TERMINAL_METHODS:
+                shape = _walk_chain(node.func.value, shapes_by_var)
+                if shape:
+                    shape['function'] = function.name
+                    shape['line'] = node.lineno
+                    key = (function.name, node.lineno, shape['model'])
+                    shapes[key] = shape
+    return sorted(shapes.values(), key=lambda shape: shape['line'])
+
+
+def _is_supported(shape, table):
+    """Uma consulta é sustentada por um índice cujo prefixo sejam colunas de
+    igualdade (começando por uma chave estrangeira) e, havendo ORDER BY, cuja
+    coluna seguinte ao prefixo seja a primeira coluna de ordenação."""
+    columns = set(table.columns.keys())
+    equality = {c for c in shape['equality'] if c in columns}
+    order = [c for c in shape['order'] if c in columns]
+    foreign_keys = {fk.parent.name for fk in table.foreign_keys}
+    if 'id' in equality or not equality & foreign_keys:
+        return True  # Busca por PK ou consulta sem chave por usuário/reunião
+    for index in table.indexes:
+        index_columns = [column.name for column in index.columns]
+        prefix = 0
+        while prefix < len(index_columns) and index_columns[prefix] in equality:
+            prefix += 1
+        if prefix == 0 or index_columns[0] not in foreign_keys:
+            continue
+        if order and order[0] not in index_columns[:prefix + 1]:
+            continue
+        return True
+    return False
+
+
+def find_unsupported_queries():
+    tables = _model_tables()
+    missing = []
+    for shape in collect_query_shapes():
+        table = tables.get(shape['model'])
+        if table is None:
+            continue
+        if not _is_supported(shape, table):
+            missing.append(shape)
+    return missing
+
+
+def test_hot_queries_have_supporting_index():
+    """Toda consulta por chave estrangeira precisa de um índice composto"""
+    missing = find_unsupported_queries()
+    details = [
+        f"{shape['function']} (linha {shape['line']}): {shape['model']} "
+        f"igualdade={shape['equality']} faixa={shape['range']} ordem={shape['order']}"
+        for shape in missing
+    ]
+    assert not missing, "Consultas sem índice de suporte:\n" + "\n".join(details)
+
+
+def test_index_migration_restores_missing_indexes(tmp_path):
+    """A migração cria índices ausentes em um banco existente sem recriar tabelas"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'migracao.db'}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text('DROP INDEX uq_contacts_user_id_phone_number'))
+        # Banco migrado antes da troca pelo índice único
+        connection.execute(text('CREATE INDEX ix_contacts_user_id_phone_number ON contacts (user_id, phone_number)'))
+
+    created = apply_index_migrations(engine)
+
+    assert 'uq_contacts_user_id_phone_number' in created
+    index_names = {index['name'] for index in inspect(engine).get_indexes('contacts')}
+    assert 'uq_contacts_user_id_phone_number' in index_names
+    assert 'ix_contacts_user_id_phone_number' not in index_names
+    # Segunda execução é idempotente
+    assert apply_index_migrations(engine) == []
+
+
+if __name__ == '__main__':
+    print("🔍 VERIFICAÇÃO DE ÍNDICES - SISTEMA IAON")
+    print("=" * 40)
+    pending = find_unsupported_queries()
+    for shape in pending:
+        print(f"❌ {shape['function']} (linha {shape['line']}): {shape['model']} "
+              f"igualdade={shape['equality']} faixa={shape['range']} ordem={shape['order']}")
+    if not pending:
+        print("✅ Todas as consultas quentes possuem índice de suporte")
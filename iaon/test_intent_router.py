@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Teste do roteador de intenções compilado
+"""
+
+import random
+
+from app import app, CHAT_INTENTS, VOICE_COMMAND_INTENTS, TRANSACTION_CATEGORIES, auto_categorize_transaction
+from benchmark_intent_router import CORPUS, legacy_table, legacy_first
+from intent_router import IntentClassifier
+
+
+def test_palavras_sobrepostas_e_contidas():
+    classifier = IntentClassifier([
+        ('help', ['ajuda']),
+        ('emergency', ['ajuda urgente', 'socorro']),
+        ('market', ['mercado']),
+        ('food', ['supermercado']),
+        ('overlap', ['cde']),
+    ])
+    matches = classifier.classify('Socorro! Preciso de AJUDA URGENTE no supermercado abcde')
+    assert matches.keywords == {'socorro', 'ajuda urgente', 'ajuda', 'supermercado', 'mercado', 'cde'}
+    assert matches.intents == ['help', 'emergency', 'market', 'food', 'overlap']
+    assert matches.ranked()[0] == ('emergency', 2)
+    assert matches.first() == 'help' and matches.first({'food', 'market'}) == 'market'
+    assert classifier.first('nada aqui', default='outros') == 'outros'
+    assert classifier.classify('').best() is None
+
+
+def test_mesmo_resultado_das_cadeias_antigas():
+    rng = random.Random(7)
+    for classifier in (CHAT_INTENTS, VOICE_COMMAND_INTENTS, TRANSACTION_CATEGORIES):
+        table = legacy_table(classifier)
+        keywords = list(classifier.intents_by_keyword)
+        texts = list(CORPUS)
+        for _ in range(300):  # Frases com palavras-chave e pedaços de palavras misturados
+            words = [rng.choice(keywords) for _ in range(rng.randint(0, 3))]
+            words += [keyword[:rng.randint(1, len(keyword))] for keyword in rng.sample(keywords, 2)]
+            rng.shuffle(words)
+            texts.append(' '.join(words))
+        for text in texts:
+            assert classifier.first(text) == legacy_first(table, text), text
+        # Em lote (uma passada sobre os textos distintos) o resultado é o mesmo
+        assert classifier.first_many(texts + texts[:50], 'outros') == \
+            [classifier.first(text, default='outros') for text in texts + texts[:50]]
+
+    assert auto_categorize_transaction('Compra SUPERMERCADO extra') == 'alimentacao'
+    assert auto_categorize_transaction('Pix recebido') == 'outros'
+
+
+def test_chat_roteia_especialidade_do_coach():
+    with app.app_context():
+        client = app.test_client()
+        response = client.post('/api/chat', json={'message': 'Quero um coach empresarial'}).get_json()['response']
+        assert 'Coach Empresarial' in response
+        response = client.post('/api/chat', json={'message': 'coach para minha vida'}).get_json()['response']
+        assert 'Coach de Vida' in response
+        response = client.post('/api/chat', json={'message': 'como vai o clima?'}).get_json()['response']
+        assert 'coach' not in response.lower()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Teste da fila de tarefas em segundo plano
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import (app, db, job_queue, BackgroundJob, ConversationMemory, EmergencyContact, NotificationSystem,
+                 SuicideRiskAssessment)
+from job_queue import JobQueue
+
+
+def test_chat_responde_antes_da_memoria():
+    with app.app_context():
+        client = app.test_client()
+        data = client.post('/api/ai/chat', json={'user_id': 960, 'message': 'Preciso lembrar da reunião com a Marta amanhã'}).get_json()
+        assert data['response']
+        assert ConversationMemory.query.filter_by(user_id=960).count() == 0
+        assert BackgroundJob.query.filter_by(job_type='conversation_memory', status='pending').count() == 1
+
+        job_queue.run_pending()
+        memory = ConversationMemory.query.filter_by(user_id=960).one()
+        assert memory.session_id == data['session_id'] and memory.follow_up_needed
+        assert BackgroundJob.query.filter_by(job_type='conversation_memory', status='pending').count() == 0
+
+
+def test_lembretes_e_protocolo_de_emergencia():
+    with app.app_context():
+        client = app.test_client()
+        start = datetime.utcnow() + timedelta(days=2)
+        event_id = client.post('/api/calendar/create-event', json={
+            'user_id': 961, 'title': 'Dentista', 'reminders': ['15min', '1d'],
+            'start_datetime': start.isoformat(), 'end_datetime': (start + timedelta(hours=1)).isoformat()
+        }).get_json()['event_id']
+
+        db.session.add(EmergencyContact(user_id=961, contact_name='Irmã', relationship='família', phone_number='11999990000'))
+        db.session.commit()
+        data = client.post('/api/emotional/analyze', json={'user_id': 961, 'message': 'quero morrer, acabar com tudo'}).get_json()
+        assert data['emergency_response']['emergency_activated']
+
+        # A emergência passa na frente dos lembretes
+        job_queue.run_pending(limit=1)
+        assessment = SuicideRiskAssessment.query.filter_by(user_id=961).one()
+        assert assessment.risk_level == data['suicide_risk']['level']
+        assert NotificationSystem.query.filter_by(related_entity_type='calendar_event', related_entity_id=event_id).count() == 0
+
+        job_queue.run_pending()
+        assert NotificationSystem.query.filter_by(related_entity_type='calendar_event', related_entity_id=event_id).count() == 2
+
+        metrics = client.get('/api/admin/jobs').get_json()['metrics']
+        assert metrics['types']['emergency_protocol']['succeeded'] >= 1
+        assert metrics['queue']['calendar_reminders']['done'] >= 1
+
+
+def test_nova_tentativa_com_espera_e_falha_final():
+    with app.app_context():
+        queue = JobQueue(app, db, BackgroundJob, workers=0)
+        calls = []
+
+        @queue.handler('instavel', max_attempts=3, backoff_seconds=10)
+        def flaky(payload):
+            calls.append(payload['n'])
+            raise ValueError('serviço fora do ar')
+
+        job = queue.enqueue('instavel', {'n': 1})
+        db.session.commit()
+        assert queue.run_pending() == 1
+        db.session.refresh(job)
+        assert job.status == 'pending' and job.attempts == 1 and 'serviço fora do ar' in job.last_error
+        assert 9 <= (job.run_after - datetime.utcnow()).total_seconds() <= 10
+        assert queue.run_pending() == 0  # Ainda esperando o backoff
+
+        for expected_wait in (20, None):
+            job.run_after = datetime.utcnow()
+            db.session.commit()
+            queue.run_pending()
+            db.session.refresh(job)
+            if expected_wait:
+                assert expected_wait - 1 <= (job.run_after - datetime.utcnow()).total_seconds() <= expected_wait
+        assert job.status == 'failed' and job.attempts == 3 and calls == [1, 1, 1]
+        assert queue.metrics()['types']['instavel']['retried'] == 2
+
+        # Tarefas presas em running (worker morto) voltam para a fila
+        job.status, job.started_at = 'running', datetime.utcnow() - timedelta(hours=1)
+        db.session.commit()
+        assert queue.recover_stale() == 1
+
+
+def test_limpeza_de_tarefas_antigas():
+    with app.app_context():
+        queue = JobQueue(app, db, BackgroundJob, workers=0, retention_seconds=3600, failed_retention_seconds=86400)
+        now = datetime.utcnow()
+        jobs = [BackgroundJob(job_type='limpeza', status=status, finished_at=now - timedelta(hours=hours))
+                for status, hours in (('done', 2), ('done', 0.5), ('failed', 2), ('failed', 48), ('pending', 0))]
+        jobs[-1].finished_at = None
+        db.session.add_all(jobs)
+        db.session.commit()
+        ids = [job.id for job in jobs]
+
+        assert queue.purge_finished() == 2
+        remaining = {job.id for job in BackgroundJob.query.filter(BackgroundJob.id.in_(ids))}
+        assert remaining == {ids[1], ids[2], ids[4]}
+
+
+def test_limite_de_concorrencia_por_tipo():
+    with app.app_context():
+        queue = JobQueue(app, db, BackgroundJob, workers=4, poll_interval=0.05)
+        running = {'serial': 0, 'paralelo': 0}
+        peak = {'serial': 0, 'paralelo': 0}
+        lock = threading.Lock()
+
+        def make_handler(name):
+            def handler(payload):
+                with lock:
+                    running[name] += 1
+                    peak[name] = max(peak[name], running[name])
+                time.sleep(0.05)
+                with lock:
+                    running[name] -= 1
+            return handler
+
+        queue.handler('serial', concurrency=1)(make_handler('serial'))
+        queue.handler('paralelo', concurrency=3)(make_handler('paralelo'))
+        for index in range(6):
+            queue.enqueue('serial', {'n': index})
+            queue.enqueue('paralelo', {'n': index})
+        db.session.commit()
+
+        deadline = time.time() + 20
+        while time.time() < deadline and BackgroundJob.query.filter(
+                BackgroundJob.job_type.in_(['serial', 'paralelo']), BackgroundJob.status != 'done').count():
+            time.sleep(0.05)
+        queue.stop()
+        assert BackgroundJob.query.filter(BackgroundJob.job_type.in_(['serial', 'paralelo']),
+                                          BackgroundJob.status == 'done').count() == 12
+        assert peak['serial'] == 1 and 1 < peak['paralelo'] <= 3
+
+
+def test_limite_de_concorrencia_entre_processos():
+    with app.app_context():
+        queue = JobQueue(app, db, BackgroundJob, workers=0)
+        done = []
+        queue.handler('exclusivo', concurrency=1)(lambda payload: done.append(payload['n']))
+        # Outro worker do gunicorn está executando uma tarefa do mesmo tipo
+        other = BackgroundJob(job_type='exclusivo', status='running', locked_by='9999:iaon-jobs-0',
+                              started_at=datetime.utcnow())
+        db.session.add(other)
+        queue.enqueue('exclusivo', {'n': 1})
+        db.session.commit()
+
+        assert queue.run_pending() == 0
+        other.status, other.finished_at = 'done', datetime.utcnow()
+        db.session.commit()
+        assert queue.run_pending() == 1 and done == [1]
+
+
+def test_falha_no_commit_da_reivindicacao_libera_a_vaga(monkeypatch):
+    with app.app_context():
+        queue = JobQueue(app, db, BackgroundJob, workers=0)
+        done = []
+        queue.handler('reivindicacao', concurrency=1)(lambda payload: done.append(payload['n']))
+        queue.enqueue('reivindicacao', {'n': 1})
+        db.session.commit()
+
+        commit = db.session.commit
+        calls = []
+
+        def _failing_commit():
+            calls.append(1)
+            if len(calls) == 2:  # Commit do UPDATE que reivindica a tarefa
+                raise RuntimeError('conexão perdida')
+            commit()
+
+        monkeypatch.setattr(db.session, 'commit', _failing_commit)
+        with pytest.raises(RuntimeError):
+            queue.run_next()
+        monkeypatch.undo()
+
+        assert queue.stats['reivindicacao'].running == 0
+        assert queue.run_pending() == 1 and done == [1]
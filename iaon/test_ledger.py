@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Teste dos saldos por razão (deltas atômicos + checkpoints) sob concorrência
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+from app import app, db, balance_ledger, FinancialAccount, FinancialBalanceCheckpoint, FinancialTransaction
+
+USER_ID = 2201
+WRITERS = 64
+PER_WRITER = 5
+
+
+def _account(name, balance=100.0):
+    with app.app_context():
+        account = FinancialAccount(user_id=USER_ID, account_name=name, account_type='checking',
+                                   current_balance=balance, available_balance=balance)
+        db.session.add(account)
+        db.session.commit()
+        return account.id
+
+
+def _later():
+    return datetime.utcnow() + timedelta(seconds=balance_ledger.settle_seconds + 1)
+
+
+def test_64_escritores_sem_perder_atualizacoes():
+    account_id = _account('Conta Concorrida')
+    barrier = threading.Barrier(WRITERS)
+    statuses, expected = [], []
+    lock = threading.Lock()
+
+    def writer(index):
+        client = app.test_client()
+        barrier.wait()  # Todos começam juntos
+        for number in range(PER_WRITER):
+            income = (index + number) % 3 == 0
+            amount = round(1.0 + index * 0.37 + number * 0.11, 2)
+            response = client.post('/api/finance/transactions/create', json={
+                'user_id': USER_ID, 'account_id': account_id, 'amount': amount, 'description': f'Escritor {index}',
+                'transaction_type': 'income' if income else 'expense', 'category': 'teste'
+            })
+            with lock:
+                statuses.append(response.status_code)
+                expected.append(amount if income else -amount)
+
+    threads = [threading.Thread(target=writer, args=(index,)) for index in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * (WRITERS * PER_WRITER)
+    accounts = app.test_client().get(f'/api/finance/accounts/{USER_ID}').get_json()['accounts']
+    balance = next(account['current_balance'] for account in accounts if account['id'] == account_id)
+    assert abs(balance - (100.0 + sum(expected))) < 1e-6
+
+    # Checkpoint confere com as transações: nada a corrigir
+    with app.app_context():
+        result = balance_ledger.checkpoint(db.session, [account_id], now=_later())
+        assert result == {'accounts': 1, 'checkpoints': 1, 'corrections': 0, 'opened': 0}
+        checkpoint = FinancialBalanceCheckpoint.query.filter_by(account_id=account_id).order_by(
+            FinancialBalanceCheckpoint.id.desc()).first()
+        assert checkpoint.transaction_count == WRITERS * PER_WRITER
+        assert abs(checkpoint.current_balance - balance) < 1e-6
+
+
+def test_checkpoint_corrige_escritas_fora_da_sessao():
+    account_id = _account('Conta Conferida', balance=50.0)
+    with app.app_context():
+        transaction = FinancialTransaction(user_id=USER_ID, account_id=account_id, transaction_type='expense',
+                                           amount=20.0, description='Mercado', transaction_date=datetime.utcnow())
+        db.session.add(transaction)
+        db.session.commit()
+        assert db.session.get(FinancialAccount, account_id).current_balance == 30.0
+
+        # Alterações e cancelamentos pela sessão também ajustam o saldo
+        transaction.amount = 25.0
+        db.session.commit()
+        assert db.session.get(FinancialAccount, account_id).current_balance == 25.0
+        transaction.status = 'cancelled'
+        db.session.commit()
+        assert db.session.get(FinancialAccount, account_id).current_balance == 50.0
+
+        # Inserção em lote não passa pelo before_flush: o checkpoint encontra e corrige a diferença
+        db.session.execute(FinancialTransaction.__table__.insert(), [
+            {'user_id': USER_ID, 'account_id': account_id, 'transaction_type': 'income', 'amount': 10.0,
+             'description': 'Importado', 'transaction_date': datetime.utcnow(), 'status': 'confirmed',
+             'created_at': datetime.utcnow()}
+        ])
+        db.session.commit()
+        assert db.session.get(FinancialAccount, account_id).current_balance == 50.0
+
+        result = balance_ledger.checkpoint(db.session, [account_id], now=_later())
+        assert result['corrections'] == 1
+        account = db.session.get(FinancialAccount, account_id)
+        db.session.refresh(account)
+        assert account.current_balance == 60.0 and account.available_balance == 60.0
+        assert balance_ledger.checkpoint(db.session, [account_id], now=_later())['corrections'] == 0
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Teste das estatísticas incrementais de reuniões
+"""
+
+from sqlalchemy import event
+
+from app import (app, db, MeetingSession, MeetingParticipant, MeetingTranscript, reconcile_meeting_statistics,
+                 recompute_meeting_statistics)
+
+
+def _transcript(meeting_id, speaker, content, start, end, confidence, **flags):
+    return MeetingTranscript(meeting_id=meeting_id, speaker_name=speaker, content=content,
+                             start_time_seconds=start, end_time_seconds=end, confidence_score=confidence, **flags)
+
+
+def test_agregados_acompanham_cada_transcricao():
+    with app.app_context():
+        client = app.test_client()
+        meeting_id = client.post('/api/meetings/start', json={'user_id': 956, 'title': 'Agregados'}).get_json()['meeting']['id']
+        for name in ('Ana', 'Bruno'):
+            client.post(f'/api/meetings/{meeting_id}/participant-introduction', json={
+                'participant_name': name, 'audio_data': 'a' * 400, 'introduction_text': f'Olá, eu sou {name}'
+            })
+
+        db.session.add_all([
+            _transcript(meeting_id, 'Ana', 'vamos decidir o prazo hoje', 0, 30, 0.9, is_decision=True),
+            _transcript(meeting_id, 'Bruno', 'essa tarefa é minha', 30, 45, 0.8, is_action_item=True),
+        ])
+        db.session.commit()
+        db.session.add(_transcript(meeting_id, 'Ana', 'combinado', 45, 51, 0.7))
+        db.session.add(_transcript(meeting_id, 'Ana (provável)', 'ok', 51, 52, 0.6))  # Não conta para Ana
+        db.session.commit()
+
+        details = client.get(f'/api/meetings/{meeting_id}').get_json()
+        statistics = details['statistics']
+        assert statistics['total_transcripts'] == 4
+        assert statistics['total_words'] == 5 + 4 + 1 + 1
+        assert statistics['action_items_count'] == 1 and statistics['decisions_count'] == 1
+        assert abs(statistics['average_confidence'] - 0.75) < 1e-9
+
+        participants = {p['participant_name']: p for p in details['participants']}
+        assert abs(participants['Ana']['speaking_time_minutes'] - 36 / 60) < 1e-9
+        assert participants['Ana']['interventions_count'] == 2 and participants['Ana']['words_count'] == 6
+        assert participants['Bruno']['interventions_count'] == 1
+
+        data = client.post(f'/api/meetings/{meeting_id}/end').get_json()
+        assert data['statistics']['total_transcripts'] == 4 and data['statistics']['total_participants'] == 2
+        assert abs(data['meeting']['quality_score'] - 0.75) < 1e-9
+
+        # Recalcular do zero (migração de bancos antigos) dá os mesmos valores
+        recompute_meeting_statistics()
+        db.session.expire_all()
+        recomputed = MeetingSession.query.get(meeting_id).get_statistics()
+        assert abs(recomputed.pop('average_confidence') - statistics.pop('average_confidence')) < 1e-9
+        assert recomputed == statistics
+        ana = MeetingParticipant.query.filter_by(meeting_id=meeting_id, participant_name='Ana').first()
+        assert ana.interventions_count == 2 and ana.words_count == 6
+
+
+def test_listagem_sem_consultas_por_reuniao():
+    with app.app_context():
+        client = app.test_client()
+        for index in range(5):
+            meeting_id = client.post('/api/meetings/start', json={'user_id': 957, 'title': f'Reunião {index}'}).get_json()['meeting']['id']
+            client.post(f'/api/meetings/{meeting_id}/participant-introduction', json={
+                'participant_name': 'Carla', 'audio_data': 'c' * 400, 'introduction_text': 'Olá'
+            })
+            db.session.add(_transcript(meeting_id, 'Carla', 'bom dia', 0, 5, 0.9))
+            db.session.commit()
+
+        statements = []
+
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', _capture)
+        try:
+            data = client.get('/api/meetings/user/957').get_json()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', _capture)
+        assert data['total'] == 5
+        assert all(m['participants_count'] == 1 and m['transcripts_count'] == 1 for m in data['meetings'])
+        assert len(statements) == 1
+
+
+def test_gravacoes_fora_da_sessao_e_exclusoes():
+    with app.app_context():
+        meeting = MeetingSession(user_id=958, title='Fora da sessão')
+        db.session.add(meeting)
+        db.session.commit()
+        meeting_id, created = meeting.id, meeting.updated_at
+
+        # Transcrição pela sessão avança updated_at (o backup incremental leva os agregados)
+        transcript = _transcript(meeting_id, 'Ana', 'vamos começar', 0, 10, 0.9)
+        db.session.add(transcript)
+        db.session.commit()
+        meeting = db.session.get(MeetingSession, meeting_id)
+        assert meeting.transcripts_count == 1 and meeting.updated_at > created
+
+        # Lote gravado direto na tabela (ex.: restauração) não passa pelo before_flush
+        db.session.execute(MeetingParticipant.__table__.insert(), [{'meeting_id': meeting_id, 'participant_name': 'Bia'}])
+        db.session.execute(MeetingTranscript.__table__.insert(), [
+            {'meeting_id': meeting_id, 'speaker_name': 'Bia', 'content': 'tarefa para amanhã', 'confidence_score': 0.5,
+             'is_action_item': True}])
+        db.session.commit()
+        assert reconcile_meeting_statistics() >= 1
+        db.session.expire_all()
+        meeting = db.session.get(MeetingSession, meeting_id)
+        assert (meeting.transcripts_count, meeting.total_words, meeting.action_items_count,
+                meeting.total_participants) == (2, 5, 1, 1)
+        assert reconcile_meeting_statistics() == 0
+
+        db.session.delete(db.session.get(MeetingTranscript, transcript.id))
+        db.session.commit()
+        assert db.session.get(MeetingSession, meeting_id).get_statistics()['total_transcripts'] == 1
+        assert reconcile_meeting_statistics() == 0
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Teste da busca textual da memória conversacional (FTS5 no SQLite)
+"""
+
+import json
+
+from sqlalchemy import event, text
+
+from app import app, db, ConversationMemory, search_relevant_memories, ensure_memory_search_index
+from text_search import build_search_text, search_terms
+
+
+def _save(client, user_id, user_message, ai_response):
+    response = client.post('/api/conversation/save-memory', json={
+        'user_id': user_id,
+        'session_id': 'sessao-busca',
+        'user_message': user_message,
+        'ai_response': ai_response
+    })
+    assert response.status_code == 200
+    return response.get_json()['memory_id']
+
+
+def test_normalizacao_portugues():
+    """Acentos, plurais e flexões caem no mesmo termo"""
+    assert search_terms('Reuniões') == search_terms('reuniao')
+    assert search_terms('médicos') == search_terms('medico')
+    assert 'para' not in build_search_text('lembrete para amanhã')
+
+
+def test_busca_ranqueada_em_uma_consulta():
+    with app.app_context():
+        ensure_memory_search_index()
+        client = app.test_client()
+        reuniao_id = _save(client, 901, 'Preciso marcar uma reunião com o médico', 'Posso agendar a consulta')
+        _save(client, 901, 'Quanto gastei no mercado?', 'Você gastou R$ 200 em alimentação')
+        _save(client, 902, 'Reunião com o médico amanhã', 'Anotado')
+
+        search_relevant_memories(901, 'aquecimento')  # Detecta o FTS5 uma única vez
+        statements = []
+
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', _capture)
+        try:
+            memories = search_relevant_memories(901, 'Como foram as reunioes com medicos?')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', _capture)
+
+        assert [memory.id for memory in memories] == [reuniao_id]
+        assert len([s for s in statements if s.lstrip().upper().startswith('SELECT')]) == 1
+
+        response = client.post('/api/conversation/search-memory', json={'user_id': 901, 'query': 'gastos mercado'})
+        found = response.get_json()['memories']
+        assert len(found) == 1 and 'mercado' in found[0]['user_message']
+
+        # Nenhum resultado quando nem todas as palavras aparecem
+        response = client.post('/api/conversation/search-memory', json={'user_id': 901, 'query': 'mercado médico'})
+        assert response.get_json()['count'] == 0
+
+
+def test_backfill_de_memorias_antigas():
+    with app.app_context():
+        memory = ConversationMemory(user_id=903, session_id='antiga', user_message='Investimentos em ações',
+                                    ai_response='Vamos revisar sua carteira')
+        db.session.add(memory)
+        db.session.commit()
+        assert memory.search_text is None
+
+        ensure_memory_search_index()
+        db.session.expire_all()
+
+        assert [m.id for m in search_relevant_memories(903, 'meu investimento')] == [memory.id]
+
+
+def test_contexto_extraido_entra_na_busca():
+    with app.app_context():
+        db.session.execute(text("DELETE FROM schema_state WHERE name = 'memory_search_text'"))
+        memory = ConversationMemory(user_id=904, session_id='contexto', user_message='Onde moro?',
+                                    ai_response='Anotado', search_text=build_search_text('Onde moro?', 'Anotado'),
+                                    context_extracted=json.dumps({'personal_info': {'cidade': 'Curitiba'}, 'goals': []}))
+        db.session.add(memory)
+        db.session.commit()
+
+        ensure_memory_search_index()  # Documento indexado mudou: reindexa as memórias já indexadas
+        db.session.expire_all()
+
+        response = app.test_client().post('/api/conversation/search-memory', json={'user_id': 904, 'query': 'Curitiba'})
+        assert [found['id'] for found in response.get_json()['memories']] == [memory.id]
+        response = app.test_client().post('/api/conversation/search-memory', json={'user_id': 904, 'query': 'goals'})
+        assert response.get_json()['count'] == 0  # Chaves do JSON não são indexadas
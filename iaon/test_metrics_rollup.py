@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Teste dos agregados das métricas administrativas
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import (app, db, job_queue, metric_rollups, BackgroundJob, Coach, CoachingSession, MeetingSession,
+                 MetricRollup, SubscriptionPlan, User, UserSubscription, reconcile_metric_rollups)
+
+
+def _stored():
+    return {(row.metric, row.period, row.bucket, row.dimension): row.value
+            for row in MetricRollup.query.all() if abs(row.value) > 1e-6}
+
+
+def _assert_consistent():
+    expected = metric_rollups.recompute(db.session)
+    stored = _stored()
+    assert set(stored) == set(expected)
+    assert all(abs(stored[key] - expected[key]) < 1e-6 for key in expected)
+
+
+def _dashboard():
+    return app.test_client().get('/api/admin/dashboard').get_json()
+
+
+def test_agregados_acompanham_as_escritas():
+    with app.app_context():
+        plan = SubscriptionPlan(name='rollup', display_name='Rollup', price_monthly=50.0, price_yearly=480.0)
+        coach = Coach(name='Coach Rollup', specialty='business')
+        users = [User(username=f'rollup{n}', email=f'rollup{n}@iaon.app') for n in range(3)]
+        db.session.add_all([plan, coach] + users)
+        db.session.commit()
+        before = _dashboard()
+
+        monthly = UserSubscription(user_id=users[0].id, plan_id=plan.id, status='active', next_billing_amount=50.0)
+        yearly = UserSubscription(user_id=users[1].id, plan_id=plan.id, status='trial', billing_cycle='yearly',
+                                  next_billing_amount=480.0)
+        db.session.add_all([monthly, yearly, MeetingSession(user_id=users[0].id, title='Rollup'),
+                            CoachingSession(user_id=users[0].id, coach_id=coach.id)])
+        db.session.commit()
+
+        yearly.status = 'active'  # Trial convertido: entra na receita como 480 / 12
+        monthly.status = 'cancelled'
+        users[2].is_active = False
+        db.session.commit()
+        db.session.expire_all()  # Campos não carregados: o valor antigo é lido ao alterar
+        users[0].last_activity = datetime.utcnow() - timedelta(days=20)
+        db.session.commit()
+
+        after = _dashboard()
+        assert after['overview']['total_users'] == before['overview']['total_users'] - 1
+        assert after['overview']['total_meetings'] == before['overview']['total_meetings'] + 1
+        assert after['overview']['active_subscriptions'] == before['overview']['active_subscriptions'] + 1
+        assert abs(after['overview']['monthly_revenue'] - before['overview']['monthly_revenue'] - 40.0) < 1e-6
+        assert {'plan': 'Rollup', 'subscribers': 1} in after['plan_distribution']
+        assert {'name': 'Coach Rollup', 'specialty': 'business', 'sessions': 1} in after['popular_coaches']
+        _assert_consistent()
+
+        db.session.delete(yearly)
+        db.session.commit()
+        _assert_consistent()
+
+
+def test_reconciliacao_corrige_escritas_em_massa():
+    with app.app_context():
+        db.session.add(User(username='rollup-massa', email='rollup-massa@iaon.app'))
+        db.session.commit()
+        # UPDATE em massa não passa pelo before_flush
+        User.query.filter_by(username='rollup-massa').update({'is_active': False}, synchronize_session=False)
+        db.session.commit()
+        live = User.query.filter_by(is_active=True).count()
+        assert metric_rollups.total(db.session, 'users_active') == live + 1
+
+        assert reconcile_metric_rollups() >= 1
+        _assert_consistent()
+        assert reconcile_metric_rollups() == 0
+
+
+
+def test_reconciliacao_que_falha_continua_agendada(monkeypatch):
+    def fail(session):
+        raise RuntimeError('banco indisponível')
+
+    with app.app_context():
+        BackgroundJob.query.filter_by(job_type='metrics_reconcile').delete()
+        job = job_queue.enqueue('metrics_reconcile')
+        job.max_attempts = 1
+        db.session.commit()
+        monkeypatch.setattr(metric_rollups, 'reconcile', fail)
+        job_queue.run_pending()
+
+        db.session.expire_all()
+        assert db.session.get(BackgroundJob, job.id).status == 'failed'
+        nightly = BackgroundJob.query.filter_by(job_type='metrics_reconcile', status='pending').one()
+        assert nightly.run_after > datetime.utcnow()
+
+def test_dashboards_leem_so_os_agregados():
+    with app.app_context():
+        client = app.test_client()
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            dashboard = client.get('/api/admin/dashboard').get_json()
+            analytics = client.get('/api/admin/users/analytics').get_json()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        assert dashboard['success'] and analytics['success']
+        assert analytics['user_metrics']['total_users'] == User.query.filter_by(is_active=True).count()
+        assert analytics['user_metrics']['new_users_30d'] == User.query.filter(
+            User.created_at >= datetime.utcnow() - timedelta(days=30)).count()
+        for table in ('FROM users', 'FROM user_subscriptions', 'FROM meeting_sessions', 'FROM coaching_sessions'):
+            assert not [statement for statement in statements if table in statement]
+
+        series = client.get('/api/admin/metrics/daily?metric=users_new&days=7').get_json()['series']
+        assert sum(series.values()) >= 1
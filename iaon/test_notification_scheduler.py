@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Teste do agendador de notificações
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import app, db, job_queue, NotificationSystem
+from notification_scheduler import NotificationScheduler, MemoryChannel
+
+
+def _notification(user_id, title, scheduled_for, method='push', status='pending'):
+    return NotificationSystem(user_id=user_id, title=title, message=title, notification_type='calendar',
+                              delivery_method=method, scheduled_for=scheduled_for, status=status)
+
+
+def _scheduler(**options):
+    scheduler = NotificationScheduler(app, db, NotificationSystem, enabled=False, **options)
+    push, email = MemoryChannel(), MemoryChannel(fail=True)
+    scheduler.register_channel('push', push)
+    scheduler.register_channel('email', email)
+    return scheduler, push
+
+
+def _titles(channel, user_id):
+    return [n.title for n in channel.sent if n.user_id == user_id]
+
+
+def test_entrega_no_horario_pelo_heap():
+    with app.app_context():
+        now = datetime.utcnow()
+        rows = [
+            _notification(970, 'atrasada', now - timedelta(minutes=10)),
+            _notification(970, 'em 5 minutos', now + timedelta(minutes=5)),
+            _notification(970, 'depois de amanhã', now + timedelta(days=2)),
+            _notification(970, 'esquecida', now - timedelta(days=3)),
+            _notification(970, 'já lida', now - timedelta(minutes=1), status='read'),
+            _notification(970, 'email', now - timedelta(minutes=2), method='email'),
+        ]
+        db.session.add_all(rows)
+        db.session.commit()
+
+        scheduler, push = _scheduler()
+        scheduler.hydrate(now)
+        heap_ids = {notification_id for _, notification_id in scheduler._heap}
+        assert {rows[0].id, rows[1].id, rows[5].id} <= heap_ids and rows[2].id not in heap_ids
+
+        scheduler.run_once(now)
+        assert _titles(push, 970) == ['atrasada']
+        statuses = {n.title: n.status for n in NotificationSystem.query.filter_by(user_id=970)}
+        assert statuses == {'atrasada': 'sent', 'em 5 minutos': 'pending', 'depois de amanhã': 'pending',
+                            'esquecida': 'expired', 'já lida': 'read', 'email': 'failed'}
+
+        scheduler.run_once(now + timedelta(minutes=6))
+        assert _titles(push, 970) == ['atrasada', 'em 5 minutos']
+        metrics = scheduler.metrics()
+        assert metrics['channels']['push']['sent'] >= 2 and metrics['channels']['email']['failed'] >= 1
+        assert metrics['lag_seconds']['max'] >= 600 and metrics['sent_last_minute'] >= 2
+
+
+def test_novas_reagendadas_e_de_outros_processos():
+    with app.app_context():
+        now = datetime.utcnow()
+        scheduler, push = _scheduler()
+        other, other_push = _scheduler()
+        scheduler.hydrate(now)
+        other.hydrate(now)
+
+        # Gravada por este processo: entra no heap no commit
+        soon = _notification(971, 'nova', now + timedelta(minutes=1))
+        moved = _notification(971, 'reagendada', now + timedelta(minutes=2))
+        db.session.add_all([soon, moved])
+        db.session.commit()
+        moved.scheduled_for = now + timedelta(minutes=10)
+        db.session.commit()
+        assert {soon.id, moved.id} <= {notification_id for _, notification_id in scheduler._heap}
+
+        # Gravada "por outro processo" (sem passar pela sessão): pega pela varredura de atrasadas
+        db.session.execute(text(
+            "INSERT INTO notification_system (user_id, title, message, notification_type, delivery_method, "
+            "status, scheduled_for, created_at) VALUES (971, 'externa', 'externa', 'calendar', 'push', "
+            "'pending', :when, :when)"
+        ), {'when': now + timedelta(minutes=1)})
+        db.session.commit()
+
+        later = now + timedelta(minutes=3)
+        scheduler.run_once(later)
+        other.run_once(later)
+        delivered = _titles(push, 971) + _titles(other_push, 971)
+        assert sorted(delivered) == ['externa', 'nova']  # Cada uma uma vez só, entre os dois agendadores
+
+        scheduler.run_once(now + timedelta(minutes=11))
+        assert 'reagendada' in _titles(push, 971)
+
+
+def test_lembretes_de_evento_e_envio_imediato():
+    with app.app_context():
+        scheduler, push = _scheduler()  # Antes do primeiro uso da sessão, que só vê ouvintes já registrados
+        client = app.test_client()
+        data = client.post('/api/notifications/create', json={'user_id': 972, 'title': 'Agora', 'message': 'já'}).get_json()
+        assert NotificationSystem.query.get(data['notification_id']).status == 'sent'
+
+        scheduler.hydrate()
+        start = datetime.utcnow() + timedelta(minutes=15, seconds=5)
+        client.post('/api/calendar/create-event', json={
+            'user_id': 972, 'title': 'Reunião', 'reminders': ['15min'],
+            'start_datetime': start.isoformat(), 'end_datetime': (start + timedelta(hours=1)).isoformat()
+        })
+        job_queue.run_pending()
+        assert len(scheduler) >= 1  # Lembrete criado pela fila entrou no heap no commit
+        scheduler.run_once(datetime.utcnow() + timedelta(seconds=10))
+        assert _titles(push, 972) == ['Lembrete: Reunião']
+
+        # Horário com fuso ('Z' do toISOString no JavaScript) é gravado e agendado em UTC sem fuso
+        when = datetime.utcnow().replace(microsecond=0) + timedelta(minutes=5)
+        response = client.post('/api/notifications/create', json={
+            'user_id': 972, 'title': 'Com fuso', 'message': 'z', 'scheduled_for': when.isoformat() + 'Z'})
+        assert response.status_code == 200
+        notification_id = response.get_json()['notification_id']
+        assert NotificationSystem.query.get(notification_id).scheduled_for == when
+        assert (when, notification_id) in scheduler._heap
+
+
+def test_consultas_usam_o_indice_de_status_e_horario():
+    with app.app_context():
+        now = datetime.utcnow()
+        plan = db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT scheduled_for, id FROM notification_system "
+            "WHERE status = 'pending' AND scheduled_for >= :start AND scheduled_for < :end"
+        ), {'start': now, 'end': now + timedelta(minutes=15)}).fetchall()
+        assert 'ix_notification_system_status_scheduled_for' in ' '.join(str(row) for row in plan)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Teste da paginação por cursor e das respostas em fluxo das listagens
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import app, db, FinancialTransaction, KnownParticipant, MeetingSession, TRANSACTIONS_KEYSET
+from pagination import InvalidCursor
+
+USER_ID = 2501
+
+
+def _pages(client, url, key, limit):
+    """Percorrer todas as páginas seguindo next_cursor"""
+    items, cursor, pages = [], None, 0
+    while True:
+        response = client.get(f"{url}?limit={limit}" + (f"&cursor={cursor}" if cursor else '')).get_json()
+        items.extend(response[key])
+        pages += 1
+        if not response['has_more']:
+            assert response['next_cursor'] is None
+            return items, pages
+        cursor = response['next_cursor']
+
+
+def test_paginas_sem_repetir_nem_pular_com_empates():
+    start = datetime(2024, 5, 1, 9)
+    with app.app_context():
+        # Grupos de reuniões no mesmo instante: só o id desempata
+        db.session.add_all([MeetingSession(user_id=USER_ID, title=f'Reunião {number}',
+                                           created_at=start + timedelta(hours=number // 4)) for number in range(23)])
+        db.session.commit()
+        expected = [meeting.id for meeting in MeetingSession.query.filter_by(user_id=USER_ID).order_by(
+            MeetingSession.created_at.desc(), MeetingSession.id.desc())]
+
+    client = app.test_client()
+    meetings, pages = _pages(client, f'/api/meetings/user/{USER_ID}', 'meetings', 5)
+    assert [meeting['id'] for meeting in meetings] == expected and pages == 5
+
+    # Reunião nova entre uma página e outra não desloca a continuação
+    first = client.get(f'/api/meetings/user/{USER_ID}?limit=10').get_json()
+    with app.app_context():
+        db.session.add(MeetingSession(user_id=USER_ID, title='Nova', created_at=start + timedelta(days=1)))
+        db.session.commit()
+    second = client.get(f"/api/meetings/user/{USER_ID}?limit=10&cursor={first['next_cursor']}").get_json()
+    assert [meeting['id'] for meeting in second['meetings']] == expected[10:20]
+
+    assert client.get(f'/api/meetings/user/{USER_ID}?cursor=xyz').status_code == 400
+    assert client.get(f"/api/finance/goals/{USER_ID}?cursor={first['next_cursor']}").status_code == 400
+
+
+def test_fluxo_ndjson_e_documento_json():
+    with app.app_context():
+        account_time = datetime(2024, 6, 1)
+        db.session.add_all([FinancialTransaction(user_id=USER_ID, account_id=1, transaction_type='expense',
+                                                 amount=float(number), description=f'Compra {number}',
+                                                 transaction_date=account_time - timedelta(days=number % 7))
+                            for number in range(1, 31)])
+        db.session.commit()
+
+    client = app.test_client()
+    pages, _ = _pages(client, f'/api/finance/transactions/{USER_ID}', 'transactions', 7)
+    response = client.get(f'/api/finance/transactions/{USER_ID}?format=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['id'] for row in lines] == [row['id'] for row in pages] and len(lines) == 30
+
+    document = json.loads(client.get(f'/api/finance/transactions/{USER_ID}?format=json-stream').get_data(as_text=True))
+    assert document['count'] == 30 and [row['id'] for row in document['transactions']] == [row['id'] for row in pages]
+
+    # Fluxo a partir de um cursor continua da página seguinte
+    first = client.get(f'/api/finance/transactions/{USER_ID}?limit=12').get_json()
+    rest = client.get(f"/api/finance/transactions/{USER_ID}?format=ndjson&cursor={first['next_cursor']}")
+    assert [json.loads(line)['id'] for line in rest.get_data(as_text=True).splitlines()] == [row['id'] for row in pages[12:]]
+
+    with pytest.raises(InvalidCursor):
+        TRANSACTIONS_KEYSET.decode(first['next_cursor'][:-3] + '!!!')
+
+
+def test_participantes_frequentes_paginados():
+    with app.app_context():
+        db.session.add_all([KnownParticipant(user_id=USER_ID, name=f'Pessoa {number}', is_frequent=number % 5 != 0,
+                                             meeting_count=number % 4) for number in range(17)])
+        db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = USER_ID
+    participants, _ = _pages(client, '/api/participants/frequent', 'frequent_participants', 4)
+    assert len(participants) == len({participant['id'] for participant in participants}) == 13
+    counts = [participant['meeting_count'] for participant in participants]
+    assert counts == sorted(counts, reverse=True)
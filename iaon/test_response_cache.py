@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Teste do cache de respostas do catálogo
+"""
+
+from datetime import datetime
+
+from app import app, db, response_cache, Coach, CoachingSession, SubscriptionPlan
+from response_cache import LocalCacheBackend
+
+
+def test_etag_304_e_invalidacao_de_planos():
+    with app.app_context():
+        plan = SubscriptionPlan(name='teste-cache', display_name='Cache', price_monthly=10.0, sort_order=99)
+        db.session.add(plan)
+        db.session.commit()
+        client = app.test_client()
+
+        first = client.get('/api/plans/list')
+        assert first.status_code == 200 and first.headers['ETag']
+        assert 'max-age=60' in first.headers['Cache-Control']
+        hits = response_cache.metrics()['hits']
+
+        again = client.get('/api/plans/list', headers={'If-None-Match': first.headers['ETag']})
+        assert again.status_code == 304 and again.data == b''
+        assert response_cache.metrics()['hits'] == hits + 1
+
+        # Alteração pelo ORM invalida no commit: nova versão, novo ETag
+        plan.display_name = 'Cache Atualizado'
+        db.session.commit()
+        changed = client.get('/api/plans/list', headers={'If-None-Match': first.headers['ETag']})
+        assert changed.status_code == 200 and changed.headers['ETag'] != first.headers['ETag']
+        assert 'Cache Atualizado' in [p['display_name'] for p in changed.get_json()['plans']]
+
+
+def test_coaches_invalidados_por_edicao_e_sessao():
+    with app.app_context():
+        coach = Coach(name='Coach Cache', specialty='life', languages='["pt-BR"]')
+        other = Coach(name='Outro Coach', specialty='life', languages='["pt-BR"]')
+        db.session.add_all([coach, other])
+        db.session.commit()
+        client = app.test_client()
+
+        detail = client.get(f'/api/coaches/{coach.id}').get_json()
+        other_etag = client.get(f'/api/coaches/{other.id}').headers['ETag']
+        assert detail['statistics']['total_sessions'] == 0
+        listed = client.get('/api/coaches/list?specialty=life').get_json()
+        assert 'Coach Cache' in [c['name'] for c in listed['coaches']]
+
+        # Sessão agendada muda as estatísticas só deste coach
+        db.session.add(CoachingSession(user_id=1, coach_id=coach.id, scheduled_at=datetime.utcnow()))
+        db.session.commit()
+        assert client.get(f'/api/coaches/{coach.id}').get_json()['statistics']['total_sessions'] == 1
+        assert client.get(f'/api/coaches/{other.id}', headers={'If-None-Match': other_etag}).status_code == 304
+
+        coach.is_active = False
+        db.session.commit()
+        listed = client.get('/api/coaches/list?specialty=life').get_json()
+        assert 'Coach Cache' not in [c['name'] for c in listed['coaches']]
+
+        # Rollback não invalida nada
+        invalidations = response_cache.metrics()['invalidations']
+        other.name = 'Descartado'
+        db.session.flush()
+        db.session.rollback()
+        assert response_cache.metrics()['invalidations'] == invalidations
+        assert client.get('/api/admin/cache').get_json()['metrics']['backend'] == 'LocalCacheBackend'
+
+
+def test_backend_local_lru_e_ttl():
+    now = [0.0]
+    backend = LocalCacheBackend(max_entries=2, clock=lambda: now[0])
+    backend.incr('version:plans')
+    backend.set('a', 1, ttl=10)
+    backend.set('b', 2)
+    assert backend.get('a') == 1  # 'a' passa a ser a mais recente
+    backend.set('c', 3)
+    assert backend.get('b') is None and backend.get('c') == 3 and len(backend) == 2
+
+    now[0] = 11
+    assert backend.get('a') is None and backend.get('c') == 3
+    assert backend.counters(['version:plans', 'version:coaches']) == [1, 0]  # Versões não saem pelo LRU
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Teste da inicialização do esquema na partida (fora do caminho da requisição)
+"""
+
+import time
+
+from sqlalchemy import create_engine, event, inspect, text
+
+import app as app_module
+from app import app, db, schema_bootstrap, Contact, SchemaState
+from schema_bootstrap import SchemaBootstrap
+
+
+def test_passos_rodam_so_quando_o_esquema_muda():
+    assert schema_bootstrap.ready
+    calls = []
+    steps = lambda: calls.append(1)
+
+    first = SchemaBootstrap(app, db, SchemaState, steps, version=1, name='teste')
+    assert first.run() and first.applied and calls == [1]
+    # Mesma impressão digital: uma consulta, sem passos
+    again = SchemaBootstrap(app, db, SchemaState, steps, version=1, name='teste')
+    assert again.run() and not again.applied and calls == [1]
+    # Nova versão dos passos
+    bumped = SchemaBootstrap(app, db, SchemaState, steps, version=2, name='teste')
+    assert bumped.run() and bumped.applied and calls == [1, 1]
+    with app.app_context():
+        state = SchemaState.query.filter_by(name='teste').one()
+        assert state.fingerprint and state.duration_ms is not None
+
+
+def test_requisicoes_nao_inspecionam_o_esquema():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.upper())
+
+    with app.app_context():
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            client = app.test_client()
+            assert client.get('/health').status_code == 200
+            assert client.get('/api/plans/list').status_code == 200
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+    assert statements
+    assert not [s for s in statements if 'SQLITE_MASTER' in s or 'PRAGMA' in s or 'CREATE ' in s]
+
+
+def test_health_503_ate_a_nova_tentativa_funcionar(monkeypatch):
+    attempts = []
+
+    def flaky_steps():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError('banco indisponível')
+
+    bootstrap = SchemaBootstrap(app, db, SchemaState, flaky_steps, version=1, name='teste-falha')
+    monkeypatch.setattr(app_module, 'schema_bootstrap', bootstrap)
+    assert not bootstrap.run()
+
+    response = app.test_client().get('/health')
+    assert response.status_code == 503
+    assert response.get_json()['bootstrap']['error'] == 'banco indisponível'
+
+    # A thread de nova tentativa (espera de 1 s) conclui os passos
+    deadline = time.monotonic() + 10
+    while not bootstrap.ready and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert bootstrap.ready and len(attempts) == 2
+    assert app.test_client().get('/health').status_code == 200
+
+
+def test_passos_criam_indices_em_tabelas_existentes():
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP INDEX uq_contacts_user_id_phone_number'))
+            connection.execute(text(
+                "INSERT INTO contacts (user_id, name, phone_number) VALUES (3101, 'Ana', '5511999990000'), "
+                "(3101, 'Ana (cópia)', '5511999990000')"))
+        app_module.bootstrap_database()
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('contacts')}
+        assert 'uq_contacts_user_id_phone_number' in indexes
+        assert Contact.query.filter_by(user_id=3101).count() == 1
+
+
+def test_telefones_antigos_normalizados_antes_do_indice():
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO contacts (user_id, name, phone_number) VALUES (3102, 'Bia', '5511988880000'), "
+                "(3102, 'Bia (antiga)', ' 5511988880000 '), (3102, 'Caio', '5511977770000\n')"))
+        assert app_module.merge_duplicate_contacts() == 1
+        phones = {contact.name: contact.phone_number for contact in Contact.query.filter_by(user_id=3102)}
+        assert phones == {'Bia': '5511988880000', 'Caio': '5511977770000'}
+
+
+def test_updated_at_adicionado_em_tabelas_existentes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'antigo.db'}")
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE meeting_participants (id INTEGER PRIMARY KEY, created_at TIMESTAMP)'))
+        connection.execute(text("INSERT INTO meeting_participants (created_at) VALUES ('2024-01-02 03:04:05')"))
+    with app.app_context():
+        assert app_module.ensure_updated_at_columns(engine) == ['meeting_participants']
+        assert app_module.ensure_updated_at_columns(engine) == []
+    with engine.connect() as connection:
+        assert connection.execute(text('SELECT updated_at FROM meeting_participants')).scalar() == '2024-01-02 03:04:05'
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Teste do perfil de produção (workers e pool de conexões)
+"""
+
+from serving import engine_options, pool_environ, serving_profile
+
+
+def test_pool_cabe_no_orcamento_de_conexoes():
+    profile = serving_profile(cpu_count=4, environ={})
+    assert profile['workers'] == 9 and profile['worker_class'] == 'gthread'
+    # 4 threads de requisição + 4 da fila + agendador
+    assert profile['pool_size'] == 9 and profile['max_overflow'] == 1
+    assert profile['connections'] <= profile['connection_budget'] == 90
+    assert not profile['warnings']
+
+    tight = serving_profile(cpu_count=16, environ={'IAON_DB_MAX_CONNECTIONS': '25', 'GUNICORN_THREADS': '1'})
+    assert tight['workers'] == 7 and tight['worker_class'] == 'sync'
+    assert tight['connections'] <= 15 and tight['warnings']
+
+    fixed = serving_profile(cpu_count=2, environ={'WEB_CONCURRENCY': '2', 'IAON_JOB_WORKERS': '0',
+                                                 'IAON_NOTIFICATION_SCHEDULER': '0'})
+    assert (fixed['workers'], fixed['pool_size'], fixed['max_overflow']) == (2, 4, 4)
+
+    assert serving_profile(cpu_count=2, environ={'WEB_CONCURRENCY': '0'})['workers'] == 1
+
+
+def test_opcoes_do_engine():
+    environ = pool_environ(serving_profile(cpu_count=2, environ={}))
+    options = engine_options('postgresql://iaon@localhost/iaon', environ)
+    assert options['pool_size'] == int(environ['IAON_DB_POOL_SIZE']) and options['pool_pre_ping']
+    # SQLite usa o pool próprio do dialeto
+    assert 'pool_size' not in engine_options('sqlite:///iaon.db', environ)
+    assert 'pool_size' not in engine_options('postgresql://iaon@localhost/iaon', {})
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Teste do motor vetorizado de identificação de falantes
+"""
+
+import json
+
+import numpy as np
+from sqlalchemy import event
+
+from app import (app, db, extract_audio_features, create_enhanced_voice_profile, meeting_profile_cache,
+                 bump_meeting_profiles_version, get_meeting_speaker_engine, MeetingParticipant, MeetingSession)
+from speaker_scoring import SpeakerScoringEngine, MeetingProfileCache, UNKNOWN_SPEAKER
+
+FEATURES = {
+    'fundamental_frequency': 150,
+    'formants': {'f1': 800, 'f2': 1200, 'f3': 2400, 'f4': 3200},
+    'speech_rate': 150,
+    'spectral_features': {'spectral_centroid': 2500, 'spectral_rolloff': 8000},
+    'prosodic_features': {'intonation_pattern': 'rising', 'rhythm_score': 0.7}
+}
+
+
+def test_pesos_e_normalizacoes():
+    other = {
+        'fundamental_frequency': 200,  # 1 - 50/100 = 0.5
+        'formants': [800, 1200],  # Formato antigo (lista) -> 0.5
+        'speech_rate': 180,  # 1 - 30/60 = 0.5
+        'spectral_features': {'spectral_centroid': 3500},  # 1 - 1000/2000 = 0.5
+        'prosodic_features': {'intonation_pattern': 'falling', 'rhythm_score': 0.7}  # (0.3 + 1) / 2
+    }
+    engine = SpeakerScoringEngine([
+        {'name': 'Igual', 'voice_profile': json.dumps(FEATURES), 'is_verified': True},
+        {'name': 'Outro', 'voice_profile': other},
+        {'name': 'Sem perfil', 'voice_profile': '{}'},
+        {'name': 'Inválido', 'voice_profile': 'não é json'},
+    ])
+
+    similarities = engine.similarities(FEATURES)
+    expected_other = 0.25 * 0.5 + 0.30 * 0.5 + 0.15 * 0.5 + 0.20 * 0.5 + 0.10 * 0.65
+    assert np.allclose(similarities, [1.0, expected_other, 0.0, 0.0])
+
+    confidences = engine.confidence_batch([FEATURES])[0]
+    assert np.allclose(confidences, [1.0, expected_other, 0.1, 0.1])  # Bônus com teto 1.0
+    assert engine.identify(FEATURES) == 'Igual'
+
+    # Categoria que nenhum perfil tem conta como divergente e não cresce o vocabulário
+    vocabulary = dict(engine.vocabulary)
+    for pattern in ('flat', 'wavy', 'rising-falling'):
+        chunk = dict(FEATURES, prosodic_features={'intonation_pattern': pattern, 'rhythm_score': 0.7})
+        assert np.isclose(engine.similarities(chunk)[0], 1.0 - 0.10 * 0.35)
+    assert engine.vocabulary == vocabulary
+
+
+def test_lote_igual_a_trechos_individuais():
+    profiles = [
+        {'name': f'Participante {i}', 'voice_profile': create_enhanced_voice_profile('a' * (i * 137), 'b' * i),
+         'is_verified': i % 2 == 0}
+        for i in range(25)
+    ]
+    engine = SpeakerScoringEngine(profiles)
+    chunks = [extract_audio_features('z' * size) for size in range(0, 3000, 97)]
+
+    batch = engine.similarity_batch(chunks)
+    assert batch.shape == (len(chunks), 25)
+    for row, chunk in zip(batch, chunks):
+        assert np.allclose(row, engine.similarities(chunk))
+    assert engine.identify_batch(chunks) == [engine.identify(chunk) for chunk in chunks]
+    assert SpeakerScoringEngine([]).identify(FEATURES) == UNKNOWN_SPEAKER
+
+
+def test_endpoint_teste_de_reconhecimento():
+    with app.app_context():
+        client = app.test_client()
+        meeting_id = client.post('/api/meetings/start', json={'user_id': 953, 'title': 'Reconhecimento'}).get_json()['meeting']['id']
+        for name, size in (('Ana', 400), ('Bruno', 1800)):
+            client.post(f'/api/meetings/{meeting_id}/participant-introduction', json={
+                'participant_name': name, 'audio_data': 'a' * size, 'introduction_text': f'Olá, eu sou {name}'
+            })
+
+        data = client.post(f'/api/meetings/{meeting_id}/test-recognition', json={'audio_data': 'a' * 400}).get_json()
+        assert data['success'] is True
+        assert data['test_results']['participants_analyzed'] == 2
+        scores = [item['similarity_score'] for item in data['test_results']['all_similarities']]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_cache_lru_ttl_e_atualizacao_incremental():
+    now = [0.0]
+    cache = MeetingProfileCache(max_meetings=2, ttl_seconds=60, clock=lambda: now[0])
+    cache.put(1, SpeakerScoringEngine(), version=1)
+    cache.put(2, SpeakerScoringEngine(), version=1)
+    assert cache.get(1, version=1) is not None  # 1 passa a ser o mais recente
+    cache.put(3, SpeakerScoringEngine())
+    assert 2 not in cache and 1 in cache and 3 in cache
+
+    previous = cache.get(1)
+    assert cache.upsert_participant(1, {'participant_id': 10, 'name': 'Ana', 'voice_profile': FEATURES},
+                                    expected_version=1, version=2)
+    engine = cache.get(1, version=2)
+    assert engine.names == ['Ana'] and len(previous) == 0  # Quem já usava o motor antigo não é afetado
+    engine = engine.with_profile({'participant_id': 10, 'name': 'Ana Maria', 'voice_profile': '{}'})
+    assert engine.names == ['Ana Maria'] and not engine.has_profile[0]
+
+    # Outro worker já tinha passado a reunião para a versão 3: a entrada em cache não é marcada como atual
+    assert not cache.upsert_participant(1, {'participant_id': 11, 'name': 'Bia', 'voice_profile': FEATURES},
+                                        expected_version=3, version=4)
+    assert 1 not in cache
+    cache.put(1, engine, version=2)
+    assert cache.get(1, version=3) is None  # Versão diferente (outro worker alterou)
+    now[0] = 120
+    assert cache.get(3) is None  # Expirado
+    assert not cache.upsert_participant(99, {'name': 'X'})
+
+
+def test_ciclo_de_vida_da_reuniao():
+    with app.app_context():
+        client = app.test_client()
+        meeting_id = client.post('/api/meetings/start', json={'user_id': 954, 'title': 'Ciclo'}).get_json()['meeting']['id']
+        assert meeting_id in meeting_profile_cache
+
+        client.post(f'/api/meetings/{meeting_id}/participant-introduction', json={
+            'participant_name': 'Carla', 'audio_data': 'c' * 900, 'introduction_text': 'Olá'
+        })
+        engine = meeting_profile_cache.get(meeting_id)
+        assert engine.names == ['Carla'] and engine.has_profile[0]
+
+        # Outro worker inclui Davi (só no banco): a inclusão seguinte descarta o motor deste worker
+        db.session.add(MeetingParticipant(meeting_id=meeting_id, participant_name='Davi'))
+        bump_meeting_profiles_version(meeting_id)
+        db.session.commit()
+        client.post(f'/api/meetings/{meeting_id}/participant-introduction', json={
+            'participant_name': 'Eva', 'audio_data': 'e' * 900, 'introduction_text': 'Oi'
+        })
+        assert meeting_id not in meeting_profile_cache
+        engine = get_meeting_speaker_engine(db.session.get(MeetingSession, meeting_id))
+        assert sorted(engine.names) == ['Carla', 'Davi', 'Eva']
+
+        statements = []
+
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        misses = meeting_profile_cache.misses
+        event.listen(db.engine, 'before_cursor_execute', _capture)
+        try:
+            # Os agregados somados a cada trecho não mudam a versão dos perfis
+            responses = [client.post(f'/api/meetings/{meeting_id}/transcribe', json={'audio_data': 'c' * 900})
+                         for _ in range(3)]
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', _capture)
+        assert all(response.status_code == 200 for response in responses)
+        assert not [s for s in statements if 'FROM meeting_participants' in s]  # Perfis vieram do cache
+        assert meeting_profile_cache.misses == misses
+
+        client.post(f'/api/meetings/{meeting_id}/end')
+        assert meeting_id not in meeting_profile_cache
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Teste da importação de extratos (OFX/CSV): duplicatas, categorias, saldo e somas
+"""
+
+import io
+from datetime import datetime
+
+from app import (app, db, finance_totals, user_activity, FinancialAccount, FinancialMonthlyTotal,
+                 FinancialTransaction, import_statement_rows)
+from bank_statement import iter_text, parse_amount, parse_date, parse_ofx, parse_statement
+
+USER_ID = 2401
+
+OFX = """OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+ENCODING:USASCII
+CHARSET:1252
+
+<OFX>
+<BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20240105120000[-3:BRT]
+<TRNAMT>5000.00
+<FITID>A1
+<MEMO>Salário Empresa
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240106
+<TRNAMT>-250.40
+<FITID>A2
+<NAME>SUPERMERCADO BOM PREÇO
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240107
+<TRNAMT>-12.00
+<FITID>A3
+<NAME>PADARIA CENTRAL
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240107
+<TRNAMT>-12.00
+<FITID>A4
+<NAME>PADARIA CENTRAL
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240108
+<TRNAMT>abc
+<FITID>A5
+<NAME>Inválido
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1>
+</OFX>
+""".encode('cp1252')
+
+CSV = """Data;Histórico;Valor (R$);Categoria
+07/01/2024;Padaria Central;-12,00;
+10/01/2024;Uber *Viagem;-1.234,56;
+11/01/2024;Farmácia São João;-80,00;remedios
+12/01/2024;Devolução;+45,00;
+""".encode('utf-8')
+
+
+def _account():
+    with app.app_context():
+        account = FinancialAccount(user_id=USER_ID, account_name='Conta Extrato', account_type='checking',
+                                   current_balance=1000.0, available_balance=1000.0)
+        db.session.add(account)
+        db.session.commit()
+        return account.id
+
+
+def test_leitura_de_valores_e_datas():
+    assert parse_amount('-1.234,56') == -1234.56 and parse_amount('1,234.56') == 1234.56
+    assert parse_amount('(45,90)') == -45.9 and parse_amount('R$ 10') == 10.0 and parse_amount('12,5-') == -12.5
+    assert parse_date('20240105120000[-3:BRT]') == datetime(2024, 1, 5, 12)
+    assert parse_date('05/01/2024').date() == parse_date('2024-01-05').date()
+
+    # Lido em blocos pequenos: campos e caracteres cortados entre blocos
+    rows = list(parse_statement(io.BytesIO(OFX)))
+    small = parse_ofx(iter_text(io.BytesIO(OFX), encoding='cp1252', read_size=5))
+    assert rows == list(small)
+    assert [row.get('amount') for row in rows] == [5000.0, -250.4, -12.0, -12.0, None]
+    assert rows[0]['description'] == 'Salário Empresa' and 'error' in rows[4]
+
+    rows = list(parse_statement(io.BytesIO(b'Data,Valor,Descricao,Tipo\n2024-01-02,"1,234.50",Aluguel,D\n')))
+    assert rows[0]['amount'] == -1234.5 and rows[0]['description'] == 'Aluguel'
+
+
+def test_importacao_pela_api_sem_duplicar():
+    account_id = _account()
+    client = app.test_client()
+    with app.app_context():
+        # Lançado à mão antes: o extrato não deve duplicá-lo
+        db.session.add(FinancialTransaction(user_id=USER_ID, account_id=account_id, transaction_type='expense',
+                                            amount=250.40, description='Supermercado Bom Preco',
+                                            transaction_date=datetime(2024, 1, 6, 18, 30)))
+        db.session.commit()
+
+    response = client.post('/api/finance/transactions/import', data={
+        'user_id': USER_ID, 'account_id': account_id, 'file': (io.BytesIO(OFX), 'extrato.ofx')
+    }, content_type='multipart/form-data').get_json()
+    assert (response['imported'], response['duplicates'], response['rejected']) == (3, 1, 1)
+    assert response['auto_categorized'] == 3 and len(response['errors']) == 1
+
+    # CSV (corpo bruto) sobreposto ao OFX: a padaria repetida casa com uma das duas já importadas
+    response = client.post(f'/api/finance/transactions/import?user_id={USER_ID}&account_id={account_id}&format=csv',
+                           data=CSV).get_json()
+    assert (response['imported'], response['duplicates']) == (3, 1)
+
+    # O mesmo extrato de novo: nada entra
+    again = client.post('/api/finance/transactions/import', data={
+        'user_id': USER_ID, 'account_id': account_id, 'file': (io.BytesIO(OFX), 'extrato.ofx')
+    }, content_type='multipart/form-data').get_json()
+    assert (again['imported'], again['duplicates']) == (0, 4)
+
+    assert client.post('/api/finance/transactions/import', data={
+        'user_id': USER_ID + 1, 'account_id': account_id, 'file': (io.BytesIO(OFX), 'extrato.ofx')
+    }, content_type='multipart/form-data').status_code == 404
+
+    with app.app_context():
+        transactions = FinancialTransaction.query.filter_by(account_id=account_id).all()
+        categories = {transaction.description: transaction.category for transaction in transactions}
+        assert categories['Uber *Viagem'] == 'transporte' and categories['Farmácia São João'] == 'remedios'
+        assert categories['PADARIA CENTRAL'] == 'alimentacao'
+        assert len(transactions) == 7
+
+        # Saldo somado uma vez por lote confere com as transações; somas mensais sem nada a corrigir
+        expected = 1000.0 + 5000.0 - 250.40 - 12.0 * 2 - 1234.56 - 80.0 + 45.0
+        account = db.session.get(FinancialAccount, account_id)
+        assert abs(account.current_balance - expected) < 1e-6
+        assert finance_totals.reconcile(db.session, [USER_ID]) == 0
+        totals = {(row.category, row.transaction_type): (round(row.total_amount, 2), row.transaction_count)
+                  for row in FinancialMonthlyTotal.query.filter_by(user_id=USER_ID, year_month='2024-01').all()}
+        assert totals[('alimentacao', 'expense')] == (24.0, 2) and totals[('', 'expense')] == (250.4, 1)
+        assert user_activity.window(db.session, USER_ID, 1)['transactions'] == 7
+
+
+def test_lotes_pequenos_preservam_repetidos_do_arquivo():
+    account_id = _account()
+    rows = [{'line': number, 'transaction_date': datetime(2024, 3, 1 + number % 3), 'amount': -9.9,
+             'description': 'Café', 'reference_number': None} for number in range(9)]
+    with app.app_context():
+        stats = import_statement_rows(USER_ID, account_id, rows, batch_size=2)
+        assert (stats['imported'], stats['batches']) == (9, 5)
+        # Reimportado em outros lotes: cada existente casa uma única vez
+        stats = import_statement_rows(USER_ID, account_id, rows + rows[:2], batch_size=4)
+        assert (stats['imported'], stats['duplicates']) == (2, 9)
+        assert FinancialTransaction.query.filter_by(account_id=account_id).count() == 11
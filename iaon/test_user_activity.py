@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Teste dos contadores diários de atividade por usuário
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import (app, db, user_activity, AppLaunchLog, ConversationMemory, FinancialTransaction, SmartCalendar,
+                 UserActivityDaily)
+
+
+def _rows(user_id, when=None):
+    now = datetime.utcnow()
+    return [
+        ConversationMemory(user_id=user_id, session_id='s', user_message='oi', ai_response='olá', created_at=when),
+        SmartCalendar(user_id=user_id, title='Evento', start_datetime=now, end_datetime=now, created_at=when),
+        FinancialTransaction(user_id=user_id, account_id=1, transaction_type='expense', amount=10.0,
+                             description='padaria', transaction_date=now, created_at=when),
+        AppLaunchLog(user_id=user_id, app_name='Agenda', launched_at=when),
+    ]
+
+
+def _dashboard(client, user_id):
+    return client.get(f'/api/analytics/dashboard/{user_id}').get_json()['analytics']['recent_activity']
+
+
+def test_janela_de_sete_dias_pelos_contadores():
+    with app.app_context():
+        client = app.test_client()
+        old = _rows(990, datetime.utcnow() - timedelta(days=10))
+        recent = _rows(990)
+        db.session.add_all(old + recent + _rows(991))
+        db.session.commit()
+        client.post('/api/ai/voice-command', json={'user_id': 990, 'command_text': 'abrir agenda'})
+
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            activity = _dashboard(client, 990)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        assert activity == {'conversations_7d': 1, 'events_7d': 1, 'transactions_7d': 1,
+                            'voice_commands_7d': 1, 'app_launches_7d': 1}
+        assert [s for s in statements if 'user_activity_daily' in s]
+        assert not [s for s in statements if 'FROM conversation_memory' in s or 'FROM smart_calendar' in s]
+
+        db.session.delete(recent[0])  # Excluir a linha de origem tira do contador
+        db.session.commit()
+        assert _dashboard(client, 990)['conversations_7d'] == 0
+        assert UserActivityDaily.query.filter_by(user_id=990).count() == 2  # Um dia antigo e hoje
+
+
+def test_reconstrucao_mantem_comandos_de_voz():
+    with app.app_context():
+        db.session.add_all(_rows(992))
+        user_activity.record(db.session, 992, 'voice_commands', 3)
+        db.session.commit()
+        before = user_activity.window(db.session, 992, 7)
+
+        UserActivityDaily.query.filter_by(user_id=992).update({'events': 40}, synchronize_session=False)
+        user_activity.rebuild(db.session)
+        db.session.commit()
+        assert user_activity.window(db.session, 992, 7) == before
+        assert before['voice_commands'] == 3 and before['events'] == 1
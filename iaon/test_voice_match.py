@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Teste do índice de correspondência por voz (contatos e aplicativos)
+"""
+
+import time
+
+from sqlalchemy import event
+
+from app import app, db, Contact, AppControl
+from voice_match import VoiceMatchIndex, phonetic_key
+
+USER_ID = 952
+
+
+def test_scores_iguais_ao_modelo():
+    """O índice reproduz get_voice_match_score() e o motivo da correspondência"""
+    contact = Contact(name='Maria Silva', display_name='Mãe', voice_aliases='["mamãe", "minha mae"]')
+    index = VoiceMatchIndex()
+    index.add(1, contact.name, contact.display_name, contact.voice_aliases)
+
+    for spoken in ('maria silva', 'Maria', 'silva', 'mamãe', 'mae', 'mamae'):
+        ranked = index.match(spoken)
+        expected = contact.get_voice_match_score(spoken)
+        if expected > 50:
+            assert ranked and ranked[0][1] >= expected
+    assert index.match('maria')[0][2] == 'parte_do_nome'
+    assert index.match('Maria Silva')[0][2] == 'nome_exato'
+    assert index.match('mamãe')[0][2] == 'apelido_exato'
+
+    # Chave fonética para grafias diferentes do mesmo nome
+    assert phonetic_key('Thiago') == phonetic_key('Tiago')
+    assert phonetic_key('Luíza') == phonetic_key('Luisa')
+
+
+def test_top_k_rapido_com_muitos_contatos():
+    index = VoiceMatchIndex()
+    for i in range(5000):
+        index.add(i, f'Contato {i:05d} Sobrenome', None, [f'apelido {i}'])
+    index.add(9999, 'Rafael Souza', None, ['rafa'])
+
+    start = time.perf_counter()
+    for _ in range(100):
+        ranked = index.match('rafael', limit=3)
+    elapsed = (time.perf_counter() - start) / 100
+
+    assert ranked[0][0] == 9999
+    assert elapsed < 0.001  # Sub-milissegundo por consulta
+    assert index.match('raphael')[0] == (9999, 60, 'fonetica')
+
+
+def test_endpoints_compartilham_indice_e_invalidam():
+    with app.app_context():
+        client = app.test_client()
+        client.post('/api/contacts', json={'user_id': USER_ID, 'name': 'Joana Prado', 'phone_number': '+55 11 91111-2222'})
+        client.post('/api/contacts/sync', json={'user_id': USER_ID, 'contacts': [
+            {'name': 'Pedro Lima', 'phone_number': '+55 11 93333-4444'}
+        ]})
+
+        statements = []
+
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        data = client.post('/api/contacts/search-voice', json={'user_id': USER_ID, 'voice_input': 'Pedro'}).get_json()
+        assert [m['contact']['name'] for m in data['matches']] == ['Pedro Lima']
+
+        # Índice já montado: só o contato correspondido é lido do banco
+        event.listen(db.engine, 'before_cursor_execute', _capture)
+        try:
+            data = client.post('/api/contacts/search-voice', json={'user_id': USER_ID, 'voice_input': 'Joana'}).get_json()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', _capture)
+        assert data['matches'][0]['score'] == 165  # parte do nome + primeiro nome
+        assert len([s for s in statements if 'FROM contacts' in s]) == 1
+
+        # Apelido novo invalida o índice daquele usuário
+        contact_id = data['matches'][0]['contact']['id']
+        client.post(f'/api/contacts/{contact_id}/voice-aliases', json={'aliases': ['Jojo']})
+        data = client.post('/api/contacts/search-voice', json={'user_id': USER_ID, 'voice_input': 'jojo'}).get_json()
+        assert data['matches'][0]['match_reason'] == 'apelido_exato'
+
+        # Aplicativos: sincronização + comando de voz
+        client.post('/api/apps/sync', json={'user_id': USER_ID, 'apps': [
+            {'app_name': 'WhatsApp', 'app_package': 'com.whatsapp'}
+        ]})
+        data = client.post('/api/voice/open-app', json={'user_id': USER_ID, 'voice_command': 'abrir whatsapp'}).get_json()
+        assert data['success'] is True
+        assert AppControl.query.filter_by(user_id=USER_ID, app_package='com.whatsapp').first().usage_count == 1
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Teste da detecção de voz e da palavra de ativação (VAD + DTW)
+"""
+
+import base64
+import io
+
+import numpy as np
+from sqlalchemy import event
+
+from app import app, db, User
+from wake_word import WakeWordDetector, WakeWordStream, extract_template, speech_regions
+
+SAMPLE_RATE = 16000
+# Trajetórias de formantes (F1, F2) das "palavras" sintéticas
+EION = [(500, 1800), (300, 2300), (500, 900), (300, 1000)]
+OUTRA = [(750, 1200), (700, 1300), (400, 2000), (650, 1100)]
+
+
+def _word(formants, f0=130, stretch=1.0, seed=0, noise=0.002, silence=0.4, sample_rate=SAMPLE_RATE):
+    """Palavra sintética: harmônicos de f0 moldados por formantes que variam no tempo, entre silêncios"""
+    rng = np.random.default_rng(seed)
+    count = int(0.6 * stretch * sample_rate)
+    times = np.arange(count) / sample_rate
+    position = np.linspace(0, len(formants) - 1, count)
+    f1 = np.interp(position, np.arange(len(formants)), [f for f, _ in formants])
+    f2 = np.interp(position, np.arange(len(formants)), [f for _, f in formants])
+    pitch = f0 * (1 + 0.1 * np.sin(2 * np.pi * 1.5 * times / stretch))
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    signal = np.zeros(count)
+    for harmonic in range(1, int(4000 / f0)):
+        frequency = harmonic * pitch
+        gain = np.exp(-((frequency - f1) / 90) ** 2) + 0.6 * np.exp(-((frequency - f2) / 120) ** 2) + 0.05
+        signal += gain * np.sin(harmonic * phase)
+    signal *= np.sin(np.pi * np.arange(count) / count) ** 0.5
+    gap = np.zeros(int(silence * sample_rate))
+    audio = np.concatenate((gap, 0.3 * signal / np.abs(signal).max(), gap))
+    return audio + noise * rng.standard_normal(len(audio))
+
+
+def _pcm(samples):
+    return (np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes()
+
+
+def _templates():
+    return [extract_template(_word(EION, f0=f0, stretch=stretch, seed=seed), SAMPLE_RATE)
+            for seed, (f0, stretch) in enumerate([(120, 1.0), (135, 1.1), (125, 0.9)])]
+
+
+def test_vad_descarta_silencio_e_chiado_antes_do_dtw():
+    rng = np.random.default_rng(1)
+    assert speech_regions(0.001 * rng.standard_normal(SAMPLE_RATE), SAMPLE_RATE, 512) == []
+    assert speech_regions(0.05 * rng.standard_normal(SAMPLE_RATE), SAMPLE_RATE, 512) == []  # Chiado: ZCR alta
+
+    calls = []
+    detector = WakeWordDetector(lambda: calls.append(1) or _templates(), sensitivity=0.7)
+    assert detector.detect(0.001 * rng.standard_normal(SAMPLE_RATE), SAMPLE_RATE)['stage'] == 'silence'
+    assert calls == []  # Modelos nem foram carregados
+
+    result = detector.detect(_word(EION, f0=150, stretch=1.2, seed=9, noise=0.01), SAMPLE_RATE)
+    assert result['valid'] and result['phrase_detected'] == 'EION' and calls == [1]
+    assert 0.6 < result['speech_seconds'] < result['duration_seconds']
+    assert not detector.detect(_word(OUTRA, seed=3), SAMPLE_RATE)['valid']
+
+    # Sensibilidade baixa exige correspondência mais próxima
+    strict = WakeWordDetector(_templates(), sensitivity=0.2)
+    assert strict.min_confidence > detector.min_confidence
+    assert not strict.detect(_word(OUTRA, seed=3), SAMPLE_RATE)['valid']
+
+
+def test_fluxo_continuo_por_modo_de_energia():
+    for mode, sample_rate in (('eco', 16000), ('performance', 44100)):
+        templates = [extract_template(_word(EION, seed=seed, sample_rate=sample_rate), sample_rate, power_mode=mode)
+                     for seed in range(3)]
+        stream = WakeWordStream(WakeWordDetector(templates, sensitivity=0.7, power_mode=mode))
+        parts = []
+        for index in range(4):
+            parts.append(0.002 * np.random.default_rng(index).standard_normal(2 * sample_rate))
+            parts.append(_word(EION if index % 2 else OUTRA, f0=125 + index, seed=20 + index, sample_rate=sample_rate))
+        pcm = _pcm(np.concatenate(parts))
+        detections = []
+        for offset in range(0, len(pcm), 3000):  # Pedaços de tamanho arbitrário
+            detections += stream.feed(pcm[offset:offset + 3000])
+        detections += stream.flush()
+
+        assert [d['valid'] for d in detections] == [False, True, False, True]
+        stats = stream.stats()
+        assert stats['segments_checked'] == 4 and stats['speech_seconds'] < 0.5 * stats['audio_seconds']
+
+
+def test_cadastro_e_ativacao_pela_api():
+    with app.app_context():
+        user = User(username='wake-word', email='wake-word@iaon.test', custom_trigger_word='EION', trigger_sensitivity=0.7)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    encode = lambda samples: base64.b64encode(_pcm(samples)).decode('ascii')
+
+    # Sem modelos: vale o detector do aparelho
+    response = client.post('/api/voice/background-listening/trigger',
+                           json={'user_id': user_id, 'audio_data': encode(_word(EION)), 'power_mode': 'eco'}).get_json()
+    assert not response['triggered'] and response['enrollment_required']
+
+    # PCM cru: taxa do modo de energia (eco = 16 kHz) ou sample_rate explícito
+    silent = client.post('/api/voice/trigger-word/enroll', json={'user_id': user_id, 'samples': [encode(np.zeros(8000))]})
+    assert silent.status_code == 400
+    samples = [encode(_word(EION, f0=f0, seed=seed)) for seed, f0 in enumerate((120, 135, 125))]
+    enrolled = client.post('/api/voice/trigger-word/enroll', json={'user_id': user_id, 'samples': samples, 'sample_rate': SAMPLE_RATE}).get_json()
+    assert enrolled['templates'] == 3
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            silence = client.post('/api/voice/background-listening/trigger', json={
+                'user_id': user_id, 'audio_data': encode(0.001 * np.random.default_rng(2).standard_normal(16000)),
+                'power_mode': 'eco'}).get_json()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+    assert not silence['triggered'] and silence['stage'] == 'silence'
+    assert not [s for s in statements if 'trigger_word_templates' in s]
+
+    other = client.post('/api/voice/background-listening/trigger',
+                        json={'user_id': user_id, 'audio_data': encode(_word(OUTRA, seed=5)), 'power_mode': 'eco'}).get_json()
+    assert not other['triggered'] and other['stage'] == 'no_match'
+    hit = client.post('/api/voice/background-listening/trigger',
+                      json={'user_id': user_id, 'audio_data': encode(_word(EION, f0=145, seed=7)), 'power_mode': 'eco',
+                            'screen_locked': True}).get_json()
+    assert hit['triggered'] and hit['trigger_word'] == 'EION' and 'wake_screen_briefly' in hit['actions']
+
+
+def test_escuta_continua_pelo_endpoint_de_fluxo():
+    with app.app_context():
+        user = User(username='wake-stream', email='wake-stream@iaon.test', custom_trigger_word='EION', trigger_sensitivity=0.7)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    url = f'/api/voice/background-listening/stream?user_id={user_id}&power_mode=eco&sample_rate={SAMPLE_RATE}'
+    chunked = {'headers': {'Content-Type': 'application/octet-stream', 'Transfer-Encoding': 'chunked'},
+               'environ_overrides': {'wsgi.input_terminated': True}}  # Como no gunicorn
+
+    silence = _pcm(0.002 * np.random.default_rng(3).standard_normal(3 * SAMPLE_RATE))
+    data = client.post(url, input_stream=io.BytesIO(silence), **chunked).get_json()
+    assert not data['triggered'] and data['stage'] == 'silence' and data['stream']['segments_checked'] == 0
+
+    samples = [base64.b64encode(_pcm(_word(EION, f0=f0, seed=seed))).decode('ascii')
+               for seed, f0 in enumerate((120, 135, 125))]
+    client.post('/api/voice/trigger-word/enroll', json={'user_id': user_id, 'samples': samples, 'sample_rate': SAMPLE_RATE})
+
+    # Outra palavra, a palavra de ativação e depois mais áudio que não chega a ser lido
+    audio = silence + _pcm(_word(OUTRA, seed=11)) + _pcm(_word(EION, f0=140, seed=12)) + silence * 20
+    data = client.post(url + '&screen_locked=true', input_stream=io.BytesIO(audio), **chunked).get_json()
+    assert data['triggered'] and data['trigger_word'] == 'EION' and 'wake_screen_briefly' in data['actions']
+    assert 3.5 < data['detected_at_seconds'] < 5.0 and data['stream']['audio_seconds'] < 10
+
+    assert client.post(url + '&encoding=opus', data=b'x').status_code == 415
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Normalização de texto para busca do IAON
+
+Remove acentos, separa tokens, descarta stopwords e aplica um stemmer leve de
+português (inspirado no RSLP) para que "reuniões", "reunião" e "reuniao"
+caiam no mesmo termo. O mesmo texto normalizado alimenta o índice FTS5 do
+SQLite e o índice GIN (to_tsvector 'simple') do PostgreSQL, garantindo que
+os dois bancos se comportem igual.
+"""
+
+import re
+import unicodedata
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Stopwords mais comuns do português, já sem acento
+STOPWORDS = frozenset("""
+a ao aos aquela aquelas aquele aqueles aquilo as ate com como da das de dela delas dele
+deles depois do dos e ela elas ele eles em entre era eram essa essas esse esses esta estas
+este estes estou eu foi fomos for foram ha isso isto ja la lhe lhes mais mas me mesmo meu
+meus minha minhas muito na nas nem no nos nossa nossas nosso nossos num numa o os ou para
+pela pelas pelo pelos por qual quando que quem se sem ser seu seus so sua suas tambem te
+tem tinha to tu tua tuas um uma umas uns voce voces vou vai sobre esta estao estava
+""".split())
+
+# Regras aplicadas em ordem (sufixo, substituição, tamanho mínimo do radical)
+PLURAL_RULES = (
+    ('oes', 'ao', 1), ('aes', 'ao', 1), ('ais', 'al', 1), ('eis', 'el', 2),
+    ('ois', 'ol', 1), ('is', 'il', 2), ('ns', 'm', 1), ('res', 'r', 3), ('s', '', 2),
+)
+FEMININE_RULES = (
+    ('ona', 'ao', 3), ('ora', 'or', 3), ('na', 'no', 4), ('inha', 'inho', 3),
+    ('esa', 'es', 3), ('osa', 'oso', 3), ('iaca', 'iaco', 3), ('ica', 'ico', 3),
+    ('ada', 'ado', 2), ('ida', 'ido', 3), ('ima', 'imo', 3), ('iva', 'ivo', 3),
+    ('eira', 'eiro', 3),
+)
+DEGREE_RULES = (
+    ('issimo', '', 3), ('errimo', '', 4), ('zinho', '', 2), ('inho', '', 3),
+    ('zao', '', 2), ('ao', '', 3),
+)
+ADVERB_RULES = (('mente', '', 4),)
+NOUN_RULES = (
+    ('amento', '', 3), ('imento', '', 3), ('mento', '', 4), ('acao', '', 3),
+    ('icao', '', 3), ('cao', '', 3), ('idade', '', 4), ('ismo', '', 3),
+    ('ista', '', 4), ('avel', '', 2), ('ivel', '', 3), ('eza', '', 3),
+    ('agem', '', 3), ('ario', '', 3), ('ador', '', 3), ('edor', '', 3),
+    ('ivo', '', 4), ('oso', '', 3), ('al', '', 4),
+)
+VERB_RULES = (
+    ('aramos', '', 2), ('assemos', '', 2), ('iriamos', '', 3), ('ariamos', '', 2),
+    ('eriamos', '', 2), ('avamos', '', 2), ('aram', '', 2), ('eram', '', 3),
+    ('iram', '', 3), ('ando', '', 2), ('endo', '', 3), ('indo', '', 3),
+    ('ava', '', 2), ('avam', '', 2), ('aria', '', 2), ('eria', '', 3),
+    ('iria', '', 3), ('amos', '', 2), ('emos', '', 2), ('imos', '', 3),
+    ('ado', '', 2), ('ido', '', 3), ('ar', '', 2), ('er', '', 2), ('ir', '', 3),
+    ('ou', '', 3), ('am', '', 2), ('em', '', 2), ('ei', '', 3),
+)
+VOWEL_RULES = (('a', '', 3), ('e', '', 3), ('o', '', 3))
+
+
+def fold_accents(text):
+    """Remover acentos e caixa ('Reunião' -> 'reuniao')"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    """Separar em tokens já normalizados"""
+    return TOKEN_PATTERN.findall(fold_accents(text))
+
+
+def _apply_rules(word, rules):
+    for suffix, replacement, min_stem in rules:
+        if word.endswith(suffix) and len(word) - len(suffix) >= min_stem:
+            return word[:-len(suffix)] + replacement, True
+    return word, False
+
+
+def stem_portuguese(word):
+    """Reduzir uma palavra (sem acentos) ao seu radical aproximado"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    word, _ = _apply_rules(word, PLURAL_RULES)
+    word, _ = _apply_rules(word, FEMININE_RULES)
+    word, _ = _apply_rules(word, DEGREE_RULES)
+    word, _ = _apply_rules(word, ADVERB_RULES)
+    word, changed = _apply_rules(word, NOUN_RULES)
+    if not changed:
+        word, changed = _apply_rules(word, VERB_RULES)
+    if not changed:
+        word, _ = _apply_rules(word, VOWEL_RULES)
+    return word
+
+
+def build_search_text(*parts):
+    """Texto indexável: tokens normalizados e reduzidos ao radical, na ordem original"""
+    stems = []
+    for part in parts:
+        for token in tokenize(part):
+            if token in STOPWORDS:
+                continue
+            stems.append(stem_portuguese(token))
+    return ' '.join(stems)
+
+
+def search_terms(text, min_length=4, max_terms=16):
+    """Termos de consulta únicos (mesma normalização do índice)"""
+    terms = []
+    seen = set()
+    for token in tokenize(text):
+        if len(token) < min_length or token in STOPWORDS:
+            continue
+        stem = stem_portuguese(token)
+        if stem not in seen:
+            seen.add(stem)
+            terms.append(stem)
+        if len(terms) >= max_terms:
+            break
+    return terms
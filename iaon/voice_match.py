@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de correspondência por voz do IAON
+
+Mantém, por usuário, os nomes de contatos/aplicativos já normalizados (sem
+acento e em minúsculas), o primeiro nome, os apelidos de voz já decodificados
+do JSON, um índice de trigramas e uma chave fonética para o português. Assim
+um comando de voz não precisa carregar e re-analisar todas as linhas do banco:
+a consulta olha só os candidatos que compartilham os trigramas do termo falado.
+
+Os scores reproduzem os de Contact/AppControl.get_voice_match_score():
+nome exato 100, nome de exibição 95, alias exato 90, primeiro nome 85,
+parte do nome 80, parte do alias 70 (somados). A chave fonética só entra
+quando nenhuma regra textual casou (ex.: "Tiago" x "Thiago").
+"""
+
+import heapq
+import json
+import re
+
+from text_search import fold_accents
+
+PHONETIC_SCORE = 60
+
+CONTACT_REASONS = {
+    'alias_exact': 'apelido_exato',
+    'alias_part': 'parte_apelido',
+}
+APP_REASONS = {
+    'alias_exact': 'alias_exato',
+    'alias_part': 'parte_alias',
+}
+
+# Regras fonéticas aplicadas em ordem sobre o texto já sem acento
+PHONETIC_RULES = (
+    (re.compile(r'[^a-z ]'), ''),
+    (re.compile(r'ph'), 'f'),
+    (re.compile(r'th'), 't'),
+    (re.compile(r'lh'), 'li'),
+    (re.compile(r'nh'), 'ni'),
+    (re.compile(r'(ch|sh|x)'), 'x'),
+    (re.compile(r'qu|q'), 'k'),
+    (re.compile(r'gu(?=[ei])'), 'g'),
+    (re.compile(r'g(?=[ei])'), 'j'),
+    (re.compile(r'c(?=[ei])'), 's'),
+    (re.compile(r'c'), 'k'),
+    (re.compile(r'(?<=[aeiou])s(?=[aeiou])'), 'z'),
+    (re.compile(r'w'), 'v'),
+    (re.compile(r'y'), 'i'),
+    (re.compile(r'h'), ''),
+    (re.compile(r'(?<=[aeiou])[mn](?= |$)'), ''),
+    (re.compile(r'(.)\1+'), r'\1'),
+)
+
+
+def normalize_voice_text(text):
+    """Texto de comparação: sem acento, minúsculo e sem espaços nas pontas"""
+    return fold_accents(text).strip()
+
+
+def phonetic_key(text):
+    """Chave fonética aproximada do português ('Thiago' e 'Tiago' -> 'tiago')"""
+    key = normalize_voice_text(text)
+    for pattern, replacement in PHONETIC_RULES:
+        key = pattern.sub(replacement, key)
+    return ' '.join(key.split())
+
+
+def trigrams(text):
+    """Trigramas de um texto já normalizado"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def parse_aliases(raw_aliases):
+    """Decodificar o JSON de apelidos de voz (tolerante a valores inválidos)"""
+    if not raw_aliases:
+        return []
+    try:
+        aliases = json.loads(raw_aliases)
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(aliases, list):
+        return []
+    return [str(alias) for alias in aliases if alias]
+
+
+class VoiceMatchIndex:
+    """Índice em memória de nomes/apelidos de um usuário"""
+
+    def __init__(self, reasons=CONTACT_REASONS, match_first_name=True):
+        self.reasons = reasons
+        self.match_first_name = match_first_name
+        self.entries = []
+        self.by_id = {}
+        self._exact = {}  # texto normalizado -> posições (nome, exibição, alias, primeiro nome)
+        self._trigrams = {}  # trigrama -> posições cujo nome/alias o contém
+        self._phonetic = {}  # chave fonética -> posições
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry_id, name, display_name=None, aliases=None, label=None):
+        """Adicionar um contato/app. `aliases` aceita lista ou o JSON do banco"""
+        if isinstance(aliases, str) or aliases is None:
+            aliases = parse_aliases(aliases)
+        name_key = normalize_voice_text(name)
+        entry = {
+            'id': entry_id,
+            'label': label or display_name or name,
+            'name': name_key,
+            'display_name': normalize_voice_text(display_name) if display_name else '',
+            'first_name': name_key.split()[0] if self.match_first_name and name_key.split() else '',
+            'aliases': [normalize_voice_text(alias) for alias in aliases],
+        }
+        position = len(self.entries)
+        self.entries.append(entry)
+        self.by_id[entry_id] = entry
+
+        for key in (entry['name'], entry['display_name'], entry['first_name'], *entry['aliases']):
+            if key:
+                self._exact.setdefault(key, set()).add(position)
+        for key in (entry['name'], *entry['aliases']):
+            for gram in trigrams(key):
+                self._trigrams.setdefault(gram, set()).add(position)
+        for key in (entry['name'], entry['first_name'], *entry['aliases']):
+            if key:
+                self._phonetic.setdefault(phonetic_key(key), set()).add(position)
+
+    def _candidates(self, query):
+        """Posições que podem casar com o termo (igualdade ou substring)"""
+        if len(query) < 3:
+            return range(len(self.entries))
+        postings = sorted((self._trigrams.get(gram, set()) for gram in trigrams(query)), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        candidates |= self._exact.get(query, set())
+        return sorted(candidates)
+
+    def score(self, entry, query):
+        """Score e motivo de um item (mesmas regras de get_voice_match_score)"""
+        score = 0
+        reason = None
+        if entry['name'] and entry['name'] == query:
+            score += 100
+            reason = 'nome_exato'
+        if entry['display_name'] and entry['display_name'] == query:
+            score += 95
+            reason = reason or 'nome_exibicao'
+        if entry['name'] and query in entry['name']:
+            score += 80
+            reason = reason or 'parte_do_nome'
+        for alias in entry['aliases']:
+            if alias == query:
+                score += 90
+                reason = reason or self.reasons['alias_exact']
+            elif query in alias:
+                score += 70
+                reason = reason or self.reasons['alias_part']
+        if entry['first_name'] and entry['first_name'] == query:
+            score += 85
+            reason = reason or 'primeiro_nome'
+        return score, reason or 'similaridade'
+
+    def match(self, voice_input, threshold=50, limit=None):
+        """Top-k (id, score, motivo) com score acima do limiar, do maior para o menor"""
+        query = normalize_voice_text(voice_input)
+        scored = []
+        for position in self._candidates(query):
+            score, reason = self.score(self.entries[position], query)
+            if score > threshold:
+                scored.append((score, -position, reason))
+
+        if not scored and query and PHONETIC_SCORE > threshold:
+            for position in sorted(self._phonetic.get(phonetic_key(query), ())):
+                scored.append((PHONETIC_SCORE, -position, 'fonetica'))
+
+        # -posição desempata pela ordem de inserção (mesma ordem do banco)
+        best = heapq.nlargest(limit, scored) if limit else sorted(scored, reverse=True)
+        return [(self.entries[-neg_position]['id'], score, reason) for score, neg_position, reason in best]
+
+    def similar(self, target_name, limit=5):
+        """Rótulos de itens que compartilham alguma palavra com o termo (sugestões)"""
+        words = normalize_voice_text(target_name).split()
+        if not words:
+            return []
+        similar = []
+        for entry in self.entries:
+            if any(word in entry['name'] for word in words):
+                similar.append(entry['label'])
+                if len(similar) >= limit:
+                    break
+        return similar
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Detecção de voz e da palavra de ativação do IAON (NumPy)
+
+Filtro em dois estágios para a escuta em segundo plano, do mais barato ao
+mais caro:
+1. VAD por energia RMS e taxa de cruzamentos por zero (ZCR) em blocos de
+   buffer_size amostras, sem FFT: silêncio e chiado (ZCR alta) são
+   descartados; o que sobra vira trechos de fala com margem (hangover)
+2. palavra de ativação por comparação com modelos: MFCCs calculados só nos
+   trechos de fala e comparados por DTW de subsequência (a palavra pode
+   começar em qualquer ponto do trecho) com os modelos que o usuário gravou
+   para custom_trigger_word; trechos curtos demais para a palavra nem chegam
+   ao DTW
+
+trigger_sensitivity baixa o limiar de energia do VAD e aceita distâncias
+DTW maiores. O modo de energia (power_mode) define a taxa de amostragem, o
+tamanho do bloco do VAD e de quanto em quanto tempo um fluxo é processado.
+"""
+
+from collections import deque
+from functools import lru_cache
+
+import numpy as np
+
+from audio_features import decode_audio, frame_signal
+
+POWER_PROFILES = {
+    'eco': {
+        'sample_rate': 16000,           # Menor taxa de amostragem
+        'buffer_size': 1024,            # Buffer maior
+        'processing_interval': 500,     # Processa a cada 500ms
+        'cpu_usage': 'minimal',
+        'battery_impact': '1-2%/hora'
+    },
+    'balanced': {
+        'sample_rate': 22050,           # Taxa média
+        'buffer_size': 512,             # Buffer médio
+        'processing_interval': 250,     # Processa a cada 250ms
+        'cpu_usage': 'low',
+        'battery_impact': '3-5%/hora'
+    },
+    'performance': {
+        'sample_rate': 44100,           # Taxa alta
+        'buffer_size': 256,             # Buffer pequeno
+        'processing_interval': 100,     # Processa a cada 100ms
+        'cpu_usage': 'moderate',
+        'battery_impact': '8-12%/hora'
+    }
+}
+DEFAULT_POWER_MODE = 'balanced'
+DEFAULT_SENSITIVITY = 0.7
+
+# VAD
+MIN_RMS = 0.003  # ~-50 dBFS: abaixo disso é silêncio em qualquer sensibilidade média
+NOISE_PERCENTILE = 10  # Blocos mais fracos de um trecho estimam o ruído de fundo
+NOISE_RISE = 0.1  # Fração com que o piso de ruído de um fluxo sobe por intervalo (desce na hora)
+MAX_SPEECH_ZCR = 0.35  # Ruído branco fica perto de 0.5; vogais bem abaixo
+HANGOVER_SECONDS = 0.15  # Margem mantida antes e depois da fala
+MIN_SPEECH_SECONDS = 0.15  # Trechos menores (cliques, batidas) são descartados
+MAX_SEGMENT_SECONDS = 3.0  # A palavra de ativação está no começo do trecho
+
+# MFCC e DTW
+FRAME_SECONDS = 0.025
+HOP_SECONDS = 0.010
+N_MELS = 26
+N_MFCC = 13  # c0 (energia) é descartado: comparação independe do volume
+MAX_FREQUENCY = 8000.0  # Banco mel até 8 kHz: mesmos MFCCs em 16, 22 ou 44 kHz
+STEP_PENALTY = 2.0  # Peso dos passos que esticam/comprimem a palavra no DTW
+MIN_LENGTH_RATIO = 0.6  # Trecho de fala mais curto que isso x modelo não é a palavra
+HALF_CONFIDENCE_DISTANCE = 4.0  # Distância DTW média por quadro com confiança 0.5
+
+
+def power_profile(power_mode):
+    """Perfil de energia (modo desconhecido usa o equilibrado)"""
+    return dict(POWER_PROFILES.get(power_mode) or POWER_PROFILES[DEFAULT_POWER_MODE])
+
+
+def to_samples(audio, sample_rate):
+    """Amostras float (-1..1) de bytes/base64 (via decode_audio) ou de um array já decodificado"""
+    if isinstance(audio, np.ndarray):
+        return audio.astype(np.float64, copy=False), sample_rate
+    return decode_audio(audio, sample_rate)
+
+
+def block_energy(blocks):
+    """Energia RMS e ZCR por bloco (matriz blocos x amostras)"""
+    rms = np.sqrt(np.mean(blocks * blocks, axis=1))
+    zcr = np.mean(np.signbit(blocks[:, 1:]) != np.signbit(blocks[:, :-1]), axis=1)
+    return rms, zcr
+
+
+def speech_threshold(noise_floor, sensitivity):
+    """Limiar de energia: piso de ruído x razão (menor com sensibilidade alta)"""
+    ratio = 1.5 + 3.0 * (1.0 - sensitivity)
+    return max(MIN_RMS * (0.5 + 2.0 * (1.0 - sensitivity)), noise_floor * ratio)
+
+
+def _runs(mask):
+    """Pares (início, fim) dos trechos True de uma máscara booleana"""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def speech_regions(samples, sample_rate, block_size, sensitivity=DEFAULT_SENSITIVITY, noise_floor=None):
+    """Trechos de fala (início, fim em amostras) de um clipe; só energia e ZCR, sem FFT"""
+    blocks = frame_signal(samples, block_size, block_size)
+    if len(blocks) == 0:
+        return []
+    rms, zcr = block_energy(blocks)
+    if noise_floor is None:
+        noise_floor = float(np.percentile(rms, NOISE_PERCENTILE))
+    speech = (rms >= speech_threshold(noise_floor, sensitivity)) & (zcr <= MAX_SPEECH_ZCR)
+    hangover = int(np.ceil(HANGOVER_SECONDS * sample_rate / block_size))
+    if hangover and speech.any():
+        speech = np.convolve(speech, np.ones(2 * hangover + 1), mode='same') > 0
+    min_blocks = MIN_SPEECH_SECONDS * sample_rate / block_size
+    return [(int(start) * block_size, min(len(samples), int(end) * block_size))
+            for start, end in _runs(speech) if end - start >= min_blocks]
+
+
+@lru_cache(maxsize=8)
+def mfcc_setup(sample_rate):
+    """Tamanhos, janela, banco mel (até MAX_FREQUENCY) e DCT por taxa de amostragem"""
+    frame_length = int(round(FRAME_SECONDS * sample_rate))
+    hop_length = int(round(HOP_SECONDS * sample_rate))
+    n_fft = 1 << (frame_length - 1).bit_length()
+    frequencies = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    top = min(MAX_FREQUENCY, sample_rate / 2.0)
+    mel_points = np.linspace(0.0, 2595.0 * np.log10(1.0 + top / 700.0), N_MELS + 2)
+    hz_points = 700.0 * (10 ** (mel_points / 2595.0) - 1.0)
+    filterbank = np.zeros((N_MELS, len(frequencies)))
+    for band in range(N_MELS):
+        left, center, right = hz_points[band:band + 3]
+        filterbank[band] = np.maximum(0.0, np.minimum((frequencies - left) / (center - left),
+                                                      (right - frequencies) / (right - center)))
+    n = np.arange(N_MELS)
+    dct = np.cos(np.pi / N_MELS * (n[None, :] + 0.5) * np.arange(1, N_MFCC)[:, None]) * np.sqrt(2.0 / N_MELS)
+    return frame_length, hop_length, n_fft, np.hanning(frame_length), filterbank.T.copy(), dct.T.copy()
+
+
+def mfcc_frames(samples, sample_rate):
+    """MFCCs c1..c12 por quadro de 25 ms, com a média do trecho subtraída (CMN)"""
+    frame_length, hop_length, n_fft, window, filterbank, dct = mfcc_setup(sample_rate)
+    frames = frame_signal(samples, frame_length, hop_length)
+    power = np.abs(np.fft.rfft(frames * window, n_fft)) ** 2
+    mfcc = np.log(power @ filterbank + 1e-10) @ dct
+    return mfcc - mfcc.mean(axis=0)
+
+
+def subsequence_dtw(template, segment):
+    """Menor distância média por quadro do modelo contra qualquer subsequência do trecho.
+
+    Cada quadro do modelo avança 1 quadro do trecho (diagonal) ou, com peso
+    STEP_PENALTY, 0 ou 2 quadros (fala mais lenta ou mais rápida que o modelo).
+    Cada linha depende só da anterior, então o laço é por quadro do modelo e
+    vetorizado ao longo do trecho."""
+    squared = (template * template).sum(axis=1)[:, None] + (segment * segment).sum(axis=1)[None, :] \
+        - 2.0 * template @ segment.T
+    cost = np.sqrt(np.maximum(squared, 0.0))
+    inf = np.full(2, np.inf)
+    previous = cost[0]  # Início livre em qualquer quadro do trecho
+    for row in cost[1:]:
+        padded = np.concatenate((inf, previous))
+        previous = np.minimum(padded[1:-1] + row, np.minimum(padded[:-2], previous) + STEP_PENALTY * row)
+    return float(previous.min()) / len(template)
+
+
+def distance_confidence(distance):
+    """Confiança 0..1 a partir da distância DTW (0.5 em HALF_CONFIDENCE_DISTANCE)"""
+    return 1.0 / (1.0 + (distance / HALF_CONFIDENCE_DISTANCE) ** 2)
+
+
+def extract_template(audio, sample_rate=None, sensitivity=DEFAULT_SENSITIVITY, power_mode=DEFAULT_POWER_MODE):
+    """Modelo da palavra (MFCCs float32 do maior trecho de fala) ou None sem fala no clipe"""
+    profile = power_profile(power_mode)
+    samples, sample_rate = to_samples(audio, sample_rate or profile['sample_rate'])
+    block_size = max(1, round(sample_rate * profile['buffer_size'] / profile['sample_rate']))
+    # Gravação cortada rente à fala não tem piso de ruído: vale o limiar absoluto
+    regions = speech_regions(samples, sample_rate, block_size, sensitivity) or \
+        speech_regions(samples, sample_rate, block_size, sensitivity, noise_floor=0.0)
+    if not regions:
+        return None
+    start, end = max(regions, key=lambda region: region[1] - region[0])
+    end = min(end, start + int(MAX_SEGMENT_SECONDS * sample_rate))
+    return mfcc_frames(samples[start:end], sample_rate).astype(np.float32)
+
+
+def template_to_bytes(template):
+    return np.ascontiguousarray(template, dtype='<f4').tobytes()
+
+
+def template_from_bytes(data):
+    return np.frombuffer(data, dtype='<f4').reshape(-1, N_MFCC - 1)
+
+
+class WakeWordDetector:
+    """Detector da palavra de ativação de um usuário
+
+    `templates` pode ser uma lista de modelos (MFCCs de extract_template) ou
+    uma função sem argumentos que os devolve; a função só é chamada quando há
+    fala no áudio (o caso comum, silêncio, não consulta o banco)."""
+
+    def __init__(self, templates=(), phrase='EION', sensitivity=DEFAULT_SENSITIVITY, power_mode=DEFAULT_POWER_MODE):
+        self._templates = templates
+        self.phrase = phrase
+        self.sensitivity = min(0.99, max(0.01, float(sensitivity if sensitivity is not None else DEFAULT_SENSITIVITY)))
+        self.power_mode = power_mode if power_mode in POWER_PROFILES else DEFAULT_POWER_MODE
+        self.profile = power_profile(self.power_mode)
+        self.block_seconds = self.profile['buffer_size'] / self.profile['sample_rate']
+        # Confiança mínima para aceitar: mais sensível, aceita mais longe
+        self.min_confidence = 1.0 - self.sensitivity
+
+    @property
+    def templates(self):
+        if callable(self._templates):
+            self._templates = [np.asarray(template) for template in self._templates()]
+        return self._templates
+
+    def block_size(self, sample_rate):
+        return max(1, round(sample_rate * self.block_seconds))
+
+    def settings(self):
+        """Parâmetros efetivos (para a resposta de configuração da escuta)"""
+        return {
+            'vad_block_ms': round(self.block_seconds * 1000, 1),
+            'vad_threshold_ratio': round(speech_threshold(1.0, self.sensitivity), 2),
+            'max_speech_zcr': MAX_SPEECH_ZCR,
+            'hangover_ms': int(HANGOVER_SECONDS * 1000),
+            'min_confidence': round(self.min_confidence, 3),
+            'processing_interval_ms': self.profile['processing_interval']
+        }
+
+    def match(self, samples, sample_rate):
+        """Comparar um trecho de fala com os modelos: (confiança, estágio)"""
+        templates = self.templates
+        if not templates:
+            return 0.0, 'no_template'
+        seconds = len(samples) / sample_rate
+        if seconds < MIN_LENGTH_RATIO * min(len(template) for template in templates) * HOP_SECONDS:
+            return 0.0, 'too_short'
+        segment = mfcc_frames(samples[:int(MAX_SEGMENT_SECONDS * sample_rate)], sample_rate)
+        distance = min(subsequence_dtw(template, segment) for template in templates)
+        confidence = distance_confidence(distance)
+        return confidence, 'match' if confidence >= self.min_confidence else 'no_match'
+
+    def detect(self, audio, sample_rate=None, noise_floor=None):
+        """Procurar a palavra em um clipe: silêncio sai no VAD, antes de MFCC/DTW"""
+        samples, sample_rate = to_samples(audio, sample_rate or self.profile['sample_rate'])
+        regions = speech_regions(samples, sample_rate, self.block_size(sample_rate), self.sensitivity, noise_floor)
+        result = {
+            'valid': False,
+            'confidence': 0.0,
+            'phrase_detected': 'unknown',
+            'stage': 'silence',
+            'duration_seconds': round(len(samples) / sample_rate, 3),
+            'speech_seconds': round(sum(end - start for start, end in regions) / sample_rate, 3)
+        }
+        for start, end in regions:
+            confidence, stage = self.match(samples[start:end], sample_rate)
+            if confidence >= result['confidence'] or result['stage'] == 'silence':
+                result.update(confidence=round(confidence, 3), stage=stage)
+            if stage in ('match', 'no_template'):
+                break
+        if result['stage'] == 'match':
+            result.update(valid=True, phrase_detected=self.phrase)
+        return result
+
+
+class WakeWordStream:
+    """Escuta contínua de um cliente: PCM 16 bits mono em pedaços de qualquer tamanho
+
+    Os bytes são acumulados sem conversão e processados a cada processing_interval do perfil,
+    em blocos de buffer_size amostras. O piso de ruído acompanha o ambiente
+    (desce na hora, sobe devagar) e cada trecho de fala é comparado com os
+    modelos quando termina (pausa maior que o hangover) ou chega a
+    MAX_SEGMENT_SECONDS."""
+
+    def __init__(self, detector, sample_rate=None):
+        self.detector = detector
+        self.sample_rate = sample_rate or detector.profile['sample_rate']
+        self.block_size = detector.block_size(self.sample_rate)
+        self.block_bytes = self.block_size * 2
+        self.interval_bytes = max(self.block_bytes, int(self.sample_rate * detector.profile['processing_interval'] / 1000) * 2)
+        self.hangover_blocks = max(1, int(np.ceil(HANGOVER_SECONDS * self.sample_rate / self.block_size)))
+        self.max_blocks = int(MAX_SEGMENT_SECONDS * self.sample_rate / self.block_size)
+        self.noise_floor = None
+        self.position = 0  # Amostras já processadas
+        self.speech_samples = 0
+        self.segments_checked = 0
+        self._pending = bytearray()
+        self._preroll = deque(maxlen=self.hangover_blocks)
+        self._segment = []  # Blocos do trecho de fala em andamento
+        self._segment_start = 0
+        self._lead_blocks = 0  # Blocos de margem antes do início da fala
+        self._silent_blocks = 0
+
+    def feed(self, pcm):
+        """Acrescentar áudio; devolve as detecções dos trechos encerrados neste pedaço"""
+        self._pending.extend(pcm)
+        if len(self._pending) < self.interval_bytes:
+            return []
+        return self._process_pending()
+
+    def flush(self):
+        """Encerrar o trecho em andamento (fim do fluxo)"""
+        detections = self._process_pending()
+        self._pending.clear()
+        if self._segment:
+            detections.extend(self._close())
+        return detections
+
+    def _process_pending(self):
+        usable = len(self._pending) // self.block_bytes * self.block_bytes
+        if not usable:
+            return []
+        chunk = np.frombuffer(bytes(self._pending[:usable]), dtype='<i2') / 32768.0
+        del self._pending[:usable]
+        return self._process(chunk)
+
+    def _process(self, chunk):
+        blocks = chunk.reshape(-1, self.block_size)
+        rms, zcr = block_energy(blocks)
+        quiet = len(rms) * NOISE_PERCENTILE // 100
+        floor = float(np.partition(rms, quiet)[quiet])
+        if self.noise_floor is None or floor < self.noise_floor:
+            self.noise_floor = floor
+        else:
+            self.noise_floor += (floor - self.noise_floor) * NOISE_RISE
+        speech = (rms >= speech_threshold(self.noise_floor, self.detector.sensitivity)) & (zcr <= MAX_SPEECH_ZCR)
+
+        detections = []
+        for index, block in enumerate(blocks):
+            if self._segment:
+                self._segment.append(block)
+                self._silent_blocks = 0 if speech[index] else self._silent_blocks + 1
+                if self._silent_blocks >= self.hangover_blocks or len(self._segment) >= self.max_blocks:
+                    detections.extend(self._close())
+            elif speech[index]:
+                self._segment_start = self.position + index * self.block_size - len(self._preroll) * self.block_size
+                self._segment = list(self._preroll) + [block]
+                self._lead_blocks = len(self._preroll)
+                self._silent_blocks = 0
+                self._preroll.clear()
+            else:
+                self._preroll.append(block)
+        self.position += len(chunk)
+        return detections
+
+    def _close(self):
+        blocks = self._segment
+        self._segment = []
+        voiced = len(blocks) - self._silent_blocks - self._lead_blocks
+        self._silent_blocks = 0
+        if voiced * self.block_size < MIN_SPEECH_SECONDS * self.sample_rate:
+            return []
+        samples = np.concatenate(blocks)
+        self.speech_samples += len(samples)
+        self.segments_checked += 1
+        confidence, stage = self.detector.match(samples, self.sample_rate)
+        return [{
+            'valid': stage == 'match',
+            'confidence': round(confidence, 3),
+            'phrase_detected': self.detector.phrase if stage == 'match' else 'unknown',
+            'stage': stage,
+            'start_seconds': round(self._segment_start / self.sample_rate, 3),
+            'end_seconds': round((self._segment_start + len(samples)) / self.sample_rate, 3)
+        }]
+
+    def stats(self):
+        seconds = self.position / self.sample_rate
+        return {
+            'audio_seconds': round(seconds, 3),
+            'speech_seconds': round(self.speech_samples / self.sample_rate, 3),
+            'segments_checked': self.segments_checked,
+            'noise_floor': self.noise_floor
+        }